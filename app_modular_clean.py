@@ -171,6 +171,33 @@ def initialize_route_services(app):
             except Exception as e:
                 print(f"️ Warning: Could not initialize admin routes: {e}")
                 
+            # Build resort room availability index from current bookings
+            try:
+                from services.room_availability import get_room_index
+                get_room_index().rebuild()
+            except Exception as e:
+                print(f" Warning: Could not build room availability index: {e}")
+
+            # Generate spa slot bitmaps for the coming season
+            try:
+                from services.spa_scheduler import get_spa_scheduler
+                get_spa_scheduler().generate_season()
+            except Exception as e:
+                print(f" Warning: Could not generate spa slots: {e}")
+
+            # Subscribe mission progress counters and activity bitmaps to domain
+            # events, re-assign missions to customers on an outdated catalog version
+            # and schedule the recurring mission expiry / rollover sweeper
+            try:
+                import services.mission_progress
+                import services.activity_bitmaps
+                from services.mission_assignment import mission_assigner
+                from services.mission_expiry import mission_sweeper
+                mission_assigner.request_sweep()
+                mission_sweeper.schedule()
+            except Exception as e:
+                print(f" Warning: Could not start mission engines: {e}")
+
             # Initialize AI chat routes
             try:
                 from routes.ai_chat_routes import ai_chat_bp
@@ -444,6 +471,11 @@ def log_request_info():
 @app.after_request
 def after_request(response):
     logger.debug('Response: %s %s', response.status_code, response.status)
+    from services.request_lookup import get_lookup_stats
+    lookup_stats = get_lookup_stats()
+    if lookup_stats['queries'] or lookup_stats['saved']:
+        logger.debug('Lookups: %s queries, %s saved', lookup_stats['queries'], lookup_stats['saved'])
+        response.headers['X-Lookup-Queries-Saved'] = str(lookup_stats['saved'])
     return response
 
 
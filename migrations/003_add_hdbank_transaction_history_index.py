@@ -0,0 +1,65 @@
+# migrations/003_add_hdbank_transaction_history_index.py
+# -*- coding: utf-8 -*-
+"""
+Migration script to add the composite index used by keyset-paginated HDBank history
+Created on: 2026-10-18
+"""
+
+from sqlalchemy import text
+from models.database import db
+
+INDEX_NAME = 'idx_hdbank_tx_customer_date_id'
+
+
+def upgrade():
+    """Create index hdbank_transactions(customer_id, transaction_date, id)"""
+    try:
+        with db.engine.connect() as conn:
+            # db.create_all() đã tạo index cho database mới
+            exists = conn.execute(text('''
+                SELECT COUNT(*) FROM information_schema.statistics
+                WHERE table_schema = DATABASE()
+                  AND table_name = 'hdbank_transactions'
+                  AND index_name = :index_name
+            '''), {'index_name': INDEX_NAME}).scalar()
+
+            if not exists:
+                conn.execute(text(f'''
+                    CREATE INDEX {INDEX_NAME}
+                    ON hdbank_transactions (customer_id, transaction_date, id)
+                '''))
+
+            conn.commit()
+            print("✅ HDBank history index migration completed successfully")
+            return True
+
+    except Exception as e:
+        print(f"❌ HDBank history index migration failed: {e}")
+        return False
+
+
+def downgrade():
+    """Drop the history index"""
+    try:
+        with db.engine.connect() as conn:
+            conn.execute(text(f'DROP INDEX {INDEX_NAME} ON hdbank_transactions'))
+            conn.commit()
+            print("✅ HDBank history index dropped successfully")
+            return True
+
+    except Exception as e:
+        print(f"❌ Failed to drop HDBank history index: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    # Run migration when executed directly
+    from flask import Flask
+    from config import Config
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    db.init_app(app)
+
+    with app.app_context():
+        upgrade()
@@ -0,0 +1,72 @@
+# migrations/005_add_vietjet_group_booking_columns.py
+# -*- coding: utf-8 -*-
+"""
+Migration script to add per-passenger group booking columns to vietjet_flights
+Created on: 2026-10-18
+"""
+
+from sqlalchemy import text
+from models.database import db
+
+INDEX_NAME = 'idx_vietjet_flight_booking_group'
+
+
+def upgrade():
+    """Add vietjet_flights.passenger_name, booking_group_id and the group index"""
+    try:
+        with db.engine.connect() as conn:
+            # db.create_all() đã tạo cột / index cho database mới
+            columns = {row[0] for row in conn.execute(text('''
+                SELECT column_name FROM information_schema.columns
+                WHERE table_schema = DATABASE() AND table_name = 'vietjet_flights'
+            '''))}
+
+            if 'passenger_name' not in columns:
+                conn.execute(text('ALTER TABLE vietjet_flights ADD COLUMN passenger_name VARCHAR(100) NULL'))
+            if 'booking_group_id' not in columns:
+                conn.execute(text('ALTER TABLE vietjet_flights ADD COLUMN booking_group_id VARCHAR(50) NULL'))
+
+            exists = conn.execute(text('''
+                SELECT COUNT(*) FROM information_schema.statistics
+                WHERE table_schema = DATABASE()
+                  AND table_name = 'vietjet_flights'
+                  AND index_name = :index_name
+            '''), {'index_name': INDEX_NAME}).scalar()
+            if not exists:
+                conn.execute(text(f'CREATE INDEX {INDEX_NAME} ON vietjet_flights (booking_group_id)'))
+
+            conn.commit()
+            print("✅ Vietjet group booking migration completed successfully")
+            return True
+
+    except Exception as e:
+        print(f"❌ Vietjet group booking migration failed: {e}")
+        return False
+
+
+def downgrade():
+    """Drop the group booking columns"""
+    try:
+        with db.engine.connect() as conn:
+            conn.execute(text(f'DROP INDEX {INDEX_NAME} ON vietjet_flights'))
+            conn.execute(text('ALTER TABLE vietjet_flights DROP COLUMN booking_group_id, DROP COLUMN passenger_name'))
+            conn.commit()
+            print("✅ Vietjet group booking columns dropped successfully")
+            return True
+
+    except Exception as e:
+        print(f"❌ Failed to drop Vietjet group booking columns: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    # Run migration when executed directly
+    from flask import Flask
+    from config import Config
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    db.init_app(app)
+
+    with app.app_context():
+        upgrade()
@@ -0,0 +1,82 @@
+# migrations/006_add_resort_booking_room_dates.py
+# -*- coding: utf-8 -*-
+"""
+Migration script to add room and stay dates to resort_bookings for the room availability index
+Created on: 2026-10-18
+"""
+
+from sqlalchemy import text
+from models.database import db
+
+INDEX_NAME = 'idx_resort_booking_room_checkout'
+
+
+def upgrade():
+    """Add resort_bookings.room_id, check_in_date, check_out_date and the room index"""
+    try:
+        with db.engine.connect() as conn:
+            # db.create_all() đã tạo cột / index cho database mới (và bảng resort_rooms)
+            columns = {row[0] for row in conn.execute(text('''
+                SELECT column_name FROM information_schema.columns
+                WHERE table_schema = DATABASE() AND table_name = 'resort_bookings'
+            '''))}
+
+            if 'room_id' not in columns:
+                conn.execute(text('ALTER TABLE resort_bookings ADD COLUMN room_id INT NULL'))
+                conn.execute(text('''
+                    ALTER TABLE resort_bookings ADD CONSTRAINT fk_resort_booking_room
+                    FOREIGN KEY (room_id) REFERENCES resort_rooms (id)
+                '''))
+            if 'check_in_date' not in columns:
+                conn.execute(text('ALTER TABLE resort_bookings ADD COLUMN check_in_date DATE NULL'))
+            if 'check_out_date' not in columns:
+                conn.execute(text('ALTER TABLE resort_bookings ADD COLUMN check_out_date DATE NULL'))
+
+            exists = conn.execute(text('''
+                SELECT COUNT(*) FROM information_schema.statistics
+                WHERE table_schema = DATABASE()
+                  AND table_name = 'resort_bookings'
+                  AND index_name = :index_name
+            '''), {'index_name': INDEX_NAME}).scalar()
+            if not exists:
+                conn.execute(text(f'CREATE INDEX {INDEX_NAME} ON resort_bookings (room_id, check_out_date)'))
+
+            conn.commit()
+            print("✅ Resort booking room dates migration completed successfully")
+            return True
+
+    except Exception as e:
+        print(f"❌ Resort booking room dates migration failed: {e}")
+        return False
+
+
+def downgrade():
+    """Drop the room and stay date columns"""
+    try:
+        with db.engine.connect() as conn:
+            conn.execute(text('ALTER TABLE resort_bookings DROP FOREIGN KEY fk_resort_booking_room'))
+            conn.execute(text(f'DROP INDEX {INDEX_NAME} ON resort_bookings'))
+            conn.execute(text('''
+                ALTER TABLE resort_bookings
+                DROP COLUMN check_out_date, DROP COLUMN check_in_date, DROP COLUMN room_id
+            '''))
+            conn.commit()
+            print("✅ Resort booking room dates columns dropped successfully")
+            return True
+
+    except Exception as e:
+        print(f"❌ Failed to drop resort booking room dates columns: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    # Run migration when executed directly
+    from flask import Flask
+    from config import Config
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    db.init_app(app)
+
+    with app.app_context():
+        upgrade()
@@ -0,0 +1,65 @@
+# migrations/007_add_p2p_listing_feed_index.py
+# -*- coding: utf-8 -*-
+"""
+Migration script to add the composite index used by the keyset-paginated P2P listing feed
+Created on: 2026-10-18
+"""
+
+from sqlalchemy import text
+from models.database import db
+
+INDEX_NAME = 'idx_p2p_listing_status_created_id'
+
+
+def upgrade():
+    """Create index p2p_listings(status, created_at, id)"""
+    try:
+        with db.engine.connect() as conn:
+            # db.create_all() đã tạo index cho database mới
+            exists = conn.execute(text('''
+                SELECT COUNT(*) FROM information_schema.statistics
+                WHERE table_schema = DATABASE()
+                  AND table_name = 'p2p_listings'
+                  AND index_name = :index_name
+            '''), {'index_name': INDEX_NAME}).scalar()
+
+            if not exists:
+                conn.execute(text(f'''
+                    CREATE INDEX {INDEX_NAME}
+                    ON p2p_listings (status, created_at, id)
+                '''))
+
+            conn.commit()
+            print("✅ P2P listing feed index migration completed successfully")
+            return True
+
+    except Exception as e:
+        print(f"❌ P2P listing feed index migration failed: {e}")
+        return False
+
+
+def downgrade():
+    """Drop the feed index"""
+    try:
+        with db.engine.connect() as conn:
+            conn.execute(text(f'DROP INDEX {INDEX_NAME} ON p2p_listings'))
+            conn.commit()
+            print("✅ P2P listing feed index dropped successfully")
+            return True
+
+    except Exception as e:
+        print(f"❌ Failed to drop P2P listing feed index: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    # Run migration when executed directly
+    from flask import Flask
+    from config import Config
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    db.init_app(app)
+
+    with app.app_context():
+        upgrade()
@@ -0,0 +1,81 @@
+# migrations/008_add_customer_mission_unique_keys.py
+# -*- coding: utf-8 -*-
+"""
+Migration script to add the unique keys used by the bulk mission sync
+Created on: 2026-10-18
+"""
+
+from sqlalchemy import text
+from models.database import db
+
+# (table, index name, columns)
+INDEXES = [
+    ('customer_missions', 'uq_customer_mission', 'customer_id, mission_id'),
+    ('customer_mission_progress', 'uq_customer_mission_progress', 'customer_id, mission_id, requirement_key'),
+]
+
+
+def upgrade():
+    """Create unique indexes customer_missions(customer_id, mission_id) và
+    customer_mission_progress(customer_id, mission_id, requirement_key)"""
+    try:
+        with db.engine.connect() as conn:
+            for table, index_name, columns in INDEXES:
+                # db.create_all() đã tạo index cho database mới
+                exists = conn.execute(text('''
+                    SELECT COUNT(*) FROM information_schema.statistics
+                    WHERE table_schema = DATABASE()
+                      AND table_name = :table
+                      AND index_name = :index_name
+                '''), {'table': table, 'index_name': index_name}).scalar()
+                if exists:
+                    continue
+
+                # Bản ghi trùng do các lần đồng bộ chạy song song trước đây: không tự xóa dữ liệu,
+                # chỉ tạo index thường để vẫn có đường truy vấn theo khách hàng
+                duplicates = conn.execute(text(f'''
+                    SELECT COUNT(*) FROM (
+                        SELECT 1 FROM {table} GROUP BY {columns} HAVING COUNT(*) > 1
+                    ) AS dup
+                ''')).scalar()
+                if duplicates:
+                    print(f"⚠️ {table}: {duplicates} nhóm bản ghi trùng, tạo index không unique")
+                    conn.execute(text(f'CREATE INDEX {index_name} ON {table} ({columns})'))
+                else:
+                    conn.execute(text(f'CREATE UNIQUE INDEX {index_name} ON {table} ({columns})'))
+
+            conn.commit()
+            print("✅ Customer mission unique keys migration completed successfully")
+            return True
+
+    except Exception as e:
+        print(f"❌ Customer mission unique keys migration failed: {e}")
+        return False
+
+
+def downgrade():
+    """Drop the unique keys"""
+    try:
+        with db.engine.connect() as conn:
+            for table, index_name, _ in INDEXES:
+                conn.execute(text(f'DROP INDEX {index_name} ON {table}'))
+            conn.commit()
+            print("✅ Customer mission unique keys dropped successfully")
+            return True
+
+    except Exception as e:
+        print(f"❌ Failed to drop customer mission unique keys: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    # Run migration when executed directly
+    from flask import Flask
+    from config import Config
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    db.init_app(app)
+
+    with app.app_context():
+        upgrade()
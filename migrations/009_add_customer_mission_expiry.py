@@ -0,0 +1,72 @@
+# migrations/009_add_customer_mission_expiry.py
+# -*- coding: utf-8 -*-
+"""
+Migration script to add the recurring mission period / expiry columns to customer_missions
+Created on: 2026-10-18
+"""
+
+from sqlalchemy import text
+from models.database import db
+
+INDEX_NAME = 'idx_customer_mission_expiry'
+
+
+def upgrade():
+    """Add customer_missions.period_key, expires_at and the (status, expires_at) sweeper index"""
+    try:
+        with db.engine.connect() as conn:
+            # db.create_all() đã tạo cột / index (và bảng customer_missions_archive) cho database mới
+            columns = {row[0] for row in conn.execute(text('''
+                SELECT column_name FROM information_schema.columns
+                WHERE table_schema = DATABASE() AND table_name = 'customer_missions'
+            '''))}
+
+            if 'period_key' not in columns:
+                conn.execute(text('ALTER TABLE customer_missions ADD COLUMN period_key VARCHAR(20) NULL'))
+            if 'expires_at' not in columns:
+                conn.execute(text('ALTER TABLE customer_missions ADD COLUMN expires_at DATETIME NULL'))
+
+            exists = conn.execute(text('''
+                SELECT COUNT(*) FROM information_schema.statistics
+                WHERE table_schema = DATABASE()
+                  AND table_name = 'customer_missions'
+                  AND index_name = :index_name
+            '''), {'index_name': INDEX_NAME}).scalar()
+            if not exists:
+                conn.execute(text(f'CREATE INDEX {INDEX_NAME} ON customer_missions (status, expires_at)'))
+
+            conn.commit()
+            print("✅ Customer mission expiry migration completed successfully")
+            return True
+
+    except Exception as e:
+        print(f"❌ Customer mission expiry migration failed: {e}")
+        return False
+
+
+def downgrade():
+    """Drop the expiry columns"""
+    try:
+        with db.engine.connect() as conn:
+            conn.execute(text(f'DROP INDEX {INDEX_NAME} ON customer_missions'))
+            conn.execute(text('ALTER TABLE customer_missions DROP COLUMN expires_at, DROP COLUMN period_key'))
+            conn.commit()
+            print("✅ Customer mission expiry columns dropped successfully")
+            return True
+
+    except Exception as e:
+        print(f"❌ Failed to drop customer mission expiry columns: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    # Run migration when executed directly
+    from flask import Flask
+    from config import Config
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    db.init_app(app)
+
+    with app.app_context():
+        upgrade()
@@ -0,0 +1,61 @@
+# migrations/010_add_customer_achievement_unlock_index.py
+# -*- coding: utf-8 -*-
+"""
+Migration script to add the (achievement_id, unlocked_at) index used by the admin achievement catalog
+Created on: 2026-10-18
+"""
+
+from sqlalchemy import text
+from models.database import db
+
+INDEX_NAME = 'idx_customer_achievement_unlocked'
+
+
+def upgrade():
+    """Create index customer_achievements(achievement_id, unlocked_at)"""
+    try:
+        with db.engine.connect() as conn:
+            # db.create_all() đã tạo index cho database mới
+            exists = conn.execute(text('''
+                SELECT COUNT(*) FROM information_schema.statistics
+                WHERE table_schema = DATABASE()
+                  AND table_name = 'customer_achievements'
+                  AND index_name = :index_name
+            '''), {'index_name': INDEX_NAME}).scalar()
+            if not exists:
+                conn.execute(text(f'CREATE INDEX {INDEX_NAME} ON customer_achievements (achievement_id, unlocked_at)'))
+
+            conn.commit()
+            print("✅ Customer achievement unlock index migration completed successfully")
+            return True
+
+    except Exception as e:
+        print(f"❌ Customer achievement unlock index migration failed: {e}")
+        return False
+
+
+def downgrade():
+    """Drop the unlock index"""
+    try:
+        with db.engine.connect() as conn:
+            conn.execute(text(f'DROP INDEX {INDEX_NAME} ON customer_achievements'))
+            conn.commit()
+            print("✅ Customer achievement unlock index dropped successfully")
+            return True
+
+    except Exception as e:
+        print(f"❌ Failed to drop customer achievement unlock index: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    # Run migration when executed directly
+    from flask import Flask
+    from config import Config
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    db.init_app(app)
+
+    with app.app_context():
+        upgrade()
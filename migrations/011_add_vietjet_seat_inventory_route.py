@@ -0,0 +1,61 @@
+# migrations/011_add_vietjet_seat_inventory_route.py
+# -*- coding: utf-8 -*-
+"""
+Migration script to add the flight route to vietjet_seat_inventory
+Created on: 2026-10-18
+"""
+
+from sqlalchemy import text
+from models.database import db
+
+
+def upgrade():
+    """Add vietjet_seat_inventory.origin, destination"""
+    try:
+        with db.engine.connect() as conn:
+            # db.create_all() đã tạo cột cho database mới
+            columns = {row[0] for row in conn.execute(text('''
+                SELECT column_name FROM information_schema.columns
+                WHERE table_schema = DATABASE() AND table_name = 'vietjet_seat_inventory'
+            '''))}
+
+            # Dòng cũ để NULL: tuyến được tra lại theo lịch bay khi xác nhận giữ chỗ
+            if 'origin' not in columns:
+                conn.execute(text('ALTER TABLE vietjet_seat_inventory ADD COLUMN origin VARCHAR(10) NULL'))
+            if 'destination' not in columns:
+                conn.execute(text('ALTER TABLE vietjet_seat_inventory ADD COLUMN destination VARCHAR(10) NULL'))
+
+            conn.commit()
+            print("✅ Vietjet seat inventory route migration completed successfully")
+            return True
+
+    except Exception as e:
+        print(f"❌ Vietjet seat inventory route migration failed: {e}")
+        return False
+
+
+def downgrade():
+    """Drop the route columns"""
+    try:
+        with db.engine.connect() as conn:
+            conn.execute(text('ALTER TABLE vietjet_seat_inventory DROP COLUMN destination, DROP COLUMN origin'))
+            conn.commit()
+            print("✅ Vietjet seat inventory route columns dropped successfully")
+            return True
+
+    except Exception as e:
+        print(f"❌ Failed to drop Vietjet seat inventory route columns: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    # Run migration when executed directly
+    from flask import Flask
+    from config import Config
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    db.init_app(app)
+
+    with app.app_context():
+        upgrade()
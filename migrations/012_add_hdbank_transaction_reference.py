@@ -0,0 +1,71 @@
+# migrations/012_add_hdbank_transaction_reference.py
+# -*- coding: utf-8 -*-
+"""
+Migration script to add the per-customer transfer reference to hdbank_transactions
+Created on: 2026-10-18
+"""
+
+from sqlalchemy import text
+from models.database import db
+
+INDEX_NAME = 'uq_hdbank_tx_customer_reference'
+
+
+def upgrade():
+    """Add hdbank_transactions.reference and the unique (customer_id, reference) index"""
+    try:
+        with db.engine.connect() as conn:
+            # db.create_all() đã tạo cột / index cho database mới
+            columns = {row[0] for row in conn.execute(text('''
+                SELECT column_name FROM information_schema.columns
+                WHERE table_schema = DATABASE() AND table_name = 'hdbank_transactions'
+            '''))}
+
+            # Dòng cũ để NULL: reference trước đây được lưu làm transaction_id
+            if 'reference' not in columns:
+                conn.execute(text('ALTER TABLE hdbank_transactions ADD COLUMN reference VARCHAR(50) NULL'))
+
+            exists = conn.execute(text('''
+                SELECT COUNT(*) FROM information_schema.statistics
+                WHERE table_schema = DATABASE()
+                  AND table_name = 'hdbank_transactions'
+                  AND index_name = :index_name
+            '''), {'index_name': INDEX_NAME}).scalar()
+            if not exists:
+                conn.execute(text(f'CREATE UNIQUE INDEX {INDEX_NAME} ON hdbank_transactions (customer_id, reference)'))
+
+            conn.commit()
+            print("✅ HDBank transaction reference migration completed successfully")
+            return True
+
+    except Exception as e:
+        print(f"❌ HDBank transaction reference migration failed: {e}")
+        return False
+
+
+def downgrade():
+    """Drop the reference column and its index"""
+    try:
+        with db.engine.connect() as conn:
+            conn.execute(text(f'DROP INDEX {INDEX_NAME} ON hdbank_transactions'))
+            conn.execute(text('ALTER TABLE hdbank_transactions DROP COLUMN reference'))
+            conn.commit()
+            print("✅ HDBank transaction reference column dropped successfully")
+            return True
+
+    except Exception as e:
+        print(f"❌ Failed to drop HDBank transaction reference column: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    # Run migration when executed directly
+    from flask import Flask
+    from config import Config
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    db.init_app(app)
+
+    with app.app_context():
+        upgrade()
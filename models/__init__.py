@@ -5,19 +5,23 @@ from .customer import Customer
 from .transactions import HDBankTransaction, TokenTransaction
 from .hdbank_card import HDBankCard
 from .achievements import Achievement, CustomerAchievement
-from .missions import CustomerMission, CustomerMissionProgress
-from .marketplace import MarketplaceItem, P2PListing
-from .flights import VietjetFlight
-from .resorts import ResortBooking
+from .missions import CustomerMission, CustomerMissionProgress, CustomerMissionState, CustomerMissionArchive
+from .marketplace import MarketplaceItem, P2PListing, P2POrder, VoucherCode
+from .flights import VietjetFlight, VietjetSchedule, VietjetSeatInventory, VietjetSeatHold
+from .resorts import ResortBooking, ResortRoom, ResortRoomNight, SpaResource, SpaSlotClaim
+from .statements import HDBankStatement
+from .activity import CustomerActivityBitmap
 
 __all__ = [
     'db', 'bcrypt', 'init_db',
     'User', 'Customer',
     'HDBankTransaction', 'TokenTransaction', 'HDBankCard',
     'Achievement', 'CustomerAchievement',
-    'CustomerMission', 'CustomerMissionProgress',
-    'MarketplaceItem', 'P2PListing',
-    'VietjetFlight', 'ResortBooking'
+    'CustomerMission', 'CustomerMissionProgress', 'CustomerMissionState', 'CustomerMissionArchive',
+    'MarketplaceItem', 'P2PListing', 'P2POrder', 'VoucherCode',
+    'VietjetFlight', 'VietjetSchedule', 'VietjetSeatInventory', 'VietjetSeatHold',
+    'ResortBooking', 'ResortRoom', 'ResortRoomNight', 'SpaResource', 'SpaSlotClaim',
+    'HDBankStatement', 'CustomerActivityBitmap'
 ]
 """
 Models package for One-Sovico Platform
@@ -28,6 +28,10 @@ class Achievement(db.Model):
 
 class CustomerAchievement(db.Model):
     __tablename__ = 'customer_achievements'
+    __table_args__ = (
+        # Catalog admin: đếm / tốc độ mở khóa theo achievement chỉ đọc index
+        db.Index('idx_customer_achievement_unlocked', 'achievement_id', 'unlocked_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customers.customer_id'), nullable=False)
@@ -0,0 +1,27 @@
+# models/activity.py
+# -*- coding: utf-8 -*-
+"""
+Customer daily activity bitmaps (login, transaction, ...)
+"""
+
+import datetime
+from .database import db
+
+BITMAP_BYTES = 46  # 366 ngày, 1 bit mỗi ngày
+
+
+class CustomerActivityBitmap(db.Model):
+    """Một dòng cho mỗi (khách hàng, loại hoạt động, năm): bit thứ i = hoạt động vào ngày thứ i của năm"""
+    __tablename__ = 'customer_activity_bitmaps'
+    __table_args__ = (
+        db.UniqueConstraint('customer_id', 'activity_type', 'year', name='uq_activity_customer_type_year'),
+        db.Index('idx_activity_type_year_customer', 'activity_type', 'year', 'customer_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.customer_id'), nullable=False)
+    activity_type = db.Column(db.String(20), nullable=False)
+    year = db.Column(db.SmallInteger, nullable=False)
+    bits = db.Column(db.LargeBinary(BITMAP_BYTES), nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=0)  # khóa lạc quan khi OR thêm bit
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
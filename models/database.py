@@ -60,7 +60,7 @@ def init_db(app):
             missions.init_db(db)
             hdbank_card.init_db(db)
             # flights, resorts & marketplace are static declarative; just import to register
-            from . import user, customer, achievements, marketplace, flights as _f, resorts as _r
+            from . import user, customer, achievements, marketplace, statements, activity, flights as _f, resorts as _r
             # Create all tables
             db.create_all()
             # Apply automatic migrations
@@ -73,6 +73,18 @@ def init_db(app):
             # Create default achievements if they don't exist
             from models.achievements import create_default_achievements
             create_default_achievements()
+
+            # Create default Vietjet route network if no schedules exist
+            from models.flights import create_default_schedules
+            create_default_schedules()
+
+            # Create default resort rooms if none exist
+            from models.resorts import create_default_rooms
+            create_default_rooms()
+
+            # Create default spa therapists / treatment rooms if none exist
+            from models.resorts import create_default_spa_resources
+            create_default_spa_resources()
             
         except Exception as e:
             print(f" Error initializing database: {e}")
@@ -5,10 +5,16 @@ Vietjet flight booking models
 """
 
 import datetime
+import math
 from .database import db
 
 class VietjetFlight(db.Model):
     __tablename__ = 'vietjet_flights'
+    # Phục vụ lịch sử đặt vé phân trang keyset theo (flight_date, id)
+    __table_args__ = (
+        db.Index('idx_vietjet_flight_customer_date_id', 'customer_id', 'flight_date', 'id'),
+        db.Index('idx_vietjet_flight_booking_group', 'booking_group_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     flight_id = db.Column(db.String(50), unique=True, nullable=False)
@@ -18,6 +24,8 @@ class VietjetFlight(db.Model):
     destination = db.Column(db.String(10), nullable=False)
     ticket_class = db.Column(db.Enum('economy', 'business'), nullable=False)
     booking_value = db.Column(db.Numeric(12, 2), nullable=False)
+    passenger_name = db.Column(db.String(100), nullable=True)    # vé theo từng hành khách (đặt vé đoàn)
+    booking_group_id = db.Column(db.String(50), nullable=True)   # các vé cùng một lần đặt vé đoàn
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
 
     def to_dict(self):
@@ -29,5 +37,182 @@ class VietjetFlight(db.Model):
             'destination': self.destination,
             'ticket_class': self.ticket_class,
             'booking_value': float(self.booking_value),
+            'passenger_name': self.passenger_name,
+            'booking_group_id': self.booking_group_id,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S')
         }
+
+
+class VietjetSchedule(db.Model):
+    """Lịch bay định kỳ: một chuyến bay chạy vào các thứ trong tuần trong khoảng hiệu lực"""
+    __tablename__ = 'vietjet_schedules'
+    __table_args__ = (
+        db.Index('idx_vietjet_schedule_route', 'origin', 'destination'),
+        db.Index('idx_vietjet_schedule_updated', 'updated_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    flight_number = db.Column(db.String(10), nullable=False)
+    origin = db.Column(db.String(10), nullable=False)
+    destination = db.Column(db.String(10), nullable=False)
+    departure_minute = db.Column(db.Integer, nullable=False)  # phút tính từ 00:00 giờ địa phương
+    duration_minutes = db.Column(db.Integer, nullable=False)
+    days_of_week = db.Column(db.Integer, nullable=False, default=127)  # bit 0 = Thứ 2 ... bit 6 = Chủ nhật
+    valid_from = db.Column(db.Date, nullable=False)
+    valid_to = db.Column(db.Date, nullable=True)
+    aircraft = db.Column(db.String(50), default='Airbus A321')
+    fare_economy = db.Column(db.Numeric(12, 2), nullable=False)
+    fare_business = db.Column(db.Numeric(12, 2), nullable=False)
+    seats_economy = db.Column(db.Integer, nullable=False, default=180)
+    seats_business = db.Column(db.Integer, nullable=False, default=12)
+    status = db.Column(db.Enum('active', 'cancelled'), nullable=False, default='active')
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'flight_number': self.flight_number,
+            'origin': self.origin,
+            'destination': self.destination,
+            'departure_time': f"{self.departure_minute // 60:02d}:{self.departure_minute % 60:02d}",
+            'duration_minutes': self.duration_minutes,
+            'days_of_week': self.days_of_week,
+            'valid_from': self.valid_from.strftime('%Y-%m-%d'),
+            'valid_to': self.valid_to.strftime('%Y-%m-%d') if self.valid_to else None,
+            'aircraft': self.aircraft,
+            'fare_economy': float(self.fare_economy),
+            'fare_business': float(self.fare_business),
+            'status': self.status
+        }
+
+
+
+class VietjetSeatInventory(db.Model):
+    """Số ghế còn lại của một chuyến bay (số hiệu + ngày bay) theo hạng vé"""
+    __tablename__ = 'vietjet_seat_inventory'
+    __table_args__ = (
+        db.UniqueConstraint('flight_number', 'flight_date', 'ticket_class', name='uq_vietjet_inventory_flight_class'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    flight_number = db.Column(db.String(10), nullable=False)
+    flight_date = db.Column(db.Date, nullable=False)
+    ticket_class = db.Column(db.Enum('economy', 'business'), nullable=False)
+    origin = db.Column(db.String(10), nullable=True)  # tuyến của chuyến bay, để xác nhận giữ chỗ đúng tuyến
+    destination = db.Column(db.String(10), nullable=True)
+    capacity = db.Column(db.Integer, nullable=False)
+    available = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'flight_number': self.flight_number,
+            'flight_date': self.flight_date.strftime('%Y-%m-%d'),
+            'ticket_class': self.ticket_class,
+            'capacity': self.capacity,
+            'available': self.available
+        }
+
+
+class VietjetSeatHold(db.Model):
+    """Giữ chỗ tạm thời; ghế được trả lại kho khi hết hạn mà chưa xác nhận"""
+    __tablename__ = 'vietjet_seat_holds'
+    __table_args__ = (
+        db.Index('idx_vietjet_hold_status_expires', 'status', 'expires_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    hold_id = db.Column(db.String(50), unique=True, nullable=False)
+    inventory_id = db.Column(db.Integer, db.ForeignKey('vietjet_seat_inventory.id'), nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.customer_id'), nullable=False)
+    seats = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.Enum('held', 'confirmed', 'released', 'expired'), nullable=False, default='held')
+    expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'hold_id': self.hold_id,
+            'customer_id': self.customer_id,
+            'seats': self.seats,
+            'status': self.status,
+            'expires_at': self.expires_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None
+        }
+
+# Sân bay trong mạng bay mặc định: (mã, nội địa?, vĩ độ, kinh độ)
+DEFAULT_AIRPORTS = [
+    ('SGN', True, 10.818, 106.652), ('HAN', True, 21.221, 105.807), ('DAD', True, 16.044, 108.199),
+    ('CXR', True, 11.998, 109.219), ('PQC', True, 10.170, 103.993), ('BKK', False, 13.690, 100.750),
+    ('SIN', False, 1.364, 103.991), ('KUL', False, 2.746, 101.710), ('MNL', False, 14.509, 121.020),
+    ('ICN', False, 37.460, 126.440),
+]
+DEFAULT_HUBS = ('SGN', 'HAN')
+
+
+def _great_circle_km(a, b):
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[2], a[3], b[2], b[3]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371 * math.asin(math.sqrt(h))
+
+
+def create_default_schedules():
+    """Tạo mạng bay mặc định nếu bảng lịch bay còn trống
+
+    Nội địa: mọi cặp sân bay nội địa. Quốc tế: từ hai hub SGN/HAN.
+    Trục HAN-SGN có 6 chuyến/ngày, tuyến hub 4 chuyến, tuyến còn lại 2 chuyến.
+    """
+    try:
+        if VietjetSchedule.query.count() > 0:
+            return
+
+        airports = {a[0]: a for a in DEFAULT_AIRPORTS}
+        routes = []
+        for origin in airports.values():
+            for destination in airports.values():
+                if origin is destination:
+                    continue
+                if origin[1] and destination[1]:
+                    routes.append((origin, destination))
+                elif origin[0] in DEFAULT_HUBS or destination[0] in DEFAULT_HUBS:
+                    if origin[1] or destination[1]:
+                        routes.append((origin, destination))
+
+        today = datetime.date.today()
+        flight_no = 100
+        schedules = []
+        for origin, destination in routes:
+            distance = _great_circle_km(origin, destination)
+            domestic = origin[1] and destination[1]
+            duration = int(round((35 + distance / 12.5) / 5.0)) * 5
+            fare_economy = round(((1200000 if domestic else 2800000) + distance * (600 if domestic else 900)) / 1000) * 1000
+            hubs = sum(code in DEFAULT_HUBS for code in (origin[0], destination[0]))
+            per_day = 6 if hubs == 2 else (4 if hubs == 1 and domestic else 2)
+            # Tuyến phụ quốc tế không bay thứ 3 và thứ 4
+            days = 127 if domestic or hubs == 2 else 0b1111001
+
+            for i in range(per_day):
+                departure = 6 * 60 + i * (15 * 60 // per_day) + (flight_no % 4) * 10
+                schedules.append(VietjetSchedule(
+                    flight_number=f"VJ{flight_no}",
+                    origin=origin[0],
+                    destination=destination[0],
+                    departure_minute=departure,
+                    duration_minutes=duration,
+                    days_of_week=days,
+                    valid_from=today,
+                    valid_to=None,
+                    aircraft='Airbus A321' if domestic else 'Airbus A330',
+                    fare_economy=fare_economy,
+                    fare_business=fare_economy * 2.5,
+                    seats_economy=180 if domestic else 260,
+                    seats_business=12 if domestic else 24
+                ))
+                flight_no += 1
+
+        db.session.add_all(schedules)
+        db.session.commit()
+        print(f"Created {len(schedules)} default Vietjet schedules")
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating default Vietjet schedules: {e}")
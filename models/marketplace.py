@@ -18,6 +18,10 @@ class MarketplaceItem(db.Model):
 
 class P2PListing(db.Model):
     __tablename__ = 'p2p_listings'
+    # Feed tin đăng active phân trang keyset theo (created_at, id)
+    __table_args__ = (
+        db.Index('idx_p2p_listing_status_created_id', 'status', 'created_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     seller_customer_id = db.Column(db.Integer, db.ForeignKey('customers.customer_id'), nullable=False)
@@ -32,3 +36,61 @@ class P2PListing(db.Model):
     # Relationships
     seller = db.relationship('Customer', foreign_keys=[seller_customer_id], backref='p2p_listings')
     buyer = db.relationship('Customer', foreign_keys=[buyer_customer_id], backref='p2p_purchases')
+
+
+class P2POrder(db.Model):
+    """Lệnh mua trên sổ lệnh P2P; tin đăng P2PListing đóng vai trò lệnh bán (1 đơn vị)"""
+    __tablename__ = 'p2p_orders'
+    __table_args__ = (
+        db.Index('idx_p2p_order_market_status', 'market', 'status'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.String(50), unique=True, nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.customer_id'), nullable=False)
+    market = db.Column(db.String(100), nullable=False)  # tên vật phẩm đã chuẩn hóa
+    price_svt = db.Column(db.Numeric(10, 2), nullable=False)  # giá mua tối đa mỗi đơn vị
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    filled_quantity = db.Column(db.Integer, nullable=False, default=0)
+    status = db.Column(db.Enum('open', 'filled', 'cancelled'), nullable=False, default='open')
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'order_id': self.order_id,
+            'customer_id': self.customer_id,
+            'market': self.market,
+            'price_svt': float(self.price_svt),
+            'quantity': self.quantity,
+            'filled_quantity': self.filled_quantity,
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class VoucherCode(db.Model):
+    """Mã voucher sinh sẵn cho một MarketplaceItem, gán cho khách khi mua"""
+    __tablename__ = 'voucher_codes'
+    __table_args__ = (
+        db.Index('idx_voucher_item_status', 'item_id', 'status', 'id'),
+        db.Index('idx_voucher_customer', 'customer_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('marketplace_items.id'), nullable=False)
+    code = db.Column(db.String(12), nullable=False)  # 12 ký tự base32 (60 bit ngẫu nhiên)
+    code_hash = db.Column(db.BigInteger, unique=True, nullable=False)  # tra cứu O(1) khi đổi mã
+    status = db.Column(db.Enum('available', 'assigned', 'redeemed'), nullable=False, default='available')
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.customer_id'), nullable=True)
+    assigned_at = db.Column(db.DateTime, nullable=True)
+    redeemed_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'code': '-'.join(self.code[i:i + 4] for i in range(0, len(self.code), 4)),
+            'item_id': self.item_id,
+            'status': self.status,
+            'assigned_at': self.assigned_at.isoformat() if self.assigned_at else None,
+            'redeemed_at': self.redeemed_at.isoformat() if self.redeemed_at else None
+        }
@@ -8,10 +8,12 @@ _initialized = False
 db = None
 CustomerMission = None
 CustomerMissionProgress = None
+CustomerMissionState = None
+CustomerMissionArchive = None
 
 
 def init_db(database):
-    global db, CustomerMission, CustomerMissionProgress, _initialized
+    global db, CustomerMission, CustomerMissionProgress, CustomerMissionState, CustomerMissionArchive, _initialized
     if _initialized:
         return
     _initialized = True
@@ -33,10 +35,18 @@ def init_db(database):
         started_at = db.Column(db.DateTime, nullable=True)
         completed_at = db.Column(db.DateTime, nullable=True)
         created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+        period_key = db.Column(db.String(20), nullable=True)  # Kỳ của mission lặp lại: '2026-10-18', '2026-W42'
+        expires_at = db.Column(db.DateTime, nullable=True)  # Hết kỳ thì sweeper chuyển sang 'expired'
 
         # Relationships
         customer = db.relationship('Customer', backref='missions')
 
+        # Đồng bộ mission theo lô: đọc theo khách hàng, chống ghi trùng khi nhiều request cùng đồng bộ
+        __table_args__ = (
+            db.UniqueConstraint('customer_id', 'mission_id', name='uq_customer_mission'),
+            db.Index('idx_customer_mission_expiry', 'status', 'expires_at'),
+        )
+
 
     class CustomerMissionProgress(db.Model):
         __tablename__ = 'customer_mission_progress'
@@ -52,7 +62,43 @@ def init_db(database):
 
         # Relationships
         customer = db.relationship('Customer', backref='mission_progress')
+
+        __table_args__ = (
+            db.UniqueConstraint('customer_id', 'mission_id', 'requirement_key', name='uq_customer_mission_progress'),
+        )
+
+
+    class CustomerMissionState(db.Model):
+        """Phiên bản catalog mission đã gán cho khách hàng (gán bất đồng bộ)"""
+        __tablename__ = 'customer_mission_state'
+
+        customer_id = db.Column(db.Integer, db.ForeignKey('customers.customer_id'), primary_key=True)
+        catalog_version = db.Column(db.String(40), nullable=False)
+        assigned_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+
+    class CustomerMissionArchive(db.Model):
+        """Mission đã hoàn thành / hết hạn quá thời gian lưu, chuyển khỏi customer_missions"""
+        __tablename__ = 'customer_missions_archive'
+
+        id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # giữ id gốc
+        customer_id = db.Column(db.Integer, nullable=False, index=True)
+        mission_id = db.Column(db.String(100), nullable=False)
+        mission_title = db.Column(db.String(200), nullable=False)
+        mission_category = db.Column(db.String(50), nullable=False)
+        mission_level = db.Column(db.String(50), nullable=False)
+        status = db.Column(db.String(20), nullable=False)
+        progress_data = db.Column(db.JSON)
+        svt_reward = db.Column(db.Numeric(10, 2), default=0)
+        started_at = db.Column(db.DateTime, nullable=True)
+        completed_at = db.Column(db.DateTime, nullable=True)
+        created_at = db.Column(db.DateTime, nullable=True)
+        period_key = db.Column(db.String(20), nullable=True)
+        expires_at = db.Column(db.DateTime, nullable=True)
+        archived_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     
     # Assign classes to global variables
     globals()['CustomerMission'] = CustomerMission
-    globals()['CustomerMissionProgress'] = CustomerMissionProgress
\ No newline at end of file
+    globals()['CustomerMissionProgress'] = CustomerMissionProgress
+    globals()['CustomerMissionState'] = CustomerMissionState
+    globals()['CustomerMissionArchive'] = CustomerMissionArchive
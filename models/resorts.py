@@ -9,6 +9,10 @@ from .database import db
 
 class ResortBooking(db.Model):
     __tablename__ = 'resort_bookings'
+    # Nạp các đặt phòng còn hiệu lực vào index phòng trống
+    __table_args__ = (
+        db.Index('idx_resort_booking_room_checkout', 'room_id', 'check_out_date'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     booking_id = db.Column(db.String(50), unique=True, nullable=False)
@@ -17,6 +21,9 @@ class ResortBooking(db.Model):
     booking_date = db.Column(db.DateTime, nullable=False)
     nights_stayed = db.Column(db.Integer, nullable=False)
     booking_value = db.Column(db.Numeric(12, 2), nullable=False)
+    room_id = db.Column(db.Integer, db.ForeignKey('resort_rooms.id'), nullable=True)  # NULL với dịch vụ spa
+    check_in_date = db.Column(db.Date, nullable=True)
+    check_out_date = db.Column(db.Date, nullable=True)   # ngày trả phòng (không tính đêm)
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
 
     def to_dict(self):
@@ -27,5 +34,161 @@ class ResortBooking(db.Model):
             'booking_date': self.booking_date.strftime('%Y-%m-%d %H:%M:%S'),
             'nights_stayed': self.nights_stayed,
             'booking_value': float(self.booking_value),
+            'room_id': self.room_id,
+            'check_in_date': self.check_in_date.strftime('%Y-%m-%d') if self.check_in_date else None,
+            'check_out_date': self.check_out_date.strftime('%Y-%m-%d') if self.check_out_date else None,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S')
         }
+
+
+# Hạng phòng: (giá mỗi đêm, số khách tối đa, tầng, số phòng)
+ROOM_TYPES = {
+    'standard': (2000000, 2, 1, 20),
+    'deluxe': (3500000, 3, 2, 12),
+    'suite': (6000000, 4, 3, 6),
+}
+DEFAULT_RESORT_NAME = 'Sovico Premium Resort'
+
+
+class ResortRoom(db.Model):
+    """Phòng của resort theo hạng phòng"""
+    __tablename__ = 'resort_rooms'
+
+    id = db.Column(db.Integer, primary_key=True)
+    room_number = db.Column(db.String(10), unique=True, nullable=False)
+    resort_name = db.Column(db.String(200), nullable=False)
+    room_type = db.Column(db.Enum('standard', 'deluxe', 'suite'), nullable=False)
+    price_per_night = db.Column(db.Numeric(12, 2), nullable=False)
+    max_guests = db.Column(db.Integer, nullable=False, default=2)
+    status = db.Column(db.Enum('active', 'maintenance'), nullable=False, default='active')
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'room_id': self.id,
+            'room_number': self.room_number,
+            'resort_name': self.resort_name,
+            'room_type': self.room_type,
+            'price_per_night': float(self.price_per_night),
+            'max_guests': self.max_guests,
+            'status': self.status
+        }
+
+
+class ResortRoomNight(db.Model):
+    """Một đêm đã bán của một phòng; unique (room_id, night) chặn đặt trùng giữa các process"""
+    __tablename__ = 'resort_room_nights'
+    __table_args__ = (
+        db.UniqueConstraint('room_id', 'night', name='uq_resort_room_night'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    room_id = db.Column(db.Integer, db.ForeignKey('resort_rooms.id'), nullable=False)
+    night = db.Column(db.Date, nullable=False)
+    booking_id = db.Column(db.String(50), nullable=False)
+
+
+def create_default_rooms():
+    """Tạo phòng mặc định của resort nếu bảng phòng còn trống"""
+    try:
+        if ResortRoom.query.count() > 0:
+            return
+
+        rooms = []
+        for room_type, (price, max_guests, floor, count) in ROOM_TYPES.items():
+            for i in range(1, count + 1):
+                rooms.append(ResortRoom(
+                    room_number=f"{floor}{i:02d}",
+                    resort_name=DEFAULT_RESORT_NAME,
+                    room_type=room_type,
+                    price_per_night=price,
+                    max_guests=max_guests,
+                    status='active'
+                ))
+
+        db.session.add_all(rooms)
+        db.session.commit()
+        print(f"Created {len(rooms)} default resort rooms")
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating default resort rooms: {e}")
+
+
+class SpaResource(db.Model):
+    """Kỹ thuật viên hoặc phòng trị liệu của spa với giờ làm việc"""
+    __tablename__ = 'spa_resources'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    resource_type = db.Column(db.Enum('therapist', 'room'), nullable=False)
+    open_minute = db.Column(db.Integer, nullable=False, default=9 * 60)    # phút tính từ 00:00
+    close_minute = db.Column(db.Integer, nullable=False, default=21 * 60)
+    days_of_week = db.Column(db.Integer, nullable=False, default=127)      # bit 0 = Thứ 2 ... bit 6 = Chủ nhật
+    status = db.Column(db.Enum('active', 'inactive'), nullable=False, default='active')
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'resource_id': self.id,
+            'name': self.name,
+            'resource_type': self.resource_type,
+            'open_time': f"{self.open_minute // 60:02d}:{self.open_minute % 60:02d}",
+            'close_time': f"{self.close_minute // 60:02d}:{self.close_minute % 60:02d}",
+            'days_of_week': self.days_of_week,
+            'status': self.status
+        }
+
+
+class SpaSlotClaim(db.Model):
+    """Một ô 15 phút đã bán của một tài nguyên spa; unique chặn đặt trùng giữa các process"""
+    __tablename__ = 'spa_slot_claims'
+    __table_args__ = (
+        db.UniqueConstraint('resource_id', 'slot_date', 'slot', name='uq_spa_slot_claim'),
+        db.Index('idx_spa_slot_claim_created', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    resource_id = db.Column(db.Integer, db.ForeignKey('spa_resources.id'), nullable=False)
+    slot_date = db.Column(db.Date, nullable=False)
+    slot = db.Column(db.Integer, nullable=False)  # ô thứ n trong ngày (n * 15 phút)
+    booking_id = db.Column(db.String(50), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+
+def create_default_spa_resources():
+    """Tạo kỹ thuật viên và phòng trị liệu mặc định nếu chưa có"""
+    try:
+        if SpaResource.query.count() > 0:
+            return
+
+        resources = []
+        # Mỗi kỹ thuật viên nghỉ một ngày trong tuần, ca sáng hoặc ca chiều
+        for i in range(6):
+            day_off = i % 7
+            early = i % 2 == 0
+            resources.append(SpaResource(
+                name=f"Kỹ thuật viên {i + 1}",
+                resource_type='therapist',
+                open_minute=(9 if early else 12) * 60,
+                close_minute=(18 if early else 21) * 60,
+                days_of_week=127 & ~(1 << day_off),
+                status='active'
+            ))
+        for i in range(4):
+            resources.append(SpaResource(
+                name=f"Phòng trị liệu {i + 1}",
+                resource_type='room',
+                open_minute=8 * 60,
+                close_minute=22 * 60,
+                days_of_week=127,
+                status='active'
+            ))
+
+        db.session.add_all(resources)
+        db.session.commit()
+        print(f"Created {len(resources)} default spa resources")
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating default spa resources: {e}")
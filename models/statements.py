@@ -0,0 +1,43 @@
+# models/statements.py
+# -*- coding: utf-8 -*-
+"""
+HDBank monthly statement models
+"""
+
+import datetime
+from .database import db
+
+class HDBankStatement(db.Model):
+    __tablename__ = 'hdbank_statements'
+    __table_args__ = (
+        db.UniqueConstraint('customer_id', 'period', name='uq_hdbank_statement_customer_period'),
+        db.Index('idx_hdbank_statement_period', 'period'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.customer_id'), nullable=False)
+    period = db.Column(db.String(7), nullable=False)  # 'YYYY-MM'
+    opening_balance = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    closing_balance = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    min_balance = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    total_credit = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    total_debit = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+    svt_earned = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    top_merchants = db.Column(db.JSON)  # [{'merchant': ..., 'amount': ..., 'count': ...}]
+    generated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'customer_id': self.customer_id,
+            'period': self.period,
+            'opening_balance': float(self.opening_balance),
+            'closing_balance': float(self.closing_balance),
+            'min_balance': float(self.min_balance),
+            'total_credit': float(self.total_credit),
+            'total_debit': float(self.total_debit),
+            'transaction_count': self.transaction_count,
+            'svt_earned': float(self.svt_earned),
+            'top_merchants': self.top_merchants or [],
+            'generated_at': self.generated_at.strftime('%Y-%m-%d %H:%M:%S') if self.generated_at else None
+        }
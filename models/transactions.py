@@ -29,8 +29,16 @@ def init_db(database):
         balance = db.Column(db.Numeric(15, 2), nullable=True)
         description = db.Column(db.Text)
         status = db.Column(db.String(30), default='completed')
+        reference = db.Column(db.String(50), nullable=True)  # Mã tham chiếu của khách (chuyển khoản hàng loạt)
         created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
 
+        # Phục vụ lịch sử giao dịch phân trang keyset theo (transaction_date, id);
+        # reference chỉ duy nhất trong phạm vi một khách hàng
+        __table_args__ = (
+            db.Index('idx_hdbank_tx_customer_date_id', 'customer_id', 'transaction_date', 'id'),
+            db.UniqueConstraint('customer_id', 'reference', name='uq_hdbank_tx_customer_reference'),
+        )
+
 
     class TokenTransaction(db.Model):
         __tablename__ = 'token_transactions'
@@ -4,8 +4,13 @@
 Admin API routes under /api/admin (auth-required), split from app.py without behavior changes.
 This mirrors the admin endpoints in the monolithic app so the modular app exposes identical APIs.
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from services.auth_service import require_auth
+from services.marketplace_service import MarketplaceService
+from services.mission_service import MissionService
+from services.flash_sale import flash_sales
+from services.mission_expiry import mission_sweeper
+from services.achievement_catalog import VELOCITY_DAYS, get_achievement_catalog, invalidate_achievement_catalog
 from models import db
 from models.customer import Customer
 from models.achievements import Achievement, CustomerAchievement
@@ -18,6 +23,9 @@ import random
 
 admin_api_bp = Blueprint('admin_api', __name__, url_prefix='/api/admin')
 
+_marketplace_service = MarketplaceService()
+_mission_service = MissionService()
+
 
 def _ensure_admin():
     user = getattr(request, 'current_user', None)
@@ -100,6 +108,7 @@ def assign_achievement_to_customer():
             db.session.add(token_tx)
 
         db.session.commit()
+        invalidate_achievement_catalog()
 
         user = request.current_user
         return jsonify({
@@ -125,13 +134,11 @@ def get_all_achievements():
         if err:
             return jsonify(err[0]), err[1]
 
-        achievements = Achievement.query.all()
-        result = []
-        for a in achievements:
-            customer_count = CustomerAchievement.query.filter_by(achievement_id=a.id).count()
-            d = a.to_dict()
-            d['customer_count'] = customer_count
-            result.append(d)
+        try:
+            velocity_days = int(request.args.get('velocity_days', VELOCITY_DAYS))
+        except ValueError:
+            return jsonify({'error': 'velocity_days phải là số nguyên'}), 400
+        result = get_achievement_catalog(velocity_days)
         return jsonify({'success': True, 'achievements': result, 'total': len(result)})
     except Exception as e:
         return jsonify({'error': f'Lỗi lấy danh sách achievements: {str(e)}'}), 500
@@ -160,6 +167,7 @@ def create_new_achievement():
         ach = Achievement(name=name, description=description, badge_image_url=badge_image_url)
         db.session.add(ach)
         db.session.commit()
+        invalidate_achievement_catalog()
 
         user = request.current_user
         return jsonify({
@@ -173,6 +181,140 @@ def create_new_achievement():
         return jsonify({'error': f'Lỗi tạo achievement: {str(e)}'}), 500
 
 
+@admin_api_bp.route('/marketplace/items', methods=['POST'])
+@require_auth
+def create_marketplace_item():
+    try:
+        err = _ensure_admin()
+        if err:
+            return jsonify(err[0]), err[1]
+
+        data = request.get_json() or {}
+        result = _marketplace_service.create_item(
+            name=(data.get('name') or '').strip(),
+            price_svt=data.get('price_svt'),
+            quantity=data.get('quantity', 0),
+            description=data.get('description'),
+            partner_brand=data.get('partner_brand'),
+            image_url=data.get('image_url')
+        )
+        return (jsonify(result), 200) if result['success'] else (jsonify(result), 400)
+    except Exception as e:
+        return jsonify({'error': f'Lỗi tạo vật phẩm: {str(e)}'}), 500
+
+
+@admin_api_bp.route('/marketplace/items/<int:item_id>', methods=['PUT'])
+@require_auth
+def update_marketplace_item(item_id):
+    try:
+        err = _ensure_admin()
+        if err:
+            return jsonify(err[0]), err[1]
+
+        data = request.get_json() or {}
+        result = _marketplace_service.update_item(item_id, **{
+            field: data.get(field)
+            for field in ('name', 'description', 'price_svt', 'quantity', 'partner_brand', 'image_url', 'is_active')
+        })
+        if result['success']:
+            return jsonify(result)
+        return jsonify(result), 404 if result['error'] == 'Item not found' else 400
+    except Exception as e:
+        return jsonify({'error': f'Lỗi cập nhật vật phẩm: {str(e)}'}), 500
+
+
+@admin_api_bp.route('/marketplace/items/<int:item_id>/vouchers', methods=['POST'])
+@require_auth
+def generate_marketplace_vouchers(item_id):
+    try:
+        err = _ensure_admin()
+        if err:
+            return jsonify(err[0]), err[1]
+
+        data = request.get_json() or {}
+        result = _marketplace_service.generate_vouchers(item_id, data.get('count'))
+        if result['success']:
+            return jsonify(result)
+        return jsonify(result), 404 if result['error'] == 'Item not found' else 400
+    except Exception as e:
+        return jsonify({'error': f'Lỗi sinh mã voucher: {str(e)}'}), 500
+
+
+@admin_api_bp.route('/marketplace/flash-sale/<int:item_id>/start', methods=['POST'])
+@require_auth
+def start_flash_sale(item_id):
+    try:
+        err = _ensure_admin()
+        if err:
+            return jsonify(err[0]), err[1]
+
+        data = request.get_json(silent=True) or {}
+        sale = flash_sales.start(current_app._get_current_object(), item_id,
+                                 per_customer_limit=data.get('per_customer_limit', 1))
+        if sale is None:
+            return jsonify({'error': f'Vật phẩm {item_id} không tồn tại hoặc đã ẩn'}), 404
+        return jsonify({'success': True, 'item_id': item_id, 'stock': sale.remaining, 'stats': sale.stats})
+    except Exception as e:
+        return jsonify({'error': f'Lỗi mở flash sale: {str(e)}'}), 500
+
+
+@admin_api_bp.route('/marketplace/flash-sale/<int:item_id>/stop', methods=['POST'])
+@require_auth
+def stop_flash_sale(item_id):
+    try:
+        err = _ensure_admin()
+        if err:
+            return jsonify(err[0]), err[1]
+
+        sale = flash_sales.stop(item_id)
+        if sale is None:
+            return jsonify({'error': f'Vật phẩm {item_id} không có flash sale'}), 404
+        return jsonify({'success': True, 'item_id': item_id, 'stats': sale.stats})
+    except Exception as e:
+        return jsonify({'error': f'Lỗi dừng flash sale: {str(e)}'}), 500
+
+
+@admin_api_bp.route('/missions/retention', methods=['GET'])
+@require_auth
+def mission_activity_retention():
+    try:
+        err = _ensure_admin()
+        if err:
+            return jsonify(err[0]), err[1]
+        try:
+            end_date = datetime.date.fromisoformat(request.args['end_date']) if request.args.get('end_date') \
+                else datetime.datetime.utcnow().date()
+            weeks = int(request.args.get('weeks', 8))
+        except ValueError:
+            return jsonify({'error': 'end_date (YYYY-MM-DD) hoặc weeks không hợp lệ'}), 400
+        result = _mission_service.get_activity_retention(request.args.get('type', 'login'), end_date, weeks)
+        if not result.get('success'):
+            return jsonify(result), 400
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': f'Lỗi tính retention: {str(e)}'}), 500
+
+
+@admin_api_bp.route('/missions/sweep', methods=['POST'])
+@require_auth
+def run_mission_sweep():
+    try:
+        err = _ensure_admin()
+        if err:
+            return jsonify(err[0]), err[1]
+
+        data = request.get_json(silent=True) or {}
+        archive_after_days = data.get('archive_after_days')
+        if archive_after_days is not None and (not isinstance(archive_after_days, int) or archive_after_days < 0):
+            return jsonify({'error': 'archive_after_days phải là số nguyên không âm'}), 400
+        result = mission_sweeper.run(archive_after_days=archive_after_days)
+        if not result['success']:
+            return jsonify(result), 500
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': f'Lỗi quét mission hết hạn: {str(e)}'}), 500
+
+
 @admin_api_bp.route('/customer/<int:customer_id>/achievements', methods=['GET'])
 @require_auth
 def get_customer_achievements_for_admin(customer_id):
@@ -308,6 +450,8 @@ def bulk_assign_achievements():
                 errors.append(f'Customer {cid}: {str(e)}')
 
         db.session.commit()
+        if success_count:
+            invalidate_achievement_catalog()
 
         user = request.current_user
         return jsonify({
@@ -385,6 +529,8 @@ def auto_assign_achievements(customer_id):
             _assign_by_name('Người tiên phong', f'{total_transactions} giao dịch', 600)
 
         db.session.commit()
+        if assigned:
+            invalidate_achievement_catalog()
 
         return jsonify({
             'success': True,
@@ -9,6 +9,7 @@ from models.achievements import Achievement, CustomerAchievement
 from models import transactions as tx
 from models.flights import VietjetFlight
 from models.resorts import ResortBooking
+from services.achievement_catalog import invalidate_achievement_catalog
 import datetime
 import uuid
 import random
@@ -245,6 +246,7 @@ def create_achievement():
         )
         db.session.add(ach)
         db.session.commit()
+        invalidate_achievement_catalog()
 
         return jsonify({
             'success': True,
@@ -4,9 +4,10 @@
 Marketplace and P2P trading routes
 """
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request
 from services.marketplace_service import MarketplaceService
 from services.auth_service import require_auth
+from services.flash_sale import get_ticket_result
 
 marketplace_bp = Blueprint('marketplace', __name__, url_prefix='/api/marketplace')
 p2p_bp = Blueprint('p2p', __name__, url_prefix='/api/p2p')
@@ -17,13 +18,16 @@ marketplace_service = MarketplaceService()
 # Marketplace routes
 @marketplace_bp.route('/items', methods=['GET'])
 def get_marketplace_items():
-    """API để lấy danh sách vật phẩm trên sàn giao dịch"""
+    """API để lấy danh sách vật phẩm trên sàn giao dịch (cache theo version, hỗ trợ ETag / 304)"""
     try:
-        items = marketplace_service.get_all_items()
-        return jsonify({
-            'items': items,
-            'total': len(items)
-        })
+        body, etag = marketplace_service.get_catalog()
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     except Exception as e:
         return jsonify({
             'error': f'Lỗi khi lấy vật phẩm: {str(e)}'
@@ -45,7 +49,9 @@ def purchase_marketplace_item():
         )
 
         if result['success']:
-            return jsonify(result)
+            return (jsonify(result), 202) if result.get('queued') else jsonify(result)
+        elif result.get('retry'):
+            return jsonify(result), 503, {'Retry-After': '1'}
         else:
             return jsonify(result), 400
 
@@ -56,15 +62,79 @@ def purchase_marketplace_item():
         }), 500
 
 
+@marketplace_bp.route('/purchase/<ticket_id>', methods=['GET'])
+@require_auth
+def get_flash_sale_purchase(ticket_id):
+    """API tra kết quả lượt mua flash sale còn đang xử lý"""
+    user = request.current_user
+    result = get_ticket_result(ticket_id, user.customer.customer_id if user.customer else None)
+    if result is None:
+        return jsonify({'success': True, 'queued': True, 'ticket_id': ticket_id}), 202
+    return jsonify(result)
+
+
+@marketplace_bp.route('/vouchers', methods=['GET'])
+@require_auth
+def get_my_vouchers():
+    """API lấy mã voucher khách đã mua (lọc theo ?status=assigned|redeemed)"""
+    try:
+        user = request.current_user
+        if not user.customer:
+            return jsonify({'success': False, 'error': 'Customer ID required'}), 400
+
+        result = marketplace_service.get_customer_vouchers(user.customer.customer_id, request.args.get('status'))
+        return (jsonify(result), 200) if result['success'] else (jsonify(result), 500)
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Lỗi lấy voucher: {str(e)}'
+        }), 500
+
+
+@marketplace_bp.route('/vouchers/redeem', methods=['POST'])
+@require_auth
+def redeem_voucher():
+    """API đổi mã voucher tại đối tác"""
+    try:
+        data = request.get_json() or {}
+        user = request.current_user
+
+        result = marketplace_service.redeem_voucher(
+            customer_id=user.customer.customer_id if user.customer else None,
+            code=data.get('code'),
+            partner_brand=data.get('partner_brand')
+        )
+        return (jsonify(result), 200) if result['success'] else (jsonify(result), 400)
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Lỗi đổi voucher: {str(e)}'
+        }), 500
+
+
 # P2P routes
 @p2p_bp.route('/listings', methods=['GET'])
 def get_p2p_listings():
-    """API để lấy danh sách tin đăng P2P"""
+    """API để lấy danh sách tin đăng P2P (phân trang cursor, lọc giá / từ khóa)"""
     try:
-        listings = marketplace_service.get_all_p2p_listings()
+        args = request.args
+        result = marketplace_service.get_p2p_listings(
+            limit=args.get('limit', 20, type=int),
+            cursor=args.get('cursor'),
+            min_price=args.get('min_price'),
+            max_price=args.get('max_price'),
+            keyword=args.get('q')
+        )
+        if not result['success']:
+            status = 400 if result.get('invalid_params') else 500
+            return jsonify(result), status
         return jsonify({
-            'listings': listings,
-            'total': len(listings)
+            'listings': result['listings'],
+            'count': result['count'],
+            'has_more': result['has_more'],
+            'next_cursor': result['next_cursor']
         })
     except Exception as e:
         return jsonify({
@@ -88,7 +158,7 @@ def create_p2p_listing():
         )
 
         if result['success']:
-            return jsonify(result)
+            return (jsonify(result), 202) if result.get('pending') else jsonify(result)
         else:
             return jsonify(result), 400
 
@@ -96,4 +166,68 @@ def create_p2p_listing():
         return jsonify({
             'success': False,
             'error': f'Lỗi tạo tin đăng: {str(e)}'
-        }), 500
\ No newline at end of file
+        }), 500
+
+
+@p2p_bp.route('/orders', methods=['POST'])
+@require_auth
+def place_p2p_buy_order():
+    """API đặt lệnh mua P2P (khớp theo giá rồi thời gian với các tin đăng)"""
+    try:
+        data = request.get_json() or {}
+        user = request.current_user
+
+        result = marketplace_service.place_buy_order(
+            customer_id=user.customer.customer_id if user.customer else None,
+            item_name=data.get('item_name'),
+            price_svt=data.get('price_svt'),
+            quantity=data.get('quantity', 1)
+        )
+
+        if result['success']:
+            return (jsonify(result), 202) if result.get('pending') else jsonify(result)
+        else:
+            return jsonify(result), 400
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Lỗi đặt lệnh mua: {str(e)}'
+        }), 500
+
+
+@p2p_bp.route('/orders/<order_id>', methods=['DELETE'])
+@require_auth
+def cancel_p2p_buy_order(order_id):
+    """API hủy lệnh mua P2P và hoàn ký quỹ"""
+    try:
+        user = request.current_user
+        result = marketplace_service.cancel_buy_order(
+            customer_id=user.customer.customer_id if user.customer else None,
+            order_id=order_id
+        )
+
+        if result['success']:
+            return jsonify(result)
+        return jsonify(result), 404 if result['error'] == 'Order not found' else 400
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Lỗi hủy lệnh: {str(e)}'
+        }), 500
+
+
+@p2p_bp.route('/orderbook', methods=['GET'])
+def get_p2p_order_book():
+    """API xem độ sâu sổ lệnh P2P của một vật phẩm"""
+    try:
+        result = marketplace_service.get_order_book(
+            item_name=request.args.get('item_name'),
+            levels=request.args.get('levels', 10, type=int)
+        )
+        return (jsonify(result), 200) if result['success'] else (jsonify(result), 400)
+    except Exception as e:
+        return jsonify({
+            'error': f'Lỗi lấy sổ lệnh: {str(e)}'
+        }), 500
@@ -14,13 +14,14 @@ mission_service = MissionService()
 
 @mission_bp.route('/<int:customer_id>', methods=['GET'])
 def get_customer_missions(customer_id):
-    """API để lấy nhiệm vụ cho khách hàng"""
+    """API để lấy nhiệm vụ cho khách hàng (chỉ đọc snapshot, mission được gán nền)"""
     try:
-        missions = mission_service.get_missions_for_customer(customer_id)
+        snapshot = mission_service.get_mission_snapshot(customer_id)
         return jsonify({
             'success': True,
             'customer_id': customer_id,
-            'missions': missions
+            'missions': snapshot['missions'],
+            'assignment_pending': snapshot['assignment_pending']
         })
     except Exception as e:
         return jsonify({
@@ -28,6 +29,22 @@ def get_customer_missions(customer_id):
             'error': f'Lỗi lấy missions: {str(e)}'
         }), 500
 
+@mission_bp.route('/<int:customer_id>/activity', methods=['GET'])
+def get_customer_activity(customer_id):
+    """API để lấy chuỗi ngày hoạt động (đăng nhập / giao dịch) cho daily missions"""
+    try:
+        activity_type = request.args.get('type', 'login')
+        result = mission_service.get_activity_summary(customer_id, activity_type)
+        if result['success']:
+            return jsonify(result)
+        else:
+            return jsonify(result), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Lỗi lấy activity: {str(e)}'
+        }), 500
+
 @mission_bp.route('/<int:customer_id>/start', methods=['POST'])
 def start_mission(customer_id):
     """API để bắt đầu một nhiệm vụ"""
@@ -8,6 +8,7 @@ from flask import Blueprint, jsonify, request
 from services.hdbank_service import HDBankService
 from services.vietjet_service import VietjetService
 from services.resort_service import ResortService
+from services.analytics_service import AnalyticsService
 
 # Create blueprints
 hdbank_bp = Blueprint('hdbank', __name__, url_prefix='/api/service/hdbank')
@@ -18,6 +19,7 @@ resort_bp = Blueprint('resort', __name__, url_prefix='/api/service/resort')
 _hdbank_service = None
 _vietjet_service = None
 _resort_service = None
+_analytics_service = AnalyticsService()  # stateless, an toàn khi tạo sớm
 
 
 def get_hdbank_service():
@@ -91,9 +93,22 @@ def hdbank_service_status(customer_id):
 def hdbank_transactions(customer_id):
     """Lấy lịch sử giao dịch HDBank của khách hàng"""
     try:
-        limit = request.args.get('limit', 100, type=int)
-        result = get_hdbank_service().get_transactions(customer_id, limit)
-        status = 200 if result.get('success') else 500
+        args = request.args
+        result = get_hdbank_service().get_transactions(
+            customer_id,
+            limit=args.get('limit', 100, type=int),
+            cursor=args.get('cursor'),
+            transaction_type=args.get('type'),
+            min_amount=args.get('min_amount', type=float),
+            max_amount=args.get('max_amount', type=float),
+            date_from=args.get('date_from'),
+            date_to=args.get('date_to'),
+            search=args.get('q')
+        )
+        if result.get('success'):
+            status = 200
+        else:
+            status = 400 if result.get('invalid_params') else 500
         return jsonify(result), status
     except Exception as e:
         return jsonify({
@@ -140,6 +155,31 @@ def hdbank_transfer():
         }), 500
 
 
+@hdbank_bp.route('/transfer/batch', methods=['POST'])
+def hdbank_batch_transfer():
+    """Chuyển khoản hàng loạt (chi lương) với báo cáo kết quả từng dòng"""
+    try:
+        data = request.get_json() or {}
+        from_customer_id = data.get('from_customer_id') or data.get('customer_id')
+        if not from_customer_id:
+            return jsonify({
+                'success': False,
+                'error': 'Missing from_customer_id or customer_id'
+            }), 400
+
+        result = get_hdbank_service().process_batch_transfer(
+            from_customer_id=from_customer_id,
+            transfers=data.get('transfers'),
+            chunk_size=data.get('chunk_size', 1000)
+        )
+        return (jsonify(result), 200) if result.get('success') else (jsonify(result), 400)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Lỗi chuyển khoản hàng loạt: {str(e)}'
+        }), 500
+
+
 @hdbank_bp.route('/loan', methods=['POST'])
 def hdbank_loan():
     """Đăng ký khoản vay HDBank"""
@@ -177,6 +217,58 @@ def hdbank_open_card():
         }), 500
 
 
+@hdbank_bp.route('/statements/<int:customer_id>', methods=['GET'])
+def hdbank_statements(customer_id):
+    """Xem sao kê tháng đã tạo bởi statement engine"""
+    try:
+        from services.statement_service import StatementService
+        result = StatementService.get_statements(customer_id, request.args.get('period'))
+        return (jsonify(result), 200) if result.get('success') else (jsonify(result), 500)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Lỗi lấy sao kê: {str(e)}'
+        }), 500
+
+
+@hdbank_bp.route('/analytics/<int:customer_id>', methods=['GET'])
+def hdbank_analytics(customer_id):
+    """Phân tích chi tiêu theo tháng / danh mục của khách hàng"""
+    try:
+        result = _analytics_service.get_customer_analytics(customer_id, request.args.get('months'))
+        if result.get('success'):
+            status = 200
+        else:
+            status = 400 if result.get('invalid_params') else 500
+        return jsonify(result), status
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Lỗi phân tích chi tiêu: {str(e)}'
+        }), 500
+
+
+@hdbank_bp.route('/analytics/segment', methods=['GET'])
+def hdbank_segment_analytics():
+    """Phân tích chi tiêu gộp theo phân khúc (persona_type, city)"""
+    try:
+        result = _analytics_service.get_segment_analytics(
+            persona_type=request.args.get('persona_type'),
+            city=request.args.get('city'),
+            months=request.args.get('months')
+        )
+        if result.get('success'):
+            status = 200
+        else:
+            status = 400 if result.get('invalid_params') else 500
+        return jsonify(result), status
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Lỗi phân tích chi tiêu: {str(e)}'
+        }), 500
+
+
 @hdbank_bp.route('/cards/<int:customer_id>', methods=['GET'])
 def get_customer_cards(customer_id):
     """Xem danh sách thẻ của khách hàng"""
@@ -228,12 +320,14 @@ def vietjet_book_flight():
             
         result = service.book_flight(
             customer_id=data.get('customer_id'),
-            origin=data.get('origin', 'HAN'),
-            destination=data.get('destination', 'SGN'),
+            origin=data.get('origin'),
+            destination=data.get('destination'),
             flight_date=data.get('flight_date') or data.get('departure_date'),  # Support both field names
             ticket_class=data.get('ticket_class', 'economy'),
             booking_value=data.get('booking_value', 2500000),
-            passengers=data.get('passengers', 1)
+            passengers=data.get('passengers', 1),
+            flight_number=data.get('flight_number'),
+            hold_id=data.get('hold_id')
         )
         return jsonify(result)
 
@@ -244,12 +338,92 @@ def vietjet_book_flight():
         }), 500
 
 
+@vietjet_bp.route('/book-group', methods=['POST'])
+def vietjet_book_group():
+    """Đặt vé đoàn nhiều hành khách, trả về danh sách hành khách (manifest)"""
+    try:
+        data = request.get_json() or {}
+        result = get_vietjet_service().book_group(
+            customer_id=data.get('customer_id'),
+            origin=data.get('origin'),
+            destination=data.get('destination'),
+            flight_date=data.get('flight_date') or data.get('departure_date'),
+            passengers=data.get('passengers'),
+            ticket_class=data.get('ticket_class', 'economy'),
+            fare_per_passenger=data.get('fare_per_passenger', 2500000),
+            flight_number=data.get('flight_number'),
+            hold_id=data.get('hold_id')
+        )
+        return (jsonify(result), 200) if result.get('success') else (jsonify(result), 400)
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Lỗi đặt vé đoàn: {str(e)}"
+        }), 500
+
+
+@vietjet_bp.route('/group/<int:customer_id>/<booking_group_id>', methods=['GET'])
+def vietjet_group_manifest(customer_id, booking_group_id):
+    """Danh sách hành khách của một lần đặt vé đoàn"""
+    try:
+        result = get_vietjet_service().get_group_manifest(customer_id, booking_group_id)
+        return (jsonify(result), 200) if result.get('success') else (jsonify(result), 404)
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Lỗi lấy danh sách hành khách: {str(e)}"
+        }), 500
+
+
+@vietjet_bp.route('/hold', methods=['POST'])
+def vietjet_hold_seats():
+    """Giữ ghế tạm thời trên một chuyến bay"""
+    try:
+        data = request.get_json() or {}
+        result = get_vietjet_service().hold_seats(
+            customer_id=data.get('customer_id'),
+            origin=data.get('origin', 'HAN'),
+            destination=data.get('destination', 'SGN'),
+            flight_date=data.get('flight_date') or data.get('departure_date'),
+            ticket_class=data.get('ticket_class', 'economy'),
+            seats=data.get('seats', 1),
+            flight_number=data.get('flight_number')
+        )
+        return (jsonify(result), 200) if result.get('success') else (jsonify(result), 409)
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Lỗi giữ chỗ: {str(e)}"
+        }), 500
+
+
+@vietjet_bp.route('/hold/<hold_id>/release', methods=['POST'])
+def vietjet_release_hold(hold_id):
+    """Hủy giữ chỗ"""
+    try:
+        data = request.get_json() or {}
+        result = get_vietjet_service().release_hold(data.get('customer_id'), hold_id)
+        return (jsonify(result), 200) if result.get('success') else (jsonify(result), 404)
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Lỗi hủy giữ chỗ: {str(e)}"
+        }), 500
+
+
 @vietjet_bp.route('/history/<int:customer_id>', methods=['GET'])
 def vietjet_history(customer_id):
     """Lấy lịch sử đặt vé của khách hàng"""
     try:
-        result = get_vietjet_service().get_booking_history(customer_id)
-        return jsonify(result)
+        result = get_vietjet_service().get_booking_history(
+            customer_id,
+            limit=request.args.get('limit', 50, type=int),
+            cursor=request.args.get('cursor')
+        )
+        if result.get('success'):
+            return jsonify(result)
+        status = 400 if result.get('invalid_params') else 500
+        return jsonify(result), status
     except Exception as e:
         return jsonify({
             "success": False,
@@ -257,6 +431,87 @@ def vietjet_history(customer_id):
         }), 500
 
 
+@vietjet_bp.route('/search', methods=['GET'])
+def vietjet_search_flights():
+    """Tìm chuyến bay theo tuyến và ngày bay"""
+    try:
+        args = request.args
+        if not args.get('origin') or not args.get('destination'):
+            return jsonify({
+                "success": False,
+                "error": "Missing origin or destination"
+            }), 400
+
+        result = get_vietjet_service().search_flights(
+            origin=args.get('origin'),
+            destination=args.get('destination'),
+            departure_date=args.get('departure_date'),
+            return_date=args.get('return_date')
+        )
+        return (jsonify(result), 200) if result.get('success') else (jsonify(result), 400)
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"Lỗi tìm chuyến bay: {str(e)}"
+        }), 500
+
+
+@vietjet_bp.route('/fare-calendar', methods=['GET'])
+def vietjet_fare_calendar():
+    """Lịch giá vé thấp nhất theo ngày (cả tháng hoặc khoảng ngày)"""
+    try:
+        args = request.args
+        if not args.get('origin') or not args.get('destination'):
+            return jsonify({
+                "success": False,
+                "error": "Missing origin or destination"
+            }), 400
+
+        result = get_vietjet_service().get_fare_calendar(
+            origin=args.get('origin'),
+            destination=args.get('destination'),
+            month=args.get('month'),
+            date_from=args.get('date_from'),
+            date_to=args.get('date_to'),
+            ticket_class=args.get('ticket_class', 'economy')
+        )
+        return (jsonify(result), 200) if result.get('success') else (jsonify(result), 400)
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"Lỗi lấy lịch giá vé: {str(e)}"
+        }), 500
+
+
+@vietjet_bp.route('/itineraries', methods=['GET'])
+def vietjet_itineraries():
+    """Tìm hành trình bay thẳng / nối chuyến rẻ nhất hoặc nhanh nhất"""
+    try:
+        args = request.args
+        if not args.get('origin') or not args.get('destination'):
+            return jsonify({
+                "success": False,
+                "error": "Missing origin or destination"
+            }), 400
+
+        result = get_vietjet_service().search_itineraries(
+            origin=args.get('origin'),
+            destination=args.get('destination'),
+            departure_date=args.get('departure_date'),
+            k=args.get('k', 5, type=int),
+            mode=args.get('mode', 'cheapest'),
+            ticket_class=args.get('ticket_class', 'economy'),
+            max_stops=args.get('max_stops', 2, type=int),
+            min_connection=args.get('min_connection', 60, type=int)
+        )
+        return (jsonify(result), 200) if result.get('success') else (jsonify(result), 400)
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"Lỗi tìm hành trình: {str(e)}"
+        }), 500
+
+
 # =============================================================================
 # RESORT ROUTES
 # =============================================================================
@@ -276,7 +531,8 @@ def resort_book_room():
         result = service.book_room(
             customer_id=data.get('customer_id'),
             nights=data.get('nights', 2),
-            room_type=data.get('room_type', 'deluxe')
+            room_type=data.get('room_type', 'deluxe'),
+            check_in_date=data.get('check_in_date')
         )
         return jsonify(result)
 
@@ -287,6 +543,43 @@ def resort_book_room():
         }), 500
 
 
+@resort_bp.route('/availability', methods=['GET'])
+def resort_availability():
+    """Số phòng trống của một hạng phòng trong khoảng ngày"""
+    try:
+        args = request.args
+        if not args.get('check_in_date') or not args.get('check_out_date'):
+            return jsonify({
+                "success": False,
+                "message": "Missing check_in_date or check_out_date"
+            }), 400
+
+        result = get_resort_service().check_availability(
+            room_type=args.get('room_type', 'deluxe'),
+            check_in_date=args.get('check_in_date'),
+            check_out_date=args.get('check_out_date')
+        )
+        return (jsonify(result), 200) if result.get('success') else (jsonify(result), 400)
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Lỗi kiểm tra phòng trống: {str(e)}"
+        }), 500
+
+
+@resort_bp.route('/availability-calendar', methods=['GET'])
+def resort_availability_calendar():
+    """Lịch phòng trống theo ngày của mọi hạng phòng trong một tháng"""
+    try:
+        result = get_resort_service().get_availability_calendar(month=request.args.get('month'))
+        return (jsonify(result), 200) if result.get('success') else (jsonify(result), 400)
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Lỗi lấy lịch phòng trống: {str(e)}"
+        }), 500
+
+
 @resort_bp.route('/book-spa', methods=['POST'])
 def resort_book_spa():
     """Đặt dịch vụ Spa và lưu vào database"""
@@ -301,7 +594,9 @@ def resort_book_spa():
             
         result = service.book_spa(
             customer_id=data.get('customer_id'),
-            spa_type=data.get('spa_type', 'massage')
+            spa_type=data.get('spa_type', 'massage'),
+            appointment_date=data.get('appointment_date'),
+            start_time=data.get('start_time')
         )
         return jsonify(result)
 
@@ -309,4 +604,23 @@ def resort_book_spa():
         return jsonify({
             "success": False,
             "message": f"Lỗi đặt spa: {str(e)}"
-        }), 500
\ No newline at end of file
+        }), 500
+
+
+@resort_bp.route('/spa/availability', methods=['GET'])
+def resort_spa_availability():
+    """Các giờ hẹn spa trống sớm nhất của một dịch vụ"""
+    try:
+        args = request.args
+        result = get_resort_service().get_spa_availability(
+            spa_type=args.get('spa_type', 'massage'),
+            date_from=args.get('date_from'),
+            count=args.get('count', 5, type=int),
+            days=args.get('days', 14, type=int)
+        )
+        return (jsonify(result), 200) if result.get('success') else (jsonify(result), 400)
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Lỗi lấy lịch spa trống: {str(e)}"
+        }), 500
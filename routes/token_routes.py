@@ -22,11 +22,11 @@ def get_token_service():
 def get_user_tokens(customer_id):
     """Get user's SVT token balance and transaction history"""
     try:
-        from models.customer import Customer
+        from services.request_lookup import get_customer
         from models.transactions import TokenTransaction
 
         # Check if customer exists
-        customer = Customer.query.filter_by(customer_id=customer_id).first()
+        customer = get_customer(customer_id)
         if not customer:
             return jsonify({'success': False, 'error': 'Customer not found'}), 404
 
@@ -14,10 +14,10 @@ token_transaction_bp = Blueprint('token_transactions', __name__, url_prefix='/ap
 def get_customer_token_transactions(customer_id):
     """Get token transactions for customer"""
     try:
-        from models.customer import Customer
+        from services.request_lookup import get_customer
         from models.transactions import TokenTransaction
         
-        customer = Customer.query.filter_by(customer_id=customer_id).first()
+        customer = get_customer(customer_id)
         if not customer:
             return jsonify({'success': False, 'error': 'Customer not found'}), 404
         
@@ -64,7 +64,7 @@ def get_customer_token_transactions(customer_id):
 def create_token_transaction(user_id):
     """Create new token transaction"""
     try:
-        from models.customer import Customer
+        from services.request_lookup import get_customer
         from models.transactions import TokenTransaction
         
         data = request.json
@@ -79,7 +79,7 @@ def create_token_transaction(user_id):
                 'error': 'customer_id, transaction_type, and amount are required'
             }), 400
         
-        customer = Customer.query.filter_by(customer_id=customer_id).first()
+        customer = get_customer(customer_id)
         if not customer:
             return jsonify({'success': False, 'error': 'Customer not found'}), 404
         
@@ -0,0 +1,74 @@
+# services/achievement_catalog.py
+# -*- coding: utf-8 -*-
+"""
+Admin achievement catalog with unlock statistics
+
+Danh sách achievement cho admin được dựng từ đúng một truy vấn
+achievements LEFT JOIN customer_achievements GROUP BY achievement: số khách
+đã mở khóa, số lượt mở khóa trong VELOCITY_DAYS ngày gần nhất và kỳ liền
+trước, lần mở khóa gần nhất; tổng số khách hàng đi kèm dưới dạng scalar
+subquery để tính tỉ lệ mở khóa. Kết quả được cache và xóa khi gán achievement
+hoặc tạo achievement mới (process khác nhận thay đổi sau tối đa CATALOG_TTL giây).
+"""
+
+import datetime
+
+from sqlalchemy import case, func, select
+
+from models.database import db
+from models.achievements import Achievement, CustomerAchievement
+from models.customer import Customer
+from services.cache import TTLCache
+
+CATALOG_TTL = 300
+VELOCITY_DAYS = 7
+MAX_VELOCITY_DAYS = 90
+
+# (velocity_days) -> danh sách achievement kèm thống kê
+_catalog_cache = TTLCache(ttl=CATALOG_TTL, max_entries=MAX_VELOCITY_DAYS)
+
+
+def invalidate_achievement_catalog():
+    """Xóa catalog đã cache sau khi gán / tạo achievement"""
+    _catalog_cache.clear()
+
+
+def get_achievement_catalog(velocity_days=VELOCITY_DAYS):
+    """Achievement kèm customer_count, unlock_rate và tốc độ mở khóa gần đây (cache hoặc một truy vấn)"""
+    velocity_days = max(1, min(int(velocity_days), MAX_VELOCITY_DAYS))
+    cached = _catalog_cache.get(velocity_days)
+    if cached is not None:
+        return cached
+
+    now = datetime.datetime.utcnow()
+    recent_since = now - datetime.timedelta(days=velocity_days)
+    previous_since = recent_since - datetime.timedelta(days=velocity_days)
+    unlocked_at = CustomerAchievement.unlocked_at
+
+    rows = db.session.query(
+        Achievement,
+        func.count(CustomerAchievement.id).label('customer_count'),
+        func.count(case((unlocked_at >= recent_since, 1))).label('recent_unlocks'),
+        func.count(case((db.and_(unlocked_at >= previous_since, unlocked_at < recent_since), 1))).label('previous_unlocks'),
+        func.max(unlocked_at).label('last_unlocked_at'),
+        select(func.count(Customer.id)).scalar_subquery().label('total_customers')
+    ).outerjoin(
+        CustomerAchievement, CustomerAchievement.achievement_id == Achievement.id
+    ).group_by(Achievement.id).order_by(Achievement.id).all()
+
+    catalog = []
+    for achievement, customer_count, recent_unlocks, previous_unlocks, last_unlocked_at, total_customers in rows:
+        entry = achievement.to_dict()
+        entry.update({
+            'customer_count': customer_count,
+            'unlock_rate': round(customer_count / total_customers, 4) if total_customers else 0.0,
+            'recent_unlocks': recent_unlocks,
+            'previous_unlocks': previous_unlocks,
+            'unlocks_per_day': round(recent_unlocks / velocity_days, 2),
+            'velocity_change': round((recent_unlocks - previous_unlocks) / previous_unlocks, 4) if previous_unlocks else None,
+            'last_unlocked_at': last_unlocked_at.isoformat() if last_unlocked_at else None
+        })
+        catalog.append(entry)
+
+    _catalog_cache.set(velocity_days, catalog)
+    return catalog
@@ -0,0 +1,310 @@
+# services/activity_bitmaps.py
+# -*- coding: utf-8 -*-
+"""
+Daily activity bitmaps for streak / retention missions
+
+Mỗi (khách hàng, loại hoạt động, năm) là một dòng customer_activity_bitmaps
+với BLOB 46 byte: bit thứ i (little-endian trong từng byte) = có hoạt động vào
+ngày thứ i của năm. Một năm của một khách hàng chỉ tốn 46 byte, thay vì quét
+lại token_transactions / hdbank_transactions theo thời gian.
+
+- Ghi: ActivityRecorder đăng ký domain event (đăng nhập, các giao dịch) và
+  gộp các ngày cần bật trong bộ nhớ; worker định kỳ đọc các dòng liên quan
+  bằng truy vấn IN, OR bit bằng numpy rồi ghi bulk insert / executemany UPDATE
+  có điều kiện version (khóa lạc quan, xung đột thì đọc lại và thử lại).
+- Đọc: các dòng được ghép thành ma trận (khách hàng x ngày) và tính vector hóa
+  bằng numpy: chuỗi ngày liên tiếp hiện tại, chuỗi dài nhất (run-length), số
+  ngày hoạt động trong M ngày gần nhất, retention theo cohort.
+"""
+
+import datetime
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy import bindparam
+from sqlalchemy.exc import IntegrityError
+
+from models.database import db
+from models.activity import CustomerActivityBitmap, BITMAP_BYTES
+from services import domain_events
+
+ACTIVITY_LOGIN = 'login'
+ACTIVITY_TRANSACTION = 'transaction'
+ACTIVITY_TYPES = (ACTIVITY_LOGIN, ACTIVITY_TRANSACTION)
+
+FLUSH_SECONDS = 1.0
+FLUSH_ATTEMPTS = 3
+QUERY_CHUNK = 1000
+MAX_WINDOW_DAYS = 366 * 2
+
+
+def day_index(date):
+    """Ngày thứ mấy trong năm (0-based)"""
+    return date.timetuple().tm_yday - 1
+
+
+def _empty_bits():
+    return np.zeros(BITMAP_BYTES, dtype=np.uint8)
+
+
+# ------------------------------------------------------------------ ghi bit
+
+class ActivityRecorder:
+    """Gộp các ngày hoạt động từ domain event và OR vào bitmap theo batch"""
+
+    # Loại sự kiện -> loại hoạt động
+    EVENT_ACTIVITIES = dict(
+        [(event_type, ACTIVITY_TRANSACTION) for event_type in domain_events.TRANSACTION_EVENTS]
+        + [(domain_events.CUSTOMER_LOGIN, ACTIVITY_LOGIN)]
+    )
+
+    def __init__(self, flush_seconds=FLUSH_SECONDS):
+        self.flush_seconds = flush_seconds
+        self._pending = defaultdict(set)  # (customer_id, activity_type, year) -> {ngày trong năm}
+        self._lock = threading.Lock()
+        self._app = None
+        self._worker = None
+        self.stats = {'events': 0, 'batches': 0, 'rows': 0, 'conflicts': 0}
+
+    def handle(self, events):
+        """Subscriber của domain_events"""
+        for event in events:
+            activity_type = self.EVENT_ACTIVITIES.get(event.type)
+            if activity_type:
+                self.record(event.customer_id, activity_type, event.occurred_at.date())
+
+    def record(self, customer_id, activity_type, date=None):
+        """Đánh dấu khách hàng có hoạt động vào ngày `date` (mặc định hôm nay, UTC)"""
+        date = date or datetime.datetime.utcnow().date()
+        with self._lock:
+            self._pending[(customer_id, activity_type, date.year)].add(day_index(date))
+            self.stats['events'] += 1
+        self._ensure_worker()
+
+    def _ensure_worker(self):
+        if self._worker is not None or not has_app_context():
+            return
+        with self._lock:
+            if self._worker is None:
+                self._app = current_app._get_current_object()
+                self._worker = threading.Thread(target=self._run, name='activity-bitmaps', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            with self._app.app_context():
+                try:
+                    self.flush()
+                finally:
+                    db.session.remove()
+
+    def flush(self):
+        """Ghi các ngày đang chờ (cần app context); trả về số dòng bitmap đã ghi"""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(set)
+        if not pending:
+            return 0
+        for attempt in range(FLUSH_ATTEMPTS):
+            try:
+                written = self._apply(pending)
+                self.stats['batches'] += 1
+                self.stats['rows'] += written
+                return written
+            except _VersionConflict:
+                db.session.rollback()
+                self.stats['conflicts'] += 1
+            except IntegrityError:
+                # Process khác vừa tạo cùng dòng: đọc lại và OR vào dòng đó
+                db.session.rollback()
+                self.stats['conflicts'] += 1
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Activity bitmap flush failed: {e}")
+                break
+        with self._lock:
+            for key, days in pending.items():
+                self._pending[key] |= days
+        return 0
+
+    def _apply(self, pending):
+        existing = {}
+        customer_ids = sorted({key[0] for key in pending})
+        years = {key[2] for key in pending}
+        types = {key[1] for key in pending}
+        for start in range(0, len(customer_ids), QUERY_CHUNK):
+            rows = db.session.query(
+                CustomerActivityBitmap.id, CustomerActivityBitmap.customer_id, CustomerActivityBitmap.activity_type,
+                CustomerActivityBitmap.year, CustomerActivityBitmap.bits, CustomerActivityBitmap.version
+            ).filter(
+                CustomerActivityBitmap.customer_id.in_(customer_ids[start:start + QUERY_CHUNK]),
+                CustomerActivityBitmap.activity_type.in_(types),
+                CustomerActivityBitmap.year.in_(years)
+            ).all()
+            for row in rows:
+                existing[(row.customer_id, row.activity_type, row.year)] = row
+
+        now = datetime.datetime.utcnow()
+        inserts, updates = [], []
+        for key, days in pending.items():
+            row = existing.get(key)
+            bits = np.frombuffer(row.bits, dtype=np.uint8).copy() if row else _empty_bits()
+            before = bits.copy()
+            day_array = np.fromiter(days, dtype=np.int64, count=len(days))
+            np.bitwise_or.at(bits, day_array >> 3, np.left_shift(1, day_array & 7).astype(np.uint8))
+            if row is None:
+                inserts.append({'customer_id': key[0], 'activity_type': key[1], 'year': key[2],
+                                'bits': bits.tobytes(), 'version': 0, 'updated_at': now})
+            elif not np.array_equal(bits, before):
+                updates.append({'bitmap_pk': row.id, 'new_bits': bits.tobytes(), 'old_version': row.version})
+
+        if inserts:
+            db.session.execute(CustomerActivityBitmap.__table__.insert(), inserts)
+        if updates:
+            bitmaps = CustomerActivityBitmap.__table__
+            updated = db.session.execute(
+                bitmaps.update()
+                .where(bitmaps.c.id == bindparam('bitmap_pk'), bitmaps.c.version == bindparam('old_version'))
+                .values(bits=bindparam('new_bits'), version=bitmaps.c.version + 1, updated_at=now),
+                updates
+            ).rowcount
+            if updated != len(updates):
+                raise _VersionConflict()
+        db.session.commit()
+        return len(inserts) + len(updates)
+
+
+class _VersionConflict(Exception):
+    pass
+
+
+# ------------------------------------------------------------------ đọc bit
+
+def load_window(activity_type, end_date, days, customer_ids=None):
+    """Ma trận hoạt động (customer_ids, bool[n, days]) của `days` ngày kết thúc tại end_date
+
+    Cột cuối là end_date. customer_ids=None: mọi khách hàng có ít nhất một
+    bitmap trong các năm của cửa sổ.
+    """
+    days = max(1, min(int(days), MAX_WINDOW_DAYS))
+    start_date = end_date - datetime.timedelta(days=days - 1)
+
+    per_year = {}
+    for year in range(start_date.year, end_date.year + 1):
+        query = db.session.query(CustomerActivityBitmap.customer_id, CustomerActivityBitmap.bits).filter(
+            CustomerActivityBitmap.activity_type == activity_type,
+            CustomerActivityBitmap.year == year
+        )
+        if customer_ids is None:
+            rows = query.all()
+        else:
+            wanted = list(customer_ids)
+            rows = []
+            for start in range(0, len(wanted), QUERY_CHUNK):
+                rows.extend(query.filter(
+                    CustomerActivityBitmap.customer_id.in_(wanted[start:start + QUERY_CHUNK])).all())
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        packed = np.frombuffer(b''.join(row[1] for row in rows), dtype=np.uint8).reshape(len(rows), BITMAP_BYTES)
+        per_year[year] = (ids, packed)
+
+    if customer_ids is None:
+        all_ids = np.unique(np.concatenate([ids for ids, _ in per_year.values()]))
+    else:
+        all_ids = np.unique(np.fromiter(customer_ids, dtype=np.int64))
+
+    segments = []
+    for year in range(start_date.year, end_date.year + 1):
+        ids, packed = per_year[year]
+        full = np.zeros((len(all_ids), BITMAP_BYTES), dtype=np.uint8)
+        if len(ids):
+            full[np.searchsorted(all_ids, ids)] = packed
+        first = day_index(start_date) if year == start_date.year else 0
+        last = day_index(end_date) if year == end_date.year else day_index(datetime.date(year, 12, 31))
+        segments.append(np.unpackbits(full, axis=1, bitorder='little')[:, first:last + 1].astype(bool))
+    return all_ids, np.concatenate(segments, axis=1)
+
+
+def _leading_run(matrix):
+    """Độ dài dãy True liên tiếp tính từ cột 0 của mỗi hàng"""
+    if matrix.shape[1] == 0:
+        return np.zeros(matrix.shape[0], dtype=np.int64)
+    zeros = ~matrix
+    return np.where(zeros.any(axis=1), zeros.argmax(axis=1), matrix.shape[1])
+
+
+def current_streaks(matrix, allow_pending_today=True):
+    """Chuỗi ngày hoạt động liên tiếp kết thúc ở cột cuối
+
+    allow_pending_today: hôm nay chưa hoạt động thì chuỗi tính đến hôm qua vẫn còn.
+    """
+    reversed_days = matrix[:, ::-1]
+    streak = _leading_run(reversed_days)
+    if allow_pending_today and matrix.shape[1] > 1:
+        streak = np.where(reversed_days[:, 0], streak, _leading_run(reversed_days[:, 1:]))
+    return streak
+
+
+def longest_streaks(matrix):
+    """Chuỗi dài nhất của mỗi hàng (run-length trên ma trận đã chèn cột 0 ngăn cách)"""
+    rows, width = matrix.shape
+    padded = np.zeros((rows, width + 1), dtype=np.int8)
+    padded[:, :width] = matrix
+    edges = np.diff(np.concatenate([[0], padded.ravel()]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    longest = np.zeros(rows, dtype=np.int64)
+    if len(starts):
+        np.maximum.at(longest, starts // (width + 1), ends - starts)
+    return longest
+
+
+def cohort_retention(matrix, period_days=7):
+    """Retention theo cohort: cohort = kỳ hoạt động đầu tiên trong cửa sổ
+
+    Trả về (sizes[c], rates[c, k]) với rates[c, k] = tỉ lệ khách của cohort c
+    còn hoạt động ở kỳ c + k (NaN khi c + k vượt cửa sổ).
+    """
+    periods = matrix.shape[1] // period_days
+    matrix = matrix[:, :periods * period_days]
+    matrix = matrix[matrix.any(axis=1)]
+    sizes = np.zeros(periods, dtype=np.int64)
+    rates = np.full((periods, periods), np.nan)
+    if not len(matrix) or not periods:
+        return sizes, rates
+
+    active = matrix.reshape(len(matrix), periods, period_days).any(axis=2)
+    cohort = active.argmax(axis=1)
+    sizes = np.bincount(cohort, minlength=periods)
+    target = cohort[:, None] + np.arange(periods)[None, :]
+    in_window = target < periods
+    retained_rows = active[np.arange(len(matrix))[:, None], np.minimum(target, periods - 1)] & in_window
+    retained = np.zeros((periods, periods), dtype=np.int64)
+    np.add.at(retained, cohort, retained_rows.astype(np.int64))
+    valid = (np.arange(periods)[:, None] + np.arange(periods)[None, :]) < periods
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rates = np.where(valid & (sizes[:, None] > 0), retained / sizes[:, None], np.nan)
+    return sizes, rates
+
+
+def customer_activity_summary(customer_id, activity_type, as_of=None):
+    """Chuỗi hiện tại, chuỗi dài nhất và số ngày hoạt động gần đây của một khách hàng"""
+    as_of = as_of or datetime.datetime.utcnow().date()
+    _, matrix = load_window(activity_type, as_of, 366, customer_ids=[customer_id])
+    row = matrix[:1]
+    return {
+        'activity_type': activity_type,
+        'as_of': as_of.isoformat(),
+        'current_streak': int(current_streaks(row)[0]),
+        'longest_streak_366d': int(longest_streaks(row)[0]),
+        'active_days_7d': int(row[:, -7:].sum()),
+        'active_days_30d': int(row[:, -30:].sum()),
+        'active_today': bool(row[0, -1])
+    }
+
+
+activity_recorder = ActivityRecorder()
+for _event_type in ActivityRecorder.EVENT_ACTIVITIES:
+    domain_events.subscribe(_event_type, activity_recorder.handle)
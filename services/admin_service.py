@@ -3,6 +3,9 @@
 Admin Service - Xử lý tất cả business logic cho Admin
 """
 
+from services.achievement_catalog import VELOCITY_DAYS, get_achievement_catalog, invalidate_achievement_catalog
+from services.request_lookup import get_customer
+
 class AdminService:
     def __init__(self, db, config, blockchain_enabled=False):
         self.db = db
@@ -14,25 +17,14 @@ class AdminService:
         """Set model classes after initialization"""
         self.models = model_classes
 
-    def get_all_achievements(self):
-        """Get all available achievements"""
+    def get_all_achievements(self, velocity_days=VELOCITY_DAYS):
+        """Get all available achievements with customer counts, unlock rate and unlock velocity"""
         try:
-            Achievement = self.models.get('Achievement')
-            CustomerAchievement = self.models.get('CustomerAchievement')
-            if not Achievement:
+            if not self.models.get('Achievement'):
                 return {'error': 'Achievement model not found'}, 500
-                
-            achievements = Achievement.query.all()
-            achievement_list = []
-            for ach in achievements:
-                customer_count = 0
-                if CustomerAchievement:
-                    customer_count = CustomerAchievement.query.filter_by(achievement_id=ach.id).count()
-                
-                achievement_data = ach.to_dict()
-                achievement_data['customer_count'] = customer_count
-                achievement_list.append(achievement_data)
-            
+
+            achievement_list = get_achievement_catalog(velocity_days)
+
             return {
                 'success': True,
                 'achievements': achievement_list,
@@ -52,7 +44,7 @@ class AdminService:
             customers = []
             if query_param.isdigit():
                 # Tìm theo customer_id
-                customer = Customer.query.filter_by(customer_id=int(query_param)).first()
+                customer = get_customer(int(query_param))
                 if customer:
                     customers = [customer]
             else:
@@ -174,7 +166,7 @@ class AdminService:
                 return {'error': 'Required models not found'}, 500
 
             # Kiểm tra customer tồn tại
-            customer = Customer.query.filter_by(customer_id=customer_id).first()
+            customer = get_customer(customer_id)
             if not customer:
                 return {'error': f'Không tìm thấy khách hàng với ID {customer_id}'}, 404
 
@@ -230,6 +222,7 @@ class AdminService:
 
             self.db.session.add(new_assignment)
             self.db.session.commit()
+            invalidate_achievement_catalog()
 
             return {
                 'success': True,
@@ -259,7 +252,7 @@ class AdminService:
                 return {'error': 'Required models not found'}, 500
 
             # Get customer
-            customer = Customer.query.filter_by(customer_id=customer_id).first()
+            customer = get_customer(customer_id)
             if not customer:
                 return {'error': f'Không tìm thấy khách hàng với ID {customer_id}'}, 404
 
@@ -322,6 +315,8 @@ class AdminService:
                         continue
 
             self.db.session.commit()
+            if assigned_count:
+                invalidate_achievement_catalog()
 
             return {
                 'success': True,
@@ -0,0 +1,264 @@
+# services/analytics_service.py
+# -*- coding: utf-8 -*-
+"""
+HDBank spending analytics
+
+Giao dịch của một khách hàng (hoặc một phân khúc khách hàng) được tải bằng
+một truy vấn vào các mảng cột pandas/NumPy. Phân loại chi tiêu theo
+description dùng bảng từ khóa đã compile thành regex và chỉ chạy trên các
+description khác nhau (pd.factorize), sau đó groupby theo tháng, trung bình
+trượt 3 tháng và percentile đều tính vector hóa. Kết quả được cache ngắn hạn.
+"""
+
+import datetime
+import re
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from models.database import db
+from services.cache import TTLCache
+
+DEFAULT_MONTHS = 12
+MAX_MONTHS = 36
+ROLLING_WINDOW = 3
+PERCENTILES = (50, 75, 90, 99)
+
+# (mã danh mục, nhãn, từ khóa) - thứ tự là độ ưu tiên khi description khớp nhiều danh mục
+CATEGORY_KEYWORDS = [
+    ('salary', 'Lương & thu nhập', ['lương', 'salary', 'payroll', 'thưởng tháng']),
+    ('loan', 'Khoản vay', ['giải ngân', 'khoản vay', 'trả nợ', 'loan']),
+    ('card', 'Thẻ & phí ngân hàng', ['mở thẻ', 'phí thường niên', 'phí dịch vụ', 'annual fee']),
+    ('travel', 'Du lịch', ['vietjet', 'vé máy bay', 'chuyến bay', 'resort', 'khách sạn', 'hotel', 'spa', 'booking']),
+    ('food', 'Ăn uống', ['nhà hàng', 'cafe', 'coffee', 'cà phê', 'highlands', 'starbucks', 'grabfood',
+                         'shopeefood', 'baemin', 'ăn uống', 'restaurant']),
+    ('shopping', 'Mua sắm', ['shopee', 'lazada', 'tiki', 'mua sắm', 'siêu thị', 'vinmart', 'winmart',
+                             'bách hóa xanh', 'co.opmart', 'sendo']),
+    ('bills', 'Hóa đơn & tiện ích', ['tiền điện', 'tiền nước', 'hóa đơn', 'internet', 'viettel', 'vnpt',
+                                     'mobifone', 'fpt telecom', 'evn']),
+    ('transport', 'Di chuyển', ['grab', 'gojek', 'xăng', 'petrolimex', 'taxi', 'gửi xe']),
+    ('transfer', 'Chuyển khoản', ['chuyển khoản']),
+]
+OTHER_CATEGORY = ('other', 'Khác')
+
+_CATEGORY_PATTERNS = [
+    (code, label, re.compile('|'.join(re.escape(keyword) for keyword in keywords)))
+    for code, label, keywords in CATEGORY_KEYWORDS
+]
+_CATEGORY_LABELS = dict([(code, label) for code, label, _ in CATEGORY_KEYWORDS] + [OTHER_CATEGORY])
+
+_CUSTOMER_TX_SQL = text("""
+    SELECT transaction_date, amount, description
+    FROM hdbank_transactions
+    WHERE customer_id = :customer_id AND transaction_date >= :since
+""")
+
+_SEGMENT_TX_SQL = """
+    SELECT t.transaction_date, t.amount, t.description
+    FROM hdbank_transactions t
+    JOIN customers c ON c.customer_id = t.customer_id
+    WHERE t.transaction_date >= :since {filters}
+"""
+
+_SEGMENT_COUNT_SQL = """
+    SELECT COUNT(*) FROM customers c WHERE 1 = 1 {filters}
+"""
+
+_analytics_cache = TTLCache(ttl=300, max_entries=2000)
+
+
+def invalidate_customer_analytics(customer_id):
+    """Bỏ kết quả analytics đã cache của khách hàng (sau khi có giao dịch mới)"""
+    try:
+        _analytics_cache.invalidate_prefix(('customer', int(customer_id)))
+    except (TypeError, ValueError):
+        pass
+
+
+def classify_descriptions(descriptions):
+    """Mảng description -> mảng mã danh mục (chỉ phân loại mỗi description khác nhau một lần)"""
+    codes, uniques = pd.factorize(pd.Series(descriptions, dtype=object).fillna(''), sort=False)
+    if len(uniques) == 0:
+        return np.array([], dtype=object)
+    unique_text = pd.Series(uniques, dtype=object).str.lower()
+    conditions = [unique_text.str.contains(pattern, regex=True).to_numpy()
+                  for _, _, pattern in _CATEGORY_PATTERNS]
+    unique_categories = np.select(conditions, [code for code, _, _ in _CATEGORY_PATTERNS],
+                                  default=OTHER_CATEGORY[0])
+    return unique_categories[codes]
+
+
+def _window_start(months, today=None):
+    """Ngày đầu tháng của tháng sớm nhất trong cửa sổ `months` tháng gần nhất"""
+    today = today or datetime.date.today()
+    month_index = today.year * 12 + today.month - 1 - (months - 1)
+    return datetime.datetime(month_index // 12, month_index % 12 + 1, 1)
+
+
+def _load_frame(sql, params):
+    """Một truy vấn -> DataFrame (transaction_date, amount, description)"""
+    rows = db.session.execute(sql, params).fetchall()
+    if not rows:
+        return pd.DataFrame({'transaction_date': pd.Series(dtype='datetime64[ns]'),
+                             'amount': pd.Series(dtype=np.float64),
+                             'description': pd.Series(dtype=object)})
+    dates, amounts, descriptions = zip(*rows)
+    return pd.DataFrame({
+        'transaction_date': pd.to_datetime(pd.Series(dates)),
+        'amount': np.fromiter((float(a or 0) for a in amounts), dtype=np.float64, count=len(amounts)),
+        'description': pd.Series(descriptions, dtype=object)
+    })
+
+
+def _percentiles(values):
+    if len(values) == 0:
+        return {f'p{p}': 0.0 for p in PERCENTILES}
+    results = np.percentile(values, PERCENTILES)
+    return {f'p{p}': round(float(v), 2) for p, v in zip(PERCENTILES, results)}
+
+
+def summarize(frame, since, months):
+    """Tính toàn bộ chỉ số analytics trên DataFrame giao dịch"""
+    amounts = frame['amount'].to_numpy()
+    credit = np.where(amounts > 0, amounts, 0.0)
+    debit = np.where(amounts < 0, -amounts, 0.0)
+    categories = classify_descriptions(frame['description'].to_numpy())
+
+    # Tổng thu / chi theo tháng, đủ mọi tháng trong cửa sổ (tháng trống = 0)
+    month_range = pd.period_range(since, periods=months, freq='M')
+    periods = frame['transaction_date'].dt.to_period('M')
+    monthly = pd.DataFrame({'month': periods, 'credit': credit, 'debit': debit}) \
+        .groupby('month').agg(credit=('credit', 'sum'), debit=('debit', 'sum'), count=('credit', 'size')) \
+        .reindex(month_range, fill_value=0)
+    rolling = monthly[['credit', 'debit']].rolling(ROLLING_WINDOW, min_periods=1).mean()
+
+    monthly_rows = [{
+        'month': str(month),
+        'credit': round(float(row['credit']), 2),
+        'debit': round(float(row['debit']), 2),
+        'net': round(float(row['credit'] - row['debit']), 2),
+        'transaction_count': int(row['count']),
+        'credit_rolling_3m': round(float(rolling.at[month, 'credit']), 2),
+        'debit_rolling_3m': round(float(rolling.at[month, 'debit']), 2)
+    } for month, row in monthly.iterrows()]
+
+    # Chi tiêu theo danh mục (chỉ tính giao dịch chi)
+    is_debit = debit > 0
+    total_debit = float(debit.sum())
+    by_category = pd.DataFrame({'category': categories[is_debit], 'amount': debit[is_debit]}) \
+        .groupby('category')['amount'].agg(['sum', 'size']).sort_values('sum', ascending=False)
+    category_rows = [{
+        'category': code,
+        'label': _CATEGORY_LABELS.get(code, code),
+        'amount': round(float(row['sum']), 2),
+        'transaction_count': int(row['size']),
+        'share': round(float(row['sum']) / total_debit * 100, 2) if total_debit else 0.0
+    } for code, row in by_category.iterrows()]
+
+    total_credit = float(credit.sum())
+    return {
+        'months': months,
+        'period_from': str(month_range[0]),
+        'period_to': str(month_range[-1]),
+        'transaction_count': int(len(frame)),
+        'totals': {
+            'credit': round(total_credit, 2),
+            'debit': round(total_debit, 2),
+            'net': round(total_credit - total_debit, 2),
+            'average_monthly_debit': round(total_debit / months, 2)
+        },
+        'monthly': monthly_rows,
+        'categories': category_rows,
+        'percentiles': {
+            'debit': _percentiles(debit[is_debit]),
+            'credit': _percentiles(credit[credit > 0])
+        }
+    }
+
+
+class AnalyticsService:
+    """Phân tích chi tiêu HDBank cho khách hàng và phân khúc khách hàng"""
+
+    def _normalize_months(self, months):
+        try:
+            months = int(months) if months is not None else DEFAULT_MONTHS
+        except (TypeError, ValueError):
+            raise ValueError('months')
+        if not 1 <= months <= MAX_MONTHS:
+            raise ValueError('months')
+        return months
+
+    def get_customer_analytics(self, customer_id, months=DEFAULT_MONTHS):
+        """Phân tích chi tiêu của một khách hàng trong `months` tháng gần nhất"""
+        try:
+            months = self._normalize_months(months)
+        except ValueError:
+            return {'success': False, 'invalid_params': True, 'error': f'Tham số không hợp lệ: months (1-{MAX_MONTHS})'}
+
+        cache_key = ('customer', int(customer_id), months)
+        cached = _analytics_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        try:
+            started = time.perf_counter()
+            since = _window_start(months)
+            frame = _load_frame(_CUSTOMER_TX_SQL, {'customer_id': customer_id, 'since': since})
+            result = {
+                'success': True,
+                'customer_id': customer_id,
+                **summarize(frame, since, months),
+                'generated_at': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+            }
+            _analytics_cache.set(cache_key, result)
+            return result
+        except Exception as e:
+            print(f"❌ Error computing spending analytics: {e}")
+            return {'success': False, 'error': str(e)}
+
+    def get_segment_analytics(self, persona_type=None, city=None, months=DEFAULT_MONTHS):
+        """Phân tích chi tiêu gộp cho phân khúc khách hàng (persona_type / city)"""
+        try:
+            months = self._normalize_months(months)
+        except ValueError:
+            return {'success': False, 'invalid_params': True, 'error': f'Tham số không hợp lệ: months (1-{MAX_MONTHS})'}
+
+        cache_key = ('segment', persona_type, city, months)
+        cached = _analytics_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        try:
+            started = time.perf_counter()
+            since = _window_start(months)
+            filters, params = '', {'since': since}
+            if persona_type:
+                filters += ' AND c.persona_type = :persona_type'
+                params['persona_type'] = persona_type
+            if city:
+                filters += ' AND c.city = :city'
+                params['city'] = city
+
+            frame = _load_frame(text(_SEGMENT_TX_SQL.format(filters=filters)), params)
+            customer_count = db.session.execute(
+                text(_SEGMENT_COUNT_SQL.format(filters=filters)), params).scalar() or 0
+
+            summary = summarize(frame, since, months)
+            summary['totals']['average_monthly_debit_per_customer'] = round(
+                summary['totals']['debit'] / months / customer_count, 2) if customer_count else 0.0
+            result = {
+                'success': True,
+                'segment': {'persona_type': persona_type, 'city': city},
+                'customer_count': int(customer_count),
+                **summary,
+                'generated_at': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+            }
+            _analytics_cache.set(cache_key, result)
+            return result
+        except Exception as e:
+            print(f"❌ Error computing segment analytics: {e}")
+            return {'success': False, 'error': str(e)}
@@ -9,6 +9,7 @@ import jwt
 from functools import wraps
 from flask import request, jsonify, current_app
 from models.database import db, bcrypt
+from services import domain_events
 
 
 class AuthService:
@@ -60,10 +61,7 @@ class AuthService:
             customer_business_id = None
             if role == 'customer':
                 # Generate unique customer_id
-                import random
-                customer_business_id = random.randint(100000, 999999)
-                while Customer.query.filter_by(customer_id=customer_business_id).first():
-                    customer_business_id = random.randint(100000, 999999)
+                customer_business_id = self._allocate_customer_id()
 
                 customer = Customer(
                     customer_id=customer_business_id,
@@ -84,6 +82,8 @@ class AuthService:
 
             db.session.add(user)
             db.session.commit()
+            if customer_business_id:
+                domain_events.publish(domain_events.CUSTOMER_CREATED, customer_business_id)
 
             token = self.create_token(user.id)
             return {
@@ -101,6 +101,22 @@ class AuthService:
             db.session.rollback()
             return {'success': False, 'error': str(e)}
 
+    def _allocate_customer_id(self, candidates=16):
+        """Chọn customer_id 6 chữ số chưa dùng, kiểm tra cả lô ứng viên bằng một truy vấn.
+
+        customers.customer_id là cột INT nên không chứa được ID Snowflake 63 bit.
+        """
+        import random
+        from models.customer import Customer
+
+        while True:
+            pool = random.sample(range(100000, 1000000), candidates)
+            taken = {row[0] for row in db.session.query(Customer.customer_id)
+                     .filter(Customer.customer_id.in_(pool)).all()}
+            for candidate in pool:
+                if candidate not in taken:
+                    return candidate
+
     def login(self, email, password):
         """Đăng nhập"""
         try:
@@ -116,6 +132,7 @@ class AuthService:
             actual_customer_id = None
             if user.customer_id and user.customer:
                 actual_customer_id = user.customer.customer_id
+                domain_events.publish(domain_events.CUSTOMER_LOGIN, actual_customer_id)
 
             token = self.create_token(user.id)
             return {
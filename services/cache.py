@@ -0,0 +1,64 @@
+# services/cache.py
+# -*- coding: utf-8 -*-
+"""
+In-process TTL cache used by services for short-lived read results
+"""
+
+import threading
+import time
+
+
+class TTLCache:
+    """Thread-safe key/value cache whose entries expire after `ttl` seconds"""
+
+    def __init__(self, ttl=30, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Trả về giá trị còn hạn hoặc `default`"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Lưu giá trị với TTL riêng (mặc định dùng TTL của cache)"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if len(self._data) >= self.max_entries and key not in self._data:
+                self._evict_expired()
+                if len(self._data) >= self.max_entries:
+                    # Bỏ entry cũ nhất (dict giữ thứ tự chèn)
+                    self._data.pop(next(iter(self._data)))
+            self._data[key] = (expires_at, value)
+
+    def invalidate(self, key):
+        """Xóa một key khỏi cache"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_prefix(self, prefix):
+        """Xóa tất cả key dạng tuple bắt đầu bằng `prefix`"""
+        with self._lock:
+            for key in [k for k in self._data if isinstance(k, tuple) and k[:len(prefix)] == prefix]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        for key in [k for k, (expires_at, _) in self._data.items() if expires_at < now]:
+            del self._data[key]
+
+    def __len__(self):
+        return len(self._data)
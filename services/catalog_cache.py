@@ -0,0 +1,93 @@
+# services/catalog_cache.py
+# -*- coding: utf-8 -*-
+"""
+Versioned marketplace catalog cache
+
+Danh mục vật phẩm ít thay đổi nhưng được đọc liên tục. Cache giữ sẵn JSON của
+từng vật phẩm (đã chuyển Decimal -> float) dưới dạng mảnh chuỗi thiếu trường
+`quantity`; body trả về chỉ là phép nối chuỗi với số lượng tồn kho lấy từ một
+map nhỏ (hot stock overlay). Nhờ vậy:
+
+- tạo / sửa vật phẩm: tăng `version`, lần đọc sau dựng lại từ database;
+- mua hàng: chỉ cập nhật overlay và tăng `stock_version`, body được nối lại
+  mà không truy vấn hay serialize lại danh mục.
+
+ETag mạnh là SHA-1 của body, tính một lần cho mỗi (version, stock_version),
+nên client gửi If-None-Match nhận 304 khi danh mục và tồn kho chưa đổi.
+Thay đổi từ process khác được nhận sau tối đa MAX_AGE giây.
+"""
+
+import hashlib
+import json
+import threading
+import time
+
+from models.marketplace import MarketplaceItem
+
+MAX_AGE = 60  # giây tối đa giữ danh mục trước khi đọc lại database
+
+
+class CatalogCache:
+    """Body JSON + ETag của danh mục marketplace, dựng lại theo version"""
+
+    def __init__(self, max_age=MAX_AGE):
+        self.max_age = max_age
+        self.version = 0
+        self.stock_version = 0
+        self._fragments = None   # [(item_id, '{"id": ..., "quantity": '), ...]
+        self._built_version = None
+        self._built_at = 0.0
+        self._stock = {}         # item_id -> số lượng còn lại
+        self._body = None        # (version, stock_version, body, etag)
+        self._lock = threading.Lock()
+
+    def bump(self):
+        """Danh mục đã đổi (tạo / sửa / ẩn vật phẩm): lần đọc sau dựng lại từ database"""
+        with self._lock:
+            self.version += 1
+
+    def set_stock(self, item_id, quantity):
+        """Cập nhật tồn kho của một vật phẩm sau khi mua (không dựng lại danh mục)"""
+        with self._lock:
+            if self._stock.get(item_id) != quantity:
+                self._stock[item_id] = quantity
+                self.stock_version += 1
+
+    def get(self):
+        """(body bytes, etag) của danh mục hiện tại"""
+        with self._lock:
+            if self._fragments is None or self._built_version != self.version \
+                    or time.monotonic() - self._built_at > self.max_age:
+                self._build_locked()
+            key = (self.version, self.stock_version)
+            if self._body is None or self._body[:2] != key:
+                parts = [f"{fragment}{self._stock.get(item_id, 0)}}}" for item_id, fragment in self._fragments]
+                body = f'{{"items": [{", ".join(parts)}], "total": {len(parts)}}}'.encode()
+                etag = hashlib.sha1(body).hexdigest()
+                self._body = key + (body, etag)
+            return self._body[2], self._body[3]
+
+    def _build_locked(self):
+        items = MarketplaceItem.query.filter_by(is_active=True).order_by(MarketplaceItem.id).all()
+        fragments = []
+        stock = {}
+        for item in items:
+            data = json.dumps({
+                'id': item.id,
+                'name': item.name,
+                'description': item.description,
+                'price_svt': float(item.price_svt),
+                'partner_brand': item.partner_brand,
+                'image_url': item.image_url,
+                'created_at': item.created_at.isoformat() if item.created_at else None
+            })
+            fragments.append((item.id, f'{data[:-1]}, "quantity": '))
+            stock[item.id] = item.quantity or 0
+        self._fragments = fragments
+        self._stock = stock
+        self._built_version = self.version
+        self._built_at = time.monotonic()
+        self.stock_version += 1
+
+
+catalog_cache = CatalogCache()
@@ -1,5 +1,7 @@
 # services/customer_service.py
 
+from services.request_lookup import get_customer
+
 class CustomerService:
     def __init__(self, db, config):
         self.db = db
@@ -21,7 +23,7 @@ class CustomerService:
             # Return mock data if Customer model is not available
             return self._get_mock_customer_profile(customer_id)
 
-        customer = Customer.query.filter_by(customer_id=customer_id).first()
+        customer = get_customer(customer_id)
         if not customer:
             # Return mock data if customer not found
             return self._get_mock_customer_profile(customer_id)
@@ -98,7 +100,7 @@ class CustomerService:
             customers = []
             if q.isdigit():
                 # Tìm theo customer_id
-                customer = Customer.query.filter_by(customer_id=int(q)).first()
+                customer = get_customer(int(q))
                 if customer:
                     customers = [customer]
             else:
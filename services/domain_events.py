@@ -0,0 +1,65 @@
+# services/domain_events.py
+# -*- coding: utf-8 -*-
+"""
+In-process domain events
+
+Các service ghi nghiệp vụ (chuyển khoản HDBank, đặt vé Vietjet, đặt phòng /
+spa resort, mua hàng marketplace, đóng góp ESG, tạo khách hàng, đăng nhập) phát sự kiện
+SAU khi commit. Subscriber (tiến độ mission, gán mission, ...) đăng ký theo
+loại sự kiện và nhận danh sách sự kiện; publish() không bao giờ làm hỏng
+request ghi — lỗi của subscriber chỉ được in ra.
+"""
+
+import datetime
+import threading
+from collections import defaultdict, namedtuple
+
+HDBANK_TRANSFER = 'hdbank.transfer'
+FLIGHT_BOOKED = 'vietjet.flight_booked'
+RESORT_BOOKED = 'resort.room_booked'
+SPA_BOOKED = 'resort.spa_booked'
+MARKETPLACE_PURCHASE = 'marketplace.purchase'
+ESG_CONTRIBUTION = 'esg.contribution'
+CUSTOMER_CREATED = 'customer.created'
+CUSTOMER_LOGIN = 'customer.login'
+
+# Các sự kiện phát sinh giao dịch của khách hàng
+TRANSACTION_EVENTS = (HDBANK_TRANSFER, FLIGHT_BOOKED, RESORT_BOOKED, SPA_BOOKED, MARKETPLACE_PURCHASE, ESG_CONTRIBUTION)
+
+DomainEvent = namedtuple('DomainEvent', 'type customer_id payload occurred_at')
+
+_subscribers = defaultdict(list)
+_lock = threading.Lock()
+
+
+def subscribe(event_type, handler):
+    """Đăng ký handler(events) cho một loại sự kiện"""
+    with _lock:
+        if handler not in _subscribers[event_type]:
+            _subscribers[event_type].append(handler)
+
+
+def unsubscribe(event_type, handler):
+    with _lock:
+        if handler in _subscribers[event_type]:
+            _subscribers[event_type].remove(handler)
+
+
+def publish(event_type, customer_id, **payload):
+    """Phát một sự kiện"""
+    publish_many(event_type, [(customer_id, payload)])
+
+
+def publish_many(event_type, entries):
+    """Phát nhiều sự kiện cùng loại [(customer_id, payload), ...] (batch chuyển khoản, flash sale...)"""
+    handlers = _subscribers.get(event_type)
+    if not handlers or not entries:
+        return
+    now = datetime.datetime.utcnow()
+    events = [DomainEvent(event_type, customer_id, payload or {}, now)
+              for customer_id, payload in entries if customer_id]
+    for handler in list(handlers):
+        try:
+            handler(events)
+        except Exception as e:
+            print(f"❌ Domain event handler failed for {event_type}: {e}")
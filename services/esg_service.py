@@ -7,6 +7,7 @@ ESG Service - Business logic for ESG programs and contributions (Fixed version)
 from sqlalchemy import text
 from models.database import db
 from datetime import datetime
+from services import domain_events
 import logging
 
 logger = logging.getLogger(__name__)
@@ -212,40 +213,37 @@ class ESGService:
                     'program_id': program_id
                 })
                 
+                # Get user's customer info (token transaction + ESG_CONTRIBUTION event)
+                user_query = text("""
+                    SELECT u.customer_id as user_customer_id, c.customer_id as customer_number 
+                    FROM users u 
+                    JOIN customers c ON u.customer_id = c.id 
+                    WHERE u.id = :user_id
+                """)
+                user_row = conn.execute(user_query, {'user_id': user_id}).fetchone()
+                customer_number = user_row._mapping['customer_number'] if user_row else None
+                if not customer_number:
+                    logger.warning(f"User {user_id} has no valid customer relationship for token transaction")
+                
                 # Record SVT token transaction to blockchain if svt_amount > 0
-                if svt_amount > 0:
+                if svt_amount > 0 and customer_number:
                     try:
-                        # Get user's customer info for token transaction
-                        user_query = text("""
-                            SELECT u.customer_id as user_customer_id, c.customer_id as customer_number 
-                            FROM users u 
-                            JOIN customers c ON u.customer_id = c.id 
-                            WHERE u.id = :user_id
+                        # Record token transaction to blockchain (using customers.customer_id)
+                        insert_token_tx = text("""
+                            INSERT INTO token_transactions 
+                            (tx_hash, customer_id, transaction_type, amount, description, created_at)
+                            VALUES (:tx_hash, :customer_id, :transaction_type, :amount, :description, NOW())
                         """)
-                        user_result = conn.execute(user_query, {'user_id': user_id})
-                        user_row = user_result.fetchone()
                         
-                        if user_row and user_row._mapping['customer_number']:
-                            customer_number = user_row._mapping['customer_number']
-                            
-                            # Record token transaction to blockchain (using customers.customer_id)
-                            insert_token_tx = text("""
-                                INSERT INTO token_transactions 
-                                (tx_hash, customer_id, transaction_type, amount, description, created_at)
-                                VALUES (:tx_hash, :customer_id, :transaction_type, :amount, :description, NOW())
-                            """)
-                            
-                            conn.execute(insert_token_tx, {
-                                'tx_hash': f"esg_{transaction_hash[:16]}",
-                                'customer_id': customer_number,  # Use customers.customer_id 
-                                'transaction_type': 'esg_contribution_reward',
-                                'amount': svt_amount,
-                                'description': f'ESG contribution reward - Program {program_id} - {amount} VND'
-                            })
-                            
-                            logger.info(f"Recorded {svt_amount} SVT blockchain transaction for customer {customer_number} - ESG contribution {contribution_id}")
-                        else:
-                            logger.warning(f"User {user_id} has no valid customer relationship for token transaction")
+                        conn.execute(insert_token_tx, {
+                            'tx_hash': f"esg_{transaction_hash[:16]}",
+                            'customer_id': customer_number,  # Use customers.customer_id 
+                            'transaction_type': 'esg_contribution_reward',
+                            'amount': svt_amount,
+                            'description': f'ESG contribution reward - Program {program_id} - {amount} VND'
+                        })
+                        
+                        logger.info(f"Recorded {svt_amount} SVT blockchain transaction for customer {customer_number} - ESG contribution {contribution_id}")
                         
                     except Exception as token_error:
                         logger.error(f"Error recording SVT token transaction: {token_error}")
@@ -253,6 +251,9 @@ class ESGService:
                 
                 # Commit all changes together
                 conn.commit()
+                if customer_number:
+                    domain_events.publish(domain_events.ESG_CONTRIBUTION, customer_number,
+                                          program_id=program_id, amount=amount, svt_amount=svt_amount)
                 
                 logger.info(f"Created ESG contribution {contribution_id} with transaction hash: {transaction_hash}")
                 return contribution_id
@@ -0,0 +1,308 @@
+# services/flash_sale.py
+# -*- coding: utf-8 -*-
+"""
+Flash-sale mode for marketplace purchases
+
+Khi mở bán (voucher drop) hàng nghìn khách cùng mua một MarketplaceItem. Thay
+vì mỗi request đọc item, cộng toàn bộ lịch sử SVT rồi UPDATE cùng một dòng:
+
+1. Bộ đếm admission trong bộ nhớ được nạp sẵn bằng số lượng tồn kho. Request
+   trừ bộ đếm dưới lock; hết hàng thì trả "sold out" ngay, không chạm database.
+   Khi bộ đếm về 0 nhưng còn lượt đang xử lý (có thể bị từ chối và trả suất
+   lại), request nhận "retry" thay vì "sold out". Số dư SVT mà worker vừa thấy
+   được giữ BALANCE_TTL giây để loại ngay khách không đủ SVT tại admission,
+   không để họ chiếm suất của khách khác.
+2. Request được nhận vào hàng đợi FIFO và chờ kết quả (tối đa WAIT_SECONDS).
+3. Một worker lấy tối đa BATCH_SIZE lượt mua mỗi lần và ghi database trong một
+   transaction: một truy vấn GROUP BY số dư SVT của cả batch, một UPDATE có
+   điều kiện trừ tồn kho cho cả batch, một lần gán mã voucher (nếu vật phẩm có
+   kho mã), một bulk insert giao dịch SVT.
+
+UPDATE có điều kiện (quantity >= n) vẫn là chốt chặn cuối, nên nhiều process
+cùng chạy flash sale cũng không bán quá số lượng trong database.
+"""
+
+import datetime
+import queue
+import random
+import threading
+import uuid
+
+from models.database import db
+from models.marketplace import MarketplaceItem
+import models.transactions as tx_models
+from services import domain_events
+from services.cache import TTLCache
+from services.catalog_cache import catalog_cache
+from services.id_generator import new_id
+from services.voucher_pool import voucher_pool
+
+BATCH_SIZE = 200
+WAIT_SECONDS = 5.0
+POLL_SECONDS = 0.05
+BALANCE_TTL = 30
+
+# Kết quả lượt mua còn chờ khi request hết thời gian đợi (tra theo ticket_id)
+_ticket_results = TTLCache(ttl=600, max_entries=100000)
+
+
+def _TokenTransaction():
+    return getattr(tx_models, 'TokenTransaction', None)
+
+
+class _Ticket:
+    __slots__ = ('ticket_id', 'customer_id', 'quantity', 'result', 'done')
+
+    def __init__(self, ticket_id, customer_id, quantity):
+        self.ticket_id = ticket_id
+        self.customer_id = customer_id
+        self.quantity = quantity
+        self.result = None
+        self.done = threading.Event()
+
+
+class FlashSale:
+    """Bộ đếm admission + hàng đợi FIFO + worker ghi database theo batch cho một vật phẩm"""
+
+    def __init__(self, app, item_id, stock, price_svt, item_name, per_customer_limit=1, batch_size=BATCH_SIZE):
+        self.app = app
+        self.item_id = item_id
+        self.price_svt = price_svt
+        self.item_name = item_name
+        self.per_customer_limit = per_customer_limit
+        self.batch_size = batch_size
+        self._remaining = stock           # suất còn nhận vào hàng đợi
+        self._per_customer = {}           # customer_id -> số lượng đã nhận
+        self._in_flight = 0               # số suất đã nhận nhưng worker chưa trả kết quả
+        self._balances = TTLCache(ttl=BALANCE_TTL, max_entries=100000)  # customer_id -> số dư SVT worker vừa thấy
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._running = True
+        self.stats = {'admitted': 0, 'sold': 0, 'rejected': 0, 'sold_out': 0, 'retry': 0, 'batches': 0}
+        self._worker = threading.Thread(target=self._run, name=f'flash-sale-{item_id}', daemon=True)
+        self._worker.start()
+
+    # --------------------------------------------------------------- admission
+
+    def purchase(self, customer_id, quantity=1):
+        """Nhận lượt mua vào hàng đợi và chờ worker xử lý"""
+        if not customer_id:
+            return {'success': False, 'error': 'Customer ID required'}
+        if quantity < 1:
+            return {'success': False, 'error': 'Invalid quantity'}
+
+        balance = self._balances.get(customer_id)
+        if balance is not None and balance < self.price_svt * quantity:
+            self.stats['rejected'] += 1
+            return {'success': False, 'error': 'Insufficient SVT balance'}
+
+        with self._lock:
+            if self._running and self._remaining <= 0 and self._in_flight > 0:
+                # Lượt đang xử lý có thể bị từ chối và trả suất lại: chưa chắc đã hết hàng
+                self.stats['retry'] += 1
+                return {'success': False, 'error': 'Đang xử lý các đơn trước, vui lòng thử lại',
+                        'retry': True}
+            if not self._running or self._remaining <= 0:
+                self.stats['sold_out'] += 1
+                return {'success': False, 'error': 'Sold out', 'sold_out': True}
+            bought = self._per_customer.get(customer_id, 0)
+            if self.per_customer_limit and bought + quantity > self.per_customer_limit:
+                return {'success': False, 'error': f'Mỗi khách chỉ được mua {self.per_customer_limit} suất'}
+            if quantity > self._remaining:
+                return {'success': False, 'error': 'Insufficient quantity'}
+            self._remaining -= quantity
+            self._in_flight += quantity
+            self._per_customer[customer_id] = bought + quantity
+            self.stats['admitted'] += 1
+            ticket = _Ticket(new_id('FS'), customer_id, quantity)
+            # Đưa vào hàng đợi trong lock để stop() không bỏ sót lượt đã nhận
+            self._queue.put(ticket)
+
+        if ticket.done.wait(WAIT_SECONDS):
+            return ticket.result
+        return {'success': True, 'queued': True, 'ticket_id': ticket.ticket_id,
+                'message': 'Đơn hàng đang được xử lý'}
+
+    def _give_back(self, ticket):
+        with self._lock:
+            self._remaining += ticket.quantity
+            self._per_customer[ticket.customer_id] -= ticket.quantity
+
+    def _resolve(self, ticket, result):
+        with self._lock:
+            self._in_flight -= ticket.quantity
+        ticket.result = result
+        _ticket_results.set(ticket.ticket_id, (ticket.customer_id, result))
+        ticket.done.set()
+
+    @property
+    def remaining(self):
+        return self._remaining
+
+    # ------------------------------------------------------------------ worker
+
+    def stop(self, timeout=10):
+        """Ngừng nhận lượt mua mới, xử lý hết hàng đợi rồi dừng worker"""
+        with self._lock:
+            self._running = False
+        self._worker.join(timeout)
+
+    def _run(self):
+        with self.app.app_context():
+            while self._running or not self._queue.empty():
+                try:
+                    batch = [self._queue.get(timeout=POLL_SECONDS)]
+                except queue.Empty:
+                    continue
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                try:
+                    self._apply(batch)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"❌ Flash sale batch failed for item {self.item_id}: {e}")
+                    for ticket in batch:
+                        self._give_back(ticket)
+                        self._resolve(ticket, {'success': False, 'error': 'Failed to process payment'})
+                finally:
+                    db.session.remove()
+
+    def _apply(self, batch):
+        """Ghi một batch lượt mua trong một transaction (theo thứ tự FIFO)"""
+        TTx = _TokenTransaction()
+        if not TTx:
+            raise RuntimeError("TokenTransaction model not initialized")
+        self.stats['batches'] += 1
+
+        # Số dư SVT của cả batch trong một truy vấn
+        customer_ids = {ticket.customer_id for ticket in batch}
+        balances = dict(db.session.query(TTx.customer_id, db.func.coalesce(db.func.sum(TTx.amount), 0))
+                        .filter(TTx.customer_id.in_(customer_ids)).group_by(TTx.customer_id).all())
+        balances = {customer_id: float(balances.get(customer_id, 0)) for customer_id in customer_ids}
+
+        accepted, rejected = [], []
+        for ticket in batch:
+            cost = self.price_svt * ticket.quantity
+            if balances.get(ticket.customer_id, 0) >= cost:
+                balances[ticket.customer_id] -= cost
+                accepted.append(ticket)
+            else:
+                rejected.append(ticket)
+
+        # Trừ tồn kho cho cả batch; nếu process khác đã bán bớt thì chỉ nhận phần đầu hàng đợi còn đủ hàng
+        sold_out = []
+        total = sum(ticket.quantity for ticket in accepted)
+        if total and not self._take_stock(total):
+            available = db.session.query(MarketplaceItem.quantity).filter_by(id=self.item_id).scalar() or 0
+            fitting = []
+            for ticket in accepted:
+                if ticket.quantity <= available:
+                    available -= ticket.quantity
+                    fitting.append(ticket)
+                else:
+                    sold_out.append(ticket)
+            accepted = fitting
+            total = sum(ticket.quantity for ticket in accepted)
+            if total and not self._take_stock(total):
+                sold_out, accepted = sold_out + accepted, []
+
+        codes = None
+        if accepted:
+            codes = voucher_pool.assign(self.item_id, [(ticket.customer_id, ticket.quantity) for ticket in accepted])
+            db.session.execute(TTx.__table__.insert(), [{
+                'customer_id': ticket.customer_id,
+                'transaction_type': 'marketplace_purchase',
+                'amount': -self.price_svt * ticket.quantity,
+                'description': f"Mua {ticket.quantity}x {self.item_name}",
+                'tx_hash': f"0x{uuid.uuid4().hex}",
+                'block_number': random.randint(1000000, 2000000),
+                'created_at': datetime.datetime.utcnow()
+            } for ticket in accepted])
+        remaining_stock = db.session.query(MarketplaceItem.quantity).filter_by(id=self.item_id).scalar()
+        db.session.commit()
+        for customer_id, balance in balances.items():
+            self._balances.set(customer_id, balance)
+        catalog_cache.set_stock(self.item_id, remaining_stock)
+        domain_events.publish_many(domain_events.MARKETPLACE_PURCHASE, [
+            (ticket.customer_id, {'item_id': self.item_id, 'quantity': ticket.quantity,
+                                  'total_cost': self.price_svt * ticket.quantity})
+            for ticket in accepted
+        ])
+
+        if sold_out:
+            # Database hết hàng trước bộ đếm (process khác cùng bán): đóng admission
+            with self._lock:
+                self._remaining = 0
+        for index, ticket in enumerate(accepted):
+            self.stats['sold'] += 1
+            result = {
+                'success': True,
+                'message': f'Đã mua {ticket.quantity}x {self.item_name} thành công',
+                'ticket_id': ticket.ticket_id,
+                'total_cost': self.price_svt * ticket.quantity,
+                'remaining_svt': balances[ticket.customer_id]
+            }
+            if codes is not None:
+                result['voucher_codes'] = codes[index]
+            self._resolve(ticket, result)
+        for ticket in rejected:
+            self.stats['rejected'] += 1
+            self._give_back(ticket)
+            self._resolve(ticket, {'success': False, 'error': 'Insufficient SVT balance'})
+        for ticket in sold_out:
+            self.stats['sold_out'] += 1
+            self._resolve(ticket, {'success': False, 'error': 'Sold out', 'sold_out': True})
+
+    def _take_stock(self, quantity):
+        return db.session.query(MarketplaceItem).filter(
+            MarketplaceItem.id == self.item_id,
+            MarketplaceItem.quantity >= quantity
+        ).update({MarketplaceItem.quantity: MarketplaceItem.quantity - quantity}, synchronize_session=False)
+
+
+class FlashSaleManager:
+    """Các flash sale đang chạy trong process, theo item_id"""
+
+    def __init__(self):
+        self._sales = {}
+        self._lock = threading.Lock()
+
+    def start(self, app, item_id, per_customer_limit=1):
+        """Mở flash sale: nạp tồn kho hiện tại vào bộ đếm admission"""
+        with self._lock:
+            if item_id in self._sales:
+                return self._sales[item_id]
+            item = db.session.get(MarketplaceItem, item_id)
+            if not item or not item.is_active:
+                return None
+            sale = FlashSale(app, item_id, item.quantity or 0, float(item.price_svt), item.name,
+                             per_customer_limit=per_customer_limit)
+            self._sales[item_id] = sale
+            return sale
+
+    def stop(self, item_id):
+        with self._lock:
+            sale = self._sales.pop(item_id, None)
+        if sale:
+            sale.stop()
+        return sale
+
+    def get(self, item_id):
+        try:
+            return self._sales.get(int(item_id))
+        except (TypeError, ValueError):
+            return None
+
+
+def get_ticket_result(ticket_id, customer_id):
+    """Kết quả lượt mua đã xử lý của khách, hoặc None nếu còn trong hàng đợi / không tồn tại"""
+    entry = _ticket_results.get(ticket_id)
+    if entry is None or entry[0] != customer_id:
+        return None
+    return entry[1]
+
+
+flash_sales = FlashSaleManager()
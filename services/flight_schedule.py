@@ -0,0 +1,327 @@
+# services/flight_schedule.py
+# -*- coding: utf-8 -*-
+"""
+In-memory Vietjet schedule index and fare matrix
+
+Lịch bay (bảng vietjet_schedules) được nạp vào bộ nhớ theo tuyến. Với mỗi
+tuyến (origin, destination) index giữ ma trận NumPy [chuyến x ngày] trong
+HORIZON_DAYS ngày tới: chuyến có bay ngày đó không và giá vé từng hạng.
+Giá thấp nhất theo ngày của từng hạng được tính sẵn, nên tra cứu
+(origin, destination, date) và lịch giá rẻ cả tháng chỉ là cắt mảng.
+
+Index tự làm mới tăng dần: mỗi tuyến được ghi dấu (updated_at lớn nhất, số
+dòng, id lớn nhất); chỉ tuyến có dấu thay đổi mới được dựng lại và `version`
+chỉ tăng khi có tuyến thay đổi. Sang ngày mới thì dựng lại toàn bộ (giá phụ
+thuộc số ngày bay còn lại).
+"""
+
+import datetime
+import threading
+import time
+
+import numpy as np
+
+from models.database import db
+from models.flights import VietjetSchedule
+
+HORIZON_DAYS = 365
+REFRESH_INTERVAL = 60  # giây giữa hai lần kiểm tra lịch bay thay đổi
+TICKET_CLASSES = ('economy', 'business')
+
+# Hệ số giá theo thứ trong tuần (Thứ 2 ... Chủ nhật)
+DOW_FACTOR = np.array([1.0, 0.95, 0.95, 1.0, 1.15, 1.2, 1.1])
+
+# Hệ số giá theo số ngày còn lại trước giờ bay: [0-3], [4-7], [8-14], [15-30], >30
+ADVANCE_BREAKPOINTS = np.array([4, 8, 15, 31])
+ADVANCE_FACTOR = np.array([1.5, 1.3, 1.15, 1.0, 0.9])
+
+
+def _time_of_day_factor(departure_minute):
+    """Chuyến đêm rẻ hơn, giờ cao điểm sáng/chiều đắt hơn"""
+    hour = departure_minute // 60
+    if hour < 6 or hour >= 21:
+        return 0.85
+    if 7 <= hour < 9 or 17 <= hour < 19:
+        return 1.1
+    return 1.0
+
+
+def _format_minute(minute):
+    return f"{(minute // 60) % 24:02d}:{minute % 60:02d}"
+
+
+class RouteTable:
+    """Lịch bay và ma trận giá của một tuyến trong cửa sổ [start, start + HORIZON_DAYS)"""
+
+    def __init__(self, origin, destination, rows, start, horizon=HORIZON_DAYS):
+        self.origin = origin
+        self.destination = destination
+        self.flights = sorted(rows, key=lambda r: (r['departure_minute'], r['flight_number']))
+        n = len(self.flights)
+
+        offsets = np.arange(horizon)
+        weekdays = (start.weekday() + offsets) % 7
+        days_of_week = np.array([r['days_of_week'] for r in self.flights], dtype=np.int64).reshape(n, 1)
+        valid_from = np.array([(r['valid_from'] - start).days for r in self.flights]).reshape(n, 1)
+        valid_to = np.array([(r['valid_to'] - start).days if r['valid_to'] else horizon
+                             for r in self.flights]).reshape(n, 1)
+
+        self.operates = (((days_of_week >> weekdays) & 1) == 1) & \
+            (offsets >= valid_from) & (offsets <= valid_to)
+
+        day_factor = DOW_FACTOR[weekdays] * ADVANCE_FACTOR[np.searchsorted(ADVANCE_BREAKPOINTS, offsets, side='right')]
+        time_factor = np.array([_time_of_day_factor(r['departure_minute']) for r in self.flights]).reshape(n, 1)
+
+        self.min_duration = min((r['duration_minutes'] for r in self.flights), default=0)
+        self.fares = {}
+        self.lowest = {}
+        self.lowest_flight = {}
+        for ticket_class in TICKET_CLASSES:
+            base = np.array([r[f'fare_{ticket_class}'] for r in self.flights], dtype=np.float64).reshape(n, 1)
+            fares = np.round(base * time_factor * day_factor / 1000.0) * 1000.0
+            fares[~self.operates] = np.inf
+            self.fares[ticket_class] = fares
+            if n:
+                self.lowest_flight[ticket_class] = fares.argmin(axis=0)
+                self.lowest[ticket_class] = fares.min(axis=0)
+            else:
+                self.lowest_flight[ticket_class] = np.zeros(horizon, dtype=np.int64)
+                self.lowest[ticket_class] = np.full(horizon, np.inf)
+
+    def flights_on(self, day):
+        """Các chuyến bay trong ngày thứ `day` của cửa sổ, kèm giá từng hạng"""
+        results = []
+        for i in np.flatnonzero(self.operates[:, day]):
+            flight = self.flights[i]
+            arrival = flight['departure_minute'] + flight['duration_minutes']
+            results.append({
+                'flight_number': flight['flight_number'],
+                'departure_time': _format_minute(flight['departure_minute']),
+                'arrival_time': _format_minute(arrival),
+                'arrival_day_offset': arrival // (24 * 60),
+                'duration_minutes': flight['duration_minutes'],
+                'aircraft': flight['aircraft'],
+                'prices': {c: float(self.fares[c][i, day]) for c in TICKET_CLASSES},
+                'seats': {c: flight[f'seats_{c}'] for c in TICKET_CLASSES},
+                'schedule_id': flight['id'],
+                'departure_minute': flight['departure_minute']
+            })
+        return results
+
+
+class ScheduleIndex:
+    """Index lịch bay theo (origin, destination, date), làm mới tăng dần từ database"""
+
+    def __init__(self, horizon=HORIZON_DAYS, refresh_interval=REFRESH_INTERVAL):
+        self.horizon = horizon
+        self.refresh_interval = refresh_interval
+        self._routes = {}
+        self._start = None
+        self._stamps = {}  # (origin, destination) -> (updated_at lớn nhất, số dòng, id lớn nhất)
+        self._checked_at = 0.0
+        self._boards = {}  # date -> bảng khởi hành theo sân bay, (date, 'minima', hạng) -> giá/thời gian tối thiểu
+        self.version = 0   # tăng mỗi lần index thay đổi (dùng làm khóa cache cho kết quả dẫn xuất)
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------ build
+
+    def _load_rows(self, route_keys=None):
+        """Lịch bay active (của các tuyến chỉ định, hoặc toàn bộ) gom theo tuyến"""
+        query = VietjetSchedule.query.filter(VietjetSchedule.status == 'active')
+        if route_keys is not None:
+            query = query.filter(db.tuple_(VietjetSchedule.origin, VietjetSchedule.destination).in_(list(route_keys)))
+        grouped = {key: [] for key in (route_keys or ())}
+        for s in query.all():
+            grouped.setdefault((s.origin, s.destination), []).append({
+                'id': s.id,
+                'flight_number': s.flight_number,
+                'departure_minute': s.departure_minute,
+                'duration_minutes': s.duration_minutes,
+                'days_of_week': s.days_of_week,
+                'valid_from': s.valid_from,
+                'valid_to': s.valid_to,
+                'aircraft': s.aircraft,
+                'fare_economy': float(s.fare_economy),
+                'fare_business': float(s.fare_business),
+                'seats_economy': s.seats_economy,
+                'seats_business': s.seats_business
+            })
+        return grouped
+
+    def rebuild(self):
+        """Dựng lại toàn bộ index"""
+        with self._lock:
+            self._rebuild_locked()
+
+    def _load_stamps(self):
+        """Dấu thay đổi của từng tuyến, một truy vấn GROUP BY"""
+        rows = db.session.query(
+            VietjetSchedule.origin, VietjetSchedule.destination,
+            db.func.max(VietjetSchedule.updated_at), db.func.count(VietjetSchedule.id),
+            db.func.max(VietjetSchedule.id)
+        ).group_by(VietjetSchedule.origin, VietjetSchedule.destination).all()
+        return {(row[0], row[1]): tuple(row[2:]) for row in rows}
+
+    def _rebuild_locked(self):
+        stamps = self._load_stamps()
+        self._install(self._load_rows(), datetime.date.today())
+        self._stamps = stamps
+
+    def build_from_rows(self, grouped, start=None):
+        """Dựng index từ lịch bay đã gom theo tuyến {(origin, destination): [row, ...]}
+
+        Dùng cho nguồn lịch bay ngoài database (file, benchmark).
+        """
+        with self._lock:
+            self._install(grouped, start or datetime.date.today())
+
+    def _install(self, grouped, start):
+        self._routes = {key: RouteTable(key[0], key[1], rows, start, self.horizon)
+                        for key, rows in grouped.items() if rows}
+        self._start = start
+        self._boards = {}
+        self.version += 1
+        self._checked_at = time.monotonic()
+
+    def refresh(self, force=False):
+        """Dựng lại các tuyến có lịch bay thay đổi từ lần làm mới trước"""
+        if not force and self._start == datetime.date.today() \
+                and time.monotonic() - self._checked_at < self.refresh_interval:
+            return 0
+        with self._lock:
+            if self._start != datetime.date.today():
+                self._rebuild_locked()
+                return len(self._routes)
+
+            stamps = self._load_stamps()
+            self._checked_at = time.monotonic()
+            route_keys = {key for key in stamps.keys() | self._stamps.keys()
+                          if stamps.get(key) != self._stamps.get(key)}
+            if not route_keys:
+                return 0
+
+            routes = dict(self._routes)
+            for key, rows in self._load_rows(route_keys).items():
+                if rows:
+                    routes[key] = RouteTable(key[0], key[1], rows, self._start, self.horizon)
+                else:
+                    routes.pop(key, None)
+            self._routes = routes
+            self._stamps = stamps
+            self._boards = {}
+            self.version += 1
+            return len(route_keys)
+
+    def _ensure_fresh(self):
+        if self._start is None:
+            self.rebuild()
+        else:
+            self.refresh()
+
+    # ----------------------------------------------------------------- lookup
+
+    def _day(self, date):
+        day = (date - self._start).days
+        return day if 0 <= day < self.horizon else None
+
+    def flights(self, origin, destination, date):
+        """Các chuyến bay của tuyến trong ngày `date` (đã sắp theo giờ khởi hành)"""
+        self._ensure_fresh()
+        table = self._routes.get((origin, destination))
+        day = self._day(date)
+        if table is None or day is None:
+            return []
+        return table.flights_on(day)
+
+    def lowest_fares(self, origin, destination, date_from, date_to, ticket_class='economy'):
+        """Giá thấp nhất từng ngày trong [date_from, date_to] (None nếu ngày đó không có chuyến)"""
+        self._ensure_fresh()
+        table = self._routes.get((origin, destination))
+        days = []
+        first = max((date_from - self._start).days, 0)
+        last = min((date_to - self._start).days, self.horizon - 1)
+        if table is not None and first <= last:
+            fares = table.lowest[ticket_class][first:last + 1]
+            flight_idx = table.lowest_flight[ticket_class][first:last + 1]
+            for offset, (fare, i) in enumerate(zip(fares.tolist(), flight_idx.tolist())):
+                days.append({
+                    'date': (self._start + datetime.timedelta(days=first + offset)).strftime('%Y-%m-%d'),
+                    'lowest_fare': fare if fare != float('inf') else None,
+                    'flight_number': table.flights[i]['flight_number'] if fare != float('inf') else None
+                })
+        return days
+
+    def departures(self, date):
+        """Bảng khởi hành trong ngày: {sân bay: (mảng phút khởi hành đã sắp, [chuyến, ...])}"""
+        self._ensure_fresh()
+        board = self._boards.get(date)
+        if board is not None:
+            return board
+        day = self._day(date)
+        by_airport = {}
+        if day is not None:
+            for (origin, destination), table in self._routes.items():
+                for flight in table.flights_on(day):
+                    flight['origin'] = origin
+                    flight['destination'] = destination
+                    by_airport.setdefault(origin, []).append(flight)
+        board = {}
+        for airport, flights in by_airport.items():
+            flights.sort(key=lambda f: f['departure_minute'])
+            board[airport] = (np.array([f['departure_minute'] for f in flights]), flights)
+        self._boards[date] = board
+        return board
+
+    def route_minima(self, date, ticket_class='economy'):
+        """{(origin, destination): (giá thấp nhất, thời gian bay ngắn nhất)} của các tuyến có bay ngày `date`"""
+        self._ensure_fresh()
+        key = (date, 'minima', ticket_class)
+        minima = self._boards.get(key)
+        if minima is not None:
+            return minima
+        day = self._day(date)
+        minima = {}
+        if day is not None:
+            for route, table in self._routes.items():
+                fare = table.lowest[ticket_class][day]
+                if fare != np.inf:
+                    minima[route] = (float(fare), table.min_duration)
+        self._boards[key] = minima
+        return minima
+
+    def route_of(self, flight_number, date):
+        """(origin, destination) của chuyến `flight_number` bay ngày `date`, hoặc None"""
+        self._ensure_fresh()
+        day = self._day(date)
+        if day is None:
+            return None
+        for route, table in self._routes.items():
+            for i, flight in enumerate(table.flights):
+                if flight['flight_number'] == flight_number and table.operates[i, day]:
+                    return route
+        return None
+
+    def routes(self):
+        """Các tuyến đang có lịch bay"""
+        self._ensure_fresh()
+        return sorted(self._routes)
+
+    def destinations_from(self, origin):
+        """Các điểm đến bay thẳng từ `origin`"""
+        self._ensure_fresh()
+        return sorted(d for o, d in self._routes if o == origin)
+
+    @property
+    def start_date(self):
+        return self._start
+
+
+_schedule_index = None
+
+
+def get_schedule_index():
+    """Index dùng chung cho toàn process"""
+    global _schedule_index
+    if _schedule_index is None:
+        _schedule_index = ScheduleIndex()
+    return _schedule_index
@@ -5,14 +5,60 @@ HDBank service integration
 """
 
 import datetime
+import time
 import uuid
 import random
+import numpy as np
 
 # Import stable pieces
 from models.database import db
-from models.customer import Customer
 import models.transactions as tx_models
 import models.hdbank_card as card_models
+from services.analytics_service import invalidate_customer_analytics
+from services import domain_events
+from services.cache import TTLCache
+from services.id_generator import new_id, new_ids
+from services.pagination import encode_cursor, decode_cursor
+from services.request_lookup import get_customer, get_active_card, get_balance, set_balance, forget
+
+# Dashboard đã lắp ráp theo customer_id; bị xóa khi chuyển khoản / vay / mở thẻ
+_dashboard_cache = TTLCache(ttl=30)
+
+# Số giao dịch tối đa trên một trang lịch sử
+MAX_TRANSACTION_PAGE_SIZE = 500
+
+# Giới hạn cho chuyển khoản hàng loạt (chi lương)
+MAX_BATCH_TRANSFER_ROWS = 50000
+DEFAULT_BATCH_CHUNK_SIZE = 1000
+
+# Khách hàng + thẻ active đầu tiên + thống kê giao dịch + số dư mới nhất trong một câu lệnh
+_DASHBOARD_SQL = db.text("""
+    SELECT c.name AS customer_name,
+           card.card_id, card.card_name, card.card_number, card.card_type,
+           card.credit_limit, card.opened_date, card.expiry_date, card.status AS card_status,
+           COALESCE(s.total_transactions, 0) AS total_transactions,
+           COALESCE(s.total_spent, 0) AS total_spent,
+           COALESCE(s.total_received, 0) AS total_received,
+           (SELECT t.balance FROM hdbank_transactions t
+             WHERE t.customer_id = c.customer_id
+             ORDER BY t.transaction_date DESC, t.id DESC
+             LIMIT 1) AS current_balance
+    FROM customers c
+    LEFT JOIN hdbank_cards card ON card.id = (
+        SELECT MIN(hc.id) FROM hdbank_cards hc
+        WHERE hc.customer_id = c.customer_id AND hc.status = 'active'
+    )
+    LEFT JOIN (
+        SELECT customer_id,
+               COUNT(*) AS total_transactions,
+               SUM(CASE WHEN amount < 0 THEN amount ELSE 0 END) AS total_spent,
+               SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END) AS total_received
+        FROM hdbank_transactions
+        WHERE customer_id = :customer_id
+        GROUP BY customer_id
+    ) s ON s.customer_id = c.customer_id
+    WHERE c.customer_id = :customer_id
+""")
 
 # Helper getters to always fetch latest model classes (after init_db they are populated)
 
@@ -25,17 +71,33 @@ def _TokenTransaction():
 def _HDBankCard():
     return getattr(card_models, 'HDBankCard', None)
 
+def _format_date(value):
+    """Raw SQL có thể trả datetime hoặc chuỗi tùy driver"""
+    if hasattr(value, 'strftime'):
+        return value.strftime('%Y-%m-%d')
+    return str(value)[:10] if value else None
+
+def _parse_datetime(value):
+    """Nhận 'YYYY-MM-DD' hoặc ISO datetime"""
+    if isinstance(value, datetime.datetime):
+        return value
+    return datetime.datetime.fromisoformat(value)
+
+def invalidate_dashboard(customer_id):
+    """Xóa dashboard / analytics đã cache của khách hàng sau khi có giao dịch ghi"""
+    try:
+        _dashboard_cache.invalidate(int(customer_id))
+    except (TypeError, ValueError):
+        pass
+    invalidate_customer_analytics(customer_id)
+
 class HDBankService:
     
     def get_customer_card_info(self, customer_id):
         """Lấy thông tin thẻ của khách hàng từ bảng hdbank_cards"""
         try:
-            # Tìm thẻ trong bảng hdbank_cards
-            HDBankCard = _HDBankCard()
-            if HDBankCard is None:
-                return {"has_card": False}
-                
-            card = HDBankCard.query.filter_by(customer_id=customer_id, status='active').first()
+            # Tìm thẻ trong bảng hdbank_cards (qua identity map của request)
+            card = get_active_card(customer_id)
 
             if card:
                 return {
@@ -57,24 +119,24 @@ class HDBankService:
     
     def get_dashboard_data(self, customer_id):
         """Dashboard tổng quan dịch vụ HDBank cho khách hàng"""
+        cached = _dashboard_cache.get(customer_id)
+        if cached is not None:
+            return cached
         try:
-            # Kiểm tra khách hàng
-            customer = Customer.query.filter_by(customer_id=customer_id).first()
-            if not customer:
+            # Một câu lệnh duy nhất: khách hàng + thẻ active + thống kê giao dịch
+            row = self._load_dashboard_row(customer_id)
+            if not row:
                 return {
                     "success": False,
                     "message": "Khách hàng không tồn tại"
                 }
 
-            # Kiểm tra thẻ
-            card_info = self.get_customer_card_info(customer_id)
-
             # Nếu chưa có thẻ, hiển thị giao diện mở thẻ
-            if not card_info["has_card"]:
-                return {
+            if not row.card_id:
+                result = {
                     "success": True,
                     "customer_id": customer_id,
-                    "customer_name": customer.name,
+                    "customer_name": row.customer_name,
                     "has_card": False,
                     "message": "Chào mừng đến với HDBank! Mở thẻ ngay để sử dụng dịch vụ",
                     "action_required": {
@@ -93,39 +155,31 @@ class HDBankService:
                     },
                     "available_services": []
                 }
+                _dashboard_cache.set(customer_id, result)
+                return result
 
             # Nếu đã có thẻ, hiển thị dashboard đầy đủ
-            HDBankTransaction = _HDBankTransaction()
-            if HDBankTransaction is None:
-                raise RuntimeError('HDBankTransaction model not initialized')
-                
-            total_transactions = HDBankTransaction.query.filter_by(customer_id=customer_id).count()
-            total_spent = db.session.query(db.func.sum(HDBankTransaction.amount)).filter(
-                HDBankTransaction.customer_id == customer_id,
-                HDBankTransaction.amount < 0
-            ).scalar() or 0
-
-            total_received = db.session.query(db.func.sum(HDBankTransaction.amount)).filter(
-                HDBankTransaction.customer_id == customer_id,
-                HDBankTransaction.amount > 0
-            ).scalar() or 0
-
-            # Lấy balance từ transaction mới nhất
-            latest_transaction = HDBankTransaction.query.filter_by(customer_id=customer_id) \
-                .order_by(HDBankTransaction.transaction_date.desc()).first()
-            current_balance = float(latest_transaction.balance) if latest_transaction else 0
-
-            return {
+            result = {
                 "success": True,
                 "customer_id": customer_id,
-                "customer_name": customer.name,
+                "customer_name": row.customer_name,
                 "has_card": True,
-                "card_info": card_info,
+                "card_info": {
+                    "has_card": True,
+                    "card_id": row.card_id,
+                    "card_name": row.card_name,
+                    "card_number": f"****-****-****-{row.card_number[-4:]}",
+                    "card_type": row.card_type,
+                    "credit_limit": row.credit_limit,
+                    "opened_date": _format_date(row.opened_date),
+                    "expiry_date": _format_date(row.expiry_date),
+                    "status": row.card_status
+                },
                 "account_summary": {
-                    "total_transactions": total_transactions,
-                    "total_spent": abs(total_spent),
-                    "total_received": total_received,
-                    "current_balance": current_balance
+                    "total_transactions": int(row.total_transactions or 0),
+                    "total_spent": abs(float(row.total_spent or 0)),
+                    "total_received": float(row.total_received or 0),
+                    "current_balance": float(row.current_balance) if row.current_balance is not None else 0
                 },
                 "available_services": [
                     {
@@ -144,12 +198,18 @@ class HDBankService:
                     }
                 ]
             }
+            _dashboard_cache.set(customer_id, result)
+            return result
 
         except Exception as e:
             return {
                 "success": False,
                 "message": f"Lỗi tải dashboard: {str(e)}"
             }
+
+    def _load_dashboard_row(self, customer_id):
+        """Helper: Lấy customer, thẻ active và thống kê tài khoản trong một truy vấn"""
+        return db.session.execute(_DASHBOARD_SQL, {'customer_id': customer_id}).first()
     
     def get_service_status(self, customer_id):
         """Kiểm tra trạng thái các dịch vụ HDBank"""
@@ -187,7 +247,7 @@ class HDBankService:
             if current_balance < amount:
                 return {'success': False, 'error': 'Insufficient balance'}
             transfer_tx = HTx(
-                transaction_id=f"TF{uuid.uuid4().hex[:8].upper()}",
+                transaction_id=new_id("TF"),
                 customer_id=from_customer_id,
                 transaction_date=datetime.datetime.utcnow(),
                 amount=-amount,
@@ -208,6 +268,9 @@ class HDBankService:
                 )
                 db.session.add(svt_tx)
             db.session.commit()
+            set_balance(from_customer_id, current_balance - amount)
+            invalidate_dashboard(from_customer_id)
+            domain_events.publish(domain_events.HDBANK_TRANSFER, from_customer_id, amount=amount)
             return {
                 'success': True,
                 'message': 'Chuyển khoản thành công',
@@ -221,6 +284,169 @@ class HDBankService:
             print(f"❌ Error processing transfer: {e}")
             return {'success': False, 'error': str(e)}
     
+    def process_batch_transfer(self, from_customer_id, transfers, chunk_size=DEFAULT_BATCH_CHUNK_SIZE):
+        """Chuyển khoản hàng loạt (chi lương): kiểm tra theo tập, ghi bulk, commit theo chunk"""
+        started = time.perf_counter()
+        try:
+            HTx = _HDBankTransaction(); TTx = _TokenTransaction()
+            if not HTx or not TTx:
+                return {'success': False, 'error': 'Models not initialized'}
+            if not isinstance(transfers, list) or not transfers:
+                return {'success': False, 'error': 'transfers must be a non-empty list'}
+            if len(transfers) > MAX_BATCH_TRANSFER_ROWS:
+                return {'success': False, 'error': f'Batch too large (max {MAX_BATCH_TRANSFER_ROWS} rows)'}
+            if not self._check_customer_has_card(from_customer_id):
+                return {'success': False, 'error': 'Customer does not have HDBank card'}
+            chunk_size = max(1, min(int(chunk_size or DEFAULT_BATCH_CHUNK_SIZE), 5000))
+
+            # 1. Kiểm tra từng dòng trong bộ nhớ
+            results = [{'index': i, 'status': 'rejected'} for i in range(len(transfers))]
+            valid = []  # (index, to_account, amount, description, reference)
+            seen_refs = set()
+            for i, row in enumerate(transfers):
+                row = row if isinstance(row, dict) else {}
+                to_account = str(row.get('to_account') or row.get('recipient_account') or '').strip()
+                reference = str(row.get('reference') or '').strip() or None
+                try:
+                    amount = round(float(row.get('amount')), 2)
+                except (TypeError, ValueError):
+                    amount = None
+                if not to_account:
+                    results[i]['error'] = 'Missing to_account'
+                elif amount is None or not np.isfinite(amount) or amount <= 0:
+                    results[i]['error'] = 'Invalid transfer amount'
+                elif reference and (len(reference) > 50 or reference in seen_refs):
+                    results[i]['error'] = 'Duplicate or invalid reference'
+                else:
+                    if reference:
+                        seen_refs.add(reference)
+                    valid.append((i, to_account, amount, row.get('description') or '', reference))
+
+            # 2. Reference khách đã dùng trước đó: một truy vấn IN cho mỗi 1000 reference
+            if seen_refs:
+                existing = set()
+                refs = list(seen_refs)
+                for k in range(0, len(refs), 1000):
+                    existing.update(r[0] for r in db.session.query(HTx.reference).filter(
+                        HTx.customer_id == from_customer_id,
+                        HTx.reference.in_(refs[k:k + 1000])
+                    ).all())
+                if existing:
+                    kept = []
+                    for entry in valid:
+                        if entry[4] in existing:
+                            results[entry[0]]['error'] = 'Reference already processed'
+                        else:
+                            kept.append(entry)
+                    valid = kept
+
+            if not valid:
+                return {'success': False, 'error': 'No valid transfer rows', 'results': results}
+            transaction_ids = new_ids(len(valid), 'TF')
+
+            # 3. Kiểm tra tổng số dư một lần
+            amounts = np.fromiter((entry[2] for entry in valid), dtype=np.float64, count=len(valid))
+            total_amount = float(amounts.sum())
+            current_balance = self._get_current_balance(from_customer_id)
+            if total_amount > current_balance:
+                return {
+                    'success': False,
+                    'error': 'Insufficient balance',
+                    'required': total_amount,
+                    'available': current_balance,
+                    'results': results
+                }
+
+            # 4. Số dư chạy và SVT reward tính vector hóa
+            balances_after = np.round(current_balance - np.cumsum(amounts), 2)
+            rewards = np.round(self._calculate_transfer_svt_reward(amounts), 2)
+
+            # 5. Ghi bulk theo chunk, commit mỗi chunk
+            now = datetime.datetime.utcnow()
+            completed = 0
+            failed_from = None
+            for start in range(0, len(valid), chunk_size):
+                chunk = range(start, min(start + chunk_size, len(valid)))
+                tx_rows = []
+                reward_rows = []
+                for k in chunk:
+                    index, to_account, amount, description, reference = valid[k]
+                    tx_rows.append({
+                        'transaction_id': transaction_ids[k],
+                        'customer_id': from_customer_id,
+                        # Lệch micro giây để thứ tự theo thời gian khớp thứ tự số dư chạy
+                        'transaction_date': now + datetime.timedelta(microseconds=k),
+                        'amount': -amount,
+                        'transaction_type': 'debit',
+                        'balance': float(balances_after[k]),
+                        'description': f"Chuyển khoản đến {to_account}: {description}",
+                        'status': 'completed',
+                        'reference': reference,
+                        'created_at': now
+                    })
+                    if rewards[k] > 0:
+                        reward_rows.append({
+                            'customer_id': from_customer_id,
+                            'transaction_type': 'transfer_reward',
+                            'amount': float(rewards[k]),
+                            'description': f"Thưởng SVT cho chuyển khoản {amount:,.0f} VND",
+                            'tx_hash': f"0x{uuid.uuid4().hex}",
+                            'block_number': random.randint(1000000, 2000000),
+                            'created_at': now
+                        })
+                try:
+                    db.session.execute(HTx.__table__.insert(), tx_rows)
+                    if reward_rows:
+                        db.session.execute(TTx.__table__.insert(), reward_rows)
+                    db.session.commit()
+                except Exception as chunk_error:
+                    db.session.rollback()
+                    print(f"❌ Batch transfer chunk at row {start} failed: {chunk_error}")
+                    failed_from = start
+                    for k in range(start, len(valid)):
+                        results[valid[k][0]].update({
+                            'status': 'failed' if k in chunk else 'skipped',
+                            'error': str(chunk_error) if k in chunk else 'Previous chunk failed'
+                        })
+                    break
+                for k in chunk:
+                    results[valid[k][0]].update({
+                        'status': 'completed',
+                        'transaction_id': transaction_ids[k],
+                        'reference': valid[k][4],
+                        'amount': valid[k][2],
+                        'balance_after': float(balances_after[k]),
+                        'svt_reward': float(rewards[k])
+                    })
+                completed += len(chunk)
+
+            if completed:
+                set_balance(from_customer_id, balances_after[completed - 1])
+                domain_events.publish_many(domain_events.HDBANK_TRANSFER, [
+                    (from_customer_id, {'amount': valid[k][2]}) for k in range(completed)
+                ])
+            invalidate_dashboard(from_customer_id)
+            elapsed = time.perf_counter() - started
+            return {
+                'success': completed > 0,
+                'message': f'Đã xử lý {completed}/{len(transfers)} lệnh chuyển khoản',
+                'total_rows': len(transfers),
+                'completed': completed,
+                'rejected': sum(1 for r in results if r['status'] == 'rejected'),
+                'failed': sum(1 for r in results if r['status'] in ('failed', 'skipped')),
+                'total_amount': float(amounts[:completed].sum()),
+                'total_svt_reward': float(rewards[:completed].sum()),
+                'new_balance': float(balances_after[completed - 1]) if completed else current_balance,
+                'stopped_at_row': valid[failed_from][0] if failed_from is not None else None,
+                'elapsed_ms': round(elapsed * 1000, 2),
+                'transfers_per_second': round(completed / elapsed, 1) if elapsed > 0 else None,
+                'results': results
+            }
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error processing batch transfer: {e}")
+            return {'success': False, 'error': str(e)}
+
     def apply_loan(self, customer_id, loan_amount, loan_term, loan_purpose=''):
         """Đăng ký vay vốn"""
         try:
@@ -231,13 +457,14 @@ class HDBankService:
                 return {'success': False, 'error': 'Customer does not have HDBank card'}
             if loan_amount <= 0:
                 return {'success': False, 'error': 'Invalid loan amount'}
+            new_balance = self._get_current_balance(customer_id) + loan_amount
             loan_tx = HTx(
-                transaction_id=f"LOAN{uuid.uuid4().hex[:8].upper()}",
+                transaction_id=new_id("LOAN"),
                 customer_id=customer_id,
                 transaction_date=datetime.datetime.utcnow(),
                 amount=loan_amount,
                 transaction_type='credit',
-                balance=self._get_current_balance(customer_id) + loan_amount,
+                balance=new_balance,
                 description=f"Giải ngân khoản vay {loan_term} tháng: {loan_purpose}"
             )
             db.session.add(loan_tx)
@@ -252,6 +479,8 @@ class HDBankService:
             )
             db.session.add(svt_tx)
             db.session.commit()
+            set_balance(customer_id, new_balance)
+            invalidate_dashboard(customer_id)
             return {
                 'success': True,
                 'message': f'Đăng ký vay {loan_amount:,.0f} VND thành công',
@@ -273,12 +502,12 @@ class HDBankService:
                 return {'success': False, 'error': 'Models not initialized'}
             if self._check_customer_has_card(customer_id):
                 return {'success': False, 'error': 'Customer already has HDBank card'}
-            customer = Customer.query.filter_by(customer_id=customer_id).first()
+            customer = get_customer(customer_id)
             if not customer:
                 return {'success': False, 'error': 'Customer not found'}
             card_info = self._create_new_card(customer_id, card_type, card_name or f"HDBank {card_type.title()}")
             open_card_tx = HTx(
-                transaction_id=f"CARD{uuid.uuid4().hex[:8].upper()}",
+                transaction_id=new_id("CARD"),
                 customer_id=customer_id,
                 transaction_date=datetime.datetime.utcnow(),
                 amount=0,
@@ -298,6 +527,8 @@ class HDBankService:
             )
             db.session.add(svt_tx)
             db.session.commit()
+            forget(customer_id)
+            invalidate_dashboard(customer_id)
             return {
                 'success': True,
                 'message': f'Mở thẻ HDBank {card_type} thành công',
@@ -309,29 +540,81 @@ class HDBankService:
             print(f"❌ Error opening card: {e}")
             return {'success': False, 'error': str(e)}
     
-    def get_transactions(self, customer_id, limit=100):
-        """Lấy lịch sử giao dịch HDBank theo customer_id"""
+    def get_transactions(self, customer_id, limit=100, cursor=None, transaction_type=None,
+                         min_amount=None, max_amount=None, date_from=None, date_to=None, search=None):
+        """Lấy lịch sử giao dịch HDBank theo customer_id (phân trang keyset theo transaction_date, id)"""
         try:
             HTx = _HDBankTransaction()
             if not HTx:
                 return {'success': False, 'error': 'Model not initialized'}
-            q = HTx.query.filter_by(customer_id=customer_id).order_by(HTx.transaction_date.desc())
-            if limit:
-                q = q.limit(int(limit))
-            rows = q.all()
+            limit = max(1, min(int(limit or 100), MAX_TRANSACTION_PAGE_SIZE))
+
+            # Dùng index (customer_id, transaction_date, id): mỗi trang tốn như nhau dù lịch sử dài
+            q = HTx.query.filter(HTx.customer_id == customer_id)
+            if transaction_type:
+                q = q.filter(HTx.transaction_type == transaction_type)
+            if min_amount is not None:
+                q = q.filter(HTx.amount >= min_amount)
+            if max_amount is not None:
+                q = q.filter(HTx.amount <= max_amount)
+            if date_from:
+                q = q.filter(HTx.transaction_date >= _parse_datetime(date_from))
+            if date_to:
+                if len(str(date_to)) == 10:
+                    # date_to dạng ngày được tính trọn ngày
+                    q = q.filter(HTx.transaction_date < _parse_datetime(date_to) + datetime.timedelta(days=1))
+                else:
+                    q = q.filter(HTx.transaction_date <= _parse_datetime(date_to))
+            if search:
+                pattern = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                q = q.filter(HTx.description.ilike(pattern, escape='\\'))
+            if cursor:
+                cursor_date, cursor_id = decode_cursor(cursor)
+                q = q.filter(db.or_(
+                    HTx.transaction_date < cursor_date,
+                    db.and_(HTx.transaction_date == cursor_date, HTx.id < cursor_id)
+                ))
+            rows = q.order_by(HTx.transaction_date.desc(), HTx.id.desc()).limit(limit + 1).all()
+
+            has_more = len(rows) > limit
+            rows = rows[:limit]
             transactions = []
+            total_credit = 0.0
+            total_debit = 0.0
             for t in rows:
+                amount = float(t.amount) if t.amount is not None else 0.0
+                if amount >= 0:
+                    total_credit += amount
+                else:
+                    total_debit += -amount
                 transactions.append({
                     'id': t.id,
                     'transaction_id': getattr(t, 'transaction_id', None),
                     'transaction_date': t.transaction_date.isoformat() if t.transaction_date else None,
-                    'amount': float(t.amount) if t.amount is not None else 0.0,
+                    'amount': amount,
                     'transaction_type': t.transaction_type,
                     'balance': float(t.balance) if t.balance is not None else None,
                     'description': t.description,
                     'status': getattr(t, 'status', 'completed')
                 })
-            return {'success': True, 'customer_id': customer_id, 'count': len(transactions), 'transactions': transactions}
+            next_cursor = encode_cursor(rows[-1].transaction_date, rows[-1].id) if has_more else None
+            return {
+                'success': True,
+                'customer_id': customer_id,
+                'count': len(transactions),
+                'transactions': transactions,
+                'has_more': has_more,
+                'next_cursor': next_cursor,
+                'page_summary': {
+                    'total_credit': total_credit,
+                    'total_debit': total_debit,
+                    'net_amount': total_credit - total_debit,
+                    'largest_credit': max((t['amount'] for t in transactions if t['amount'] > 0), default=0.0),
+                    'largest_debit': abs(min((t['amount'] for t in transactions if t['amount'] < 0), default=0.0))
+                }
+            }
+        except ValueError as e:
+            return {'success': False, 'invalid_params': True, 'error': f'Tham số không hợp lệ: {e}'}
         except Exception as e:
             print(f"❌ Error getting transactions: {e}")
             return {'success': False, 'error': str(e)}
@@ -380,7 +663,7 @@ class HDBankService:
             Card = _HDBankCard()
             if not Card:
                 raise RuntimeError('Card model not initialized')
-            card = Card.query.filter_by(customer_id=customer_id, status='active').first()
+            card = get_active_card(customer_id)
             return card.to_dict() if card else {'has_card': False}
         except Exception as e:
             print(f"❌ Error getting card info: {e}")
@@ -392,7 +675,7 @@ class HDBankService:
             Card = _HDBankCard()
             if not Card:
                 return False
-            return Card.query.filter_by(customer_id=customer_id, status='active').count() > 0
+            return get_active_card(customer_id) is not None
         except Exception as e:
             print(f"❌ Error checking card: {e}")
             return False
@@ -403,8 +686,7 @@ class HDBankService:
             HTx = _HDBankTransaction()
             if not HTx:
                 return 0
-            latest_tx = HTx.query.filter_by(customer_id=customer_id).order_by(HTx.transaction_date.desc()).first()
-            return float(latest_tx.balance) if latest_tx and latest_tx.balance is not None else 0
+            return get_balance(customer_id)
         except Exception as e:
             print(f"❌ Error getting balance: {e}")
             return 0
@@ -456,8 +738,10 @@ class HDBankService:
         }
     
     def _calculate_transfer_svt_reward(self, amount):
-        """Helper: Tính SVT reward cho chuyển khoản"""
+        """Helper: Tính SVT reward cho chuyển khoản (nhận số hoặc mảng numpy)"""
         # 0.1% của số tiền chuyển, tối đa 100 SVT
+        if isinstance(amount, np.ndarray):
+            return np.minimum(100, amount * 0.001)
         return min(100, amount * 0.001)
     
     def _create_new_card(self, customer_id, card_type, card_name):
@@ -480,7 +764,7 @@ class HDBankService:
             
             card = Card(
                 customer_id=customer_id,
-                card_id=f"HD{uuid.uuid4().hex[:8].upper()}",
+                card_id=new_id("HD"),
                 card_number=card_number,
                 card_type=card_type,
                 card_name=card_name,
@@ -0,0 +1,129 @@
+# services/id_generator.py
+# -*- coding: utf-8 -*-
+"""
+Snowflake-style business ID allocator
+
+ID 63 bit = 41 bit mili-giây từ EPOCH | 10 bit worker id | 12 bit sequence.
+Không cần round trip tới database; an toàn giữa các thread (lock) và giữa
+các process khi mỗi process có worker id khác nhau.
+
+Worker id lấy từ biến môi trường SOVICO_WORKER_ID (0-1023). Nếu không đặt,
+worker id = pid & 1023 — các process trên cùng một host không trùng nhau
+(trừ khi pid cách nhau bội số của 1024), nhưng production chạy nhiều host
+phải đặt SOVICO_WORKER_ID riêng cho từng process.
+"""
+
+import datetime
+import os
+import threading
+import time
+
+EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+
+WORKER_ID_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_ID_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+WORKER_ID_SHIFT = SEQUENCE_BITS
+TIMESTAMP_SHIFT = SEQUENCE_BITS + WORKER_ID_BITS
+
+
+def _default_worker_id():
+    configured = os.environ.get('SOVICO_WORKER_ID')
+    if configured is not None:
+        worker_id = int(configured)
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f'SOVICO_WORKER_ID must be between 0 and {MAX_WORKER_ID}')
+        return worker_id
+    return os.getpid() & MAX_WORKER_ID
+
+
+class SnowflakeIdGenerator:
+    """Sinh ID tăng dần theo thời gian, không trùng trong cùng worker id"""
+
+    def __init__(self, worker_id=None):
+        self._explicit_worker_id = worker_id is not None
+        self.worker_id = _default_worker_id() if worker_id is None else worker_id
+        if not 0 <= self.worker_id <= MAX_WORKER_ID:
+            raise ValueError(f'worker_id must be between 0 and {MAX_WORKER_ID}')
+        self._lock = threading.Lock()
+        self._last_timestamp = -1
+        self._sequence = 0
+
+    def next_id(self, prefix=None):
+        """Một ID (int, hoặc chuỗi `prefix` + ID nếu có prefix)"""
+        with self._lock:
+            timestamp = self._reserve(1)
+            value = (timestamp << TIMESTAMP_SHIFT) | (self.worker_id << WORKER_ID_SHIFT) | self._sequence
+        return f"{prefix}{value}" if prefix else value
+
+    def next_ids(self, count, prefix=None):
+        """`count` ID liên tiếp với một lần lấy lock (dùng cho ghi bulk)"""
+        ids = []
+        worker_bits = self.worker_id << WORKER_ID_SHIFT
+        with self._lock:
+            remaining = count
+            while remaining > 0:
+                take = min(remaining, MAX_SEQUENCE + 1)
+                timestamp = self._reserve(take)
+                base = (timestamp << TIMESTAMP_SHIFT) | worker_bits
+                ids.extend(range(base | (self._sequence - take + 1), (base | self._sequence) + 1))
+                remaining -= take
+        if prefix:
+            return [f"{prefix}{value}" for value in ids]
+        return ids
+
+    def _reserve(self, count):
+        """Giữ `count` sequence trong cùng một mili-giây; trả về timestamp dùng cho chúng.
+
+        Khi đồng hồ lùi hoặc hết sequence trong một mili-giây, timestamp logic
+        được đẩy lên mili-giây kế tiếp thay vì chờ, nên ID vẫn tăng dần và
+        không trùng.
+        """
+        now = int(time.time() * 1000) - EPOCH_MS
+        if now > self._last_timestamp:
+            self._last_timestamp = now
+            self._sequence = count - 1
+        elif self._sequence + count <= MAX_SEQUENCE:
+            self._sequence += count
+        else:
+            self._last_timestamp += 1
+            self._sequence = count - 1
+        return self._last_timestamp
+
+    def _reset_after_fork(self):
+        # Process con phải có worker id riêng, nếu không sẽ sinh ID trùng với process cha
+        self._lock = threading.Lock()
+        if not self._explicit_worker_id:
+            self.worker_id = _default_worker_id()
+        self._last_timestamp = -1
+        self._sequence = 0
+
+
+def parse_id(value):
+    """Tách ID (int hoặc chuỗi có prefix) thành các thành phần"""
+    if isinstance(value, str):
+        value = int(value.lstrip('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'))
+    timestamp_ms = (value >> TIMESTAMP_SHIFT) + EPOCH_MS
+    return {
+        'timestamp': datetime.datetime.utcfromtimestamp(timestamp_ms / 1000),
+        'worker_id': (value >> WORKER_ID_SHIFT) & MAX_WORKER_ID,
+        'sequence': value & MAX_SEQUENCE
+    }
+
+
+# Generator dùng chung cho toàn process
+_default_generator = SnowflakeIdGenerator()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_default_generator._reset_after_fork)
+
+
+def new_id(prefix=None):
+    """ID nghiệp vụ mới, ví dụ new_id('RST') -> 'RST7182...'"""
+    return _default_generator.next_id(prefix)
+
+
+def new_ids(count, prefix=None):
+    """Danh sách `count` ID nghiệp vụ mới (cho batch insert)"""
+    return _default_generator.next_ids(count, prefix)
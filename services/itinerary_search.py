@@ -0,0 +1,220 @@
+# services/itinerary_search.py
+# -*- coding: utf-8 -*-
+"""
+Multi-leg Vietjet itinerary search
+
+Lịch bay được xem như đồ thị mở rộng theo thời gian: mỗi chuyến bay trong
+ngày là một đỉnh, cạnh nối chuyến đến sân bay X với các chuyến rời X sau
+ít nhất thời gian nối chuyến tối thiểu (MCT) và không quá thời gian chờ tối
+đa. Tìm k hành trình rẻ nhất / nhanh nhất bằng Dijkstra với hàng đợi ưu
+tiên, mỗi chuyến bay được lấy ra khỏi hàng đợi tối đa k lần (k đường đi
+ngắn nhất), không quay lại sân bay đã đi qua. Cận dưới giá / thời gian bay
+tới đích (Dijkstra ngược trên đồ thị tuyến) là heuristic A* và loại sớm các
+nhánh không thể tới đích trong số chặng cho phép.
+
+Bảng khởi hành theo ngày lấy từ ScheduleIndex; kết quả cache theo
+(origin, destination, date, tham số) kèm version của index.
+"""
+
+import bisect
+import datetime
+import heapq
+import itertools
+
+from services.cache import TTLCache
+from services.flight_schedule import get_schedule_index, TICKET_CLASSES
+
+DAY_MINUTES = 24 * 60
+DEFAULT_K = 5
+MAX_K = 20
+DEFAULT_MIN_CONNECTION = 60      # phút, nối chuyến nội địa
+INTERNATIONAL_MIN_CONNECTION = 90
+DEFAULT_MAX_LAYOVER = 12 * 60
+DEFAULT_MAX_STOPS = 2
+MODES = ('cheapest', 'fastest')
+
+DOMESTIC_AIRPORTS = {'SGN', 'HAN', 'DAD', 'CXR', 'PQC', 'VCA', 'HPH', 'HUI', 'VII', 'DLI', 'BMV', 'UIH', 'VDO'}
+
+_itinerary_cache = TTLCache(ttl=300, max_entries=5000)
+
+
+def _connection_minutes(arriving, departing, min_connection):
+    """MCT: nối chuyến có chặng quốc tế cần tối thiểu INTERNATIONAL_MIN_CONNECTION phút"""
+    international = not ({arriving['origin'], departing['destination']} <= DOMESTIC_AIRPORTS)
+    return max(min_connection, INTERNATIONAL_MIN_CONNECTION) if international else min_connection
+
+
+class ItinerarySearch:
+    """Tìm hành trình nhiều chặng trên bảng khởi hành của ScheduleIndex"""
+
+    def __init__(self, index=None):
+        self.index = index or get_schedule_index()
+
+    def _merged_board(self, date):
+        """Chuyến khởi hành ngày `date` và ngày kế tiếp (phút tuyệt đối tính từ 00:00 ngày `date`)"""
+        first = self.index.departures(date)
+        second = self.index.departures(date + datetime.timedelta(days=1))
+        cache = {}
+
+        def departures_from(airport):
+            board = cache.get(airport)
+            if board is None:
+                times, flights = [], []
+                for offset, day_board in ((0, first), (DAY_MINUTES, second)):
+                    entry = day_board.get(airport)
+                    if entry is None:
+                        continue
+                    for flight in entry[1]:
+                        times.append(flight['departure_minute'] + offset)
+                        flights.append((offset, flight))
+                board = cache[airport] = (times, flights)
+            return board
+
+        return departures_from
+
+    def search(self, origin, destination, date, k=DEFAULT_K, mode='cheapest', ticket_class='economy',
+               min_connection=DEFAULT_MIN_CONNECTION, max_stops=DEFAULT_MAX_STOPS,
+               max_layover=DEFAULT_MAX_LAYOVER):
+        """k hành trình tốt nhất khởi hành trong ngày `date` (danh sách dict)"""
+        key = (self.index.version, origin, destination, date, k, mode, ticket_class,
+               min_connection, max_stops, max_layover)
+        cached = _itinerary_cache.get(key)
+        if cached is not None:
+            return cached
+        results = self._search(origin, destination, date, k, mode, ticket_class,
+                               min_connection, max_stops, max_layover)
+        _itinerary_cache.set(key, results)
+        return results
+
+    def _lower_bounds(self, destination, date, ticket_class):
+        """Cận dưới tới `destination` từ mỗi sân bay: (giá, phút bay, số chặng)
+
+        Dijkstra ngược trên đồ thị tuyến tĩnh (giá / thời gian bay nhỏ nhất của
+        tuyến trong hai ngày tìm kiếm, bỏ qua thời gian chờ) - dùng làm heuristic A*
+        và để loại sân bay không thể tới đích trong số chặng cho phép.
+        """
+        incoming = {}
+        for day in (date, date + datetime.timedelta(days=1)):
+            for (origin, dest), (fare, duration) in self.index.route_minima(day, ticket_class).items():
+                best = incoming.setdefault(dest, {}).get(origin)
+                incoming[dest][origin] = (fare, duration) if best is None \
+                    else (min(fare, best[0]), min(duration, best[1]))
+
+        bounds = {}
+        for position in range(3):
+            settled = {destination: 0}
+            heap = [(0, destination)]
+            while heap:
+                cost, airport = heapq.heappop(heap)
+                if cost > settled.get(airport, float('inf')):
+                    continue
+                for origin, edge in incoming.get(airport, {}).items():
+                    candidate = cost + (edge[position] if position < 2 else 1)
+                    if candidate < settled.get(origin, float('inf')):
+                        settled[origin] = candidate
+                        heapq.heappush(heap, (candidate, origin))
+            for airport, cost in settled.items():
+                bounds.setdefault(airport, [0, 0, 0])[position] = cost
+        return bounds
+
+    def _search(self, origin, destination, date, k, mode, ticket_class, min_connection, max_stops, max_layover):
+        departures_from = self._merged_board(date)
+        bounds = self._lower_bounds(destination, date, ticket_class)
+        max_legs = max_stops + 1
+        fastest = mode == 'fastest'
+        counter = itertools.count()
+        heap = []
+        pops = {}
+        results = []
+
+        def push(path, fare, first_departure, arrival):
+            bound = bounds.get(path[-1][1]['destination'])
+            if bound is None or len(path) + bound[2] > max_legs:
+                return  # không thể tới đích trong số chặng cho phép
+            duration = arrival - first_departure
+            cost = (duration + bound[1], fare) if fastest else (fare + bound[0], duration)
+            heapq.heappush(heap, (cost, next(counter), path, fare, first_departure, arrival))
+
+        times, flights = departures_from(origin)
+        for departure, (offset, flight) in zip(times, flights):
+            if departure >= DAY_MINUTES:
+                break
+            arrival = departure + flight['duration_minutes']
+            push(((offset, flight),), flight['prices'][ticket_class], departure, arrival)
+
+        while heap and len(results) < k:
+            _, _, path, fare, first_departure, arrival = heapq.heappop(heap)
+            offset, flight = path[-1]
+            node = (flight['flight_number'], offset)
+            if pops.get(node, 0) >= k:
+                continue
+            pops[node] = pops.get(node, 0) + 1
+
+            if flight['destination'] == destination:
+                results.append(self._itinerary(path, fare, first_departure, arrival, date, ticket_class))
+                continue
+
+            visited = {origin}.union(leg['destination'] for _, leg in path)
+            times, next_flights = departures_from(flight['destination'])
+            start = bisect.bisect_left(times, arrival + min_connection)
+            for i in range(start, len(times)):
+                departure = times[i]
+                if departure > arrival + max_layover:
+                    break
+                next_offset, next_flight = next_flights[i]
+                if next_flight['destination'] in visited:
+                    continue
+                if departure - arrival < _connection_minutes(flight, next_flight, min_connection):
+                    continue
+                push(path + ((next_offset, next_flight),), fare + next_flight['prices'][ticket_class],
+                     first_departure, departure + next_flight['duration_minutes'])
+
+        return results
+
+    def _itinerary(self, path, fare, first_departure, arrival, date, ticket_class):
+        legs = []
+        previous_arrival = None
+        for offset, flight in path:
+            departure = flight['departure_minute'] + offset
+            leg_arrival = departure + flight['duration_minutes']
+            legs.append({
+                'flight_number': flight['flight_number'],
+                'origin': flight['origin'],
+                'destination': flight['destination'],
+                'departure': self._timestamp(date, departure),
+                'arrival': self._timestamp(date, leg_arrival),
+                'duration_minutes': flight['duration_minutes'],
+                'aircraft': flight['aircraft'],
+                'price': flight['prices'][ticket_class],
+                'layover_minutes': departure - previous_arrival if previous_arrival is not None else 0
+            })
+            previous_arrival = leg_arrival
+        return {
+            'legs': legs,
+            'stops': len(legs) - 1,
+            'total_price': fare,
+            'total_duration_minutes': arrival - first_departure,
+            'departure': legs[0]['departure'],
+            'arrival': legs[-1]['arrival'],
+            'ticket_class': ticket_class
+        }
+
+    @staticmethod
+    def _timestamp(date, minute):
+        moment = datetime.datetime.combine(date, datetime.time()) + datetime.timedelta(minutes=minute)
+        return moment.strftime('%Y-%m-%d %H:%M')
+
+
+def validate_search_params(k, mode, ticket_class, max_stops, min_connection=DEFAULT_MIN_CONNECTION):
+    """Trả về thông báo lỗi (str) hoặc None nếu tham số hợp lệ"""
+    if not 1 <= k <= MAX_K:
+        return f'k phải trong khoảng 1-{MAX_K}'
+    if mode not in MODES:
+        return f'mode phải là một trong {", ".join(MODES)}'
+    if ticket_class not in TICKET_CLASSES:
+        return f'Hạng vé không hợp lệ: {ticket_class}'
+    if not 0 <= max_stops <= 3:
+        return 'max_stops phải trong khoảng 0-3'
+    if not 0 <= min_connection <= DEFAULT_MAX_LAYOVER:
+        return f'min_connection phải trong khoảng 0-{DEFAULT_MAX_LAYOVER} phút'
+    return None
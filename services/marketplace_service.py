@@ -6,9 +6,28 @@ Marketplace and P2P trading service
 
 import datetime
 import uuid
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from flask import current_app
 from models.database import db
-from models.marketplace import MarketplaceItem, P2PListing
+from models.marketplace import MarketplaceItem, P2PListing, P2POrder, VoucherCode
 from models.customer import Customer
+from services.cache import TTLCache
+from services import domain_events
+from services.catalog_cache import catalog_cache
+from services.flash_sale import flash_sales
+from services.id_generator import new_id
+from services.p2p_matching import exchange, market_key, Order
+from services.pagination import encode_cursor, decode_cursor
+from services.voucher_pool import voucher_pool, VoucherPoolExhausted
+
+DEFAULT_FEED_PAGE_SIZE = 20
+MAX_FEED_PAGE_SIZE = 100
+MAX_ORDER_QUANTITY = 1000
+MATCH_WAIT_SECONDS = 10
+MAX_VOUCHER_BATCH = 5000000
+
+# Trang đầu của feed P2P theo bộ lọc, xóa khi có tin đăng mới
+_feed_cache = TTLCache(ttl=15, max_entries=1000)
 
 class MarketplaceService:
     
@@ -33,11 +52,66 @@ class MarketplaceService:
             print(f"Error getting marketplace items: {e}")
             return []
     
+    def get_catalog(self):
+        """(body JSON bytes, ETag) của danh mục vật phẩm, lấy từ catalog cache"""
+        return catalog_cache.get()
+
+    def create_item(self, name, price_svt, quantity=0, description=None, partner_brand=None, image_url=None):
+        """Thêm vật phẩm vào marketplace"""
+        try:
+            if not name or price_svt is None:
+                return {'success': False, 'error': 'Item name and price required'}
+
+            item = MarketplaceItem(
+                name=name,
+                description=description,
+                price_svt=price_svt,
+                quantity=int(quantity or 0),
+                partner_brand=partner_brand,
+                image_url=image_url,
+                is_active=True
+            )
+            db.session.add(item)
+            db.session.commit()
+            catalog_cache.bump()
+
+            return {'success': True, 'message': 'Đã thêm vật phẩm', 'item_id': item.id}
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error creating marketplace item: {e}")
+            return {'success': False, 'error': str(e)}
+
+    def update_item(self, item_id, **fields):
+        """Cập nhật vật phẩm (tên, mô tả, giá, số lượng, hiển thị...)"""
+        try:
+            item = db.session.get(MarketplaceItem, item_id)
+            if not item:
+                return {'success': False, 'error': 'Item not found'}
+
+            for field in ('name', 'description', 'price_svt', 'quantity', 'partner_brand', 'image_url', 'is_active'):
+                if field in fields and fields[field] is not None:
+                    setattr(item, field, fields[field])
+            db.session.commit()
+            catalog_cache.bump()
+
+            return {'success': True, 'message': 'Đã cập nhật vật phẩm', 'item_id': item.id}
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error updating marketplace item: {e}")
+            return {'success': False, 'error': str(e)}
+
     def purchase_item(self, customer_id, item_id, quantity=1):
         """Mua item từ marketplace"""
         try:
             if not customer_id:
                 return {'success': False, 'error': 'Customer ID required'}
+
+            # Vật phẩm đang flash sale: đi qua bộ đếm admission + hàng đợi
+            sale = flash_sales.get(item_id)
+            if sale is not None:
+                return sale.purchase(customer_id, int(quantity or 1))
             
             # Kiểm tra item tồn tại
             item = MarketplaceItem.query.get(item_id)
@@ -78,34 +152,171 @@ class MarketplaceService:
                 print(f" Error creating transaction: {tx_error}")
                 db.session.rollback()
                 return {'success': False, 'error': 'Failed to process payment'}
+
+            # Gán mã voucher (nếu vật phẩm có kho mã) trong cùng transaction
+            try:
+                codes = voucher_pool.assign(item.id, [(customer_id, quantity)])
+            except VoucherPoolExhausted as pool_error:
+                print(f"❌ {pool_error}")
+                db.session.rollback()
+                return {'success': False, 'error': 'Voucher codes sold out'}
             
             # Giảm số lượng item
             item.quantity -= quantity
+            remaining_quantity = item.quantity
             
             db.session.commit()
+            catalog_cache.set_stock(item.id, remaining_quantity)
+            domain_events.publish(domain_events.MARKETPLACE_PURCHASE, customer_id, item_id=item.id,
+                                  quantity=quantity, total_cost=total_cost)
             
-            return {
+            result = {
                 'success': True,
                 'message': f'Đã mua {quantity}x {item.name} thành công',
                 'total_cost': total_cost,
                 'remaining_svt': current_balance - total_cost
             }
+            if codes is not None:
+                result['voucher_codes'] = codes[0]
+            return result
             
         except Exception as e:
             db.session.rollback()
             print(f" Error purchasing item: {e}")
             return {'success': False, 'error': str(e)}
     
-    def get_all_p2p_listings(self):
-        """Lấy danh sách tin đăng P2P"""
+    def generate_vouchers(self, item_id, count):
+        """Sinh sẵn `count` mã voucher cho vật phẩm (cộng vào tồn kho)"""
         try:
-            listings = P2PListing.query.filter_by(status='active').order_by(P2PListing.created_at.desc()).all()
-            
+            try:
+                count = int(count)
+            except (TypeError, ValueError):
+                return {'success': False, 'error': 'Invalid count'}
+            if count < 1 or count > MAX_VOUCHER_BATCH:
+                return {'success': False, 'error': f'Count must be between 1 and {MAX_VOUCHER_BATCH}'}
+
+            item = db.session.get(MarketplaceItem, item_id)
+            if not item:
+                return {'success': False, 'error': 'Item not found'}
+
+            quantity = voucher_pool.generate(item.id, count)
+            catalog_cache.set_stock(item.id, quantity)
+
+            return {
+                'success': True,
+                'message': f'Đã sinh {count} mã voucher cho {item.name}',
+                'item_id': item.id,
+                'generated': count,
+                'quantity': quantity
+            }
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error generating vouchers: {e}")
+            return {'success': False, 'error': str(e)}
+
+    def redeem_voucher(self, customer_id, code, partner_brand=None):
+        """Đổi mã voucher khách đã mua (tùy chọn kiểm tra đúng thương hiệu đối tác)"""
+        try:
+            if not customer_id:
+                return {'success': False, 'error': 'Customer ID required'}
+
+            voucher = voucher_pool.lookup(code)
+            if voucher is None or voucher.customer_id != customer_id:
+                return {'success': False, 'error': 'Invalid voucher code'}
+            if voucher.status == 'redeemed':
+                return {'success': False, 'error': 'Voucher already redeemed'}
+
+            item = db.session.get(MarketplaceItem, voucher.item_id)
+            if partner_brand and item and (item.partner_brand or '').lower() != partner_brand.lower():
+                return {'success': False, 'error': f'Voucher không dùng được tại {partner_brand}'}
+
+            # UPDATE có điều kiện: hai lần đổi cùng lúc chỉ một lần thành công
+            redeemed = db.session.query(VoucherCode).filter(
+                VoucherCode.id == voucher.id,
+                VoucherCode.status == 'assigned'
+            ).update({VoucherCode.status: 'redeemed', VoucherCode.redeemed_at: datetime.datetime.utcnow()},
+                     synchronize_session=False)
+            db.session.commit()
+            if not redeemed:
+                return {'success': False, 'error': 'Voucher already redeemed'}
+
+            return {
+                'success': True,
+                'message': f'Đã sử dụng voucher {item.name if item else voucher.item_id}',
+                'item_id': voucher.item_id,
+                'partner_brand': item.partner_brand if item else None
+            }
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error redeeming voucher: {e}")
+            return {'success': False, 'error': str(e)}
+
+    def get_customer_vouchers(self, customer_id, status=None):
+        """Danh sách mã voucher của khách (mới nhất trước)"""
+        try:
+            query = db.session.query(VoucherCode, MarketplaceItem.name, MarketplaceItem.partner_brand).join(
+                MarketplaceItem, MarketplaceItem.id == VoucherCode.item_id
+            ).filter(VoucherCode.customer_id == customer_id)
+            if status:
+                query = query.filter(VoucherCode.status == status)
+
+            vouchers = []
+            for voucher, item_name, partner_brand in query.order_by(VoucherCode.assigned_at.desc()).all():
+                data = voucher.to_dict()
+                data['item_name'] = item_name
+                data['partner_brand'] = partner_brand
+                vouchers.append(data)
+            return {'success': True, 'vouchers': vouchers, 'total': len(vouchers)}
+
+        except Exception as e:
+            print(f"❌ Error getting customer vouchers: {e}")
+            return {'success': False, 'error': str(e)}
+
+    def get_p2p_listings(self, limit=DEFAULT_FEED_PAGE_SIZE, cursor=None, min_price=None, max_price=None,
+                         keyword=None):
+        """Lấy danh sách tin đăng P2P (phân trang keyset theo created_at, id)
+
+        Người bán được join trong cùng một câu truy vấn; trang đầu tiên của mỗi
+        bộ lọc được cache ngắn hạn.
+        """
+        try:
+            limit = max(1, min(int(limit or DEFAULT_FEED_PAGE_SIZE), MAX_FEED_PAGE_SIZE))
+            min_price = self._parse_price(min_price, 'min_price')
+            max_price = self._parse_price(max_price, 'max_price')
+            keyword = (keyword or '').strip()[:100] or None
+
+            cache_key = (limit, min_price, max_price, keyword)
+            if not cursor:
+                cached = _feed_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+
+            # Dùng index (status, created_at, id)
+            q = db.session.query(P2PListing, Customer.name) \
+                .outerjoin(Customer, Customer.customer_id == P2PListing.seller_customer_id) \
+                .filter(P2PListing.status == 'active')
+            if cursor:
+                cursor_created, cursor_id = decode_cursor(cursor)
+                q = q.filter(db.or_(
+                    P2PListing.created_at < cursor_created,
+                    db.and_(P2PListing.created_at == cursor_created, P2PListing.id < cursor_id)
+                ))
+            if min_price is not None:
+                q = q.filter(P2PListing.price_svt >= min_price)
+            if max_price is not None:
+                q = q.filter(P2PListing.price_svt <= max_price)
+            if keyword:
+                pattern = '%' + keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                q = q.filter(db.or_(P2PListing.item_name.ilike(pattern, escape='\\'),
+                                    P2PListing.description.ilike(pattern, escape='\\')))
+            rows = q.order_by(P2PListing.created_at.desc(), P2PListing.id.desc()).limit(limit + 1).all()
+
+            has_more = len(rows) > limit
+            rows = rows[:limit]
             listings_data = []
-            for listing in listings:
-                # Lấy thông tin người bán
-                seller = Customer.query.filter_by(customer_id=listing.seller_customer_id).first()
-                
+            for listing, seller_name in rows:
                 listings_data.append({
                     'id': listing.id,
                     'item_name': listing.item_name,
@@ -113,18 +324,30 @@ class MarketplaceService:
                     'price_svt': float(listing.price_svt),
                     'seller': {
                         'customer_id': listing.seller_customer_id,
-                        'name': seller.name if seller else 'Unknown'
+                        'name': seller_name or 'Unknown'
                     },
                     'status': listing.status,
                     'created_at': listing.created_at.isoformat()
                 })
-            
-            return listings_data
-            
+
+            last = rows[-1][0] if rows else None
+            result = {
+                'success': True,
+                'listings': listings_data,
+                'count': len(listings_data),
+                'has_more': has_more,
+                'next_cursor': encode_cursor(last.created_at, last.id) if has_more else None
+            }
+            if not cursor:
+                _feed_cache.set(cache_key, result)
+            return result
+
+        except ValueError as e:
+            return {'success': False, 'invalid_params': True, 'error': f'Tham số không hợp lệ: {e}'}
         except Exception as e:
             print(f"Error getting P2P listings: {e}")
-            return []
-    
+            return {'success': False, 'error': str(e)}
+
     def create_p2p_listing(self, seller_customer_id, item_name, description, price_svt):
         """Tạo tin đăng P2P mới"""
         try:
@@ -144,18 +367,163 @@ class MarketplaceService:
             
             db.session.add(listing)
             db.session.commit()
+
+            # Tin đăng là lệnh bán trên sổ lệnh: khớp ngay nếu có lệnh mua giá cao hơn
+            match = self._await_match(exchange.market(current_app._get_current_object(), item_name).submit('sell', Order(
+                f"L{listing.id}", 'sell', float(price_svt), 1, owner=seller_customer_id, ref=listing.id
+            )))
+            _feed_cache.clear()
+            if match is None:
+                return {
+                    'success': True,
+                    'pending': True,
+                    'message': 'Tin đăng P2P đã được tạo, đang chờ khớp lệnh',
+                    'listing_id': listing.id,
+                    'sold': False
+                }
             
             return {
                 'success': True,
                 'message': 'Tin đăng P2P đã được tạo thành công',
-                'listing_id': listing.id
+                'listing_id': listing.id,
+                'sold': bool(match.get('filled'))
             }
             
         except Exception as e:
             db.session.rollback()
             print(f"Error creating P2P listing: {e}")
             return {'success': False, 'error': str(e)}
+
+    @staticmethod
+    def _await_match(future):
+        """Kết quả khớp lệnh; None khi quá MATCH_WAIT_SECONDS hoặc ghi database lỗi (lệnh đã lưu, market sẽ khớp lại)"""
+        try:
+            match = future.result(MATCH_WAIT_SECONDS)
+        except FutureTimeoutError:
+            return None
+        return None if match.get('success') is False else match
+
+    def place_buy_order(self, customer_id, item_name, price_svt, quantity=1):
+        """Đặt lệnh mua P2P: ký quỹ SVT rồi khớp với các tin đăng rẻ nhất"""
+        try:
+            if not customer_id:
+                return {'success': False, 'error': 'Customer ID required'}
+            if not market_key(item_name):
+                return {'success': False, 'error': 'Item name required'}
+            try:
+                price = round(float(price_svt), 2)
+                quantity = int(quantity)
+            except (TypeError, ValueError):
+                return {'success': False, 'invalid_params': True, 'error': 'Tham số không hợp lệ: price_svt / quantity'}
+            if price <= 0 or not 1 <= quantity <= MAX_ORDER_QUANTITY:
+                return {'success': False, 'invalid_params': True, 'error': f'Tham số không hợp lệ: giá > 0, số lượng 1-{MAX_ORDER_QUANTITY}'}
+
+            escrow = round(price * quantity, 2)
+            from models.transactions import TokenTransaction
+            balance = float(db.session.query(db.func.coalesce(db.func.sum(TokenTransaction.amount), 0))
+                            .filter(TokenTransaction.customer_id == customer_id).scalar())
+            if balance < escrow:
+                return {'success': False, 'error': 'Insufficient SVT balance'}
+
+            order = P2POrder(
+                order_id=new_id('P2PO'),
+                customer_id=customer_id,
+                market=market_key(item_name),
+                price_svt=price,
+                quantity=quantity,
+                filled_quantity=0,
+                status='open'
+            )
+            db.session.add(order)
+            db.session.add(TokenTransaction(
+                customer_id=customer_id,
+                transaction_type='p2p_escrow',
+                amount=-escrow,
+                description=f"Ký quỹ lệnh mua {order.order_id}: {quantity}x {item_name}",
+                tx_hash=f"0x{uuid.uuid4().hex}",
+                block_number=1000000
+            ))
+            db.session.commit()
+
+            match = self._await_match(exchange.market(current_app._get_current_object(), item_name).submit('buy', Order(
+                order.order_id, 'buy', price, quantity, owner=customer_id, ref=order.id
+            )))
+            _feed_cache.clear()
+            if match is None:
+                # Ký quỹ và lệnh đã ghi: lệnh vẫn nằm trên sổ, khách có thể hủy theo order_id
+                return {
+                    'success': True,
+                    'pending': True,
+                    'message': 'Lệnh mua đã được ghi nhận, đang chờ khớp',
+                    'order_id': order.order_id
+                }
+
+            return {
+                'success': True,
+                'message': f"Đã khớp {match['filled']}/{quantity}" if match['filled'] else 'Lệnh mua đang chờ khớp',
+                'order_id': order.order_id,
+                'filled': match['filled'],
+                'remaining': match['remaining'],
+                'trades': match['trades']
+            }
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error placing P2P buy order: {e}")
+            return {'success': False, 'error': str(e)}
+
+    def cancel_buy_order(self, customer_id, order_id):
+        """Hủy phần chưa khớp của lệnh mua và hoàn ký quỹ"""
+        try:
+            order = P2POrder.query.filter_by(order_id=order_id, customer_id=customer_id).first()
+            if not order:
+                return {'success': False, 'error': 'Order not found'}
+            if order.status != 'open':
+                return {'success': False, 'error': f'Lệnh đã {order.status}'}
+
+            cancelled = exchange.market(current_app._get_current_object(), order.market) \
+                .submit('cancel', order_id).result(MATCH_WAIT_SECONDS)
+            if not cancelled:
+                return {'success': False, 'error': 'Lệnh đã khớp hết'}
+            if isinstance(cancelled, dict):
+                return {'success': False, 'error': cancelled['error']}
+            return {
+                'success': True,
+                'message': 'Đã hủy lệnh mua',
+                'order_id': order_id,
+                'refunded_svt': round(cancelled.price * cancelled.remaining, 2)
+            }
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error cancelling P2P buy order: {e}")
+            return {'success': False, 'error': str(e)}
+
+    def get_order_book(self, item_name, levels=10):
+        """Độ sâu sổ lệnh P2P của một vật phẩm"""
+        try:
+            if not market_key(item_name):
+                return {'success': False, 'error': 'Item name required'}
+            market = exchange.market(current_app._get_current_object(), item_name)
+            depth = market.snapshot(max(1, min(int(levels), 50)))
+            return {'success': True, 'market': market.name, **depth}
+        except Exception as e:
+            print(f"Error getting P2P order book: {e}")
+            return {'success': False, 'error': str(e)}
     
+    @staticmethod
+    def _parse_price(value, name):
+        """Giá lọc (SVT) hoặc None; ValueError(name) nếu không phải số không âm"""
+        if value in (None, ''):
+            return None
+        try:
+            price = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(name)
+        if price < 0:
+            raise ValueError(name)
+        return price
+
     def _get_customer_svt_balance(self, customer_id):
         """Helper: Tính số dư SVT của customer"""
         try:
@@ -0,0 +1,155 @@
+# services/mission_assignment.py
+# -*- coding: utf-8 -*-
+"""
+Asynchronous mission assignment and per-customer mission snapshots
+
+GET /api/missions/<customer_id> chỉ còn là đọc. Phần ghi được tách ra:
+
+- Gán mission (đánh giá catalog theo dữ liệu khách hàng rồi ghi
+  customer_missions / customer_mission_progress) chạy trong worker nền khi
+  khách hàng được tạo (domain event customer.created), khi khách hoàn thành
+  mission hoặc một requirement (mission mới có thể mở khóa) và khi phiên bản
+  catalog đổi: lượt quét (request_sweep, gọi lúc khởi động) gán lại cho mọi
+  khách hàng chưa có customer_mission_state hoặc đang ở catalog_version cũ.
+- Snapshot mission của khách hàng (đã join tiến độ từ customer_mission_progress)
+  được đọc bằng một truy vấn và cache theo customer_id; cache bị xóa khi gán
+  mission, bắt đầu / hoàn thành mission hoặc progress engine ghi delta.
+"""
+
+import queue
+import threading
+
+from flask import current_app, has_app_context
+
+from models.database import db
+from models.customer import Customer
+import models.missions as mission_models
+from services import domain_events
+from services.cache import TTLCache
+
+SNAPSHOT_TTL = 60
+SWEEP_CHUNK = 1000
+POLL_SECONDS = 0.5
+
+_SWEEP = object()  # lệnh quét khách hàng cần gán lại trong hàng đợi
+
+# Snapshot mission theo customer_id
+_snapshot_cache = TTLCache(ttl=SNAPSHOT_TTL, max_entries=50000)
+
+
+def _CustomerMissionState():
+    return getattr(mission_models, 'CustomerMissionState', None)
+
+
+def get_cached_snapshot(customer_id):
+    return _snapshot_cache.get(int(customer_id))
+
+
+def cache_snapshot(customer_id, snapshot):
+    _snapshot_cache.set(int(customer_id), snapshot)
+
+
+def invalidate_mission_snapshot(customer_id):
+    """Xóa snapshot mission đã cache của khách hàng sau khi mission / tiến độ thay đổi"""
+    try:
+        _snapshot_cache.invalidate(int(customer_id))
+    except (TypeError, ValueError):
+        pass
+
+
+class MissionAssigner:
+    """Hàng đợi khách hàng cần gán mission + worker nền"""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._app = None
+        self._worker = None
+        self.stats = {'assigned': 0, 'failed': 0, 'sweeps': 0}
+
+    def enqueue(self, customer_ids):
+        """Đưa khách hàng vào hàng đợi gán mission (bỏ qua khách đã chờ sẵn)"""
+        with self._lock:
+            for customer_id in customer_ids:
+                if customer_id and customer_id not in self._queued:
+                    self._queued.add(customer_id)
+                    self._queue.put(customer_id)
+        self._ensure_worker()
+
+    def request_sweep(self):
+        """Quét và gán lại cho khách hàng chưa ở phiên bản catalog hiện tại"""
+        self._queue.put(_SWEEP)
+        self._ensure_worker()
+
+    def handle(self, events):
+        """Subscriber của customer.created"""
+        self.enqueue([event.customer_id for event in events])
+
+    def _ensure_worker(self):
+        if (self._worker is not None and self._worker.is_alive()) or not has_app_context():
+            return
+        with self._lock:
+            # Khởi động lại nếu worker trước đã chết
+            if self._worker is None or not self._worker.is_alive():
+                self._app = current_app._get_current_object()
+                self._worker = threading.Thread(target=self._run, name='mission-assigner', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        from services.mission_service import MissionService
+        service = MissionService()
+        while True:
+            try:
+                item = self._queue.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                continue
+            with self._app.app_context():
+                try:
+                    if item is _SWEEP:
+                        self._sweep(service)
+                    else:
+                        with self._lock:
+                            self._queued.discard(item)
+                        self._assign(service, item)
+                except Exception as e:
+                    db.session.rollback()
+                    self.stats['failed'] += 1
+                    print(f"❌ Mission assigner failed on {'sweep' if item is _SWEEP else item}: {e}")
+                finally:
+                    db.session.remove()
+
+    def _assign(self, service, customer_id, catalog_version=None):
+        try:
+            service.assign_missions(customer_id, catalog_version)
+            self.stats['assigned'] += 1
+        except Exception as e:
+            db.session.rollback()
+            self.stats['failed'] += 1
+            print(f"❌ Mission assignment failed for customer {customer_id}: {e}")
+
+    def _sweep(self, service):
+        """Gán lại theo từng khối khách hàng (keyset theo customer_id)"""
+        CustomerMissionState = _CustomerMissionState()
+        if not CustomerMissionState:
+            return
+        catalog_version = service.get_catalog_version()
+        self.stats['sweeps'] += 1
+        last_id = 0
+        while True:
+            customer_ids = [customer_id for (customer_id,) in db.session.query(Customer.customer_id).outerjoin(
+                CustomerMissionState, CustomerMissionState.customer_id == Customer.customer_id
+            ).filter(
+                Customer.customer_id > last_id,
+                db.or_(CustomerMissionState.customer_id.is_(None),
+                       CustomerMissionState.catalog_version != catalog_version)
+            ).order_by(Customer.customer_id).limit(SWEEP_CHUNK).all()]
+            if not customer_ids:
+                break
+            for customer_id in customer_ids:
+                self._assign(service, customer_id, catalog_version)
+            last_id = customer_ids[-1]
+
+
+mission_assigner = MissionAssigner()
+domain_events.subscribe(domain_events.CUSTOMER_CREATED, mission_assigner.handle)
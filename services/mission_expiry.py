@@ -0,0 +1,329 @@
+# services/mission_expiry.py
+# -*- coding: utf-8 -*-
+"""
+Recurring mission expiry, archival and rollover
+
+Mission lặp lại (RECURRING_MISSIONS: hằng ngày / hằng tuần) được gán theo kỳ:
+mỗi kỳ là một dòng customer_missions riêng với mission_id '<template>@<kỳ>',
+period_key và expires_at. Sweeper chạy định kỳ (worker nền, CLI hoặc admin API):
+
+1. expire: chuyển mission 'available' / 'in_progress' đã quá expires_at sang
+   'expired' bằng UPDATE theo khối id (SWEEP_CHUNK dòng, commit từng khối để
+   không giữ lock lâu).
+2. archive: mission 'completed' / 'expired' cũ hơn ARCHIVE_AFTER_DAYS được
+   chép sang customer_missions_archive bằng INSERT ... SELECT rồi xóa (kèm
+   customer_mission_progress của chúng) theo từng khối.
+3. rollover: sinh mission của kỳ hiện tại cho mọi khách hàng đã được gán
+   mission (customer_mission_state) mà chưa có, bulk insert theo khối.
+
+Chạy tay:
+    python -m services.mission_expiry --archive-after-days 30
+"""
+
+import datetime
+import json
+import threading
+import time
+
+from flask import current_app, has_app_context
+from sqlalchemy import bindparam, func, literal, select
+from sqlalchemy.exc import IntegrityError
+
+from models.database import db
+import models.missions as mission_models
+from services.mission_assignment import invalidate_mission_snapshot
+
+SWEEP_CHUNK = 1000
+SWEEP_INTERVAL = 300
+ARCHIVE_AFTER_DAYS = 30
+ROLLOVER_ATTEMPTS = 3
+
+OPEN_STATUSES = ('available', 'in_progress')
+CLOSED_STATUSES = ('completed', 'expired')
+
+# Mission lặp lại, gán cho mọi khách hàng; tiến độ cộng từ domain event (services/mission_progress.py)
+RECURRING_MISSIONS = [
+    {
+        'mission_id': 'daily_login',
+        'title': 'Đăng nhập mỗi ngày',
+        'category': 'lifestyle',
+        'level': 'Beginner',
+        'svt_reward': 10,
+        'recurrence': 'daily',
+        'requirements': {'login_count': 1}
+    },
+    {
+        'mission_id': 'daily_transaction',
+        'title': 'Một giao dịch trong ngày',
+        'category': 'financial',
+        'level': 'Beginner',
+        'svt_reward': 20,
+        'recurrence': 'daily',
+        'requirements': {'transaction_count': 1}
+    },
+    {
+        'mission_id': 'weekly_transactions',
+        'title': '5 giao dịch trong tuần',
+        'category': 'financial',
+        'level': 'Intermediate',
+        'svt_reward': 100,
+        'recurrence': 'weekly',
+        'requirements': {'transaction_count': 5}
+    }
+]
+
+
+def _CustomerMission():
+    return getattr(mission_models, 'CustomerMission', None)
+
+
+def _CustomerMissionProgress():
+    return getattr(mission_models, 'CustomerMissionProgress', None)
+
+
+def _CustomerMissionState():
+    return getattr(mission_models, 'CustomerMissionState', None)
+
+
+def _CustomerMissionArchive():
+    return getattr(mission_models, 'CustomerMissionArchive', None)
+
+
+def period_bounds(recurrence, at):
+    """(period_key, bắt đầu, hết hạn) của kỳ chứa thời điểm `at` (UTC)"""
+    day = datetime.datetime.combine(at.date(), datetime.time())
+    if recurrence == 'daily':
+        return day.strftime('%Y-%m-%d'), day, day + datetime.timedelta(days=1)
+    if recurrence == 'weekly':
+        start = day - datetime.timedelta(days=day.weekday())
+        year, week, _ = start.isocalendar()
+        return f'{year}-W{week:02d}', start, start + datetime.timedelta(days=7)
+    raise ValueError(f'Unknown recurrence: {recurrence}')
+
+
+def instance_id(template_id, period_key):
+    return f'{template_id}@{period_key}'
+
+
+def recurring_rows(customer_ids, now=None, templates=None):
+    """Dòng customer_missions / customer_mission_progress của kỳ hiện tại cho các khách hàng"""
+    now = now or datetime.datetime.utcnow()
+    mission_rows, progress_rows = [], []
+    for template in RECURRING_MISSIONS if templates is None else templates:
+        period_key, _, expires_at = period_bounds(template['recurrence'], now)
+        mission_id = instance_id(template['mission_id'], period_key)
+        for customer_id in customer_ids:
+            mission_rows.append({
+                'customer_id': customer_id,
+                'mission_id': mission_id,
+                'mission_title': template['title'],
+                'mission_category': template['category'],
+                'mission_level': template['level'],
+                'svt_reward': template['svt_reward'],
+                'status': 'available',
+                'progress_data': template['requirements'],
+                'period_key': period_key,
+                'expires_at': expires_at
+            })
+            progress_rows.extend({
+                'customer_id': customer_id,
+                'mission_id': mission_id,
+                'requirement_key': req_key,
+                'current_value': 0,
+                'required_value': req_value,
+                'is_completed': False
+            } for req_key, req_value in template['requirements'].items())
+    return mission_rows, progress_rows
+
+
+class MissionExpirySweeper:
+    """Hết hạn, lưu trữ và sinh kỳ mới cho mission lặp lại theo từng khối"""
+
+    def __init__(self, chunk_size=SWEEP_CHUNK, interval=SWEEP_INTERVAL, archive_after_days=ARCHIVE_AFTER_DAYS):
+        self.chunk_size = chunk_size
+        self.interval = interval
+        self.archive_after_days = archive_after_days
+        self._lock = threading.Lock()
+        self._app = None
+        self._worker = None
+        self.last_run = None
+
+    def run(self, now=None, archive_after_days=None):
+        """Chạy một lượt expire -> archive -> rollover (cần app context)"""
+        CustomerMission = _CustomerMission()
+        if not CustomerMission:
+            return {'success': False, 'error': 'CustomerMission model not initialized'}
+        now = now or datetime.datetime.utcnow()
+        days = self.archive_after_days if archive_after_days is None else archive_after_days
+        started = time.perf_counter()
+        try:
+            result = {
+                'success': True,
+                'expired': self.expire(now),
+                'archived': self.archive(now - datetime.timedelta(days=days), now),
+                'generated': self.rollover(now)
+            }
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Mission expiry sweep failed: {e}")
+            return {'success': False, 'error': str(e)}
+        result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        self.last_run = dict(result, ran_at=now.isoformat())
+        return result
+
+    def expire(self, now):
+        """'available' / 'in_progress' quá expires_at -> 'expired'; trả về số mission đã hết hạn"""
+        CustomerMission = _CustomerMission()
+        expired = 0
+        while True:
+            rows = db.session.query(CustomerMission.id, CustomerMission.customer_id).filter(
+                CustomerMission.status.in_(OPEN_STATUSES),
+                CustomerMission.expires_at <= now
+            ).order_by(CustomerMission.id).limit(self.chunk_size).all()
+            if not rows:
+                break
+            # Điều kiện status lặp lại: mission vừa được hoàn thành giữa hai câu lệnh thì giữ nguyên
+            expired += db.session.query(CustomerMission).filter(
+                CustomerMission.id.in_([row.id for row in rows]),
+                CustomerMission.status.in_(OPEN_STATUSES)
+            ).update({'status': 'expired'}, synchronize_session=False)
+            db.session.commit()
+            for customer_id in {row.customer_id for row in rows}:
+                invalidate_mission_snapshot(customer_id)
+        return expired
+
+    def archive(self, cutoff, now):
+        """Chuyển mission đã đóng trước `cutoff` sang customer_missions_archive; trả về số dòng đã chuyển"""
+        CustomerMission = _CustomerMission()
+        CustomerMissionProgress = _CustomerMissionProgress()
+        CustomerMissionArchive = _CustomerMissionArchive()
+        if not CustomerMissionArchive:
+            return 0
+        missions = CustomerMission.__table__
+        progress = CustomerMissionProgress.__table__
+        archive = CustomerMissionArchive.__table__
+        columns = [column.name for column in archive.columns if column.name != 'archived_at']
+        delete_progress = progress.delete().where(
+            progress.c.customer_id == bindparam('owner_id'),
+            progress.c.mission_id == bindparam('mission_key')
+        )
+
+        archived = 0
+        while True:
+            rows = db.session.query(CustomerMission.id, CustomerMission.customer_id, CustomerMission.mission_id).filter(
+                CustomerMission.status.in_(CLOSED_STATUSES),
+                func.coalesce(CustomerMission.completed_at, CustomerMission.expires_at,
+                              CustomerMission.created_at) < cutoff
+            ).order_by(CustomerMission.id).limit(self.chunk_size).all()
+            if not rows:
+                break
+            ids = [row.id for row in rows]
+            try:
+                db.session.execute(archive.insert().from_select(
+                    columns + ['archived_at'],
+                    select(*[missions.c[name] for name in columns],
+                           literal(now, archive.c.archived_at.type)).where(missions.c.id.in_(ids))
+                ))
+                db.session.execute(delete_progress, [
+                    {'owner_id': row.customer_id, 'mission_key': row.mission_id} for row in rows
+                ])
+                db.session.execute(missions.delete().where(missions.c.id.in_(ids)))
+                db.session.commit()
+            except IntegrityError:
+                # Process khác đang lưu trữ cùng khối
+                db.session.rollback()
+                break
+            archived += len(ids)
+            for customer_id in {row.customer_id for row in rows}:
+                invalidate_mission_snapshot(customer_id)
+        return archived
+
+    def rollover(self, now):
+        """Sinh mission lặp lại của kỳ hiện tại cho khách hàng đã được gán mission; trả về số mission đã tạo"""
+        CustomerMission = _CustomerMission()
+        CustomerMissionProgress = _CustomerMissionProgress()
+        CustomerMissionState = _CustomerMissionState()
+        if not CustomerMissionState:
+            return 0
+
+        generated = 0
+        for template in RECURRING_MISSIONS:
+            period_key, _, _ = period_bounds(template['recurrence'], now)
+            mission_id = instance_id(template['mission_id'], period_key)
+            last_id, attempts = 0, 0
+            while True:
+                customer_ids = [customer_id for (customer_id,) in db.session.query(
+                    CustomerMissionState.customer_id
+                ).outerjoin(
+                    CustomerMission,
+                    db.and_(CustomerMission.customer_id == CustomerMissionState.customer_id,
+                            CustomerMission.mission_id == mission_id)
+                ).filter(
+                    CustomerMissionState.customer_id > last_id,
+                    CustomerMission.id.is_(None)
+                ).order_by(CustomerMissionState.customer_id).limit(self.chunk_size).all()]
+                if not customer_ids:
+                    break
+                mission_rows, progress_rows = recurring_rows(customer_ids, now, [template])
+                try:
+                    db.session.execute(CustomerMission.__table__.insert(), mission_rows)
+                    if progress_rows:
+                        db.session.execute(CustomerMissionProgress.__table__.insert(), progress_rows)
+                    db.session.commit()
+                except IntegrityError:
+                    # Worker gán mission vừa tạo cho một phần khối: đọc lại khối đó
+                    db.session.rollback()
+                    attempts += 1
+                    if attempts >= ROLLOVER_ATTEMPTS:
+                        print(f"❌ Mission rollover conflict for {mission_id} after customer {last_id}")
+                        break
+                    continue
+                attempts = 0
+                generated += len(mission_rows)
+                last_id = customer_ids[-1]
+                for customer_id in customer_ids:
+                    invalidate_mission_snapshot(customer_id)
+        return generated
+
+    def schedule(self):
+        """Chạy sweeper nền mỗi `interval` giây và ngay sau mỗi nửa đêm UTC"""
+        if self._worker is not None or not has_app_context():
+            return
+        with self._lock:
+            if self._worker is None:
+                self._app = current_app._get_current_object()
+                self._worker = threading.Thread(target=self._run, name='mission-expiry', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._app.app_context():
+                try:
+                    self.run()
+                finally:
+                    db.session.remove()
+            now = datetime.datetime.utcnow()
+            next_day = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+            time.sleep(max(1, min(self.interval, (next_day - now).total_seconds() + 1)))
+
+
+mission_sweeper = MissionExpirySweeper()
+
+
+if __name__ == '__main__':
+    import argparse
+    from flask import Flask
+    from config import Config
+    from models import init_db
+
+    parser = argparse.ArgumentParser(description='Expire, archive and roll over recurring missions')
+    parser.add_argument('--archive-after-days', type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument('--chunk-size', type=int, default=SWEEP_CHUNK)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    init_db(app)
+    with app.app_context():
+        sweeper = MissionExpirySweeper(chunk_size=args.chunk_size)
+        print(json.dumps(sweeper.run(archive_after_days=args.archive_after_days), indent=2))
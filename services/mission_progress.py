@@ -0,0 +1,197 @@
+# services/mission_progress.py
+# -*- coding: utf-8 -*-
+"""
+Event-driven mission progress counters
+
+Engine đăng ký các domain event (services/domain_events.py) và cộng dồn tiến
+độ vào customer_mission_progress mà không đọc gì trên đường ghi:
+
+1. REQUIREMENT_RULES khai báo requirement_key nào tăng theo sự kiện nào (đếm 1
+   hoặc cộng một trường của payload); EVENT_INDEX là bản đảo ngược, tính sẵn
+   khi import: loại sự kiện -> [(requirement_key, trường)].
+2. Handler chỉ gộp delta theo (customer_id, requirement_key) trong bộ nhớ.
+3. Worker cứ FLUSH_SECONDS giây ghi toàn bộ delta bằng một executemany
+   UPDATE ... SET current_value = current_value + :delta, is_completed tính
+   ngay trong SQL, rồi commit một lần.
+
+Delta là phép cộng nên nhiều process cùng ghi vẫn đúng; batch lỗi được gộp
+lại vào lần ghi sau.
+"""
+
+import datetime
+import threading
+import time
+from collections import defaultdict
+
+from flask import current_app, has_app_context
+from sqlalchemy import bindparam
+
+from models.database import db
+import models.missions as mission_models
+from services import domain_events
+from services.domain_events import (
+    HDBANK_TRANSFER, FLIGHT_BOOKED, RESORT_BOOKED, SPA_BOOKED, MARKETPLACE_PURCHASE, ESG_CONTRIBUTION, CUSTOMER_LOGIN,
+    TRANSACTION_EVENTS
+)
+from services.mission_assignment import mission_assigner, invalidate_mission_snapshot
+
+FLUSH_SECONDS = 0.5
+
+# requirement_key -> [(loại sự kiện, trường payload cộng dồn; None = đếm 1)]
+REQUIREMENT_RULES = {
+    'transaction_count': [(event_type, None) for event_type in TRANSACTION_EVENTS],
+    'transfer_count': [(HDBANK_TRANSFER, None)],
+    'transfer_amount': [(HDBANK_TRANSFER, 'amount')],
+    'flight_count': [(FLIGHT_BOOKED, 'passengers')],
+    'resort_booking_count': [(RESORT_BOOKED, None)],
+    'resort_nights': [(RESORT_BOOKED, 'nights')],
+    'spa_booking_count': [(SPA_BOOKED, None)],
+    'marketplace_purchase_count': [(MARKETPLACE_PURCHASE, 'quantity')],
+    'svt_spent': [(MARKETPLACE_PURCHASE, 'total_cost')],
+    'esg_contribution_count': [(ESG_CONTRIBUTION, None)],
+    'esg_contribution_amount': [(ESG_CONTRIBUTION, 'amount')],
+    'login_count': [(CUSTOMER_LOGIN, None)],
+}
+
+
+def _build_event_index(rules):
+    index = defaultdict(list)
+    for requirement_key, sources in rules.items():
+        for event_type, field in sources:
+            index[event_type].append((requirement_key, field))
+    return {event_type: tuple(targets) for event_type, targets in index.items()}
+
+
+EVENT_INDEX = _build_event_index(REQUIREMENT_RULES)
+
+
+def _CustomerMissionProgress():
+    return getattr(mission_models, 'CustomerMissionProgress', None)
+
+
+def _CustomerMission():
+    return getattr(mission_models, 'CustomerMission', None)
+
+
+class MissionProgressEngine:
+    """Gộp delta tiến độ mission từ domain event và ghi theo batch"""
+
+    def __init__(self, flush_seconds=FLUSH_SECONDS):
+        self.flush_seconds = flush_seconds
+        self._pending = defaultdict(float)  # (customer_id, requirement_key) -> delta
+        self._lock = threading.Lock()
+        self._app = None
+        self._worker = None
+        self.stats = {'events': 0, 'batches': 0, 'rows': 0}
+
+    # ---------------------------------------------------------------- events
+
+    def handle(self, events):
+        """Subscriber của domain_events: chỉ cộng delta trong bộ nhớ"""
+        with self._lock:
+            for event in events:
+                for requirement_key, field in EVENT_INDEX.get(event.type, ()):
+                    delta = 1 if field is None else event.payload.get(field) or 0
+                    if delta:
+                        self._pending[(event.customer_id, requirement_key)] += float(delta)
+                self.stats['events'] += 1
+        self._ensure_worker()
+
+    def _ensure_worker(self):
+        if self._worker is not None or not has_app_context():
+            return
+        with self._lock:
+            if self._worker is None:
+                self._app = current_app._get_current_object()
+                self._worker = threading.Thread(target=self._run, name='mission-progress', daemon=True)
+                self._worker.start()
+
+    # ---------------------------------------------------------------- worker
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            with self._app.app_context():
+                try:
+                    self.flush()
+                finally:
+                    db.session.remove()
+
+    def flush(self):
+        """Ghi toàn bộ delta đang chờ (cần app context); trả về số cặp (khách, requirement) đã ghi"""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(float)
+        if not pending:
+            return 0
+        try:
+            apply_progress(pending, increment=True)
+            self.stats['batches'] += 1
+            self.stats['rows'] += len(pending)
+            return len(pending)
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Mission progress flush failed: {e}")
+            with self._lock:
+                for key, delta in pending.items():
+                    self._pending[key] += delta
+            return 0
+
+
+def apply_progress(values, increment=False):
+    """Ghi tiến độ {(customer_id, requirement_key): value} bằng một executemany UPDATE và commit
+
+    increment=True cộng value vào current_value, ngược lại gán bằng value.
+    Chỉ cập nhật requirement chưa hoàn thành của mission còn mở (available /
+    in_progress, chưa quá expires_at); is_completed tính trong SQL.
+    Khách hàng vừa hoàn thành requirement được đưa vào hàng đợi gán mission
+    (mission mới có thể mở khóa).
+    """
+    CustomerMissionProgress = _CustomerMissionProgress()
+    CustomerMission = _CustomerMission()
+    if not CustomerMissionProgress or not CustomerMission:
+        raise RuntimeError("Mission models not initialized")
+
+    progress = CustomerMissionProgress.__table__
+    missions = CustomerMission.__table__
+    value = bindparam('value', type_=progress.c.current_value.type)
+    new_value = progress.c.current_value + value if increment else value
+    # Bỏ micro giây: cột DATETIME của MySQL không lưu, so sánh bằng bên dưới vẫn khớp
+    now = datetime.datetime.utcnow().replace(microsecond=0)
+    # is_completed đứng trước để MySQL (gán từ trái sang phải) vẫn so với giá trị mới tính từ giá trị cũ
+    statement = progress.update().where(
+        progress.c.customer_id == bindparam('owner_id'),
+        progress.c.requirement_key == bindparam('req_key'),
+        progress.c.is_completed == db.false(),
+        # Mission lặp lại đã hết hạn (chưa bị mission_sweeper đánh dấu) không được cộng tiếp
+        db.exists().where(
+            missions.c.customer_id == progress.c.customer_id,
+            missions.c.mission_id == progress.c.mission_id,
+            missions.c.status.in_(('available', 'in_progress')),
+            db.or_(missions.c.expires_at.is_(None), missions.c.expires_at > now)
+        )
+    ).ordered_values(
+        (progress.c.is_completed, new_value >= progress.c.required_value),
+        (progress.c.current_value, new_value),
+        (progress.c.updated_at, now)
+    )
+    db.session.execute(statement, [
+        {'owner_id': customer_id, 'req_key': requirement_key, 'value': amount}
+        for (customer_id, requirement_key), amount in values.items()
+    ])
+    customer_ids = {customer_id for customer_id, _ in values}
+    # Requirement vừa hoàn thành trong lần ghi này (một truy vấn cho cả batch)
+    completed = [customer_id for (customer_id,) in db.session.query(progress.c.customer_id).filter(
+        progress.c.customer_id.in_(customer_ids),
+        progress.c.is_completed == db.true(),
+        progress.c.updated_at == now
+    ).distinct()]
+    db.session.commit()
+    for customer_id in customer_ids:
+        invalidate_mission_snapshot(customer_id)
+    if completed:
+        mission_assigner.enqueue(completed)
+
+
+progress_engine = MissionProgressEngine()
+for _event_type in EVENT_INDEX:
+    domain_events.subscribe(_event_type, progress_engine.handle)
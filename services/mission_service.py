@@ -5,8 +5,21 @@ Mission progression service
 """
 
 import datetime
+import hashlib
+import json
 import uuid
-from models import db, Customer, CustomerMission, CustomerMissionProgress, TokenTransaction
+from sqlalchemy import false, null, select, true
+from sqlalchemy.exc import IntegrityError
+from models.database import db
+import models.missions as mission_models
+import models.transactions as tx_models
+from services.mission_assignment import (
+    mission_assigner, get_cached_snapshot, cache_snapshot, invalidate_mission_snapshot
+)
+from services.mission_progress import apply_progress
+from services import activity_bitmaps
+from services.mission_expiry import RECURRING_MISSIONS, recurring_rows
+from services.request_lookup import get_customer
 
 # Import mission systems
 try:
@@ -16,42 +29,187 @@ try:
 except ImportError:
     MISSION_SYSTEM_ENABLED = False
 
+SYNC_ATTEMPTS = 2
+
+# Nhóm mission của detailed mission system -> mission_category lưu trong database
+DETAILED_CATEGORY_MAPPING = {
+    'welcome': 'onboarding',
+    'daily': 'lifestyle',
+    'financial': 'financial',
+    'travel': 'travel',
+    'social': 'social'
+}
+
+
+def _CustomerMission():
+    return getattr(mission_models, 'CustomerMission', None)
+
+
+def _CustomerMissionProgress():
+    return getattr(mission_models, 'CustomerMissionProgress', None)
+
+
+def _CustomerMissionState():
+    return getattr(mission_models, 'CustomerMissionState', None)
+
+
+def _CustomerMissionArchive():
+    return getattr(mission_models, 'CustomerMissionArchive', None)
+
+
+def _TokenTransaction():
+    return getattr(tx_models, 'TokenTransaction', None)
+
 class MissionService:
     
     def __init__(self):
+        self._catalog_version = None
+        self._catalog_details = None
         if MISSION_SYSTEM_ENABLED:
             self.detailed_mission_system = DetailedMissionSystem()
         else:
             self.detailed_mission_system = None
     
     def get_missions_for_customer(self, customer_id):
-        """Lấy danh sách missions cho customer"""
+        """Lấy danh sách missions cho customer (chỉ đọc snapshot)"""
+        return self.get_mission_snapshot(customer_id).get('missions', [])
+
+    def get_mission_snapshot(self, customer_id):
+        """Snapshot mission của khách hàng kèm tiến độ: cache hoặc đúng một truy vấn, không ghi
+
+        Khách hàng chưa được gán mission thì được đưa vào hàng đợi gán nền và
+        nhận danh sách rỗng với assignment_pending = True. Mỗi mission giữ các
+        trường của catalog (description, requirements...) như trước, trạng thái
+        và tiến độ lấy từ database; tiến độ từng requirement nằm trong
+        requirement_progress.
+        """
         try:
-            if not MISSION_SYSTEM_ENABLED:
-                return self._get_default_missions(customer_id)
-            
-            # Lấy dữ liệu customer để đánh giá missions
-            customer_data = self._get_customer_data_for_missions(customer_id)
-            
-            # Lấy missions từ detailed mission system
-            if self.detailed_mission_system:
-                missions = self.detailed_mission_system.get_missions_for_customer(customer_data)
-                # Sync vào database
-                self._sync_detailed_missions_to_database(customer_id, missions)
-                return missions
-            else:
-                # Fallback to simple mission system
-                available_missions = get_missions_for_customer(customer_data)
-                self._sync_missions_to_database(customer_id, available_missions)
-                return available_missions
-                
+            cached = get_cached_snapshot(customer_id)
+            if cached is not None:
+                return cached
+
+            CustomerMission = _CustomerMission()
+            CustomerMissionProgress = _CustomerMissionProgress()
+            rows = db.session.query(
+                CustomerMission,
+                CustomerMissionProgress.requirement_key,
+                CustomerMissionProgress.current_value,
+                CustomerMissionProgress.required_value,
+                CustomerMissionProgress.is_completed
+            ).outerjoin(
+                CustomerMissionProgress,
+                db.and_(CustomerMissionProgress.customer_id == CustomerMission.customer_id,
+                        CustomerMissionProgress.mission_id == CustomerMission.mission_id)
+            ).filter(CustomerMission.customer_id == customer_id).order_by(CustomerMission.id).all()
+
+            if not rows:
+                mission_assigner.enqueue([customer_id])
+                return {'missions': [], 'assignment_pending': True}
+
+            catalog = self._get_catalog_details()
+            missions = {}
+            for mission, requirement_key, current_value, required_value, is_completed in rows:
+                entry = missions.get(mission.mission_id)
+                if entry is None:
+                    entry = missions[mission.mission_id] = {
+                        'mission_id': mission.mission_id,
+                        'title': mission.mission_title,
+                        'category': mission.mission_category,
+                        'level': mission.mission_level,
+                        'requirements': {},
+                        **catalog.get(mission.mission_id, {}),
+                        'status': mission.status,
+                        'svt_reward': float(mission.svt_reward or 0),
+                        'started_at': mission.started_at.isoformat() if mission.started_at else None,
+                        'completed_at': mission.completed_at.isoformat() if mission.completed_at else None,
+                        'period_key': mission.period_key,
+                        'expires_at': mission.expires_at.isoformat() if mission.expires_at else None,
+                        'requirement_progress': {}
+                    }
+                if requirement_key is not None:
+                    entry['requirement_progress'][requirement_key] = self._progress_entry(
+                        current_value, required_value, is_completed)
+
+            for entry in missions.values():
+                if not entry['requirements'] and entry['requirement_progress']:
+                    entry['requirements'] = {key: progress['required_value']
+                                             for key, progress in entry['requirement_progress'].items()}
+                requirements = entry['requirement_progress'].values()
+                if entry['status'] == 'completed' or not requirements:
+                    entry['progress_percentage'] = 100 if entry['status'] == 'completed' else 0
+                else:
+                    entry['progress_percentage'] = round(
+                        sum(r['progress_percentage'] for r in requirements) / len(requirements), 2)
+
+            snapshot = {'missions': list(missions.values()), 'assignment_pending': False}
+            cache_snapshot(customer_id, snapshot)
+            return snapshot
+
         except Exception as e:
             print(f" Error getting missions: {e}")
-            return []
+            return {'missions': [], 'assignment_pending': False}
+
+    def assign_missions(self, customer_id, catalog_version=None):
+        """Đánh giá catalog cho khách hàng và ghi mission còn thiếu (chạy trong worker nền)"""
+        CustomerMissionState = _CustomerMissionState()
+        customer_data = self._get_customer_data_for_missions(customer_id)
+        if not customer_data:
+            return None
+
+        # Mission lặp lại của kỳ hiện tại; các kỳ sau do mission_sweeper sinh theo lô
+        recurring = recurring_rows([customer_id])
+        if self.detailed_mission_system:
+            missions = self.detailed_mission_system.get_missions_for_customer(customer_data)
+            created = self._sync_detailed_missions_to_database(customer_id, missions, recurring)
+        elif MISSION_SYSTEM_ENABLED:
+            created = self._sync_missions_to_database(customer_id, get_missions_for_customer(customer_data), recurring)
+        else:
+            created = self._sync_missions_to_database(customer_id, self._get_default_missions(customer_id), recurring)
+        if created is None:
+            raise RuntimeError(f"Mission sync failed for customer {customer_id}")
+
+        db.session.merge(CustomerMissionState(
+            customer_id=customer_id,
+            catalog_version=catalog_version or self.get_catalog_version(),
+            assigned_at=datetime.datetime.utcnow()
+        ))
+        db.session.commit()
+        invalidate_mission_snapshot(customer_id)
+        return created
+
+    def _get_catalog_details(self):
+        """mission_id -> mission trong catalog (các trường hiển thị như description)"""
+        if self._catalog_details is None:
+            if self.detailed_mission_system:
+                missions = self.get_mission_templates()
+            else:
+                missions = self._get_default_missions(None) + RECURRING_MISSIONS
+            self._catalog_details = {mission['mission_id']: mission for mission in missions
+                                     if isinstance(mission, dict) and mission.get('mission_id')}
+        return self._catalog_details
+
+    def get_catalog_version(self):
+        """Phiên bản catalog mission (hash của mission templates)"""
+        if self._catalog_version is None:
+            templates = json.dumps(self.get_mission_templates(), sort_keys=True, default=str)
+            self._catalog_version = hashlib.sha1(templates.encode()).hexdigest()
+        return self._catalog_version
+
+    @staticmethod
+    def _progress_entry(current_value, required_value, is_completed):
+        current_value, required_value = float(current_value or 0), float(required_value or 0)
+        return {
+            'current_value': current_value,
+            'required_value': required_value,
+            'is_completed': bool(is_completed),
+            'progress_percentage': 100 if is_completed or required_value <= 0
+            else round(min(100, current_value / required_value * 100), 2)
+        }
     
     def start_mission(self, customer_id, mission_id):
         """Bắt đầu một mission"""
         try:
+            CustomerMission = _CustomerMission()
             # Kiểm tra mission có tồn tại không
             mission = CustomerMission.query.filter_by(
                 customer_id=customer_id,
@@ -63,12 +221,16 @@ class MissionService:
             
             if mission.status != 'available':
                 return {'success': False, 'error': 'Mission not available'}
+
+            if mission.expires_at and mission.expires_at <= datetime.datetime.utcnow():
+                return {'success': False, 'error': 'Mission expired'}
             
             # Cập nhật status và thời gian bắt đầu
             mission.status = 'in_progress'
             mission.started_at = datetime.datetime.utcnow()
             
             db.session.commit()
+            invalidate_mission_snapshot(customer_id)
             
             return {
                 'success': True,
@@ -85,6 +247,8 @@ class MissionService:
     def complete_mission(self, customer_id, mission_id):
         """Hoàn thành mission và nhận thưởng"""
         try:
+            CustomerMission = _CustomerMission()
+            TokenTransaction = _TokenTransaction()
             # Kiểm tra mission
             mission = CustomerMission.query.filter_by(
                 customer_id=customer_id,
@@ -96,6 +260,9 @@ class MissionService:
             
             if mission.status != 'in_progress':
                 return {'success': False, 'error': 'Mission not in progress'}
+
+            if mission.expires_at and mission.expires_at <= datetime.datetime.utcnow():
+                return {'success': False, 'error': 'Mission expired'}
             
             # Kiểm tra điều kiện hoàn thành
             if not self._check_mission_completion(customer_id, mission_id):
@@ -119,6 +286,9 @@ class MissionService:
                 db.session.add(reward_tx)
             
             db.session.commit()
+            invalidate_mission_snapshot(customer_id)
+            # Hoàn thành mission có thể mở khóa mission mới: gán lại trong worker nền
+            mission_assigner.enqueue([customer_id])
             
             return {
                 'success': True,
@@ -135,7 +305,7 @@ class MissionService:
     def get_mission_progress(self, customer_id, mission_id):
         """Lấy tiến độ mission"""
         try:
-            progress_records = CustomerMissionProgress.query.filter_by(
+            progress_records = _CustomerMissionProgress().query.filter_by(
                 customer_id=customer_id,
                 mission_id=mission_id
             ).all()
@@ -163,8 +333,11 @@ class MissionService:
                        COUNT(cm.id) as completed_missions,
                        COALESCE(SUM(cm.svt_reward), 0) as total_svt_earned
                 FROM customers c
-                LEFT JOIN customer_missions cm ON c.customer_id = cm.customer_id 
-                    AND cm.status = 'completed'
+                LEFT JOIN (
+                    SELECT id, customer_id, svt_reward FROM customer_missions WHERE status = 'completed'
+                    UNION ALL
+                    SELECT id, customer_id, svt_reward FROM customer_missions_archive WHERE status = 'completed'
+                ) cm ON c.customer_id = cm.customer_id
                 GROUP BY c.customer_id, c.name
                 ORDER BY completed_missions DESC, total_svt_earned DESC
                 LIMIT 10
@@ -188,24 +361,22 @@ class MissionService:
             return []
     
     def update_customer_stats(self, customer_id, stats_data):
-        """Cập nhật customer stats và kiểm tra mission progress"""
+        """Gán customer stats vào mission progress (một executemany UPDATE, không đọc trước)
+
+        Tiến độ thường ngày được cộng tự động từ domain event (services/mission_progress.py);
+        API này dùng để đặt lại giá trị tuyệt đối.
+        """
         try:
-            # Cập nhật hoặc tạo customer stats
+            if not isinstance(stats_data, dict) or not stats_data:
+                return {'success': False, 'error': 'Stats data required'}
+            values = {}
             for stat_key, stat_value in stats_data.items():
-                # Cập nhật vào bảng customer_stats (nếu có)
-                # Hoặc cập nhật mission progress
-                progress_records = CustomerMissionProgress.query.filter_by(
-                    customer_id=customer_id,
-                    requirement_key=stat_key
-                ).all()
-                
-                for progress in progress_records:
-                    progress.current_value = stat_value
-                    if float(stat_value) >= float(progress.required_value):
-                        progress.is_completed = True
-                    progress.updated_at = datetime.datetime.utcnow()
-            
-            db.session.commit()
+                try:
+                    values[(customer_id, stat_key)] = float(stat_value)
+                except (TypeError, ValueError):
+                    return {'success': False, 'error': f'Invalid value for {stat_key}'}
+
+            apply_progress(values)
             
             return {
                 'success': True,
@@ -217,13 +388,53 @@ class MissionService:
             print(f"Error updating customer stats: {e}")
             return {'success': False, 'error': str(e)}
     
+    def get_activity_summary(self, customer_id, activity_type):
+        """Chuỗi ngày hoạt động / số ngày hoạt động gần đây (đọc từ activity bitmap)"""
+        if activity_type not in activity_bitmaps.ACTIVITY_TYPES:
+            return {'success': False, 'error': f'Invalid activity type: {activity_type}'}
+        try:
+            summary = activity_bitmaps.customer_activity_summary(customer_id, activity_type)
+            return {'success': True, 'customer_id': customer_id, **summary}
+        except Exception as e:
+            print(f" Error getting activity summary: {e}")
+            return {'success': False, 'error': str(e)}
+
+    def get_activity_retention(self, activity_type, end_date, weeks=8):
+        """Retention theo cohort tuần của toàn bộ khách hàng, kết thúc tại end_date"""
+        if activity_type not in activity_bitmaps.ACTIVITY_TYPES:
+            return {'success': False, 'error': f'Invalid activity type: {activity_type}'}
+        try:
+            weeks = max(1, min(int(weeks), 52))
+            _, matrix = activity_bitmaps.load_window(activity_type, end_date, weeks * 7)
+            sizes, rates = activity_bitmaps.cohort_retention(matrix, period_days=7)
+            start_date = end_date - datetime.timedelta(days=weeks * 7 - 1)
+            cohorts = [{
+                'week_start': (start_date + datetime.timedelta(weeks=week)).isoformat(),
+                'customers': int(sizes[week]),
+                'retention': [round(float(rate), 4) for rate in rates[week] if rate == rate]
+            } for week in range(weeks)]
+            streaks = activity_bitmaps.current_streaks(matrix)
+            return {
+                'success': True,
+                'activity_type': activity_type,
+                'end_date': end_date.isoformat(),
+                'active_customers': int(matrix.any(axis=1).sum()),
+                'active_today': int(matrix[:, -1].sum()),
+                'streak_7_plus': int((streaks >= 7).sum()),
+                'cohorts': cohorts
+            }
+        except Exception as e:
+            print(f" Error getting activity retention: {e}")
+            return {'success': False, 'error': str(e)}
+
     def get_mission_templates(self):
         """Lấy mission templates cho admin"""
         try:
             if self.detailed_mission_system:
-                return self.detailed_mission_system.get_mission_templates()
+                templates = self.detailed_mission_system.get_mission_templates()
             else:
-                return self._get_default_mission_templates()
+                templates = self._get_default_mission_templates()
+            return templates + RECURRING_MISSIONS if isinstance(templates, list) else templates
         except Exception as e:
             print(f" Error getting mission templates: {e}")
             return []
@@ -231,12 +442,12 @@ class MissionService:
     def _get_customer_data_for_missions(self, customer_id):
         """Lấy dữ liệu customer cho mission evaluation"""
         try:
-            customer = Customer.query.filter_by(customer_id=customer_id).first()
+            customer = get_customer(customer_id)
             if not customer:
                 return {}
             
             # Đếm số giao dịch
-            transaction_count = TokenTransaction.query.filter_by(customer_id=customer_id).count()
+            transaction_count = _TokenTransaction().query.filter_by(customer_id=customer_id).count()
             
             # Tính profile completeness
             profile_fields = ['name', 'age', 'gender', 'job', 'city', 'persona_type']
@@ -260,102 +471,123 @@ class MissionService:
             print(f" Error getting customer data: {e}")
             return {}
     
-    def _sync_missions_to_database(self, customer_id, missions):
-        """Đồng bộ missions vào database"""
-        try:
-            for mission in missions:
-                existing = CustomerMission.query.filter_by(
-                    customer_id=customer_id,
-                    mission_id=mission['mission_id']
-                ).first()
-                
-                if not existing:
-                    customer_mission = CustomerMission(
-                        customer_id=customer_id,
-                        mission_id=mission['mission_id'],
-                        mission_title=mission['title'],
-                        mission_category=mission.get('category', 'general'),
-                        mission_level=mission.get('level', 'beginner'),
-                        svt_reward=mission.get('svt_reward', 100),
-                        status='available'
-                    )
-                    db.session.add(customer_mission)
-            
-            db.session.commit()
-        except Exception as e:
-            print(f" Error syncing missions: {e}")
-            db.session.rollback()
+    def _sync_missions_to_database(self, customer_id, missions, recurring=((), ())):
+        """Đồng bộ missions (kèm các dòng mission lặp lại `recurring`) vào database"""
+        return self._bulk_sync_missions(customer_id, [{
+            'customer_id': customer_id,
+            'mission_id': mission['mission_id'],
+            'mission_title': mission['title'],
+            'mission_category': mission.get('category', 'general'),
+            'mission_level': mission.get('level', 'beginner'),
+            'svt_reward': mission.get('svt_reward', 100),
+            'status': 'available',
+            'progress_data': None,
+            'period_key': None,
+            'expires_at': None
+        } for mission in missions] + list(recurring[0]), list(recurring[1]))
     
-    def _sync_detailed_missions_to_database(self, customer_id, missions):
-        """Đồng bộ detailed missions vào database"""
-        try:
-            category_mapping = {
-                'welcome': 'onboarding',
-                'daily': 'lifestyle',
-                'financial': 'financial',
-                'travel': 'travel',
-                'social': 'social'
-            }
-            
-            for mission in missions:
-                existing = CustomerMission.query.filter_by(
-                    customer_id=customer_id,
-                    mission_id=mission['mission_id']
-                ).first()
-                
-                if not existing:
-                    customer_mission = CustomerMission(
-                        customer_id=customer_id,
-                        mission_id=mission['mission_id'],
-                        mission_title=mission['title'],
-                        mission_category=category_mapping.get(mission.get('category', 'general'), 'general'),
-                        mission_level=mission.get('level', 'Beginner'),
-                        svt_reward=mission.get('svt_reward', 100),
-                        status='available',
-                        progress_data=mission.get('requirements', {})
-                    )
-                    db.session.add(customer_mission)
-                    
-                    # Tạo progress tracking
-                    self._create_mission_progress_tracking(customer_id, mission['mission_id'], mission)
-            
-            db.session.commit()
-        except Exception as e:
-            print(f" Error syncing detailed missions: {e}")
-            db.session.rollback()
+    def _sync_detailed_missions_to_database(self, customer_id, missions, recurring=((), ())):
+        """Đồng bộ detailed missions (kèm progress tracking từng requirement) vào database"""
+        mission_rows, progress_rows = list(recurring[0]), list(recurring[1])
+        for mission in missions:
+            requirements = mission.get('requirements', {}) or {}
+            mission_rows.append({
+                'customer_id': customer_id,
+                'mission_id': mission['mission_id'],
+                'mission_title': mission['title'],
+                'mission_category': DETAILED_CATEGORY_MAPPING.get(mission.get('category', 'general'), 'general'),
+                'mission_level': mission.get('level', 'Beginner'),
+                'svt_reward': mission.get('svt_reward', 100),
+                'status': 'available',
+                'progress_data': requirements,
+                'period_key': None,
+                'expires_at': None
+            })
+            progress_rows.extend({
+                'customer_id': customer_id,
+                'mission_id': mission['mission_id'],
+                'requirement_key': req_key,
+                'current_value': 0,
+                'required_value': req_value,
+                'is_completed': False
+            } for req_key, req_value in requirements.items())
+        return self._bulk_sync_missions(customer_id, mission_rows, progress_rows)
     
-    def _create_mission_progress_tracking(self, customer_id, mission_id, mission_data):
-        """Tạo progress tracking cho mission"""
-        try:
-            requirements = mission_data.get('requirements', {})
-            
-            for req_key, req_value in requirements.items():
-                existing_progress = CustomerMissionProgress.query.filter_by(
-                    customer_id=customer_id,
-                    mission_id=mission_id,
-                    requirement_key=req_key
-                ).first()
-                
-                if not existing_progress:
-                    progress = CustomerMissionProgress(
-                        customer_id=customer_id,
-                        mission_id=mission_id,
-                        requirement_key=req_key,
-                        current_value=0,
-                        required_value=req_value,
-                        is_completed=False
-                    )
-                    db.session.add(progress)
-            
-            db.session.commit()
-        except Exception as e:
-            print(f" Error creating progress tracking: {e}")
-            db.session.rollback()
+    def _bulk_sync_missions(self, customer_id, mission_rows, progress_rows):
+        """Ghi các mission / requirement còn thiếu của khách hàng
+
+        Một truy vấn lấy tập (mission_id, requirement_key) đã có, tính phần
+        thiếu trong bộ nhớ, bulk insert và commit một lần. Khi không thiếu gì
+        (trường hợp thường gặp khi tải trang mission) chỉ tốn đúng một truy vấn.
+        Request khác đồng bộ cùng lúc làm unique key báo trùng: đọc lại và chỉ
+        ghi phần còn thiếu. Trả về số dòng đã ghi, hoặc None nếu đồng bộ lỗi.
+        """
+        CustomerMission = _CustomerMission()
+        CustomerMissionProgress = _CustomerMissionProgress()
+        if not CustomerMission or not CustomerMissionProgress or not (mission_rows or progress_rows):
+            return 0
+
+        # Catalog có thể lặp mission_id / requirement: giữ bản đầu tiên
+        unique_missions, unique_progress = {}, {}
+        for row in mission_rows:
+            unique_missions.setdefault(row['mission_id'], row)
+        for row in progress_rows:
+            unique_progress.setdefault((row['mission_id'], row['requirement_key']), row)
+
+        # Mission đã lưu trữ (customer_missions_archive) cũng tính là đã có để không bị gán lại
+        CustomerMissionArchive = _CustomerMissionArchive()
+        existing_query = select(
+            CustomerMission.mission_id, null().label('requirement_key'), false().label('archived')
+        ).where(
+            CustomerMission.customer_id == customer_id
+        ).union_all(
+            select(CustomerMissionArchive.mission_id, null(), true()).where(
+                CustomerMissionArchive.customer_id == customer_id
+            ),
+            select(CustomerMissionProgress.mission_id, CustomerMissionProgress.requirement_key, false()).where(
+                CustomerMissionProgress.customer_id == customer_id
+            )
+        )
+
+        for attempt in range(SYNC_ATTEMPTS):
+            try:
+                existing_missions, archived_missions, existing_requirements = set(), set(), set()
+                for mission_id, requirement_key, archived in db.session.execute(existing_query):
+                    if archived:
+                        archived_missions.add(mission_id)
+                    elif requirement_key is None:
+                        existing_missions.add(mission_id)
+                    else:
+                        existing_requirements.add((mission_id, requirement_key))
+
+                new_missions = [row for mission_id, row in unique_missions.items()
+                                if mission_id not in existing_missions and mission_id not in archived_missions]
+                new_progress = [row for key, row in unique_progress.items()
+                                if key not in existing_requirements and key[0] not in archived_missions]
+                if not new_missions and not new_progress:
+                    return 0
+
+                if new_missions:
+                    db.session.execute(CustomerMission.__table__.insert(), new_missions)
+                if new_progress:
+                    db.session.execute(CustomerMissionProgress.__table__.insert(), new_progress)
+                db.session.commit()
+                return len(new_missions) + len(new_progress)
+
+            except IntegrityError:
+                db.session.rollback()
+                if attempt == SYNC_ATTEMPTS - 1:
+                    print(f"❌ Mission sync conflict for customer {customer_id}")
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Error syncing missions for customer {customer_id}: {e}")
+                return None
+        return None
     
     def _check_mission_completion(self, customer_id, mission_id):
         """Kiểm tra xem mission đã hoàn thành chưa"""
         try:
-            progress_records = CustomerMissionProgress.query.filter_by(
+            progress_records = _CustomerMissionProgress().query.filter_by(
                 customer_id=customer_id,
                 mission_id=mission_id
             ).all()
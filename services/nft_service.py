@@ -5,7 +5,8 @@ NFT and blockchain service
 """
 
 import datetime
-from models import db, Customer, Achievement, CustomerAchievement
+from models import db, Achievement, CustomerAchievement
+from services.request_lookup import get_customer
 
 # Import blockchain integration
 try:
@@ -24,7 +25,7 @@ class NFTService:
     def get_nft_passport(self, customer_id):
         """Lấy thông tin NFT passport của customer"""
         try:
-            customer = Customer.query.filter_by(customer_id=customer_id).first()
+            customer = get_customer(customer_id)
             if not customer:
                 return {'success': False, 'error': 'Customer not found'}
             
@@ -110,7 +111,7 @@ class NFTService:
             
             if result.get('success'):
                 # Cập nhật database
-                customer = Customer.query.filter_by(customer_id=customer_id).first()
+                customer = get_customer(customer_id)
                 if customer:
                     customer.nft_token_id = token_id
                     customer.updated_at = datetime.datetime.utcnow()
@@ -136,7 +137,7 @@ class NFTService:
     def mint_nft_passport(self, customer_id):
         """Mint NFT passport mới cho customer"""
         try:
-            customer = Customer.query.filter_by(customer_id=customer_id).first()
+            customer = get_customer(customer_id)
             if not customer:
                 return {'success': False, 'error': 'Customer not found'}
             
@@ -192,7 +193,7 @@ class NFTService:
             if achievements:
                 highest_rank = get_highest_rank_from_achievements(achievements)
                 
-                customer = Customer.query.filter_by(customer_id=customer_id).first()
+                customer = get_customer(customer_id)
                 if customer and customer.nft_token_id:
                     self.update_nft_on_blockchain(
                         customer.nft_token_id,
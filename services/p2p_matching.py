@@ -0,0 +1,360 @@
+# services/p2p_matching.py
+# -*- coding: utf-8 -*-
+"""
+P2P order book and price-time priority matching engine
+
+Mỗi loại vật phẩm (tên vật phẩm đã chuẩn hóa) là một market với sổ lệnh riêng:
+lệnh mua (P2POrder) trong max-heap theo giá, tin đăng bán (P2PListing, mỗi tin
+một đơn vị) trong min-heap theo giá; cùng giá thì lệnh vào trước khớp trước.
+Lệnh mới khớp tăng dần với phía đối diện ở giá của lệnh đang chờ (maker), phần
+còn lại nằm trên sổ. Lệnh hủy / đã khớp hết được xóa lười khỏi heap.
+
+Mỗi market có một luồng duy nhất được ghi vào sổ lệnh (single-writer event
+loop): request gửi lệnh qua hàng đợi và chờ kết quả. Luồng này xử lý liên tiếp
+tối đa SETTLE_BATCH lệnh rồi ghi tất cả giao dịch khớp của batch trong một
+transaction (cập nhật P2PListing, P2POrder và chuyển SVT cho người bán / hoàn
+phần ký quỹ thừa cho người mua).
+
+Tiền mua được ký quỹ (p2p_escrow) khi đặt lệnh mua nên khớp lệnh không cần
+kiểm tra số dư. Market phải chạy trong một process duy nhất; khi ghi database
+lỗi, sổ lệnh được nạp lại từ database.
+"""
+
+import datetime
+import heapq
+import itertools
+import queue
+import random
+import threading
+import uuid
+from collections import namedtuple
+from concurrent.futures import Future
+
+from sqlalchemy import bindparam
+
+from models.database import db
+from models.marketplace import P2PListing, P2POrder
+import models.transactions as tx_models
+
+SETTLE_BATCH = 500
+POLL_SECONDS = 0.5
+
+Trade = namedtuple('Trade', 'buy sell price quantity')
+
+
+def _TokenTransaction():
+    return getattr(tx_models, 'TokenTransaction', None)
+
+
+def market_key(item_name):
+    """Tên market của một vật phẩm: bỏ khoảng trắng thừa, chữ thường"""
+    return (item_name or '').strip().lower()
+
+
+class Order:
+    """Lệnh trên sổ lệnh; `ref` là khóa chính P2POrder (mua) hoặc P2PListing (bán)"""
+    __slots__ = ('order_id', 'side', 'price', 'quantity', 'remaining', 'seq', 'owner', 'ref')
+
+    def __init__(self, order_id, side, price, quantity=1, owner=None, ref=None):
+        self.order_id = order_id
+        self.side = side
+        self.price = price
+        self.quantity = quantity
+        self.remaining = quantity
+        self.seq = None
+        self.owner = owner
+        self.ref = ref
+
+
+class OrderBook:
+    """Sổ lệnh hai phía với ưu tiên giá rồi thời gian (không thread-safe, chỉ một luồng ghi)"""
+
+    def __init__(self):
+        self._bids = []     # (-giá, seq, order)
+        self._asks = []     # (giá, seq, order)
+        self._live = {}     # order_id -> order còn trên sổ
+        self._seq = itertools.count()
+
+    def submit(self, order):
+        """Khớp lệnh mới với phía đối diện, phần còn lại nằm trên sổ. Trả về danh sách Trade"""
+        order.seq = next(self._seq)
+        trades = self._match(order)
+        if order.remaining:
+            self._live[order.order_id] = order
+            if order.side == 'buy':
+                heapq.heappush(self._bids, (-order.price, order.seq, order))
+            else:
+                heapq.heappush(self._asks, (order.price, order.seq, order))
+        return trades
+
+    def cancel(self, order_id):
+        """Gỡ lệnh khỏi sổ (xóa lười khỏi heap). Trả về lệnh hoặc None"""
+        return self._live.pop(order_id, None)
+
+    def _top(self, heap):
+        while heap and heap[0][2].order_id not in self._live:
+            heapq.heappop(heap)
+        return heap[0][2] if heap else None
+
+    def _match(self, taker):
+        buying = taker.side == 'buy'
+        book = self._asks if buying else self._bids
+        trades = []
+        skipped = []
+        while taker.remaining:
+            maker = self._top(book)
+            if maker is None or (maker.price > taker.price if buying else maker.price < taker.price):
+                break
+            if maker.owner is not None and maker.owner == taker.owner:
+                # Không tự khớp với lệnh của chính mình
+                skipped.append(heapq.heappop(book))
+                continue
+            quantity = min(taker.remaining, maker.remaining)
+            taker.remaining -= quantity
+            maker.remaining -= quantity
+            trades.append(Trade(taker if buying else maker, maker if buying else taker, maker.price, quantity))
+            if not maker.remaining:
+                heapq.heappop(book)
+                del self._live[maker.order_id]
+        for entry in skipped:
+            heapq.heappush(book, entry)
+        return trades
+
+    def best_bid(self):
+        order = self._top(self._bids)
+        return order.price if order else None
+
+    def best_ask(self):
+        order = self._top(self._asks)
+        return order.price if order else None
+
+    def depth(self, levels=10):
+        """Tổng khối lượng theo mức giá của mỗi phía (tối đa `levels` mức)"""
+        def aggregate(side, reverse):
+            totals = {}
+            for order in self._live.values():
+                if order.side == side:
+                    totals[order.price] = totals.get(order.price, 0) + order.remaining
+            return [{'price': price, 'quantity': quantity}
+                    for price, quantity in sorted(totals.items(), reverse=reverse)[:levels]]
+        return {'bids': aggregate('buy', True), 'asks': aggregate('sell', False)}
+
+    def __len__(self):
+        return len(self._live)
+
+
+class Market:
+    """Một market P2P: sổ lệnh + luồng ghi duy nhất + ghi database theo batch"""
+
+    def __init__(self, app, name, settle_batch=SETTLE_BATCH):
+        self.app = app
+        self.name = name
+        self.settle_batch = settle_batch
+        self.book = OrderBook()
+        self._loaded = {}   # order_id -> lệnh nạp từ database, chưa nhận lệnh submit tương ứng
+        self.stats = {'orders': 0, 'trades': 0, 'batches': 0}
+        self._commands = queue.Queue()
+        self._ready = threading.Event()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f'p2p-market-{name}', daemon=True)
+        self._thread.start()
+
+    def submit(self, kind, payload):
+        """Gửi lệnh ('buy' | 'sell' | 'cancel') cho luồng market. Trả về Future"""
+        future = Future()
+        self._commands.put((kind, payload, future))
+        return future
+
+    def snapshot(self, levels=10):
+        """Độ sâu sổ lệnh (đọc từ luồng khác, chỉ mang tính tham khảo)"""
+        self._ready.wait(5)
+        return self.submit('depth', levels).result(5)
+
+    def stop(self, timeout=10):
+        self._running = False
+        self._thread.join(timeout)
+
+    # ------------------------------------------------------------- event loop
+
+    def _run(self):
+        with self.app.app_context():
+            self._reload()
+            self._ready.set()
+            while self._running or not self._commands.empty():
+                try:
+                    batch = [self._commands.get(timeout=POLL_SECONDS)]
+                except queue.Empty:
+                    continue
+                while len(batch) < self.settle_batch:
+                    try:
+                        batch.append(self._commands.get_nowait())
+                    except queue.Empty:
+                        break
+                self._process(batch)
+
+    def _process(self, batch):
+        trades, cancelled, results = [], [], []
+        for kind, payload, future in batch:
+            if kind == 'depth':
+                results.append((future, self.book.depth(payload)))
+            elif kind == 'cancel':
+                order = self.book.cancel(payload)
+                if order is not None:
+                    cancelled.append(order)
+                results.append((future, order))
+            elif payload.order_id in self._loaded:
+                # Lệnh đã commit trước khi submit nên _reload() đã nạp (và có thể đã khớp) nó: không khớp lần hai
+                loaded = self._loaded.pop(payload.order_id)
+                results.append((future, {
+                    'order_id': payload.order_id,
+                    'filled': loaded.quantity - loaded.remaining,
+                    'remaining': loaded.remaining,
+                    'trades': []
+                }))
+            else:
+                self.stats['orders'] += 1
+                order_trades = self.book.submit(payload)
+                trades.extend(order_trades)
+                results.append((future, {
+                    'order_id': payload.order_id,
+                    'filled': payload.quantity - payload.remaining,
+                    'remaining': payload.remaining,
+                    'trades': [{'price': t.price, 'quantity': t.quantity} for t in order_trades]
+                }))
+
+        try:
+            if trades or cancelled:
+                self._settle(trades, cancelled)
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ P2P settlement failed for market {self.name}: {e}")
+            # Lệnh đã lưu trong database: sổ lệnh nạp lại sẽ khớp lại, request báo "đang chờ"
+            for future, _ in results:
+                future.set_result({'success': False, 'error': 'Settlement failed', 'pending': True})
+            self._reload()
+            return
+        finally:
+            db.session.remove()
+        for future, result in results:
+            future.set_result(result)
+
+    def _settle(self, trades, cancelled):
+        """Ghi các giao dịch khớp và lệnh hủy của một batch trong một transaction"""
+        TTx = _TokenTransaction()
+        if not TTx:
+            raise RuntimeError("TokenTransaction model not initialized")
+        now = datetime.datetime.utcnow()
+        transfers = []
+        sold = []
+        buy_orders = {}
+
+        def transfer(customer_id, kind, amount, description):
+            transfers.append({
+                'customer_id': customer_id, 'transaction_type': kind, 'amount': round(amount, 2),
+                'description': description, 'tx_hash': f"0x{uuid.uuid4().hex}",
+                'block_number': random.randint(1000000, 2000000), 'created_at': now
+            })
+
+        for trade in trades:
+            sold.append({'listing_pk': trade.sell.ref, 'buyer_id': trade.buy.owner, 'sold_at': now})
+            buy_orders[trade.buy.ref] = trade.buy
+            transfer(trade.sell.owner, 'p2p_sale', trade.price * trade.quantity,
+                     f"Bán P2P {self.name} cho lệnh {trade.buy.order_id}")
+            refund = (trade.buy.price - trade.price) * trade.quantity
+            if refund > 0:
+                transfer(trade.buy.owner, 'p2p_escrow_refund', refund,
+                         f"Hoàn chênh lệch giá lệnh {trade.buy.order_id}")
+        for order in cancelled:
+            buy_orders[order.ref] = order
+            transfer(order.owner, 'p2p_escrow_refund', order.price * order.remaining,
+                     f"Hoàn ký quỹ lệnh hủy {order.order_id}")
+
+        if sold:
+            listings = P2PListing.__table__
+            updated = db.session.execute(
+                listings.update()
+                .where(listings.c.id == bindparam('listing_pk'), listings.c.status == 'active')
+                .values(status='sold', buyer_customer_id=bindparam('buyer_id'), sold_at=bindparam('sold_at')),
+                sold
+            ).rowcount
+            if updated != len(sold):
+                raise RuntimeError(f"{len(sold) - updated} listing không còn active")
+        if buy_orders:
+            orders = P2POrder.__table__
+            cancelled_refs = {order.ref for order in cancelled}
+            db.session.execute(
+                orders.update()
+                .where(orders.c.id == bindparam('order_pk'))
+                .values(filled_quantity=bindparam('filled'), status=bindparam('new_status'), updated_at=now),
+                [{
+                    'order_pk': ref,
+                    'filled': order.quantity - order.remaining,
+                    'new_status': 'cancelled' if ref in cancelled_refs else ('open' if order.remaining else 'filled')
+                } for ref, order in buy_orders.items()]
+            )
+        if transfers:
+            db.session.execute(TTx.__table__.insert(), transfers)
+        db.session.commit()
+        self.stats['trades'] += len(trades)
+        self.stats['batches'] += 1
+
+    def _reload(self):
+        """Dựng lại sổ lệnh từ database (lệnh mua open + tin đăng active) theo thứ tự thời gian"""
+        self.book = OrderBook()
+        self._loaded = {}
+        try:
+            bids = P2POrder.query.filter(P2POrder.market == self.name, P2POrder.status == 'open').all()
+            asks = P2PListing.query.filter(P2PListing.status == 'active',
+                                           db.func.lower(db.func.trim(P2PListing.item_name)) == self.name).all()
+            pending = [(o.created_at, 0, o.id, Order(o.order_id, 'buy', float(o.price_svt), o.quantity,
+                                                     owner=o.customer_id, ref=o.id)) for o in bids]
+            pending += [(l.created_at, 1, l.id, Order(f"L{l.id}", 'sell', float(l.price_svt), 1,
+                                                      owner=l.seller_customer_id, ref=l.id)) for l in asks]
+            filled = {o.id: o.filled_quantity for o in bids}
+            trades = []
+            self._loaded = {order.order_id: order for _, _, _, order in pending}
+            for _, _, _, order in sorted(pending, key=lambda entry: entry[:3]):
+                if order.side == 'buy':
+                    order.remaining -= filled[order.ref]
+                    if order.remaining <= 0:
+                        continue
+                trades.extend(self.book.submit(order))
+            if trades:
+                # Lệnh giao nhau còn sót (ví dụ sau lỗi ghi database): khớp ngay khi nạp
+                self._settle(trades, [])
+        except Exception as e:
+            db.session.rollback()
+            # Bỏ các khớp lệnh chưa ghi được: sổ lệnh không được lệch khỏi database
+            self.book = OrderBook()
+            self._loaded = {}
+            print(f"❌ Error loading P2P market {self.name}: {e}")
+        finally:
+            db.session.remove()
+
+
+class P2PExchange:
+    """Các market P2P của process, tạo khi có lệnh đầu tiên"""
+
+    def __init__(self):
+        self._markets = {}
+        self._lock = threading.Lock()
+
+    def market(self, app, item_name):
+        name = market_key(item_name)
+        with self._lock:
+            market = self._markets.get(name)
+            if market is None:
+                market = self._markets[name] = Market(app, name)
+            return market
+
+    def get(self, item_name):
+        return self._markets.get(market_key(item_name))
+
+    def stop_all(self):
+        with self._lock:
+            markets, self._markets = list(self._markets.values()), {}
+        for market in markets:
+            market.stop()
+
+
+exchange = P2PExchange()
@@ -0,0 +1,24 @@
+# services/pagination.py
+# -*- coding: utf-8 -*-
+"""
+Opaque keyset-pagination cursors shared by history endpoints
+"""
+
+import base64
+import datetime
+
+
+def encode_cursor(sort_value, row_id):
+    """Cursor mờ cho trang kế tiếp: vị trí (giá trị sắp xếp kiểu datetime, id) của dòng cuối"""
+    raw = f"{sort_value.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Cursor -> (datetime, id); ValueError('cursor') nếu cursor không hợp lệ"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        date_part, id_part = raw.split('|', 1)
+        return datetime.datetime.fromisoformat(date_part), int(id_part)
+    except Exception:
+        raise ValueError('cursor')
@@ -0,0 +1,103 @@
+# services/request_lookup.py
+# -*- coding: utf-8 -*-
+"""
+Request-scoped identity map for Customer / active HDBank card / balance lookups
+
+Trong một request, mỗi thực thể chỉ được truy vấn tối đa một lần; các lần
+tra cứu sau lấy từ flask.g. Ngoài request context (script, worker) các hàm
+truy vấn trực tiếp và không cache.
+"""
+
+from flask import g, has_request_context
+
+from models.database import db
+from models.customer import Customer
+import models.transactions as tx_models
+import models.hdbank_card as card_models
+
+_MISSING = object()
+
+
+def _store():
+    """Trả về dict cache của request hiện tại (hoặc None nếu không có request)"""
+    if not has_request_context():
+        return None
+    store = getattr(g, '_lookup_cache', None)
+    if store is None:
+        store = g._lookup_cache = {}
+        g._lookup_stats = {'queries': 0, 'saved': 0}
+    return store
+
+
+def _key(kind, customer_id):
+    try:
+        return kind, int(customer_id)
+    except (TypeError, ValueError):
+        return kind, customer_id
+
+
+def _lookup(kind, customer_id, loader):
+    store = _store()
+    if store is None:
+        return loader()
+    key = _key(kind, customer_id)
+    value = store.get(key, _MISSING)
+    if value is not _MISSING:
+        g._lookup_stats['saved'] += 1
+        return value
+    value = loader()
+    g._lookup_stats['queries'] += 1
+    store[key] = value
+    return value
+
+
+def get_customer(customer_id):
+    """Customer theo customer_id nghiệp vụ (None nếu không tồn tại)"""
+    return _lookup('customer', customer_id,
+                   lambda: Customer.query.filter_by(customer_id=customer_id).first())
+
+
+def get_active_card(customer_id):
+    """Thẻ HDBank active đầu tiên của khách hàng (None nếu chưa có)"""
+    Card = getattr(card_models, 'HDBankCard', None)
+    if Card is None:
+        return None
+    return _lookup('card', customer_id,
+                   lambda: Card.query.filter_by(customer_id=customer_id, status='active')
+                   .order_by(Card.id).first())
+
+
+def get_balance(customer_id):
+    """Số dư hiện tại = balance của giao dịch HDBank mới nhất"""
+    HTx = getattr(tx_models, 'HDBankTransaction', None)
+    if HTx is None:
+        return 0
+
+    def load():
+        balance = db.session.query(HTx.balance).filter(HTx.customer_id == customer_id) \
+            .order_by(HTx.transaction_date.desc(), HTx.id.desc()).limit(1).scalar()
+        return float(balance) if balance is not None else 0
+
+    return _lookup('balance', customer_id, load)
+
+
+def set_balance(customer_id, balance):
+    """Cập nhật số dư đã biết sau khi request ghi giao dịch mới"""
+    store = _store()
+    if store is not None:
+        store[_key('balance', customer_id)] = float(balance)
+
+
+def forget(customer_id):
+    """Bỏ mọi entry của khách hàng (sau khi mở thẻ, rollback...)"""
+    store = _store()
+    if store is not None:
+        for kind in ('customer', 'card', 'balance'):
+            store.pop(_key(kind, customer_id), None)
+
+
+def get_lookup_stats():
+    """Số truy vấn đã chạy / đã tiết kiệm trong request hiện tại"""
+    if not has_request_context():
+        return {'queries': 0, 'saved': 0}
+    return dict(getattr(g, '_lookup_stats', {'queries': 0, 'saved': 0}))
@@ -7,10 +7,19 @@ Resort booking service
 import datetime
 import uuid
 import random
+from sqlalchemy.exc import IntegrityError
 from models.database import db
 from models.customer import Customer
-from models.resorts import ResortBooking
+from models.resorts import ResortBooking, ResortRoomNight, SpaSlotClaim, ROOM_TYPES, DEFAULT_RESORT_NAME
 import models.transactions as tx_models
+from services import domain_events
+from services.id_generator import new_id
+from services.room_availability import get_room_index
+from services.spa_scheduler import get_spa_scheduler, SPA_SERVICES, SLOT_MINUTES
+
+MAX_NIGHTS = 30
+MAX_SPA_ADVANCE_DAYS = 180
+BOOKING_ATTEMPTS = 3
 
 
 def _TokenTransaction():
@@ -18,146 +27,321 @@ def _TokenTransaction():
 
 class ResortService:
     
-    def book_room(self, customer_id, nights=2, room_type='deluxe'):
-        """Đặt phòng Resort và lưu vào database"""
+    def book_room(self, customer_id, nights=2, room_type='deluxe', check_in_date=None):
+        """Đặt phòng Resort và lưu vào database
+
+        Chọn phòng trống cả khoảng ngày từ index phòng trống; các đêm đã bán
+        được ghi vào resort_room_nights (unique theo phòng + đêm) nên hai request
+        đồng thời không thể đặt trùng phòng. Nếu phòng vừa bị process khác đặt,
+        làm mới index và thử phòng kế tiếp.
+        """
         try:
             if not customer_id:
                 return {
                     "success": False,
                     "message": "customer_id is required"
                 }
+            room_type = (room_type or 'deluxe').strip().lower()
+            if room_type not in ROOM_TYPES:
+                return {"success": False, "message": f"Hạng phòng không hợp lệ: {room_type}"}
+            try:
+                nights = int(nights)
+                check_in = self._parse_date(check_in_date) if check_in_date else datetime.date.today()
+            except (TypeError, ValueError):
+                return {"success": False, "invalid_params": True, "message": "Tham số không hợp lệ: nights hoặc check_in_date (YYYY-MM-DD)"}
+            if not 1 <= nights <= MAX_NIGHTS:
+                return {"success": False, "message": f"Số đêm phải trong khoảng 1-{MAX_NIGHTS}"}
+            if check_in < datetime.date.today():
+                return {"success": False, "message": "Ngày nhận phòng đã qua"}
+            check_out = check_in + datetime.timedelta(days=nights)
 
-            # Tạo booking ID
-            import time
-            booking_id = f"RST{int(time.time())}"
+            index = get_room_index()
+            tried = set()
+            for _ in range(BOOKING_ATTEMPTS):
+                candidates = index.free_rooms(room_type, check_in, check_out, exclude=tried)
+                if not candidates:
+                    break
+                room_id = candidates[0]
+                booking = self._insert_room_booking(customer_id, room_id, index.room(room_id),
+                                                    check_in, check_out)
+                if booking is not None:
+                    index.add_booking(booking['pk'], room_id, check_in, check_out)
+                    return {
+                        "success": True,
+                        "message": f"Đặt phòng {room_type} {nights} đêm thành công!",
+                        "booking_id": booking['booking_id'],
+                        "svt_reward": booking['svt_reward'],
+                        "booking_details": {
+                            "room_type": room_type,
+                            "room_number": index.room(room_id)['room_number'],
+                            "check_in_date": check_in.strftime('%Y-%m-%d'),
+                            "check_out_date": check_out.strftime('%Y-%m-%d'),
+                            "nights": nights,
+                            "total_price": booking['total_price']
+                        }
+                    }
+                # Phòng đã có người đặt ở process khác: nạp đặt phòng mới rồi thử phòng khác
+                tried.add(room_id)
+                index.refresh(force=True)
 
-            # Tính giá phòng
-            room_prices = {
-                'standard': 2000000,
-                'deluxe': 3500000,
-                'suite': 6000000
+            return {
+                "success": False,
+                "message": f"Hết phòng {room_type} từ {check_in.strftime('%Y-%m-%d')} đến {check_out.strftime('%Y-%m-%d')}"
             }
-            total_price = room_prices.get(room_type, 3500000) * nights
 
-            # Thêm resort booking vào database
+        except Exception as e:
+            db.session.rollback()
+            return {
+                "success": False,
+                "message": f"Lỗi đặt phòng: {str(e)}"
+            }
+
+    def _insert_room_booking(self, customer_id, room_id, room, check_in, check_out):
+        """Ghi booking, các đêm đã bán và SVT reward trong một transaction.
+
+        Trả về None nếu một trong các đêm đã bị đặt (IntegrityError).
+        """
+        nights = (check_out - check_in).days
+        booking_id = new_id('RST')
+        total_price = room['price_per_night'] * nights
+        svt_reward = nights * 400  # 400 SVT per night
+
+        TTx = _TokenTransaction()
+        if not TTx:
+            raise RuntimeError("TokenTransaction model not initialized")
+        try:
             resort_booking = ResortBooking(
                 customer_id=customer_id,
                 booking_id=booking_id,
-                resort_name=f"Sovico Premium Resort - {room_type.title()} Room",
+                resort_name=f"{DEFAULT_RESORT_NAME} - {room['room_type'].title()} Room",
                 booking_date=datetime.datetime.now(),
                 nights_stayed=nights,
-                booking_value=total_price
+                booking_value=total_price,
+                room_id=room_id,
+                check_in_date=check_in,
+                check_out_date=check_out
             )
             db.session.add(resort_booking)
-
-            # Tính SVT reward
-            svt_reward = nights * 400  # 400 SVT per night
-
-            # Thêm SVT token transaction
-            TTx = _TokenTransaction()
-            if not TTx:
-                raise RuntimeError("TokenTransaction model not initialized")
-            token_tx = TTx(
+            db.session.execute(ResortRoomNight.__table__.insert(), [
+                {'room_id': room_id, 'night': check_in + datetime.timedelta(days=i), 'booking_id': booking_id}
+                for i in range(nights)
+            ])
+            db.session.add(TTx(
                 customer_id=customer_id,
                 transaction_type="service_reward",
                 amount=svt_reward,
-                description=f"Resort booking reward: {nights} nights {room_type}",
+                description=f"Resort booking reward: {nights} nights {room['room_type']}",
                 tx_hash=f"0x{uuid.uuid4().hex}",
                 block_number=random.randint(1000000, 2000000)
-            )
-            db.session.add(token_tx)
-
+            ))
             db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return None
+        domain_events.publish(domain_events.RESORT_BOOKED, customer_id, nights=nights,
+                              booking_value=total_price, room_type=room['room_type'])
+        return {'pk': resort_booking.id, 'booking_id': booking_id,
+                'total_price': total_price, 'svt_reward': svt_reward}
 
+    def check_availability(self, room_type, check_in_date, check_out_date):
+        """Số phòng hạng `room_type` còn trống cả khoảng ngày (tra từ index trong bộ nhớ)"""
+        try:
+            room_type = (room_type or '').strip().lower()
+            if room_type not in ROOM_TYPES:
+                return {"success": False, "message": f"Hạng phòng không hợp lệ: {room_type}"}
+            try:
+                check_in = self._parse_date(check_in_date)
+                check_out = self._parse_date(check_out_date)
+            except (TypeError, ValueError):
+                return {"success": False, "invalid_params": True, "message": "Tham số không hợp lệ: check_in_date / check_out_date (YYYY-MM-DD)"}
+            nights = (check_out - check_in).days
+            if not 1 <= nights <= MAX_NIGHTS:
+                return {"success": False, "message": f"Số đêm phải trong khoảng 1-{MAX_NIGHTS}"}
+
+            free = get_room_index().free_rooms(room_type, check_in, check_out)
+            price = ROOM_TYPES[room_type][0]
             return {
                 "success": True,
-                "message": f"Đặt phòng {room_type} {nights} đêm thành công!",
-                "booking_id": booking_id,
-                "svt_reward": svt_reward,
-                "booking_details": {
-                    "room_type": room_type,
-                    "nights": nights,
-                    "total_price": total_price
-                }
+                "room_type": room_type,
+                "check_in_date": check_in.strftime('%Y-%m-%d'),
+                "check_out_date": check_out.strftime('%Y-%m-%d'),
+                "nights": nights,
+                "available": bool(free),
+                "available_rooms": len(free),
+                "price_per_night": price,
+                "total_price": price * nights
             }
 
         except Exception as e:
-            db.session.rollback()
+            print(f"❌ Error checking room availability: {e}")
+            return {"success": False, "message": str(e)}
+
+    def get_availability_calendar(self, month=None):
+        """Số phòng trống theo ngày của mọi hạng phòng trong một tháng ('YYYY-MM')"""
+        try:
+            try:
+                first = datetime.datetime.strptime(month, '%Y-%m').date() if month \
+                    else datetime.date.today().replace(day=1)
+            except (TypeError, ValueError):
+                return {"success": False, "invalid_params": True, "message": "Tham số không hợp lệ: month (YYYY-MM)"}
+            last = (first + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
+
+            index = get_room_index()
             return {
-                "success": False,
-                "message": f"Lỗi đặt phòng: {str(e)}"
+                "success": True,
+                "month": first.strftime('%Y-%m'),
+                "room_types": {
+                    room_type: {"total_rooms": total, "price_per_night": ROOM_TYPES[room_type][0]}
+                    for room_type, total in index.room_types().items()
+                },
+                "days": index.calendar(max(first, datetime.date.today()), last)
             }
 
-    def book_spa(self, customer_id, spa_type='massage'):
-        """Đặt dịch vụ Spa và lưu vào database"""
+        except Exception as e:
+            print(f"❌ Error building availability calendar: {e}")
+            return {"success": False, "message": str(e)}
+
+    @staticmethod
+    def _parse_slot(value):
+        """'HH:MM' -> ô 15 phút; giờ phải tròn 15 phút"""
+        moment = datetime.datetime.strptime(value, '%H:%M')
+        if moment.minute % SLOT_MINUTES:
+            raise ValueError(value)
+        return (moment.hour * 60 + moment.minute) // SLOT_MINUTES
+
+    @staticmethod
+    def _parse_date(value):
+        if isinstance(value, datetime.datetime):
+            return value.date()
+        if isinstance(value, datetime.date):
+            return value
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+
+    def book_spa(self, customer_id, spa_type='massage', appointment_date=None, start_time=None):
+        """Đặt dịch vụ Spa và lưu vào database
+
+        Scheduler chọn kỹ thuật viên + phòng trị liệu cho giờ hẹn sớm nhất
+        (từ `appointment_date`) hoặc đúng `start_time` ('HH:MM'). Các ô 15 phút
+        được ghi vào spa_slot_claims (unique) cùng transaction với booking.
+        """
         try:
             if not customer_id:
                 return {
                     "success": False,
                     "message": "customer_id is required"
                 }
+            if spa_type not in SPA_SERVICES:
+                return {"success": False, "message": f"Dịch vụ spa không hợp lệ: {spa_type}"}
+            try:
+                date = self._parse_date(appointment_date) if appointment_date else datetime.date.today()
+                start_slot = self._parse_slot(start_time) if start_time else None
+            except (TypeError, ValueError):
+                return {"success": False, "invalid_params": True, "message": "Tham số không hợp lệ: appointment_date (YYYY-MM-DD) hoặc start_time (HH:MM)"}
+            if not datetime.date.today() <= date <= datetime.date.today() + datetime.timedelta(days=MAX_SPA_ADVANCE_DAYS):
+                return {"success": False, "message": f"Ngày hẹn phải trong {MAX_SPA_ADVANCE_DAYS} ngày tới"}
+
+            scheduler = get_spa_scheduler()
+            spa_price, duration = SPA_SERVICES[spa_type]
+            for _ in range(BOOKING_ATTEMPTS):
+                appointment = scheduler.claim(spa_type, date, start_slot)
+                if appointment is None:
+                    break
+                spa_booking_id = new_id('SPA')
+                svt_reward = int(spa_price / 5000)  # 1 SVT per 5k VND
+                try:
+                    inserted = self._insert_spa_booking(customer_id, spa_booking_id, spa_type, spa_price, svt_reward,
+                                                        appointment, scheduler.claim_rows(appointment, spa_booking_id))
+                except Exception:
+                    # Lỗi ghi database khác: vẫn phải trả ô đã giữ trong bộ nhớ
+                    db.session.rollback()
+                    scheduler.rollback(appointment)
+                    raise
+                if inserted:
+                    details = scheduler.describe(appointment)
+                    return {
+                        "success": True,
+                        "message": f"Đặt dịch vụ {spa_type} thành công!",
+                        "booking_id": spa_booking_id,
+                        "svt_reward": svt_reward,
+                        "spa_details": {
+                            "service": spa_type,
+                            "price": spa_price,
+                            "duration_minutes": duration,
+                            **details
+                        }
+                    }
+                # Ô vừa bị process khác đặt: trả ô trong bộ nhớ, nạp lại ngày đó và thử chỗ khác
+                scheduler.rollback(appointment)
 
-            # Tạo spa booking ID
-            import time
-            spa_booking_id = f"SPA{int(time.time())}"
+            when = f"{date.strftime('%Y-%m-%d')} {start_time}" if start_time else f"từ {date.strftime('%Y-%m-%d')}"
+            return {"success": False, "message": f"Không còn lịch trống cho {spa_type} {when}"}
 
-            # Tính giá spa
-            spa_prices = {
-                'massage': 1500000,
-                'facial': 1200000,
-                'body_treatment': 2000000,
-                'premium_package': 3500000
+        except Exception as e:
+            db.session.rollback()
+            return {
+                "success": False,
+                "message": f"Lỗi đặt spa: {str(e)}"
             }
-            spa_price = spa_prices.get(spa_type, 1500000)
 
+    def _insert_spa_booking(self, customer_id, spa_booking_id, spa_type, spa_price, svt_reward, appointment, claims):
+        """Ghi booking spa, các ô đã bán và SVT reward trong một transaction. False nếu trùng ô"""
+        TTx = _TokenTransaction()
+        if not TTx:
+            raise RuntimeError("TokenTransaction model not initialized")
+        try:
             # Thêm spa booking như một resort booking
-            spa_booking = ResortBooking(
+            db.session.add(ResortBooking(
                 customer_id=customer_id,
                 booking_id=spa_booking_id,
                 resort_name=f"Sovico Premium Spa - {spa_type.title()}",
-                booking_date=datetime.datetime.now(),
+                booking_date=datetime.datetime.combine(appointment['date'], datetime.time()) +
+                datetime.timedelta(minutes=appointment['start'] * SLOT_MINUTES),
                 nights_stayed=0,  # Spa service, not overnight
                 booking_value=spa_price
-            )
-            db.session.add(spa_booking)
-
-            # SVT reward cho spa
-            svt_reward = int(spa_price / 5000)  # 1 SVT per 5k VND
-
-            # Thêm SVT token transaction
-            TTx = _TokenTransaction()
-            if not TTx:
-                raise RuntimeError("TokenTransaction model not initialized")
-            token_tx = TTx(
+            ))
+            db.session.execute(SpaSlotClaim.__table__.insert(), claims)
+            db.session.add(TTx(
                 customer_id=customer_id,
                 transaction_type="service_reward",
                 amount=svt_reward,
                 description=f"Spa service reward: {spa_type}",
                 tx_hash=f"0x{uuid.uuid4().hex}",
                 block_number=random.randint(1000000, 2000000)
-            )
-            db.session.add(token_tx)
-
+            ))
             db.session.commit()
+            domain_events.publish(domain_events.SPA_BOOKED, customer_id, spa_type=spa_type, booking_value=spa_price)
+            return True
+        except IntegrityError:
+            db.session.rollback()
+            return False
 
+    def get_spa_availability(self, spa_type='massage', date_from=None, count=5, days=14):
+        """Các giờ hẹn trống sớm nhất của một dịch vụ spa (đọc từ scheduler trong bộ nhớ)"""
+        try:
+            if spa_type not in SPA_SERVICES:
+                return {"success": False, "message": f"Dịch vụ spa không hợp lệ: {spa_type}"}
+            try:
+                first = self._parse_date(date_from) if date_from else datetime.date.today()
+            except (TypeError, ValueError):
+                return {"success": False, "invalid_params": True, "message": "Tham số không hợp lệ: date_from (YYYY-MM-DD)"}
+            if not 1 <= count <= 50 or not 1 <= days <= 31:
+                return {"success": False, "invalid_params": True, "message": "Tham số không hợp lệ: count 1-50, days 1-31"}
+            if first > datetime.date.today() + datetime.timedelta(days=MAX_SPA_ADVANCE_DAYS):
+                return {"success": False, "message": f"Ngày hẹn phải trong {MAX_SPA_ADVANCE_DAYS} ngày tới"}
+
+            price, duration = SPA_SERVICES[spa_type]
             return {
                 "success": True,
-                "message": f"Đặt dịch vụ {spa_type} thành công!",
-                "booking_id": spa_booking_id,
-                "svt_reward": svt_reward,
-                "spa_details": {
-                    "service": spa_type,
-                    "price": spa_price
-                }
+                "service": spa_type,
+                "price": price,
+                "duration_minutes": duration,
+                "slots": get_spa_scheduler().next_available(spa_type, first, count, days)
             }
 
         except Exception as e:
-            db.session.rollback()
-            return {
-                "success": False,
-                "message": f"Lỗi đặt spa: {str(e)}"
-            }
-    
+            print(f"❌ Error getting spa availability: {e}")
+            return {"success": False, "message": str(e)}
+
     def get_booking_history(self, customer_id):
         """Lấy lịch sử đặt phòng của khách hàng"""
         try:
@@ -0,0 +1,200 @@
+# services/room_availability.py
+# -*- coding: utf-8 -*-
+"""
+In-memory resort room availability index
+
+Mỗi phòng giữ danh sách các khoảng đêm đã bán [check_in, check_out) đã sắp
+xếp và không chồng nhau (ngày lưu dạng ordinal), nên kiểm tra "phòng trống
+trong khoảng ngày" là một lần bisect - O(log n). Song song, mỗi hạng phòng có
+mảng NumPy số phòng đã bán theo ngày trong HORIZON_DAYS ngày tới, lịch phòng
+trống cả tháng chỉ là cắt mảng.
+
+Index được dựng từ database khi dùng lần đầu, cập nhật ngay sau mỗi lần đặt
+phòng trong process và làm mới tăng dần (đặt phòng mới của process khác) mỗi
+REFRESH_INTERVAL giây. Database vẫn là nguồn sự thật: bảng resort_room_nights
+unique (room_id, night) chặn đặt trùng khi index của process chưa kịp làm mới.
+"""
+
+import bisect
+import datetime
+import threading
+import time
+
+import numpy as np
+
+from models.database import db
+from models.resorts import ResortBooking, ResortRoom
+
+HORIZON_DAYS = 365
+REFRESH_INTERVAL = 30   # giây giữa hai lần nạp đặt phòng mới từ database
+REFRESH_OVERLAP = 120   # giây đọc lùi để không bỏ sót đặt phòng commit trễ
+
+
+class RoomAvailabilityIndex:
+    """Index phòng trống theo phòng và theo hạng phòng"""
+
+    def __init__(self, horizon=HORIZON_DAYS, refresh_interval=REFRESH_INTERVAL):
+        self.horizon = horizon
+        self.refresh_interval = refresh_interval
+        self._rooms = {}           # room_id -> {'room_number', 'room_type', 'price_per_night', 'max_guests'}
+        self._rooms_by_type = {}   # room_type -> [room_id, ...] theo số phòng
+        self._starts = {}          # room_id -> [check_in ordinal, ...] tăng dần
+        self._ends = {}            # room_id -> [check_out ordinal, ...] cùng thứ tự
+        self._occupied = {}        # room_type -> np.ndarray số phòng đã bán theo ngày
+        self._known = set()        # id đặt phòng đã nạp (chống nạp trùng khi đọc lùi)
+        self._start = None
+        self._watermark = None
+        self._checked_at = 0.0
+        self.version = 0
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------ build
+
+    def rebuild(self):
+        """Dựng lại toàn bộ index từ database"""
+        with self._lock:
+            self._rebuild_locked()
+
+    def _rebuild_locked(self):
+        start = datetime.date.today()
+        rooms = ResortRoom.query.filter(ResortRoom.status == 'active').order_by(ResortRoom.room_number).all()
+        self._rooms = {r.id: {
+            'room_number': r.room_number,
+            'room_type': r.room_type,
+            'price_per_night': float(r.price_per_night),
+            'max_guests': r.max_guests
+        } for r in rooms}
+        self._rooms_by_type = {}
+        for room_id, room in self._rooms.items():
+            self._rooms_by_type.setdefault(room['room_type'], []).append(room_id)
+        self._starts = {room_id: [] for room_id in self._rooms}
+        self._ends = {room_id: [] for room_id in self._rooms}
+        self._occupied = {room_type: np.zeros(self.horizon, dtype=np.int32) for room_type in self._rooms_by_type}
+        self._known = set()
+        self._start = start
+
+        self._watermark = db.session.query(db.func.max(ResortBooking.created_at)).scalar()
+        rows = db.session.query(ResortBooking.id, ResortBooking.room_id,
+                                ResortBooking.check_in_date, ResortBooking.check_out_date) \
+            .filter(ResortBooking.room_id.isnot(None), ResortBooking.check_out_date > start).all()
+        for row in rows:
+            self._add_locked(row.id, row.room_id, row.check_in_date, row.check_out_date)
+        self.version += 1
+        self._checked_at = time.monotonic()
+
+    def refresh(self, force=False):
+        """Nạp các đặt phòng tạo sau lần làm mới trước. Trả về số đặt phòng mới"""
+        if not force and self._start == datetime.date.today() \
+                and time.monotonic() - self._checked_at < self.refresh_interval:
+            return 0
+        with self._lock:
+            if self._start != datetime.date.today():
+                self._rebuild_locked()
+                return len(self._known)
+
+            query = db.session.query(ResortBooking.id, ResortBooking.room_id, ResortBooking.check_in_date,
+                                     ResortBooking.check_out_date, ResortBooking.created_at) \
+                .filter(ResortBooking.room_id.isnot(None), ResortBooking.check_out_date > self._start)
+            if self._watermark is not None:
+                query = query.filter(ResortBooking.created_at >=
+                                     self._watermark - datetime.timedelta(seconds=REFRESH_OVERLAP))
+            added = 0
+            for row in query.all():
+                if self._add_locked(row.id, row.room_id, row.check_in_date, row.check_out_date):
+                    added += 1
+                if row.created_at is not None and (self._watermark is None or row.created_at > self._watermark):
+                    self._watermark = row.created_at
+            self._checked_at = time.monotonic()
+            if added:
+                self.version += 1
+            return added
+
+    def _ensure_fresh(self):
+        if self._start is None:
+            self.rebuild()
+        else:
+            self.refresh()
+
+    def add_booking(self, booking_pk, room_id, check_in, check_out):
+        """Ghi nhận đặt phòng vừa commit trong process này"""
+        self._ensure_fresh()
+        with self._lock:
+            if self._add_locked(booking_pk, room_id, check_in, check_out):
+                self.version += 1
+
+    def _add_locked(self, booking_pk, room_id, check_in, check_out):
+        if booking_pk in self._known or room_id not in self._rooms:
+            return False
+        self._known.add(booking_pk)
+        start, end = check_in.toordinal(), check_out.toordinal()
+        i = bisect.bisect_left(self._starts[room_id], start)
+        self._starts[room_id].insert(i, start)
+        self._ends[room_id].insert(i, end)
+
+        first = max(start - self._start.toordinal(), 0)
+        last = min(end - self._start.toordinal(), self.horizon)
+        if first < last:
+            self._occupied[self._rooms[room_id]['room_type']][first:last] += 1
+        return True
+
+    # ----------------------------------------------------------------- lookup
+
+    def is_room_free(self, room_id, check_in, check_out):
+        """Phòng còn trống mọi đêm trong [check_in, check_out) - O(log n)"""
+        self._ensure_fresh()
+        if room_id not in self._rooms:
+            return False
+        return self._is_free(room_id, check_in.toordinal(), check_out.toordinal())
+
+    def _is_free(self, room_id, start, end):
+        # Khoảng cuối cùng bắt đầu trước `end` là khoảng duy nhất có thể chồng lên
+        i = bisect.bisect_left(self._starts[room_id], end)
+        return i == 0 or self._ends[room_id][i - 1] <= start
+
+    def free_rooms(self, room_type, check_in, check_out, exclude=()):
+        """Id các phòng hạng `room_type` còn trống cả khoảng ngày"""
+        self._ensure_fresh()
+        start, end = check_in.toordinal(), check_out.toordinal()
+        return [room_id for room_id in self._rooms_by_type.get(room_type, ())
+                if room_id not in exclude and self._is_free(room_id, start, end)]
+
+    def room(self, room_id):
+        return self._rooms.get(room_id)
+
+    def room_types(self):
+        """{room_type: số phòng active}"""
+        self._ensure_fresh()
+        return {room_type: len(ids) for room_type, ids in self._rooms_by_type.items()}
+
+    def calendar(self, date_from, date_to):
+        """Số phòng trống theo ngày và hạng phòng trong [date_from, date_to] (trong horizon)"""
+        self._ensure_fresh()
+        first = max((date_from - self._start).days, 0)
+        last = min((date_to - self._start).days + 1, self.horizon)
+        days = []
+        if first >= last:
+            return days
+        available = {room_type: (len(self._rooms_by_type[room_type]) - occupied[first:last]).tolist()
+                     for room_type, occupied in self._occupied.items()}
+        for offset in range(last - first):
+            day = self._start + datetime.timedelta(days=first + offset)
+            days.append({
+                'date': day.strftime('%Y-%m-%d'),
+                'available': {room_type: counts[offset] for room_type, counts in available.items()}
+            })
+        return days
+
+    @property
+    def start_date(self):
+        return self._start
+
+
+_room_index = None
+
+
+def get_room_index():
+    """Index dùng chung cho toàn process"""
+    global _room_index
+    if _room_index is None:
+        _room_index = RoomAvailabilityIndex()
+    return _room_index
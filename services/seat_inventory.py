@@ -0,0 +1,178 @@
+# services/seat_inventory.py
+# -*- coding: utf-8 -*-
+"""
+Vietjet seat inventory
+
+Mỗi (chuyến bay, ngày bay, hạng vé) có một dòng trong vietjet_seat_inventory.
+Giữ / bán ghế là một câu UPDATE có điều kiện
+
+    UPDATE vietjet_seat_inventory SET available = available - :n
+    WHERE id = :id AND available >= :n
+
+nên không bao giờ bán quá số ghế và chỉ khóa đúng dòng của chuyến bay trong
+thời gian transaction (không khóa bảng, không SELECT ... FOR UPDATE). Giữ chỗ
+(hold) có hạn; hold hết hạn được trả ghế lại kho bởi release_expired_holds().
+"""
+
+import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from models.database import db
+from models.flights import VietjetSeatInventory, VietjetSeatHold
+from services.id_generator import new_id
+
+HOLD_TTL_SECONDS = 600
+EXPIRED_SWEEP_LIMIT = 500
+
+
+def get_or_create_inventory(flight_number, flight_date, ticket_class, capacity, origin=None, destination=None):
+    """Id dòng tồn kho của chuyến bay; tạo mới với `capacity` ghế (và tuyến bay) nếu chưa có"""
+    inventory_id = db.session.query(VietjetSeatInventory.id).filter_by(
+        flight_number=flight_number, flight_date=flight_date, ticket_class=ticket_class).scalar()
+    if inventory_id is not None:
+        return inventory_id
+    try:
+        inventory = VietjetSeatInventory(flight_number=flight_number, flight_date=flight_date,
+                                         ticket_class=ticket_class, origin=origin, destination=destination,
+                                         capacity=capacity, available=capacity)
+        db.session.add(inventory)
+        db.session.commit()
+        return inventory.id
+    except IntegrityError:
+        # Request khác vừa tạo cùng dòng tồn kho
+        db.session.rollback()
+        return db.session.query(VietjetSeatInventory.id).filter_by(
+            flight_number=flight_number, flight_date=flight_date, ticket_class=ticket_class).scalar()
+
+
+def reserve(inventory_id, seats, sweep_expired=True):
+    """Trừ `seats` ghế nếu còn đủ (chưa commit). Trả về True nếu giữ được ghế.
+
+    Khi hết ghế, trả lại ghế của các hold đã hết hạn ngay trong transaction của
+    người gọi (không commit giữa chừng) rồi trừ lại một lần.
+    """
+    taken = db.session.query(VietjetSeatInventory).filter(
+        VietjetSeatInventory.id == inventory_id,
+        VietjetSeatInventory.available >= seats
+    ).update({VietjetSeatInventory.available: VietjetSeatInventory.available - seats},
+             synchronize_session=False)
+    if taken:
+        return True
+    if sweep_expired and _release_expired(inventory_id=inventory_id):
+        return reserve(inventory_id, seats, sweep_expired=False)
+    return False
+
+
+def release(inventory_id, seats):
+    """Trả `seats` ghế về kho (chưa commit), không vượt quá sức chứa"""
+    return db.session.query(VietjetSeatInventory).filter(
+        VietjetSeatInventory.id == inventory_id,
+        VietjetSeatInventory.available + seats <= VietjetSeatInventory.capacity
+    ).update({VietjetSeatInventory.available: VietjetSeatInventory.available + seats},
+             synchronize_session=False)
+
+
+def hold_seats(customer_id, inventory_id, seats, ttl_seconds=HOLD_TTL_SECONDS):
+    """Giữ ghế tạm thời và commit. Trả về VietjetSeatHold hoặc None nếu hết ghế"""
+    try:
+        if not reserve(inventory_id, seats):
+            db.session.rollback()
+            return None
+        hold = VietjetSeatHold(
+            hold_id=new_id('HOLD'),
+            inventory_id=inventory_id,
+            customer_id=customer_id,
+            seats=seats,
+            status='held',
+            expires_at=datetime.datetime.utcnow() + datetime.timedelta(seconds=ttl_seconds)
+        )
+        db.session.add(hold)
+        db.session.commit()
+        return hold
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def confirm_hold(hold_id, customer_id):
+    """Chuyển hold còn hạn sang confirmed (chưa commit). Trả về (hold, inventory) hoặc None"""
+    confirmed = db.session.query(VietjetSeatHold).filter(
+        VietjetSeatHold.hold_id == hold_id,
+        VietjetSeatHold.customer_id == customer_id,
+        VietjetSeatHold.status == 'held',
+        VietjetSeatHold.expires_at > datetime.datetime.utcnow()
+    ).update({VietjetSeatHold.status: 'confirmed'}, synchronize_session=False)
+    if not confirmed:
+        return None
+    return db.session.query(VietjetSeatHold, VietjetSeatInventory) \
+        .join(VietjetSeatInventory, VietjetSeatInventory.id == VietjetSeatHold.inventory_id) \
+        .filter(VietjetSeatHold.hold_id == hold_id).first()
+
+
+def release_hold(hold_id, customer_id):
+    """Khách hủy giữ chỗ: trả ghế về kho và commit. Trả về True nếu hold còn hiệu lực"""
+    try:
+        hold = VietjetSeatHold.query.filter_by(hold_id=hold_id, customer_id=customer_id).first()
+        if hold is None:
+            return False
+        released = db.session.query(VietjetSeatHold).filter(
+            VietjetSeatHold.id == hold.id, VietjetSeatHold.status == 'held'
+        ).update({VietjetSeatHold.status: 'released'}, synchronize_session=False)
+        if released:
+            release(hold.inventory_id, hold.seats)
+        db.session.commit()
+        return bool(released)
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def release_expired_holds(inventory_id=None, limit=EXPIRED_SWEEP_LIMIT):
+    """Trả ghế của các hold hết hạn về kho và commit. Trả về số hold đã trả ghế"""
+    try:
+        claimed_count = _release_expired(inventory_id, limit)
+        if claimed_count:
+            db.session.commit()
+        return claimed_count
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error releasing expired seat holds: {e}")
+        return 0
+
+
+def _release_expired(inventory_id=None, limit=EXPIRED_SWEEP_LIMIT):
+    """Trả ghế của các hold hết hạn về kho trong transaction hiện tại (không commit)"""
+    query = db.session.query(VietjetSeatHold.id, VietjetSeatHold.inventory_id, VietjetSeatHold.seats) \
+        .filter(VietjetSeatHold.status == 'held', VietjetSeatHold.expires_at <= datetime.datetime.utcnow())
+    if inventory_id is not None:
+        query = query.filter(VietjetSeatHold.inventory_id == inventory_id)
+    expired = query.limit(limit).all()
+    if not expired:
+        return 0
+
+    # Mỗi hold chỉ được một tiến trình chuyển trạng thái (UPDATE có điều kiện)
+    returned = {}
+    claimed_count = 0
+    for hold_id, hold_inventory_id, seats in expired:
+        claimed = db.session.query(VietjetSeatHold).filter(
+            VietjetSeatHold.id == hold_id, VietjetSeatHold.status == 'held'
+        ).update({VietjetSeatHold.status: 'expired'}, synchronize_session=False)
+        if claimed:
+            claimed_count += 1
+            returned[hold_inventory_id] = returned.get(hold_inventory_id, 0) + seats
+
+    for hold_inventory_id, seats in returned.items():
+        release(hold_inventory_id, seats)
+    return claimed_count
+
+
+def availability(flight_numbers, flight_date):
+    """{(flight_number, ticket_class): số ghế còn} của các chuyến đã có dòng tồn kho"""
+    if not flight_numbers:
+        return {}
+    rows = db.session.query(VietjetSeatInventory.flight_number, VietjetSeatInventory.ticket_class,
+                            VietjetSeatInventory.available) \
+        .filter(VietjetSeatInventory.flight_date == flight_date,
+                VietjetSeatInventory.flight_number.in_(list(flight_numbers))).all()
+    return {(row.flight_number, row.ticket_class): row.available for row in rows}
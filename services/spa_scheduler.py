@@ -0,0 +1,305 @@
+# services/spa_scheduler.py
+# -*- coding: utf-8 -*-
+"""
+Spa appointment slot scheduler
+
+Một ngày được chia thành 96 ô 15 phút. Với mỗi (tài nguyên, ngày) scheduler
+giữ một bitmap (int Python) các ô còn trống: giờ làm việc của kỹ thuật viên /
+phòng trị liệu trừ đi các ô đã bán. Một lịch hẹn cần một kỹ thuật viên và một
+phòng trống cùng lúc trong n ô liên tiếp:
+
+    runs = free & (free >> 1) & ... & (free >> (n - 1))
+
+bit i của `runs` bật khi ô i..i+n-1 đều trống, ô sớm nhất là bit thấp nhất -
+tìm chỗ sớm nhất là O(n) phép toán trên số nguyên, không duyệt từng lịch hẹn.
+
+Bitmap của cả mùa được sinh một lần (generate_season) từ giờ làm việc và bảng
+spa_slot_claims; truy vấn "lịch trống sớm nhất" đọc hoàn toàn từ bộ nhớ. Đặt
+lịch giữ ô trong bộ nhớ dưới lock rồi ghi spa_slot_claims (unique theo tài
+nguyên + ngày + ô), nên process khác đặt trùng sẽ bị database từ chối và
+scheduler thử chỗ kế tiếp.
+"""
+
+import datetime
+import threading
+import time
+
+from models.database import db
+from models.resorts import SpaResource, SpaSlotClaim
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+SEASON_DAYS = 90
+LEAD_MINUTES = 30       # đặt lịch trong ngày phải trước giờ hẹn ít nhất 30 phút
+REFRESH_INTERVAL = 15   # giây giữa hai lần nạp ô đã bán của process khác
+REFRESH_OVERLAP = 120   # giây đọc lùi để không bỏ sót ô commit trễ
+
+# Dịch vụ spa: (giá, thời lượng phút)
+SPA_SERVICES = {
+    'massage': (1500000, 60),
+    'facial': (1200000, 60),
+    'body_treatment': (2000000, 90),
+    'premium_package': (3500000, 120),
+}
+
+
+def slot_count(minutes):
+    """Số ô 15 phút cần cho `minutes` phút (làm tròn lên)"""
+    return -(-minutes // SLOT_MINUTES)
+
+
+def slot_mask(start, length):
+    return ((1 << length) - 1) << start
+
+
+def earliest_fit(free, length, from_slot=0):
+    """Ô bắt đầu sớm nhất (>= from_slot) có `length` ô trống liên tiếp, hoặc None"""
+    runs = free
+    for k in range(1, length):
+        runs &= free >> k
+    runs &= ~((1 << from_slot) - 1)
+    if not runs:
+        return None
+    return (runs & -runs).bit_length() - 1
+
+
+def _format_slot(slot):
+    minute = slot * SLOT_MINUTES
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+class SpaScheduler:
+    """Bitmap ô trống theo tài nguyên và ngày, dùng chung cho toàn process"""
+
+    def __init__(self, season_days=SEASON_DAYS, refresh_interval=REFRESH_INTERVAL):
+        self.season_days = season_days
+        self.refresh_interval = refresh_interval
+        self._resources = {}   # resource_id -> {'name', 'resource_type', 'hours', 'days_of_week'}
+        self._therapists = []
+        self._rooms = []
+        self._days = {}        # date -> {resource_id: bitmap ô trống}
+        self._watermark = None
+        self._checked_at = 0.0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------ build
+
+    def _load_resources_locked(self):
+        rows = SpaResource.query.filter(SpaResource.status == 'active').order_by(SpaResource.id).all()
+        self._resources = {r.id: {
+            'name': r.name,
+            'resource_type': r.resource_type,
+            'hours': slot_mask(r.open_minute // SLOT_MINUTES,
+                               (r.close_minute - r.open_minute) // SLOT_MINUTES),
+            'days_of_week': r.days_of_week
+        } for r in rows}
+        self._therapists = [rid for rid, r in self._resources.items() if r['resource_type'] == 'therapist']
+        self._rooms = [rid for rid, r in self._resources.items() if r['resource_type'] == 'room']
+        self._days = {}
+        self._loaded = True
+
+    def generate_season(self, date_from=None, days=None):
+        """Sinh bitmap ô trống cho mọi tài nguyên trong `days` ngày từ `date_from`.
+
+        Một truy vấn lấy các ô đã bán của cả mùa. Trả về số (tài nguyên, ngày) đã sinh.
+        """
+        date_from = date_from or datetime.date.today()
+        days = days or self.season_days
+        date_to = date_from + datetime.timedelta(days=days - 1)
+        with self._lock:
+            self._load_resources_locked()
+            self._watermark = db.session.query(db.func.max(SpaSlotClaim.created_at)).scalar()
+            self._generate_locked(date_from, date_to)
+            self._checked_at = time.monotonic()
+            return sum(len(day) for day in self._days.values())
+
+    def _generate_locked(self, date_from, date_to):
+        claims = db.session.query(SpaSlotClaim.resource_id, SpaSlotClaim.slot_date, SpaSlotClaim.slot) \
+            .filter(SpaSlotClaim.slot_date >= date_from, SpaSlotClaim.slot_date <= date_to).all()
+        booked = {}
+        for resource_id, slot_date, slot in claims:
+            key = (slot_date, resource_id)
+            booked[key] = booked.get(key, 0) | (1 << slot)
+
+        day = date_from
+        while day <= date_to:
+            weekday_bit = 1 << day.weekday()
+            self._days[day] = {
+                resource_id: (resource['hours'] if resource['days_of_week'] & weekday_bit else 0)
+                & ~booked.get((day, resource_id), 0)
+                for resource_id, resource in self._resources.items()
+            }
+            day += datetime.timedelta(days=1)
+
+    def refresh(self, force=False):
+        """Trừ các ô do process khác bán từ lần làm mới trước (phép AND idempotent)"""
+        if not force and time.monotonic() - self._checked_at < self.refresh_interval:
+            return 0
+        with self._lock:
+            today = datetime.date.today()
+            for day in [d for d in self._days if d < today]:
+                del self._days[day]
+
+            query = db.session.query(SpaSlotClaim.resource_id, SpaSlotClaim.slot_date,
+                                     SpaSlotClaim.slot, SpaSlotClaim.created_at) \
+                .filter(SpaSlotClaim.slot_date >= today)
+            if self._watermark is not None:
+                query = query.filter(SpaSlotClaim.created_at >=
+                                     self._watermark - datetime.timedelta(seconds=REFRESH_OVERLAP))
+            claims = query.all()
+            for resource_id, slot_date, slot, created_at in claims:
+                day = self._days.get(slot_date)
+                if day is not None and resource_id in day:
+                    day[resource_id] &= ~(1 << slot)
+                if created_at is not None and (self._watermark is None or created_at > self._watermark):
+                    self._watermark = created_at
+            self._checked_at = time.monotonic()
+            return len(claims)
+
+    def _ensure_fresh(self):
+        if not self._loaded:
+            self.generate_season()
+        else:
+            self.refresh()
+
+    def _day_locked(self, date):
+        """Bitmap của ngày `date`; sinh thêm nếu ngày nằm ngoài mùa đã sinh"""
+        day = self._days.get(date)
+        if day is None:
+            self._generate_locked(date, date)
+            day = self._days[date]
+        return day
+
+    # ----------------------------------------------------------------- lookup
+
+    @staticmethod
+    def _first_slot(date):
+        """Ô sớm nhất còn đặt được trong ngày `date`"""
+        now = datetime.datetime.now()
+        if date > now.date():
+            return 0
+        if date < now.date():
+            return SLOTS_PER_DAY
+        return slot_count(now.hour * 60 + now.minute + LEAD_MINUTES)
+
+    def _best_pair(self, day, length, from_slot, at_slot=None):
+        """(ô bắt đầu, kỹ thuật viên, phòng) sớm nhất trong ngày, hoặc None.
+
+        Cùng giờ thì ưu tiên kỹ thuật viên còn nhiều ô trống (chia đều lịch).
+        """
+        best = None
+        for therapist in self._therapists:
+            free_therapist = day[therapist]
+            if not free_therapist:
+                continue
+            load = -bin(free_therapist).count('1')
+            for room in self._rooms:
+                free = free_therapist & day[room]
+                if at_slot is not None:
+                    mask = slot_mask(at_slot, length)
+                    start = at_slot if free & mask == mask else None
+                else:
+                    start = earliest_fit(free, length, from_slot)
+                if start is not None and (best is None or (start, load) < best[:2]):
+                    best = (start, load, therapist, room)
+        return None if best is None else (best[0], best[2], best[3])
+
+    def next_available(self, spa_type, date_from=None, count=5, days=14):
+        """Các giờ hẹn trống sớm nhất cho dịch vụ `spa_type` (đọc từ bộ nhớ)"""
+        self._ensure_fresh()
+        length = slot_count(SPA_SERVICES[spa_type][1])
+        date_from = max(date_from or datetime.date.today(), datetime.date.today())
+        results = []
+        with self._lock:
+            for offset in range(days):
+                date = date_from + datetime.timedelta(days=offset)
+                day = self._day_locked(date)
+                from_slot = self._first_slot(date)
+                while len(results) < count and from_slot < SLOTS_PER_DAY:
+                    found = self._best_pair(day, length, from_slot)
+                    if found is None:
+                        break
+                    start, therapist, room = found
+                    results.append(self._slot_info(date, start, length, therapist, room))
+                    from_slot = start + 1
+                if len(results) >= count:
+                    break
+        return results
+
+    def _slot_info(self, date, start, length, therapist, room):
+        return {
+            'date': date.strftime('%Y-%m-%d'),
+            'start_time': _format_slot(start),
+            'end_time': _format_slot(start + length),
+            'therapist': self._resources[therapist]['name'],
+            'room': self._resources[room]['name']
+        }
+
+    # ------------------------------------------------------------- allocation
+
+    def claim(self, spa_type, date, start_slot=None, days=14):
+        """Giữ chỗ trong bộ nhớ cho lịch hẹn sớm nhất (hoặc đúng ô `start_slot`).
+
+        Trả về dict lịch hẹn (date, start, length, therapist_id, room_id) hoặc None.
+        Người gọi ghi spa_slot_claims và gọi rollback() nếu ghi thất bại.
+        """
+        self._ensure_fresh()
+        length = slot_count(SPA_SERVICES[spa_type][1])
+        with self._lock:
+            dates = [date] if start_slot is not None else \
+                [date + datetime.timedelta(days=offset) for offset in range(days)]
+            for day_date in dates:
+                day = self._day_locked(day_date)
+                from_slot = self._first_slot(day_date)
+                if start_slot is not None and start_slot < from_slot:
+                    return None
+                found = self._best_pair(day, length, from_slot, at_slot=start_slot)
+                if found is None:
+                    continue
+                start, therapist, room = found
+                mask = slot_mask(start, length)
+                day[therapist] &= ~mask
+                day[room] &= ~mask
+                return {'date': day_date, 'start': start, 'length': length,
+                        'therapist_id': therapist, 'room_id': room}
+        return None
+
+    def claim_rows(self, appointment, booking_id):
+        """Các dòng spa_slot_claims của lịch hẹn (cho bulk insert)"""
+        return [
+            {'resource_id': resource_id, 'slot_date': appointment['date'], 'slot': slot,
+             'booking_id': booking_id, 'created_at': datetime.datetime.utcnow()}
+            for resource_id in (appointment['therapist_id'], appointment['room_id'])
+            for slot in range(appointment['start'], appointment['start'] + appointment['length'])
+        ]
+
+    def rollback(self, appointment):
+        """Trả ô đã giữ trong bộ nhớ khi ghi database thất bại, rồi nạp ô đã bán của ngày đó"""
+        mask = slot_mask(appointment['start'], appointment['length'])
+        date = appointment['date']
+        with self._lock:
+            day = self._days.get(date)
+            if day is not None:
+                day[appointment['therapist_id']] |= mask
+                day[appointment['room_id']] |= mask
+                claims = db.session.query(SpaSlotClaim.resource_id, SpaSlotClaim.slot) \
+                    .filter(SpaSlotClaim.slot_date == date).all()
+                for resource_id, slot in claims:
+                    if resource_id in day:
+                        day[resource_id] &= ~(1 << slot)
+
+    def describe(self, appointment):
+        return self._slot_info(appointment['date'], appointment['start'], appointment['length'],
+                               appointment['therapist_id'], appointment['room_id'])
+
+
+_spa_scheduler = None
+
+
+def get_spa_scheduler():
+    """Scheduler dùng chung cho toàn process"""
+    global _spa_scheduler
+    if _spa_scheduler is None:
+        _spa_scheduler = SpaScheduler()
+    return _spa_scheduler
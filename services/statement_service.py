@@ -0,0 +1,319 @@
+# services/statement_service.py
+# -*- coding: utf-8 -*-
+"""
+HDBank monthly statement engine
+
+Khách hàng có thẻ active được chia thành các partition và xử lý song song
+bằng process pool. Mỗi worker tự mở engine riêng, stream giao dịch trong kỳ
+theo chunk, tính số dư chạy / tổng thu chi bằng NumPy và ghi vào bảng
+hdbank_statements. Partition đã có sao kê được bỏ qua khi chạy lại (resume).
+
+Chạy batch:
+    python -m services.statement_service --period 2025-09 --workers 8
+"""
+
+import datetime
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from sqlalchemy import create_engine, text, bindparam
+
+DEFAULT_PARTITION_SIZE = 5000
+DEFAULT_CHUNK_SIZE = 20000
+TOP_MERCHANTS = 3
+
+_CARD_HOLDERS_SQL = text("""
+    SELECT DISTINCT customer_id FROM hdbank_cards
+    WHERE status = 'active'
+    ORDER BY customer_id
+""")
+
+_DONE_SQL = text("SELECT customer_id FROM hdbank_statements WHERE period = :period")
+
+# Số dư cuối cùng trước kỳ (groupwise max theo transaction_date, hòa thì lấy id lớn nhất)
+_OPENING_SQL = text("""
+    SELECT t.customer_id, t.balance
+    FROM hdbank_transactions t
+    JOIN (
+        SELECT customer_id, MAX(transaction_date) AS last_date
+        FROM hdbank_transactions
+        WHERE customer_id IN :ids AND transaction_date < :start
+        GROUP BY customer_id
+    ) m ON m.customer_id = t.customer_id AND t.transaction_date = m.last_date
+    ORDER BY t.customer_id, t.id
+""").bindparams(bindparam('ids', expanding=True))
+
+_PERIOD_TX_SQL = text("""
+    SELECT customer_id, amount, description
+    FROM hdbank_transactions
+    WHERE customer_id IN :ids AND transaction_date >= :start AND transaction_date < :end
+    ORDER BY customer_id, transaction_date, id
+""").bindparams(bindparam('ids', expanding=True))
+
+_SVT_SQL = text("""
+    SELECT customer_id, SUM(amount) AS earned
+    FROM token_transactions
+    WHERE customer_id IN :ids AND created_at >= :start AND created_at < :end AND amount > 0
+    GROUP BY customer_id
+""").bindparams(bindparam('ids', expanding=True))
+
+_DELETE_SQL = text("""
+    DELETE FROM hdbank_statements WHERE period = :period AND customer_id IN :ids
+""").bindparams(bindparam('ids', expanding=True))
+
+_INSERT_SQL = text("""
+    INSERT INTO hdbank_statements
+        (customer_id, period, opening_balance, closing_balance, min_balance, total_credit,
+         total_debit, transaction_count, svt_earned, top_merchants, generated_at)
+    VALUES
+        (:customer_id, :period, :opening_balance, :closing_balance, :min_balance, :total_credit,
+         :total_debit, :transaction_count, :svt_earned, :top_merchants, :generated_at)
+""")
+
+# "Chuyển khoản đến {tài khoản}: {nội dung}" -> tài khoản nhận
+_TRANSFER_RE = re.compile(r'^Chuyển khoản đến\s+([^:]+)')
+
+# Engine theo process (mỗi worker tạo một lần)
+_worker_engines = {}
+
+
+def period_bounds(period):
+    """'YYYY-MM' -> (datetime đầu kỳ, datetime đầu kỳ sau)"""
+    start = datetime.datetime.strptime(period, '%Y-%m')
+    end = (start + datetime.timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def _merchant_of(description):
+    if not description:
+        return 'Khác'
+    match = _TRANSFER_RE.match(description)
+    if match:
+        return match.group(1).strip()
+    return description.split(':', 1)[0].strip()[:60] or 'Khác'
+
+
+def _get_worker_engine(database_url):
+    engine = _worker_engines.get(database_url)
+    if engine is None:
+        engine = create_engine(database_url, pool_pre_ping=True)
+        _worker_engines[database_url] = engine
+    return engine
+
+
+def _generate_partition(database_url, period, customer_ids, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Worker: tạo sao kê cho một partition khách hàng, trả về (số khách, số giao dịch)"""
+    start, end = period_bounds(period)
+    engine = _get_worker_engine(database_url)
+    ids = list(customer_ids)
+    position = {cid: i for i, cid in enumerate(ids)}
+    n = len(ids)
+
+    opening = np.zeros(n)
+    credit = np.zeros(n)
+    debit = np.zeros(n)
+    count = np.zeros(n, dtype=np.int64)
+    running = np.zeros(n)      # số dư chạy tới dòng cuối đã xử lý
+    min_balance = np.zeros(n)
+    merchants = {}             # (pos, merchant) -> [amount, count]
+
+    with engine.connect() as conn:
+        params = {'ids': ids, 'start': start, 'end': end}
+        for customer_id, balance in conn.execute(_OPENING_SQL, params):
+            opening[position[customer_id]] = float(balance or 0)
+        running[:] = opening
+        min_balance[:] = opening
+
+        svt = {row.customer_id: float(row.earned or 0) for row in conn.execute(_SVT_SQL, params)}
+
+        result = conn.execution_options(stream_results=True).execute(_PERIOD_TX_SQL, params)
+        for rows in result.partitions(chunk_size):
+            pos = np.fromiter((position[r[0]] for r in rows), dtype=np.int64, count=len(rows))
+            amounts = np.fromiter((float(r[1] or 0) for r in rows), dtype=np.float64, count=len(rows))
+
+            # Ranh giới nhóm trong chunk (dữ liệu đã sắp theo customer_id)
+            group_starts = np.flatnonzero(np.r_[True, pos[1:] != pos[:-1]])
+            group_pos = pos[group_starts]
+
+            # Số dư chạy: cumsum toàn chunk trừ offset đầu nhóm, cộng số dư mang sang
+            cumulative = np.cumsum(amounts)
+            offsets = np.r_[0.0, cumulative[group_starts[1:] - 1]]
+            group_index = np.repeat(np.arange(len(group_starts)), np.diff(np.r_[group_starts, len(pos)]))
+            balances = cumulative - offsets[group_index] + running[group_pos][group_index]
+
+            credit[group_pos] += np.add.reduceat(np.where(amounts > 0, amounts, 0.0), group_starts)
+            debit[group_pos] += np.add.reduceat(np.where(amounts < 0, -amounts, 0.0), group_starts)
+            count[group_pos] += np.diff(np.r_[group_starts, len(pos)])
+            min_balance[group_pos] = np.minimum(min_balance[group_pos],
+                                                np.minimum.reduceat(balances, group_starts))
+            running[group_pos] = balances[np.r_[group_starts[1:], len(pos)] - 1]
+
+            for i in np.flatnonzero(amounts < 0):
+                key = (pos[i], _merchant_of(rows[i][2]))
+                entry = merchants.setdefault(key, [0.0, 0])
+                entry[0] += -amounts[i]
+                entry[1] += 1
+
+    top = {}
+    for (p, merchant), (amount, tx_count) in merchants.items():
+        top.setdefault(p, []).append({'merchant': merchant, 'amount': round(amount, 2), 'count': tx_count})
+
+    generated_at = datetime.datetime.utcnow()
+    records = []
+    for p, customer_id in enumerate(ids):
+        records.append({
+            'customer_id': customer_id,
+            'period': period,
+            'opening_balance': round(float(opening[p]), 2),
+            'closing_balance': round(float(running[p]), 2),
+            'min_balance': round(float(min_balance[p]), 2),
+            'total_credit': round(float(credit[p]), 2),
+            'total_debit': round(float(debit[p]), 2),
+            'transaction_count': int(count[p]),
+            'svt_earned': round(svt.get(customer_id, 0.0), 2),
+            'top_merchants': json.dumps(
+                sorted(top.get(p, []), key=lambda m: m['amount'], reverse=True)[:TOP_MERCHANTS],
+                ensure_ascii=False
+            ),
+            'generated_at': generated_at
+        })
+
+    # Ghi đè sao kê cũ của partition trong cùng transaction (chạy lại an toàn)
+    with engine.begin() as conn:
+        conn.execute(_DELETE_SQL, {'period': period, 'ids': ids})
+        conn.execute(_INSERT_SQL, records)
+
+    return n, int(count.sum())
+
+
+def _print_progress(progress):
+    print(f"📄 Statements {progress['period']}: {progress['done']}/{progress['total']} "
+          f"({progress['percent']:.1f}%) - {progress['rate']:,.0f} acc/s - ETA {progress['eta_seconds']:.0f}s")
+
+
+class StatementService:
+
+    def __init__(self, database_url=None, workers=None,
+                 partition_size=DEFAULT_PARTITION_SIZE, chunk_size=DEFAULT_CHUNK_SIZE):
+        if database_url is None:
+            from config import Config
+            database_url = Config.SQLALCHEMY_DATABASE_URI
+        self.database_url = database_url
+        self.workers = workers or os.cpu_count() or 1
+        self.partition_size = partition_size
+        self.chunk_size = chunk_size
+
+    def generate(self, period, resume=True, progress_callback=_print_progress):
+        """Tạo sao kê tháng `period` ('YYYY-MM') cho tất cả chủ thẻ"""
+        period_bounds(period)  # validate
+        started = time.perf_counter()
+
+        engine = create_engine(self.database_url)
+        try:
+            with engine.connect() as conn:
+                customer_ids = [row[0] for row in conn.execute(_CARD_HOLDERS_SQL)]
+                skipped = 0
+                if resume:
+                    done_ids = {row[0] for row in conn.execute(_DONE_SQL, {'period': period})}
+                    skipped = sum(1 for cid in customer_ids if cid in done_ids)
+                    customer_ids = [cid for cid in customer_ids if cid not in done_ids]
+        finally:
+            # Không để connection của process cha bị fork sang worker
+            engine.dispose()
+
+        partitions = [customer_ids[i:i + self.partition_size]
+                      for i in range(0, len(customer_ids), self.partition_size)]
+        total = len(customer_ids)
+        done = 0
+        transactions = 0
+        failed_partitions = []
+
+        def report():
+            if progress_callback:
+                elapsed = time.perf_counter() - started
+                rate = done / elapsed if elapsed > 0 else 0
+                progress_callback({
+                    'period': period,
+                    'done': done,
+                    'total': total,
+                    'percent': (done / total * 100) if total else 100.0,
+                    'rate': rate,
+                    'eta_seconds': ((total - done) / rate) if rate else 0
+                })
+
+        if self.workers <= 1 or len(partitions) <= 1:
+            for part in partitions:
+                try:
+                    accounts, tx_count = _generate_partition(self.database_url, period, part, self.chunk_size)
+                    done += accounts
+                    transactions += tx_count
+                except Exception as e:
+                    print(f"❌ Statement partition starting at {part[0]} failed: {e}")
+                    failed_partitions.append(part[0])
+                report()
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = {
+                    pool.submit(_generate_partition, self.database_url, period, part, self.chunk_size): part
+                    for part in partitions
+                }
+                for future in as_completed(futures):
+                    part = futures[future]
+                    try:
+                        accounts, tx_count = future.result()
+                        done += accounts
+                        transactions += tx_count
+                    except Exception as e:
+                        print(f"❌ Statement partition starting at {part[0]} failed: {e}")
+                        failed_partitions.append(part[0])
+                    report()
+
+        elapsed = time.perf_counter() - started
+        return {
+            'success': not failed_partitions,
+            'period': period,
+            'accounts_generated': done,
+            'accounts_skipped': skipped,
+            'transactions_processed': transactions,
+            'failed_partitions': failed_partitions,
+            'elapsed_seconds': round(elapsed, 2),
+            'accounts_per_second': round(done / elapsed, 1) if elapsed > 0 else None
+        }
+
+    @staticmethod
+    def get_statements(customer_id, period=None):
+        """Đọc sao kê đã tạo của khách hàng (mới nhất trước)"""
+        from models.statements import HDBankStatement
+        try:
+            q = HDBankStatement.query.filter_by(customer_id=customer_id)
+            if period:
+                q = q.filter_by(period=period)
+            statements = q.order_by(HDBankStatement.period.desc()).all()
+            return {
+                'success': True,
+                'customer_id': customer_id,
+                'statements': [s.to_dict() for s in statements]
+            }
+        except Exception as e:
+            print(f"❌ Error getting statements: {e}")
+            return {'success': False, 'error': str(e)}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Generate HDBank monthly statements')
+    parser.add_argument('--period', required=True, help="Kỳ sao kê 'YYYY-MM'")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--partition-size', type=int, default=DEFAULT_PARTITION_SIZE)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--no-resume', action='store_true', help='Tạo lại cả sao kê đã có')
+    args = parser.parse_args()
+
+    service = StatementService(args.database_url, args.workers, args.partition_size, args.chunk_size)
+    print(json.dumps(service.generate(args.period, resume=not args.no_resume), indent=2))
@@ -5,28 +5,54 @@ Vietjet flight booking service
 """
 
 import datetime
+import time
 import uuid
 import random
 from models.database import db
 from models.flights import VietjetFlight
 import models.transactions as tx_models
+from services.id_generator import new_id, new_ids
+from services.flight_schedule import get_schedule_index, TICKET_CLASSES
+from services.itinerary_search import ItinerarySearch, validate_search_params
+from services import domain_events, seat_inventory
+from services.cache import TTLCache
+from services.pagination import encode_cursor, decode_cursor
+
+
+DEFAULT_HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 200
+TOP_ROUTES = 5
+MAX_GROUP_PASSENGERS = 200
+
+# Thống kê lịch sử đặt vé theo khách hàng; xóa khi khách đặt vé mới
+_history_stats_cache = TTLCache(ttl=600)
 
 
 def _TokenTransaction():
     return getattr(tx_models, 'TokenTransaction', None)
 
 
+def invalidate_booking_statistics(customer_id):
+    """Xóa thống kê lịch sử đã cache sau khi khách hàng đặt vé"""
+    try:
+        _history_stats_cache.invalidate(int(customer_id))
+    except (TypeError, ValueError):
+        pass
+
+
 class VietjetService:
 
     def book_flight(
         self,
         customer_id,
-        origin="HAN",
-        destination="SGN",
+        origin=None,
+        destination=None,
         flight_date=None,
         ticket_class="economy",
         booking_value=2500000,
-        passengers=1
+        passengers=1,
+        flight_number=None,
+        hold_id=None
     ):
         try:
             print(f"🔍 VietjetService.book_flight called with customer_id={customer_id}")
@@ -35,26 +61,59 @@ class VietjetService:
                 return {"success": False, "message": "customer_id is required"}
 
             # Sinh flight_id
-            import time
-            flight_id = f"VJ{int(time.time() * 1000)}"
+            flight_id = new_id("VJ")
             print(f"🔍 Generated flight_id: {flight_id}")
 
-            # Parse flight_date an toàn
-            if flight_date:
-                try:
-                    if isinstance(flight_date, str):
-                        flight_datetime = datetime.datetime.strptime(flight_date, "%Y-%m-%d")
-                    elif isinstance(flight_date, datetime.datetime):
-                        flight_datetime = flight_date
-                    else:
-                        raise ValueError("flight_date phải là chuỗi 'YYYY-MM-DD' hoặc datetime object")
-                except Exception as e:
-                    return {"success": False, "message": f"Ngày bay không hợp lệ: {str(e)}"}
+            if hold_id:
+                # Xác nhận giữ chỗ: ghế đã được trừ khỏi kho lúc giữ, tuyến lấy từ chuyến đã giữ
+                confirmed, error = self._confirm_hold(hold_id, customer_id, origin, destination)
+                if confirmed is None:
+                    db.session.rollback()
+                    return {"success": False, "message": error}
+                hold, inventory, (origin, destination) = confirmed
+                passengers = hold.seats
+                ticket_class = inventory.ticket_class
+                flight_number = inventory.flight_number
+                flight_datetime = datetime.datetime.combine(inventory.flight_date, datetime.time())
             else:
-                flight_datetime = datetime.datetime.now() + datetime.timedelta(days=random.randint(7, 30))
-
-            print(f"🔍 Flight datetime: {flight_datetime}")
-            print(f"🔍 About to create VietjetFlight object...")
+                origin = (origin or "HAN").strip().upper()
+                destination = (destination or "SGN").strip().upper()
+                if origin == destination:
+                    return {"success": False, "message": "Điểm khởi hành và điểm đến không thể giống nhau"}
+
+                # Parse flight_date an toàn
+                if flight_date:
+                    try:
+                        if isinstance(flight_date, str):
+                            flight_datetime = datetime.datetime.strptime(flight_date, "%Y-%m-%d")
+                        elif isinstance(flight_date, datetime.datetime):
+                            flight_datetime = flight_date
+                        else:
+                            raise ValueError("flight_date phải là chuỗi 'YYYY-MM-DD' hoặc datetime object")
+                    except Exception as e:
+                        return {"success": False, "message": f"Ngày bay không hợp lệ: {str(e)}"}
+                else:
+                    flight_datetime = datetime.datetime.now() + datetime.timedelta(days=random.randint(7, 30))
+
+                if ticket_class not in TICKET_CLASSES:
+                    return {"success": False, "message": f"Hạng vé không hợp lệ: {ticket_class}"}
+                if not isinstance(passengers, int) or passengers < 1:
+                    return {"success": False, "message": "Số hành khách không hợp lệ"}
+
+                flight = self._resolve_flight(origin, destination, flight_datetime.date(), flight_number)
+                if flight is None:
+                    return {"success": False,
+                            "message": f"Không có chuyến bay {origin}-{destination} ngày {flight_datetime:%Y-%m-%d}"}
+                flight_number = flight["flight_number"]
+
+                # Trừ ghế có điều kiện - không bao giờ bán quá sức chứa
+                inventory_id = seat_inventory.get_or_create_inventory(
+                    flight_number, flight_datetime.date(), ticket_class, flight["seats"][ticket_class],
+                    origin, destination)
+                if not seat_inventory.reserve(inventory_id, passengers):
+                    db.session.rollback()
+                    return {"success": False,
+                            "message": f"Chuyến bay {flight_number} đã hết ghế hạng {ticket_class}"}
 
             # Tạo booking
             new_flight = VietjetFlight(
@@ -66,21 +125,9 @@ class VietjetService:
                 ticket_class=ticket_class,
                 booking_value=booking_value * passengers,
             )
-
-            print(f"🔍 VietjetFlight object created: {new_flight}")
-            print(f"🔍 About to add to db.session...")
-
             db.session.add(new_flight)
-            print(f"🔍 Added to session, about to calculate SVT reward...")
-
-            # Tính SVT reward dựa trên route
-            if origin in ["HAN", "SGN", "DAD"] and destination in ["HAN", "SGN", "DAD"]:
-                svt_reward = 50  # Domestic
-            else:
-                svt_reward = 200  # International
 
-            if origin == destination:
-                return {"success": False, "message": "Điểm khởi hành và điểm đến không thể giống nhau"}
+            svt_reward = self._route_svt_reward(origin, destination)
 
             # Thêm SVT token transaction (dynamic model access)
             TTx = _TokenTransaction()
@@ -97,6 +144,9 @@ class VietjetService:
             db.session.add(token_tx)
 
             db.session.commit()
+            invalidate_booking_statistics(customer_id)
+            domain_events.publish(domain_events.FLIGHT_BOOKED, customer_id, passengers=passengers,
+                                  booking_value=booking_value * passengers, origin=origin, destination=destination)
 
             return {
                 "success": True,
@@ -104,9 +154,11 @@ class VietjetService:
                 "flight_id": flight_id,
                 "svt_reward": svt_reward,
                 "flight_details": {
+                    "flight_number": flight_number,
                     "origin": origin,
                     "destination": destination,
                     "ticket_class": ticket_class,
+                    "passengers": passengers,
                     "booking_value": booking_value * passengers,
                     "flight_date": flight_datetime.strftime("%Y-%m-%d"),
                 },
@@ -117,15 +169,225 @@ class VietjetService:
             print(f"Error booking flight: {repr(e)}")
             return {"success": False, "message": f"Lỗi đặt vé: {str(e)}"}
 
-    def get_booking_history(self, customer_id):
-        """Lấy lịch sử đặt vé của khách hàng"""
+    def book_group(self, customer_id, origin, destination, flight_date, passengers,
+                   ticket_class="economy", fare_per_passenger=2500000, flight_number=None, hold_id=None):
+        """Đặt vé đoàn: giữ N ghế một lần, ghi bulk vé + SVT reward từng hành khách trong một transaction"""
+        started = time.perf_counter()
         try:
-            flights = (
-                VietjetFlight.query.filter_by(customer_id=customer_id)
-                .order_by(VietjetFlight.flight_date.desc())
+            if not customer_id:
+                return {"success": False, "message": "customer_id is required"}
+            if not isinstance(passengers, list) or not passengers:
+                return {"success": False, "message": "passengers phải là danh sách hành khách"}
+            if len(passengers) > MAX_GROUP_PASSENGERS:
+                return {"success": False, "message": f"Tối đa {MAX_GROUP_PASSENGERS} hành khách mỗi lần đặt"}
+            names = []
+            for i, passenger in enumerate(passengers):
+                name = passenger.get("name") if isinstance(passenger, dict) else passenger
+                if not isinstance(name, str) or not name.strip():
+                    return {"success": False, "message": f"Hành khách #{i + 1} thiếu tên"}
+                names.append(name.strip()[:100])
+            try:
+                fare = float(fare_per_passenger)
+            except (TypeError, ValueError):
+                return {"success": False, "message": "fare_per_passenger không hợp lệ"}
+            TTx = _TokenTransaction()
+            if not TTx:
+                raise RuntimeError("TokenTransaction model not initialized")
+
+            seats = len(names)
+            if hold_id:
+                confirmed, error = self._confirm_hold(hold_id, customer_id, origin, destination)
+                if confirmed is None:
+                    db.session.rollback()
+                    return {"success": False, "message": error}
+                hold, inventory, (origin, destination) = confirmed
+                if hold.seats != seats:
+                    db.session.rollback()
+                    return {"success": False,
+                            "message": f"Giữ chỗ có {hold.seats} ghế nhưng danh sách có {seats} hành khách"}
+                ticket_class = inventory.ticket_class
+                flight_number = inventory.flight_number
+                date = inventory.flight_date
+            else:
+                origin = (origin or "HAN").strip().upper()
+                destination = (destination or "SGN").strip().upper()
+                if origin == destination:
+                    return {"success": False, "message": "Điểm khởi hành và điểm đến không thể giống nhau"}
+                if ticket_class not in TICKET_CLASSES:
+                    return {"success": False, "message": f"Hạng vé không hợp lệ: {ticket_class}"}
+                try:
+                    date = datetime.datetime.strptime(flight_date, "%Y-%m-%d").date()
+                except (TypeError, ValueError):
+                    return {"success": False, "message": "Ngày bay không hợp lệ, định dạng YYYY-MM-DD"}
+                flight = self._resolve_flight(origin, destination, date, flight_number)
+                if flight is None:
+                    return {"success": False, "message": f"Không có chuyến bay {origin}-{destination} ngày {date}"}
+                flight_number = flight["flight_number"]
+
+                # Một câu UPDATE có điều kiện cho cả đoàn: đủ N ghế hoặc không giữ ghế nào
+                inventory_id = seat_inventory.get_or_create_inventory(
+                    flight_number, date, ticket_class, flight["seats"][ticket_class],
+                    origin, destination)
+                if not seat_inventory.reserve(inventory_id, seats):
+                    db.session.rollback()
+                    return {"success": False,
+                            "message": f"Chuyến bay {flight_number} không đủ {seats} ghế hạng {ticket_class}"}
+
+            group_id = new_id("GRP")
+            ticket_ids = new_ids(seats, "VJ")
+            svt_reward = self._route_svt_reward(origin, destination)
+            flight_datetime = datetime.datetime.combine(date, datetime.time())
+            now = datetime.datetime.utcnow()
+
+            ticket_rows = [{
+                "flight_id": ticket_ids[i],
+                "customer_id": customer_id,
+                "flight_date": flight_datetime,
+                "origin": origin,
+                "destination": destination,
+                "ticket_class": ticket_class,
+                "booking_value": fare,
+                "passenger_name": names[i],
+                "booking_group_id": group_id,
+                "created_at": now,
+            } for i in range(seats)]
+            reward_rows = [{
+                "customer_id": customer_id,
+                "transaction_type": "service_reward",
+                "amount": svt_reward,
+                "description": f"Vietjet group booking {group_id}: {origin}-{destination} - {names[i]}",
+                "tx_hash": f"0x{uuid.uuid4().hex}",
+                "block_number": random.randint(1000000, 2000000),
+                "created_at": now,
+            } for i in range(seats)]
+
+            db.session.execute(VietjetFlight.__table__.insert(), ticket_rows)
+            db.session.execute(TTx.__table__.insert(), reward_rows)
+            db.session.commit()
+            invalidate_booking_statistics(customer_id)
+            domain_events.publish(domain_events.FLIGHT_BOOKED, customer_id, passengers=seats,
+                                  booking_value=fare * seats, origin=origin, destination=destination)
+
+            return {
+                "success": True,
+                "message": f"Đặt {seats} vé {origin}-{destination} thành công!",
+                "booking_group_id": group_id,
+                "flight_number": flight_number,
+                "flight_date": date.strftime("%Y-%m-%d"),
+                "ticket_class": ticket_class,
+                "passenger_count": seats,
+                "total_value": fare * seats,
+                "svt_reward": svt_reward * seats,
+                "manifest": [{
+                    "seq": i + 1,
+                    "flight_id": ticket_ids[i],
+                    "passenger_name": names[i],
+                    "booking_value": fare,
+                    "svt_reward": svt_reward,
+                } for i in range(seats)],
+                "processing_time_ms": round((time.perf_counter() - started) * 1000, 2),
+            }
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error booking group: {e}")
+            return {"success": False, "message": f"Lỗi đặt vé đoàn: {str(e)}"}
+
+    def get_group_manifest(self, customer_id, booking_group_id):
+        """Danh sách hành khách của một lần đặt vé đoàn"""
+        try:
+            tickets = (
+                VietjetFlight.query.filter_by(customer_id=customer_id, booking_group_id=booking_group_id)
+                .order_by(VietjetFlight.id)
                 .all()
             )
+            if not tickets:
+                return {"success": False, "message": "Không tìm thấy đặt vé đoàn"}
+            return {
+                "success": True,
+                "booking_group_id": booking_group_id,
+                "origin": tickets[0].origin,
+                "destination": tickets[0].destination,
+                "flight_date": tickets[0].flight_date.strftime("%Y-%m-%d"),
+                "ticket_class": tickets[0].ticket_class,
+                "passenger_count": len(tickets),
+                "total_value": sum(float(t.booking_value) for t in tickets),
+                "manifest": [{
+                    "seq": i + 1,
+                    "flight_id": t.flight_id,
+                    "passenger_name": t.passenger_name,
+                    "booking_value": float(t.booking_value),
+                } for i, t in enumerate(tickets)],
+            }
+        except Exception as e:
+            print(f"❌ Error getting group manifest: {e}")
+            return {"success": False, "message": f"Lỗi lấy danh sách hành khách: {str(e)}"}
 
+    def hold_seats(self, customer_id, origin, destination, flight_date, ticket_class="economy",
+                   seats=1, flight_number=None):
+        """Giữ ghế tạm thời (hết hạn sau HOLD_TTL_SECONDS), xác nhận bằng book_flight(hold_id=...)"""
+        try:
+            if not customer_id:
+                return {"success": False, "message": "customer_id is required"}
+            if ticket_class not in TICKET_CLASSES:
+                return {"success": False, "message": f"Hạng vé không hợp lệ: {ticket_class}"}
+            if not isinstance(seats, int) or seats < 1:
+                return {"success": False, "message": "Số ghế không hợp lệ"}
+            try:
+                date = datetime.datetime.strptime(flight_date, "%Y-%m-%d").date()
+            except (TypeError, ValueError):
+                return {"success": False, "message": "Ngày bay không hợp lệ, định dạng YYYY-MM-DD"}
+
+            flight = self._resolve_flight(origin, destination, date, flight_number)
+            if flight is None:
+                return {"success": False, "message": f"Không có chuyến bay {origin}-{destination} ngày {flight_date}"}
+
+            inventory_id = seat_inventory.get_or_create_inventory(
+                flight["flight_number"], date, ticket_class, flight["seats"][ticket_class],
+                origin.upper(), destination.upper())
+            hold = seat_inventory.hold_seats(customer_id, inventory_id, seats)
+            if hold is None:
+                return {"success": False,
+                        "message": f"Chuyến bay {flight['flight_number']} đã hết ghế hạng {ticket_class}"}
+            return {
+                "success": True,
+                "flight_number": flight["flight_number"],
+                "flight_date": flight_date,
+                "ticket_class": ticket_class,
+                **hold.to_dict()
+            }
+
+        except Exception as e:
+            print(f"❌ Error holding seats: {e}")
+            return {"success": False, "message": f"Lỗi giữ chỗ: {str(e)}"}
+
+    def release_hold(self, customer_id, hold_id):
+        """Hủy giữ chỗ và trả ghế về kho"""
+        try:
+            if not seat_inventory.release_hold(hold_id, customer_id):
+                return {"success": False, "message": "Giữ chỗ không tồn tại hoặc đã hết hiệu lực"}
+            return {"success": True, "message": "Đã hủy giữ chỗ", "hold_id": hold_id}
+        except Exception as e:
+            print(f"❌ Error releasing seat hold: {e}")
+            return {"success": False, "message": f"Lỗi hủy giữ chỗ: {str(e)}"}
+
+    def get_booking_history(self, customer_id, limit=DEFAULT_HISTORY_PAGE_SIZE, cursor=None):
+        """Lấy lịch sử đặt vé của khách hàng (phân trang keyset theo flight_date, id)"""
+        try:
+            limit = max(1, min(int(limit or DEFAULT_HISTORY_PAGE_SIZE), MAX_HISTORY_PAGE_SIZE))
+
+            # Dùng index (customer_id, flight_date, id)
+            q = VietjetFlight.query.filter(VietjetFlight.customer_id == customer_id)
+            if cursor:
+                cursor_date, cursor_id = decode_cursor(cursor)
+                q = q.filter(db.or_(
+                    VietjetFlight.flight_date < cursor_date,
+                    db.and_(VietjetFlight.flight_date == cursor_date, VietjetFlight.id < cursor_id)
+                ))
+            flights = q.order_by(VietjetFlight.flight_date.desc(), VietjetFlight.id.desc()).limit(limit + 1).all()
+
+            has_more = len(flights) > limit
+            flights = flights[:limit]
             flight_data = []
             for flight in flights:
                 flight_data.append({
@@ -135,30 +397,61 @@ class VietjetService:
                     "destination": flight.destination,
                     "ticket_class": flight.ticket_class,
                     "booking_value": float(flight.booking_value),
-                    "created_at": flight.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+                    "created_at": flight.created_at.strftime("%Y-%m-%d %H:%M:%S") if flight.created_at else None,
                 })
 
-            # Tính thống kê
-            total_flights = len(flights)
-            total_spending = sum(float(f.booking_value) for f in flights)
-            business_flights = sum(1 for f in flights if f.ticket_class == "business")
-
             return {
                 "success": True,
                 "customer_id": customer_id,
                 "flights": flight_data,
-                "statistics": {
-                    "total_flights": total_flights,
-                    "total_spending": total_spending,
-                    "business_flights": business_flights,
-                    "favorite_route": f"{flights[0].origin}-{flights[0].destination}" if flights else "Chưa có",
-                },
+                "count": len(flight_data),
+                "has_more": has_more,
+                "next_cursor": encode_cursor(flights[-1].flight_date, flights[-1].id) if has_more else None,
+                "statistics": self.get_booking_statistics(customer_id),
             }
 
+        except ValueError as e:
+            return {"success": False, "invalid_params": True, "message": f"Tham số không hợp lệ: {e}"}
         except Exception as e:
             print(f"Error getting booking history: {e}")
             return {"success": False, "message": f"Lỗi lấy lịch sử: {str(e)}"}
 
+    def get_booking_statistics(self, customer_id):
+        """Thống kê toàn bộ lịch sử đặt vé bằng một truy vấn GROUP BY tuyến (có cache)"""
+        key = int(customer_id)
+        cached = _history_stats_cache.get(key)
+        if cached is not None:
+            return cached
+
+        flight_count = db.func.count(VietjetFlight.id)
+        rows = (
+            db.session.query(
+                VietjetFlight.origin,
+                VietjetFlight.destination,
+                flight_count.label("flights"),
+                db.func.coalesce(db.func.sum(VietjetFlight.booking_value), 0).label("spending"),
+                db.func.sum(db.case((VietjetFlight.ticket_class == "business", 1), else_=0)).label("business"),
+            )
+            .filter(VietjetFlight.customer_id == customer_id)
+            .group_by(VietjetFlight.origin, VietjetFlight.destination)
+            .all()
+        )
+
+        routes = sorted(
+            ({"route": f"{r.origin}-{r.destination}", "flights": int(r.flights),
+              "spending": float(r.spending or 0)} for r in rows),
+            key=lambda r: (-r["flights"], -r["spending"], r["route"])
+        )
+        statistics = {
+            "total_flights": sum(r["flights"] for r in routes),
+            "total_spending": sum(r["spending"] for r in routes),
+            "business_flights": sum(int(r.business or 0) for r in rows),
+            "favorite_route": routes[0]["route"] if routes else "Chưa có",
+            "top_routes": routes[:TOP_ROUTES],
+        }
+        _history_stats_cache.set(key, statistics)
+        return statistics
+
     def get_flight_routes(self):
         """Lấy danh sách tuyến bay có sẵn"""
         return [
@@ -175,61 +468,165 @@ class VietjetService:
         ]
 
     def search_flights(self, origin, destination, departure_date, return_date=None):
-        """Tìm kiếm chuyến bay (mock data)"""
+        """Tìm chuyến bay theo tuyến và ngày từ schedule index"""
         try:
-            flights = []
-            base_price = self._calculate_flight_price(origin, destination, "economy")
-
-            for i in range(3):
-                departure_time = f"{6 + i * 4:02d}:{random.randint(0, 5) * 10:02d}"
-                arrival_time = f"{8 + i * 4:02d}:{random.randint(0, 5) * 10:02d}"
-
-                flights.append({
-                    "flight_number": f"VJ{100 + i * 10}",
-                    "origin": origin.upper(),
-                    "destination": destination.upper(),
-                    "departure_date": departure_date,
-                    "departure_time": departure_time,
-                    "arrival_time": arrival_time,
-                    "aircraft": "Airbus A321",
-                    "prices": {
-                        "economy": base_price,
-                        "business": base_price * 2.5,
-                    },
-                    "available_seats": {
-                        "economy": random.randint(50, 180),
-                        "business": random.randint(5, 20),
-                    },
-                })
-
-            return {
+            origin, destination = origin.upper(), destination.upper()
+            try:
+                departure = datetime.datetime.strptime(departure_date, "%Y-%m-%d").date()
+                returning = datetime.datetime.strptime(return_date, "%Y-%m-%d").date() if return_date else None
+            except (TypeError, ValueError):
+                return {"success": False, "error": "Ngày bay không hợp lệ, định dạng YYYY-MM-DD"}
+
+            result = {
                 "success": True,
-                "origin": origin.upper(),
-                "destination": destination.upper(),
+                "origin": origin,
+                "destination": destination,
                 "departure_date": departure_date,
-                "flights": flights,
+                "flights": self._search_day(origin, destination, departure, departure_date),
             }
+            if returning:
+                result["return_date"] = return_date
+                result["return_flights"] = self._search_day(destination, origin, returning, return_date)
+            return result
 
         except Exception as e:
             print(f"❌ Error searching flights: {e}")
             return {"success": False, "error": str(e)}
 
-    def _calculate_flight_price(self, origin, destination, ticket_class):
-        """Helper: Tính giá vé dựa trên tuyến bay"""
-        domestic_routes = ["SGN", "HAN", "DAD", "CXR", "PQC"]
+    def get_fare_calendar(self, origin, destination, month=None, date_from=None, date_to=None,
+                          ticket_class="economy"):
+        """Lịch giá thấp nhất theo ngày cho một tháng ('YYYY-MM') hoặc khoảng ngày"""
+        try:
+            origin, destination = origin.upper(), destination.upper()
+            if ticket_class not in TICKET_CLASSES:
+                return {"success": False, "error": f"Hạng vé không hợp lệ: {ticket_class}"}
+            try:
+                if month:
+                    first = datetime.datetime.strptime(month, "%Y-%m").date()
+                    last = (first + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
+                else:
+                    first = datetime.datetime.strptime(date_from, "%Y-%m-%d").date()
+                    last = datetime.datetime.strptime(date_to, "%Y-%m-%d").date() if date_to \
+                        else first + datetime.timedelta(days=30)
+            except (TypeError, ValueError):
+                return {"success": False, "error": "Cần month=YYYY-MM hoặc date_from=YYYY-MM-DD"}
+            if last < first or (last - first).days > 366:
+                return {"success": False, "error": "Khoảng ngày không hợp lệ"}
+
+            days = get_schedule_index().lowest_fares(origin, destination, first, last, ticket_class)
+            priced = [d for d in days if d["lowest_fare"] is not None]
+            return {
+                "success": True,
+                "origin": origin,
+                "destination": destination,
+                "ticket_class": ticket_class,
+                "date_from": first.strftime("%Y-%m-%d"),
+                "date_to": last.strftime("%Y-%m-%d"),
+                "days": days,
+                "cheapest_day": min(priced, key=lambda d: d["lowest_fare"]) if priced else None,
+            }
+
+        except Exception as e:
+            print(f"❌ Error building fare calendar: {e}")
+            return {"success": False, "error": str(e)}
+
+    def search_itineraries(self, origin, destination, departure_date, k=5, mode="cheapest",
+                           ticket_class="economy", max_stops=2, min_connection=60):
+        """Tìm k hành trình (bay thẳng hoặc nối chuyến) rẻ nhất / nhanh nhất"""
+        try:
+            origin, destination = origin.upper(), destination.upper()
+            try:
+                departure = datetime.datetime.strptime(departure_date, "%Y-%m-%d").date()
+            except (TypeError, ValueError):
+                return {"success": False, "error": "Ngày bay không hợp lệ, định dạng YYYY-MM-DD"}
+            error = validate_search_params(k, mode, ticket_class, max_stops, min_connection)
+            if error:
+                return {"success": False, "error": error}
+            if origin == destination:
+                return {"success": False, "error": "Điểm khởi hành và điểm đến không thể giống nhau"}
 
-        if origin in domestic_routes and destination in domestic_routes:
-            base_price = 1500000  # Domestic flight
-        else:
-            base_price = 3500000  # International flight
+            itineraries = ItinerarySearch().search(
+                origin, destination, departure, k=k, mode=mode, ticket_class=ticket_class,
+                min_connection=min_connection, max_stops=max_stops
+            )
+            return {
+                "success": True,
+                "origin": origin,
+                "destination": destination,
+                "departure_date": departure_date,
+                "mode": mode,
+                "itineraries": itineraries,
+            }
 
-        if ticket_class == "business":
-            base_price *= 2.5
-        elif ticket_class == "premium_economy":
-            base_price *= 1.5
+        except Exception as e:
+            print(f"❌ Error searching itineraries: {e}")
+            return {"success": False, "error": str(e)}
 
-        variation = random.uniform(0.8, 1.2)
-        return int(base_price * variation)
+    def _confirm_hold(self, hold_id, customer_id, origin=None, destination=None):
+        """Helper: Xác nhận giữ chỗ (chưa commit) và lấy tuyến của chuyến đã giữ
+
+        Trả về ((hold, inventory, (origin, destination)), None), hoặc (None, thông báo lỗi)
+        khi hold không còn hiệu lực hay tuyến yêu cầu khác tuyến của chuyến đã giữ.
+        """
+        confirmed = seat_inventory.confirm_hold(hold_id, customer_id)
+        if confirmed is None:
+            return None, "Giữ chỗ không tồn tại hoặc đã hết hạn"
+        hold, inventory = confirmed
+        if inventory.origin and inventory.destination:
+            route = (inventory.origin, inventory.destination)
+        else:
+            # Dòng tồn kho tạo trước khi lưu tuyến: tra theo lịch bay
+            route = get_schedule_index().route_of(inventory.flight_number, inventory.flight_date)
+        if route is None:
+            return None, f"Không xác định được tuyến của chuyến bay {inventory.flight_number}"
+        requested = ((origin or route[0]).upper(), (destination or route[1]).upper())
+        if requested != route:
+            return None, (f"Giữ chỗ thuộc chuyến {inventory.flight_number} {route[0]}-{route[1]}, "
+                          f"không phải {requested[0]}-{requested[1]}")
+        return (hold, inventory, route), None
+
+    def _resolve_flight(self, origin, destination, date, flight_number=None):
+        """Helper: Chuyến bay trong lịch (theo số hiệu, hoặc chuyến sớm nhất trong ngày)"""
+        flights = get_schedule_index().flights(origin.upper(), destination.upper(), date)
+        if flight_number:
+            return next((f for f in flights if f["flight_number"] == flight_number), None)
+        return flights[0] if flights else None
+
+    def _search_day(self, origin, destination, date, departure_date):
+        """Helper: Chuyến bay trong ngày kèm số ghế còn lại (một truy vấn tồn kho)"""
+        flights = get_schedule_index().flights(origin, destination, date)
+        available = seat_inventory.availability([f["flight_number"] for f in flights], date)
+        results = []
+        for flight in flights:
+            result = self._search_result(flight, origin, destination, departure_date)
+            result["available_seats"] = {
+                c: available.get((flight["flight_number"], c), capacity)
+                for c, capacity in flight["seats"].items()
+            }
+            results.append(result)
+        return results
+
+    def _search_result(self, flight, origin, destination, departure_date):
+        """Helper: Chuyển chuyến bay trong index sang định dạng kết quả tìm kiếm"""
+        return {
+            "flight_number": flight["flight_number"],
+            "origin": origin,
+            "destination": destination,
+            "departure_date": departure_date,
+            "departure_time": flight["departure_time"],
+            "arrival_time": flight["arrival_time"],
+            "arrival_day_offset": flight["arrival_day_offset"],
+            "duration_minutes": flight["duration_minutes"],
+            "aircraft": flight["aircraft"],
+            "prices": flight["prices"],
+            "available_seats": flight["seats"],
+        }
+
+    def _route_svt_reward(self, origin, destination):
+        """Helper: SVT reward mỗi vé theo tuyến"""
+        if origin in ["HAN", "SGN", "DAD"] and destination in ["HAN", "SGN", "DAD"]:
+            return 50  # Domestic
+        return 200  # International
 
     def _calculate_flight_svt_reward(self, booking_value, ticket_class):
         """Helper: Tính SVT reward cho đặt vé"""
@@ -0,0 +1,304 @@
+# services/voucher_pool.py
+# -*- coding: utf-8 -*-
+"""
+Voucher code pool for marketplace items
+
+Mã voucher được sinh sẵn theo lô cho từng MarketplaceItem và gán cho khách
+ngay trong transaction mua hàng:
+
+- Sinh mã: numpy lấy 60 bit ngẫu nhiên cho mỗi mã từ os.urandom (mã phải
+  không đoán được, nên không dùng PRNG có seed), loại trùng trong lô bằng
+  np.unique và giữa các lô bằng một tập hash đã sắp xếp; mã được mã hóa thành
+  12 ký tự base32 (Crockford) và ghi bằng bulk insert.
+- code_hash: 60 bit của mã được trộn qua hàm splitmix64 thành một BIGINT có
+  unique index. Đổi mã chỉ là một lần tra index này; unique index cũng là chốt
+  chặn trùng mã giữa nhiều process sinh mã cùng lúc.
+- Bloom filter trong bộ nhớ chứa hash của mọi mã đã sinh, nên mã gõ sai / đoán
+  bừa bị từ chối mà không chạm database. Filter nạp lười từ database, cập nhật
+  mã mới của process khác theo id sau tối đa BLOOM_REFRESH_SECONDS giây.
+- Gán mã: SELECT ... FOR UPDATE SKIP LOCKED các mã còn trống rồi UPDATE có
+  điều kiện status = 'available', trong cùng transaction với giao dịch SVT.
+"""
+
+import datetime
+import math
+import os
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import bindparam
+from sqlalchemy.exc import IntegrityError
+
+from models.database import db
+from models.marketplace import MarketplaceItem, VoucherCode
+
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'  # Crockford base32, bỏ I L O U
+CODE_LENGTH = 12                               # 12 ký tự x 5 bit = 60 bit
+GENERATE_CHUNK = 100000                        # số mã mỗi lần bulk insert
+LOOKUP_CHUNK = 1000
+BLOOM_BITS_PER_CODE = 10                       # ~1% dương tính giả với 7 hàm hash
+BLOOM_HASHES = 7
+BLOOM_MIN_CAPACITY = 1 << 20
+BLOOM_REFRESH_SECONDS = 30
+
+_ALPHABET_BYTES = np.frombuffer(ALPHABET.encode(), dtype=np.uint8)
+_DECODE = {char: value for value, char in enumerate(ALPHABET)}
+_DECODE.update({'O': 0, 'I': 1, 'L': 1})
+_MASK64 = (1 << 64) - 1
+
+
+class VoucherPoolExhausted(Exception):
+    """Vật phẩm có kho mã nhưng không còn đủ mã trống"""
+
+
+# ---------------------------------------------------------------- mã hóa mã
+
+def _mix(values):
+    """splitmix64 finalizer trên mảng uint64 -> mảng int64 (giá trị lưu ở code_hash)"""
+    z = values.astype(np.uint64, copy=True)
+    z ^= z >> np.uint64(30)
+    z *= np.uint64(0xbf58476d1ce4e5b9)
+    z ^= z >> np.uint64(27)
+    z *= np.uint64(0x94d049bb133111eb)
+    z ^= z >> np.uint64(31)
+    return z.view(np.int64)
+
+
+def _encode(values):
+    """Mảng giá trị 60 bit -> danh sách mã 12 ký tự"""
+    shifts = np.arange(CODE_LENGTH - 1, -1, -1, dtype=np.uint64) * np.uint64(5)
+    digits = (values[:, None] >> shifts[None, :]) & np.uint64(31)
+    chars = np.ascontiguousarray(_ALPHABET_BYTES[digits])
+    return [code.decode() for code in chars.view(f'S{CODE_LENGTH}').ravel()]
+
+
+def normalize_code(code):
+    """Chuẩn hóa mã khách nhập (bỏ '-', khoảng trắng, chữ thường, O/I/L); None nếu sai định dạng"""
+    if not isinstance(code, str):
+        return None
+    code = code.replace('-', '').replace(' ', '').upper()
+    if len(code) != CODE_LENGTH or any(char not in _DECODE for char in code):
+        return None
+    return ''.join(ALPHABET[_DECODE[char]] for char in code)
+
+
+def code_hash(code):
+    """code_hash của một mã đã chuẩn hóa"""
+    value = 0
+    for char in code:
+        value = (value << 5) | _DECODE[char]
+    return int(_mix(np.array([value], dtype=np.uint64))[0])
+
+
+def format_code(code):
+    """XXXX-XXXX-XXXX để hiển thị"""
+    return '-'.join(code[i:i + 4] for i in range(0, len(code), 4))
+
+
+def _random_values(count):
+    return np.frombuffer(os.urandom(8 * count), dtype=np.uint64) >> np.uint64(64 - 5 * CODE_LENGTH)
+
+
+# ------------------------------------------------------------- bloom filter
+
+class VoucherBloomFilter:
+    """Bloom filter trên code_hash (bit array numpy, double hashing)"""
+
+    def __init__(self, capacity, bits_per_code=BLOOM_BITS_PER_CODE, hashes=BLOOM_HASHES):
+        self.capacity = capacity
+        self.hashes = hashes
+        self.size = max(8, math.ceil(capacity * bits_per_code / 8) * 8)
+        self.bits = np.zeros(self.size // 8, dtype=np.uint8)
+        self.count = 0
+
+    def add(self, hashes):
+        """Thêm một mảng code_hash"""
+        if not len(hashes):
+            return
+        h = np.asarray(hashes, dtype=np.int64).view(np.uint64)
+        h1 = h & np.uint64(0xffffffff)
+        h2 = (h >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(self.hashes, dtype=np.uint64)
+        positions = ((h1[:, None] + steps[None, :] * h2[:, None]) % np.uint64(self.size)).ravel()
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3),
+                         np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+        self.count += len(h)
+
+    def might_contain(self, value):
+        """False nghĩa là chắc chắn chưa từng sinh mã này"""
+        h = value & _MASK64
+        h1, h2 = h & 0xffffffff, (h >> 32) | 1
+        bits = self.bits
+        for step in range(self.hashes):
+            position = (h1 + step * h2) % self.size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+# --------------------------------------------------------------------- pool
+
+class VoucherPool:
+    """Sinh, gán và tra cứu mã voucher; giữ Bloom filter của process"""
+
+    def __init__(self):
+        self._bloom = None
+        self._max_id = 0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    # -------------------------------------------------------------- sinh mã
+
+    def generate(self, item_id, count):
+        """Sinh `count` mã mới cho vật phẩm, cộng vào tồn kho; trả về số lượng tồn kho mới"""
+        seen = np.empty(0, dtype=np.int64)  # hash đã sinh trong lần gọi này (đã sắp xếp)
+        remaining = count
+        quantity = None
+        while remaining > 0:
+            size = min(GENERATE_CHUNK, remaining)
+            values, hashes = self._fresh_chunk(size, seen)
+            try:
+                quantity = self._insert_chunk(item_id, values, hashes)
+            except IntegrityError:
+                # Trùng hash với mã đã có trong database (process khác / lần sinh trước): bỏ các mã đó
+                db.session.rollback()
+                taken = self._existing_hashes(hashes)
+                keep = ~np.isin(hashes, taken)
+                values, hashes = values[keep], hashes[keep]
+                quantity = self._insert_chunk(item_id, values, hashes)
+            seen = np.union1d(seen, hashes)
+            remaining -= len(values)
+        with self._lock:
+            # Lần tra cứu sau nạp các mã vừa sinh vào Bloom filter
+            self._checked_at = 0.0
+        return quantity
+
+    def _fresh_chunk(self, size, seen):
+        """`size` giá trị ngẫu nhiên không trùng nhau và không trùng `seen` (giữ thứ tự sinh)"""
+        values = np.empty(0, dtype=np.uint64)
+        hashes = np.empty(0, dtype=np.int64)
+        while len(values) < size:
+            candidates = _random_values(size - len(values) + 16)
+            candidate_hashes = _mix(candidates)
+            keep = ~np.isin(candidate_hashes, seen)
+            values = np.concatenate([values, candidates[keep]])
+            hashes = np.concatenate([hashes, candidate_hashes[keep]])
+            _, first = np.unique(hashes, return_index=True)
+            first.sort()
+            values, hashes = values[first], hashes[first]
+        return values[:size], hashes[:size]
+
+    def _insert_chunk(self, item_id, values, hashes):
+        db.session.execute(VoucherCode.__table__.insert(), [
+            {'item_id': item_id, 'code': code, 'code_hash': int(h), 'status': 'available'}
+            for code, h in zip(_encode(values), hashes)
+        ])
+        db.session.query(MarketplaceItem).filter_by(id=item_id).update(
+            {MarketplaceItem.quantity: db.func.coalesce(MarketplaceItem.quantity, 0) + len(values)},
+            synchronize_session=False
+        )
+        quantity = db.session.query(MarketplaceItem.quantity).filter_by(id=item_id).scalar()
+        db.session.commit()
+        return quantity
+
+    def _existing_hashes(self, hashes):
+        found = []
+        for start in range(0, len(hashes), LOOKUP_CHUNK):
+            batch = [int(h) for h in hashes[start:start + LOOKUP_CHUNK]]
+            found.extend(h for (h,) in db.session.query(VoucherCode.code_hash)
+                         .filter(VoucherCode.code_hash.in_(batch)).all())
+        return np.array(found, dtype=np.int64)
+
+    # --------------------------------------------------------------- gán mã
+
+    def assign(self, item_id, orders):
+        """Gán mã trống cho các lượt mua [(customer_id, quantity), ...] trong transaction hiện tại
+
+        Trả về danh sách mã (đã định dạng) theo từng lượt mua, hoặc None nếu vật
+        phẩm không dùng kho mã. Không commit; caller commit cùng giao dịch SVT.
+        """
+        needed = sum(quantity for _, quantity in orders)
+        rows = (db.session.query(VoucherCode.id, VoucherCode.code)
+                .filter(VoucherCode.item_id == item_id, VoucherCode.status == 'available')
+                .order_by(VoucherCode.id)
+                .limit(needed)
+                .with_for_update(skip_locked=True)
+                .all())
+        if len(rows) < needed:
+            if not rows and not db.session.query(VoucherCode.id).filter_by(item_id=item_id).first():
+                return None
+            raise VoucherPoolExhausted(f"Item {item_id} chỉ còn {len(rows)} mã voucher")
+
+        now = datetime.datetime.utcnow()
+        params, codes, position = [], [], 0
+        for customer_id, quantity in orders:
+            picked = rows[position:position + quantity]
+            position += quantity
+            params.extend({'voucher_pk': row.id, 'owner_id': customer_id} for row in picked)
+            codes.append([format_code(row.code) for row in picked])
+
+        vouchers = VoucherCode.__table__
+        updated = db.session.execute(
+            vouchers.update()
+            .where(vouchers.c.id == bindparam('voucher_pk'), vouchers.c.status == 'available')
+            .values(status='assigned', customer_id=bindparam('owner_id'), assigned_at=now),
+            params
+        ).rowcount
+        if updated != len(params):
+            raise RuntimeError(f"{len(params) - updated} mã voucher đã được gán cho đơn khác")
+        return codes
+
+    # ------------------------------------------------------------- tra cứu
+
+    def lookup(self, code):
+        """VoucherCode của mã khách nhập, hoặc None nếu mã không tồn tại"""
+        normalized = normalize_code(code)
+        if normalized is None:
+            return None
+        value = code_hash(normalized)
+        if not self.might_exist(value):
+            return None
+        voucher = db.session.query(VoucherCode).filter_by(code_hash=value).first()
+        if voucher is None or voucher.code != normalized:
+            return None
+        return voucher
+
+    def might_exist(self, value):
+        """Kiểm tra Bloom filter (nạp / cập nhật từ database khi cần)"""
+        with self._lock:
+            now = time.monotonic()
+            if self._bloom is None:
+                self._rebuild_locked()
+            elif now - self._checked_at > BLOOM_REFRESH_SECONDS:
+                self._refresh_locked()
+            return self._bloom.might_contain(value)
+
+    def _rebuild_locked(self):
+        total = db.session.query(db.func.count(VoucherCode.id)).scalar() or 0
+        self._bloom = VoucherBloomFilter(max(BLOOM_MIN_CAPACITY, 2 * total))
+        self._max_id = 0
+        self._load_locked()
+
+    def _refresh_locked(self):
+        self._load_locked()
+        if self._bloom.count > self._bloom.capacity:
+            # Quá dung lượng thì tỉ lệ dương tính giả tăng: dựng lại filter lớn hơn
+            self._rebuild_locked()
+
+    def _load_locked(self):
+        """Nạp hash của các mã có id > _max_id theo từng khối"""
+        while True:
+            rows = (db.session.query(VoucherCode.id, VoucherCode.code_hash)
+                    .filter(VoucherCode.id > self._max_id)
+                    .order_by(VoucherCode.id)
+                    .limit(GENERATE_CHUNK)
+                    .all())
+            if not rows:
+                break
+            self._bloom.add(np.fromiter((h for _, h in rows), dtype=np.int64, count=len(rows)))
+            self._max_id = rows[-1][0]
+        self._checked_at = time.monotonic()
+
+
+voucher_pool = VoucherPool()
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Activity bitmap benchmark
+Sinh bitmap đăng nhập một năm (46 byte / khách hàng) cho 1 triệu khách hàng
+và đo các phép tính vector hóa trên ma trận cửa sổ: giải nén bit, chuỗi hiện
+tại, chuỗi dài nhất, "hoạt động N trong M ngày" và retention theo cohort tuần
+(chỉ numpy trong bộ nhớ, không database).
+
+    python test/bench_activity_bitmaps.py
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+
+import numpy as np
+
+from models.activity import BITMAP_BYTES
+from services.activity_bitmaps import current_streaks, longest_streaks, cohort_retention
+
+CUSTOMERS = 1000000
+WINDOW_DAYS = 90
+END_DAY = 300  # ngày thứ 301 trong năm
+
+
+def generate(count, seed=0):
+    """Bitmap ngẫu nhiên: mỗi khách có xác suất đăng nhập mỗi ngày riêng (0-90%)"""
+    rng = np.random.default_rng(seed)
+    probability = rng.random(count, dtype=np.float32)[:, None] * 0.9
+    days = rng.random((count, BITMAP_BYTES * 8), dtype=np.float32) < probability
+    return np.packbits(days, axis=1, bitorder='little')
+
+
+def timed(label, func):
+    started = time.perf_counter()
+    result = func()
+    print(f"  {label}: {time.perf_counter() - started:.2f}s")
+    return result
+
+
+def run():
+    print(f"🚀 {CUSTOMERS:,} khách hàng, cửa sổ {WINDOW_DAYS} ngày")
+    packed = generate(CUSTOMERS)
+    print(f"  Bitmap: {packed.nbytes / 1024 / 1024:.0f} MB")
+
+    matrix = timed("Giải nén cửa sổ", lambda: np.unpackbits(packed, axis=1, bitorder='little')
+                   [:, END_DAY - WINDOW_DAYS + 1:END_DAY + 1].astype(bool))
+    streaks = timed("Chuỗi hiện tại", lambda: current_streaks(matrix))
+    longest = timed("Chuỗi dài nhất", lambda: longest_streaks(matrix))
+    active = timed("Hoạt động 20/30 ngày", lambda: matrix[:, -30:].sum(axis=1) >= 20)
+    sizes, rates = timed("Retention cohort tuần", lambda: cohort_retention(matrix, period_days=7))
+
+    assert (streaks <= longest).all() and (longest <= WINDOW_DAYS).all()
+    print(f"📊 Chuỗi ≥7 ngày: {(streaks >= 7).sum():,}, chuỗi dài nhất TB {longest.mean():.1f}, "
+          f"20/30 ngày: {active.sum():,}, retention tuần 1 của cohort đầu {rates[0, 1]:.1%} ({sizes[0]:,} khách)")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark ID generator
+Đo tốc độ sinh ID và kiểm tra không trùng khi chạy đồng thời nhiều thread / process
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from services.id_generator import SnowflakeIdGenerator
+
+SINGLE_COUNT = 1_000_000
+BATCH_COUNT = 5_000_000
+THREADS = 8
+PER_THREAD = 200_000
+PROCESSES = 4
+PER_PROCESS = 500_000
+
+
+def bench_single():
+    """Đo next_id() gọi lẻ từng ID"""
+    generator = SnowflakeIdGenerator(worker_id=1)
+    started = time.perf_counter()
+    ids = [generator.next_id() for _ in range(SINGLE_COUNT)]
+    elapsed = time.perf_counter() - started
+    assert len(set(ids)) == len(ids)
+    print(f"🔢 next_id():  {SINGLE_COUNT / elapsed:,.0f} IDs/s")
+
+
+def bench_batch():
+    """Đo next_ids() cấp phát theo lô"""
+    generator = SnowflakeIdGenerator(worker_id=2)
+    started = time.perf_counter()
+    ids = []
+    for _ in range(BATCH_COUNT // 10_000):
+        ids.extend(generator.next_ids(10_000))
+    elapsed = time.perf_counter() - started
+    assert len(set(ids)) == len(ids)
+    print(f"📦 next_ids(): {BATCH_COUNT / elapsed:,.0f} IDs/s")
+
+
+def bench_threads():
+    """Nhiều thread dùng chung một generator"""
+    generator = SnowflakeIdGenerator(worker_id=3)
+    results = [None] * THREADS
+
+    def worker(slot):
+        results[slot] = [generator.next_id() for _ in range(PER_THREAD)]
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    all_ids = [value for chunk in results for value in chunk]
+    collisions = len(all_ids) - len(set(all_ids))
+    print(f"🧵 {THREADS} threads: {len(all_ids) / elapsed:,.0f} IDs/s - collisions: {collisions}")
+    return collisions
+
+
+def _process_worker(worker_id):
+    generator = SnowflakeIdGenerator(worker_id=worker_id)
+    return generator.next_ids(PER_PROCESS)
+
+
+def bench_processes():
+    """Nhiều process, mỗi process một worker id"""
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=PROCESSES) as pool:
+        chunks = list(pool.map(_process_worker, range(10, 10 + PROCESSES)))
+    elapsed = time.perf_counter() - started
+    all_ids = [value for chunk in chunks for value in chunk]
+    collisions = len(all_ids) - len(set(all_ids))
+    print(f"⚙️  {PROCESSES} processes: {len(all_ids) / elapsed:,.0f} IDs/s - collisions: {collisions}")
+    return collisions
+
+
+if __name__ == "__main__":
+    print("🚀 ID generator benchmark")
+    bench_single()
+    bench_batch()
+    collisions = bench_threads() + bench_processes()
+    print("✅ Không có ID trùng" if collisions == 0 else f"❌ {collisions} ID trùng")
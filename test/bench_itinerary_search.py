@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark itinerary search
+Dựng mạng bay tổng hợp vài nghìn chuyến/ngày trong ScheduleIndex (không cần
+database), đo thời gian tìm k hành trình rẻ nhất / nhanh nhất và so kết quả
+với vét cạn mọi hành trình hợp lệ trên một phần các truy vấn
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datetime
+import random
+import statistics
+import time
+
+from services.flight_schedule import ScheduleIndex
+from services.itinerary_search import (ItinerarySearch, DAY_MINUTES, DEFAULT_MAX_LAYOVER, DEFAULT_MAX_STOPS,
+                                       DEFAULT_MIN_CONNECTION, _connection_minutes)
+
+AIRPORTS = 80
+HUBS = 6
+SPOKE_ROUTES = 6       # số tuyến từ mỗi sân bay nhỏ
+FLIGHTS_PER_HUB_ROUTE = 8
+FLIGHTS_PER_SPOKE_ROUTE = 3
+QUERIES = 200
+VERIFY_QUERIES = 30    # số truy vấn so với vét cạn
+
+
+def build_network(seed=42):
+    """Mạng hub-and-spoke: hub nối với nhau dày đặc, sân bay nhỏ nối với hub và vài sân bay khác"""
+    rng = random.Random(seed)
+    codes = [f"A{i:02d}" for i in range(AIRPORTS)]
+    hubs = codes[:HUBS]
+    routes = set()
+    for a in hubs:
+        for b in codes:
+            if a != b:
+                routes.add((a, b))
+                routes.add((b, a))
+    for a in codes[HUBS:]:
+        for b in rng.sample(codes[HUBS:], SPOKE_ROUTES):
+            if a != b:
+                routes.add((a, b))
+
+    today = datetime.date.today()
+    grouped = {}
+    flight_id = 0
+    for origin, destination in routes:
+        per_day = FLIGHTS_PER_HUB_ROUTE if origin in hubs and destination in hubs else FLIGHTS_PER_SPOKE_ROUTE
+        duration = rng.randrange(50, 240, 5)
+        fare = rng.randrange(800, 4000) * 1000
+        rows = []
+        for _ in range(per_day):
+            flight_id += 1
+            rows.append({
+                'id': flight_id,
+                'flight_number': f"VJ{flight_id}",
+                'departure_minute': rng.randrange(5 * 60, 23 * 60, 5),
+                'duration_minutes': duration,
+                'days_of_week': 127,
+                'valid_from': today,
+                'valid_to': None,
+                'aircraft': 'Airbus A321',
+                'fare_economy': fare,
+                'fare_business': fare * 2.5,
+                'seats_economy': 180,
+                'seats_business': 12
+            })
+        grouped[(origin, destination)] = rows
+    return codes, grouped, flight_id
+
+
+def brute_force(search, origin, destination, date, k, mode, ticket_class='economy'):
+    """k giá trị mục tiêu tốt nhất (giá hoặc thời gian) bằng cách liệt kê mọi hành trình hợp lệ"""
+    departures_from = search._merged_board(date)
+    max_legs = DEFAULT_MAX_STOPS + 1
+    found = []
+
+    def extend(path, fare, first_departure, arrival):
+        flight = path[-1]
+        if flight['destination'] == destination:
+            found.append(fare if mode == 'cheapest' else arrival - first_departure)
+            return
+        if len(path) == max_legs:
+            return
+        visited = {origin}.union(leg['destination'] for leg in path)
+        times, flights = departures_from(flight['destination'])
+        for departure, (_, next_flight) in zip(times, flights):
+            if departure - arrival < _connection_minutes(flight, next_flight, DEFAULT_MIN_CONNECTION) \
+                    or departure > arrival + DEFAULT_MAX_LAYOVER:
+                continue
+            if next_flight['destination'] in visited:
+                continue
+            if len(path) + 1 == max_legs and next_flight['destination'] != destination:
+                continue
+            extend(path + [next_flight], fare + next_flight['prices'][ticket_class],
+                   first_departure, departure + next_flight['duration_minutes'])
+
+    times, flights = departures_from(origin)
+    for departure, (_, flight) in zip(times, flights):
+        if departure < DAY_MINUTES:
+            extend([flight], flight['prices'][ticket_class], departure, departure + flight['duration_minutes'])
+    return sorted(found)[:k]
+
+
+def verify(search, pairs, date, k=5):
+    """So giá trị mục tiêu của k kết quả với vét cạn; trả về số truy vấn lệch"""
+    mismatches = 0
+    for mode, field in (('cheapest', 'total_price'), ('fastest', 'total_duration_minutes')):
+        for origin, destination in pairs:
+            expected = brute_force(search, origin, destination, date, k, mode)
+            actual = [itinerary[field] for itinerary in search.search(origin, destination, date, k=k, mode=mode)]
+            if actual != expected:
+                mismatches += 1
+                print(f"❌ {mode} {origin}-{destination}: {actual} != vét cạn {expected}")
+    return mismatches
+
+
+def run():
+    codes, grouped, total = build_network()
+    index = ScheduleIndex(horizon=60, refresh_interval=float('inf'))
+    started = time.perf_counter()
+    index.build_from_rows(grouped)
+    print(f"🛫 {len(grouped)} tuyến, {total} chuyến/ngày - dựng index {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    search = ItinerarySearch(index)
+    date = datetime.date.today() + datetime.timedelta(days=20)
+    index.departures(date)
+    index.departures(date + datetime.timedelta(days=1))
+
+    rng = random.Random(7)
+    pairs = [tuple(rng.sample(codes[HUBS:], 2)) for _ in range(QUERIES)]
+    for mode in ('cheapest', 'fastest'):
+        timings, found = [], 0
+        for origin, destination in pairs:
+            started = time.perf_counter()
+            results = search.search(origin, destination, date, k=5, mode=mode)
+            timings.append((time.perf_counter() - started) * 1000)
+            found += bool(results)
+        timings.sort()
+        print(f"🔎 {mode}: median {statistics.median(timings):.1f} ms, "
+              f"p95 {timings[int(len(timings) * 0.95)]:.1f} ms, max {timings[-1]:.1f} ms "
+              f"- có kết quả {found}/{len(pairs)}")
+
+    started = time.perf_counter()
+    for origin, destination in pairs:
+        search.search(origin, destination, date, k=5, mode='cheapest')
+    print(f"⚡ cache hit: {(time.perf_counter() - started) * 1000 / len(pairs):.3f} ms/truy vấn")
+
+    mismatches = verify(search, pairs[:VERIFY_QUERIES], date)
+    print(f"❌ {mismatches} truy vấn lệch so với vét cạn" if mismatches
+          else f"✅ {VERIFY_QUERIES} truy vấn x 2 chế độ khớp vét cạn")
+    assert not mismatches
+
+
+if __name__ == "__main__":
+    run()
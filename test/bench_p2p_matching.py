@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+P2P matching engine benchmark
+Đẩy một luồng lệnh mua / bán ngẫu nhiên quanh một mức giá vào OrderBook và
+đo số lệnh khớp được mỗi giây (chỉ engine trong bộ nhớ, không database).
+Kiểm tra thêm: mọi giao dịch đúng ưu tiên giá và khối lượng khớp hai phía bằng nhau.
+
+    python test/bench_p2p_matching.py
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import statistics
+import time
+
+from services.p2p_matching import OrderBook, Order
+
+ORDERS = 200000
+RUNS = 5
+MID_PRICE = 100.0
+CANCEL_RATIO = 0.05
+
+
+def generate(count, seed):
+    """Lệnh ngẫu nhiên: giá quanh MID_PRICE (bước 0.5), khối lượng 1-10, 1000 khách"""
+    rng = random.Random(seed)
+    orders = []
+    for i in range(count):
+        side = 'buy' if rng.random() < 0.5 else 'sell'
+        offset = rng.randint(-20, 20) * 0.5
+        orders.append(Order(f"O{i}", side, MID_PRICE + offset, rng.randint(1, 10), owner=rng.randint(1, 1000)))
+    return orders
+
+
+def run_once(seed):
+    orders = generate(ORDERS, seed)
+    rng = random.Random(seed + 1)
+    book = OrderBook()
+    trades = 0
+    volume = {'buy': 0, 'sell': 0}
+    started = time.perf_counter()
+    for order in orders:
+        for trade in book.submit(order):
+            trades += 1
+            assert trade.buy.price >= trade.price >= trade.sell.price
+            volume['buy'] += trade.quantity
+            volume['sell'] += trade.quantity
+        if rng.random() < CANCEL_RATIO:
+            book.cancel(f"O{rng.randrange(int(order.order_id[1:]) + 1)}")
+    elapsed = time.perf_counter() - started
+    assert volume['buy'] == volume['sell']
+    return elapsed, trades, len(book)
+
+
+def run():
+    print(f"🚀 {ORDERS:,} lệnh mỗi lượt, {RUNS} lượt, hủy {CANCEL_RATIO:.0%} lệnh")
+    timings = []
+    for i in range(RUNS):
+        elapsed, trades, resting = run_once(seed=i)
+        timings.append(elapsed)
+        print(f"  Lượt {i + 1}: {elapsed:.2f}s - {ORDERS / elapsed:,.0f} lệnh/s, {trades:,} giao dịch, "
+              f"{resting:,} lệnh còn trên sổ")
+    median = statistics.median(timings)
+    print(f"📊 Median: {ORDERS / median:,.0f} lệnh/s")
+
+
+if __name__ == "__main__":
+    run()
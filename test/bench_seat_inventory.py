@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Seat inventory concurrency benchmark
+Nhiều luồng cùng đặt vé một chuyến bay "hot" qua VietjetService.book_flight,
+kiểm tra không bán quá số ghế và đo throughput.
+
+    BENCH_DATABASE_URL=mysql+pymysql://... python test/bench_seat_inventory.py
+    (mặc định dùng database trong config.py)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datetime
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask
+from models.database import db
+from config import Config
+
+CAPACITY = 150
+ATTEMPTS = 400
+WORKERS = 100
+BENCH_CUSTOMER_BASE = 990000
+
+
+def create_app():
+    """Create Flask app for benchmarking"""
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if os.environ.get('BENCH_DATABASE_URL'):
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['BENCH_DATABASE_URL']
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_size': WORKERS, 'max_overflow': 10}
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
+    db.init_app(app)
+    with app.app_context():
+        from models import transactions, missions, hdbank_card
+        transactions.init_db(db)
+        missions.init_db(db)
+        hdbank_card.init_db(db)
+        from models import user, customer, achievements, marketplace, statements, flights, resorts
+        db.create_all()
+    return app
+
+
+def prepare(app, flight_date):
+    """Tạo khách hàng benchmark và đặt lại tồn kho chuyến bay về CAPACITY ghế"""
+    from models.customer import Customer
+    from models.flights import VietjetSeatInventory, create_default_schedules
+    from services.flight_schedule import get_schedule_index
+
+    with app.app_context():
+        create_default_schedules()
+        existing = {c for (c,) in db.session.query(Customer.customer_id)
+                    .filter(Customer.customer_id >= BENCH_CUSTOMER_BASE).all()}
+        for i in range(ATTEMPTS):
+            if BENCH_CUSTOMER_BASE + i not in existing:
+                db.session.add(Customer(customer_id=BENCH_CUSTOMER_BASE + i, name=f'Bench {i}'))
+        db.session.commit()
+
+        flight = get_schedule_index().flights('HAN', 'SGN', flight_date)[0]
+        VietjetSeatInventory.query.filter_by(flight_number=flight['flight_number'], flight_date=flight_date,
+                                             ticket_class='economy').delete()
+        db.session.add(VietjetSeatInventory(flight_number=flight['flight_number'], flight_date=flight_date,
+                                            ticket_class='economy', capacity=CAPACITY, available=CAPACITY))
+        db.session.commit()
+        return flight['flight_number']
+
+
+def run():
+    from services.vietjet_service import VietjetService
+    from models.flights import VietjetSeatInventory
+
+    app = create_app()
+    flight_date = datetime.date.today() + datetime.timedelta(days=200)
+    flight_number = prepare(app, flight_date)
+    service = VietjetService()
+
+    def book(i):
+        with app.app_context():
+            result = service.book_flight(
+                customer_id=BENCH_CUSTOMER_BASE + i, origin='HAN', destination='SGN',
+                flight_date=flight_date.strftime('%Y-%m-%d'), flight_number=flight_number
+            )
+            if result['success']:
+                return 'booked'
+            return 'sold_out' if 'hết ghế' in result['message'] else 'error'
+
+    print(f"🚀 {ATTEMPTS} lượt đặt vé, {WORKERS} luồng, chuyến {flight_number} còn {CAPACITY} ghế")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        outcomes = Counter(pool.map(book, range(ATTEMPTS)))
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        inventory = VietjetSeatInventory.query.filter_by(
+            flight_number=flight_number, flight_date=flight_date, ticket_class='economy').first()
+        remaining = inventory.available
+
+    print(f"📊 Kết quả: {dict(outcomes)}")
+    print(f"⏱️  {elapsed:.2f}s - {ATTEMPTS / elapsed:,.0f} lượt/s, {outcomes['booked'] / elapsed:,.0f} vé/s")
+    print(f"🪑 Ghế còn lại: {remaining}")
+    oversold = outcomes['booked'] > CAPACITY or remaining < 0 or outcomes['booked'] + remaining != CAPACITY
+    print("❌ OVERSELL / lệch tồn kho" if oversold else "✅ Không bán quá số ghế, tồn kho khớp số vé đã bán")
+
+
+if __name__ == "__main__":
+    run()
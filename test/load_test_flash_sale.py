@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Flash sale load test
+Mở flash sale cho một voucher rồi cho nhiều luồng cùng mua qua
+MarketplaceService.purchase_item; đo throughput, kiểm tra không bán quá số
+lượng, số giao dịch SVT khớp với tồn kho đã trừ và không khách nào nhận
+"sold out" khi tồn kho vẫn còn.
+
+    BENCH_DATABASE_URL=mysql+pymysql://... python test/load_test_flash_sale.py
+    (mặc định dùng database trong config.py)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask
+from models.database import db
+from config import Config
+
+STOCK = 1000
+CUSTOMERS = 5000
+WORKERS = 200
+PRICE_SVT = 100
+BENCH_CUSTOMER_BASE = 980000
+RETRY_DELAY = 0.05
+
+
+def create_app():
+    """Create Flask app for load testing"""
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if os.environ.get('BENCH_DATABASE_URL'):
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['BENCH_DATABASE_URL']
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
+    db.init_app(app)
+    with app.app_context():
+        from models import transactions, missions, hdbank_card
+        transactions.init_db(db)
+        missions.init_db(db)
+        hdbank_card.init_db(db)
+        from models import user, customer, achievements, marketplace, statements, flights, resorts
+        db.create_all()
+    return app
+
+
+def prepare(app):
+    """Tạo khách hàng benchmark (1/10 không đủ SVT) và một voucher STOCK suất"""
+    from models.customer import Customer
+    from models.marketplace import MarketplaceItem
+    from models.transactions import TokenTransaction
+
+    with app.app_context():
+        existing = {c for (c,) in db.session.query(Customer.customer_id)
+                    .filter(Customer.customer_id >= BENCH_CUSTOMER_BASE).all()}
+        new_ids = [BENCH_CUSTOMER_BASE + i for i in range(CUSTOMERS) if BENCH_CUSTOMER_BASE + i not in existing]
+        if new_ids:
+            db.session.execute(Customer.__table__.insert(), [
+                {'customer_id': customer_id, 'name': f'Flash {customer_id}'} for customer_id in new_ids
+            ])
+        db.session.execute(TokenTransaction.__table__.insert(), [{
+            'customer_id': BENCH_CUSTOMER_BASE + i,
+            'transaction_type': 'load_test_topup',
+            'amount': PRICE_SVT if i % 10 else PRICE_SVT / 2,
+            'description': 'Flash sale load test top-up',
+            'tx_hash': f"0x{uuid.uuid4().hex}",
+            'block_number': 1
+        } for i in range(CUSTOMERS)])
+
+        item = MarketplaceItem(name=f'Flash voucher {uuid.uuid4().hex[:6]}', description='Load test',
+                               price_svt=PRICE_SVT, quantity=STOCK, partner_brand='Sovico', is_active=True)
+        db.session.add(item)
+        db.session.commit()
+        return item.id, item.name
+
+
+def run():
+    app = create_app()
+    from services.marketplace_service import MarketplaceService
+    from services.flash_sale import flash_sales
+    from models.marketplace import MarketplaceItem
+    from models.transactions import TokenTransaction
+
+    item_id, item_name = prepare(app)
+    service = MarketplaceService()
+    with app.app_context():
+        sale = flash_sales.start(app, item_id, per_customer_limit=1)
+
+    def buy(i):
+        with app.app_context():
+            result = service.purchase_item(BENCH_CUSTOMER_BASE + i, item_id, 1)
+            while result.get('retry'):
+                time.sleep(RETRY_DELAY)
+                result = service.purchase_item(BENCH_CUSTOMER_BASE + i, item_id, 1)
+            if result['success']:
+                return 'queued' if result.get('queued') else 'bought'
+            if result.get('sold_out'):
+                return 'sold_out'
+            return 'no_balance' if 'balance' in result['error'] else 'error'
+
+    print(f"🚀 {CUSTOMERS} khách, {WORKERS} luồng, voucher {item_id} còn {STOCK} suất")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        outcomes = Counter(pool.map(buy, range(CUSTOMERS)))
+    elapsed = time.perf_counter() - started
+    flash_sales.stop(item_id)
+
+    with app.app_context():
+        remaining = db.session.query(MarketplaceItem.quantity).filter_by(id=item_id).scalar()
+        purchases = TokenTransaction.query.filter(
+            TokenTransaction.transaction_type == 'marketplace_purchase',
+            TokenTransaction.description == f"Mua 1x {item_name}"
+        ).count()
+
+    print(f"📊 Kết quả: {dict(outcomes)} - {sale.stats['batches']} batch ghi database, "
+          f"{sale.stats['retry']} lượt thử lại")
+    print(f"⏱️  {elapsed:.2f}s - {CUSTOMERS / elapsed:,.0f} request/s, {outcomes['bought'] / elapsed:,.0f} đơn/s")
+    print(f"🎫 Còn lại: {remaining}, giao dịch mua: {purchases}")
+    oversold = purchases > STOCK or remaining < 0 or purchases + remaining != STOCK \
+        or purchases != outcomes['bought'] + outcomes['queued']
+    print("❌ OVERSELL / lệch tồn kho" if oversold else "✅ Không bán quá số lượng, tồn kho khớp số đơn đã ghi")
+    # Đã báo "sold out" cho khách thì tồn kho phải thật sự về 0
+    undersold = outcomes['sold_out'] > 0 and remaining != 0
+    print(f"❌ {outcomes['sold_out']} khách nhận sold out nhưng còn {remaining} suất" if undersold
+          else "✅ Chỉ báo sold out khi tồn kho đã hết")
+    assert not oversold and not undersold
+
+
+if __name__ == "__main__":
+    run()
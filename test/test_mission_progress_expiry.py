@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Mission progress expiry regression test
+Mission lặp lại đã quá expires_at (mission_sweeper chưa kịp đánh dấu
+'expired') hoặc đã đóng không được cộng tiến độ nữa; mission còn hạn vẫn được
+cộng bình thường.
+
+    python test/test_mission_progress_expiry.py
+    (mặc định dùng SQLite tạm; MISSION_TEST_DATABASE_URL để chạy trên database khác)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datetime
+import tempfile
+
+from flask import Flask
+from models.database import db
+
+CUSTOMER_ID = 990101
+
+
+def create_app():
+    """Create Flask app on a throwaway database"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('MISSION_TEST_DATABASE_URL') or \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'mission_progress_expiry.db')}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        from models import transactions, missions, hdbank_card
+        transactions.init_db(db)
+        missions.init_db(db)
+        hdbank_card.init_db(db)
+        from models import user, customer, achievements, marketplace, flights, resorts
+        db.create_all()
+    return app
+
+
+def test_expired_mission_progress_unchanged(app=None):
+    """apply_progress chỉ cộng vào mission còn mở và chưa hết hạn"""
+    app = app or create_app()
+    from models.customer import Customer
+    from models.missions import CustomerMission, CustomerMissionProgress
+    from services.mission_progress import apply_progress
+
+    now = datetime.datetime.utcnow()
+    missions = {
+        'expired_daily': ('available', now - datetime.timedelta(minutes=1)),
+        'closed_daily': ('expired', now + datetime.timedelta(hours=1)),
+        'open_daily': ('in_progress', now + datetime.timedelta(hours=1)),
+        'open_forever': ('available', None),
+    }
+    with app.app_context():
+        db.session.add(Customer(customer_id=CUSTOMER_ID, name='Mission expiry'))
+        for mission_id, (status, expires_at) in missions.items():
+            db.session.add(CustomerMission(customer_id=CUSTOMER_ID, mission_id=mission_id, mission_title=mission_id,
+                                           mission_category='lifestyle', mission_level='Beginner',
+                                           status=status, expires_at=expires_at))
+            db.session.add(CustomerMissionProgress(customer_id=CUSTOMER_ID, mission_id=mission_id,
+                                                   requirement_key='login_count', current_value=0,
+                                                   required_value=5, is_completed=False))
+        db.session.commit()
+
+        apply_progress({(CUSTOMER_ID, 'login_count'): 1}, increment=True)
+
+        db.session.expire_all()
+        values = {row.mission_id: float(row.current_value) for row in
+                  CustomerMissionProgress.query.filter_by(customer_id=CUSTOMER_ID).all()}
+        assert values == {'expired_daily': 0, 'closed_daily': 0, 'open_daily': 1, 'open_forever': 1}, values
+
+
+if __name__ == "__main__":
+    test_expired_mission_progress_unchanged()
+    print("✅ Mission hết hạn / đã đóng không bị cộng tiến độ")
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+P2P cold market regression test
+Lệnh đầu tiên của một vật phẩm chưa có market: lệnh được commit trước khi
+submit nên luồng market mới nạp nó từ database; lệnh submit tương ứng không
+được khớp thêm lần nữa (trước đây lệnh mua 1 suất khớp 2 tin đăng, tin đăng
+đã bán lại bị báo "pending").
+
+    python test/test_p2p_cold_market.py
+    (mặc định dùng SQLite tạm; P2P_TEST_DATABASE_URL để chạy trên database khác)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import uuid
+
+from flask import Flask
+from models.database import db
+
+SELLER_ID = 990001
+BUYER_ID = 990002
+PRICE_SVT = 10
+
+
+def create_app():
+    """Create Flask app on a throwaway database"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('P2P_TEST_DATABASE_URL') or \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'p2p_cold_market.db')}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
+    db.init_app(app)
+    with app.app_context():
+        from models import transactions, missions, hdbank_card
+        transactions.init_db(db)
+        missions.init_db(db)
+        hdbank_card.init_db(db)
+        from models import user, customer, achievements, marketplace, flights, resorts
+        db.create_all()
+        from models.customer import Customer
+        from models.transactions import TokenTransaction
+        for customer_id in (SELLER_ID, BUYER_ID):
+            if not Customer.query.filter_by(customer_id=customer_id).first():
+                db.session.add(Customer(customer_id=customer_id, name=f'P2P {customer_id}'))
+                db.session.add(TokenTransaction(customer_id=customer_id, transaction_type='test_topup',
+                                                amount=1000, tx_hash=f"0x{uuid.uuid4().hex}", block_number=1))
+        db.session.commit()
+    return app
+
+
+def _svt_received(customer_id, item_name):
+    from models.transactions import TokenTransaction
+    return float(db.session.query(db.func.coalesce(db.func.sum(TokenTransaction.amount), 0)).filter(
+        TokenTransaction.customer_id == customer_id,
+        TokenTransaction.transaction_type == 'p2p_sale',
+        TokenTransaction.description.like(f"%{item_name.lower()}%")
+    ).scalar())
+
+
+def test_cold_buy_order_fills_once(app=None):
+    """Lệnh mua 1 suất là lệnh đầu tiên của market: khớp đúng 1 tin đăng"""
+    app = app or create_app()
+    from models.marketplace import P2PListing
+    from services.marketplace_service import MarketplaceService
+    item_name = f"Cold buy {uuid.uuid4().hex[:8]}"
+    with app.test_request_context():
+        for _ in range(2):
+            db.session.add(P2PListing(seller_customer_id=SELLER_ID, item_name=item_name,
+                                      price_svt=PRICE_SVT, status='active'))
+        db.session.commit()
+
+        result = MarketplaceService().place_buy_order(BUYER_ID, item_name, PRICE_SVT, 1)
+        assert result['success'] and not result.get('pending'), result
+        assert result['filled'] == 1, result
+
+        db.session.expire_all()
+        sold = P2PListing.query.filter_by(item_name=item_name, status='sold').count()
+        assert sold == 1, f"{sold} tin đăng bị bán cho lệnh mua 1 suất"
+        assert _svt_received(SELLER_ID, item_name) == PRICE_SVT
+
+
+def test_cold_listing_sells_once(app=None):
+    """Tin đăng là lệnh đầu tiên gửi tới market có sẵn lệnh mua: bán ngay, không báo pending"""
+    app = app or create_app()
+    from models.marketplace import P2POrder, P2PListing
+    from services.id_generator import new_id
+    from services.marketplace_service import MarketplaceService
+    from services.p2p_matching import market_key
+    item_name = f"Cold sell {uuid.uuid4().hex[:8]}"
+    with app.test_request_context():
+        db.session.add(P2POrder(order_id=new_id('P2PO'), customer_id=BUYER_ID, market=market_key(item_name),
+                                price_svt=PRICE_SVT, quantity=1, filled_quantity=0, status='open'))
+        db.session.commit()
+
+        result = MarketplaceService().create_p2p_listing(SELLER_ID, item_name, 'x', PRICE_SVT)
+        assert result['success'] and not result.get('pending'), result
+        assert result['sold'], result
+
+        db.session.expire_all()
+        listing = db.session.get(P2PListing, result['listing_id'])
+        assert listing.status == 'sold' and listing.buyer_customer_id == BUYER_ID
+        assert _svt_received(SELLER_ID, item_name) == PRICE_SVT
+
+
+if __name__ == "__main__":
+    shared_app = create_app()
+    test_cold_buy_order_fills_once(shared_app)
+    print("✅ Lệnh mua đầu tiên của market khớp đúng một lần")
+    test_cold_listing_sells_once(shared_app)
+    print("✅ Tin đăng đầu tiên của market bán đúng một lần")